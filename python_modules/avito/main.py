@@ -77,7 +77,7 @@ def main():
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        set_script_end(script_name, status="done")
+        set_script_end(script_name, status="done", items=len(updated_files))
 
         logging.info("=== Update finished successfully ===")
         TelegramNotifier.notify(f"[Avito] Update completed successfully — Duration: {duration:.2f}s")
@@ -0,0 +1,115 @@
+"""
+Замер планировщика запусков: прежний ежеминутный опрос против ScheduleEngine.
+
+Прежний цикл раз в 60 секунд читал все записи LIKE '%.schedule.%' и разбирал
+каждое cron-выражение; здесь замеряется CPU одного такого тика на временной
+SQLite-базе с --schedules записями. Для ScheduleEngine замеряются построение
+кучи из той же базы и CPU процесса за --duration секунд реальной работы.
+Чтобы за короткий прогон были запуски, к записям добавляются --probes
+секундных выражений ("* * * * * S"); по ним считается точность срабатывания -
+опоздание пробуждения относительно запланированного времени.
+
+Использование:
+    python bench_schedule.py --schedules 5000 --duration 30
+"""
+import os
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+
+def legacy_get_due_schedules(dm, croniter, now):
+    """get_due_schedules до ScheduleEngine: опрос и разбор всех записей на каждом тике"""
+    result = []
+    for name, cron_expr in dm.get_all_configs_like("%.schedule.%"):
+        try:
+            base_time = now.replace(second=0, microsecond=0)
+            itr = croniter(cron_expr, base_time - timedelta(minutes=1))
+            if itr.get_next(datetime) == base_time:
+                result.append({"script_name": name.split(".")[0], "cron_expr": cron_expr})
+        except Exception:
+            pass
+    return result
+
+
+def random_schedule(rng):
+    hour, minute = rng.randrange(24), rng.randrange(60)
+    days = sorted(rng.sample(range(1, 8), rng.randint(1, 7)))
+    return (
+        f"script{rng.randrange(20)}.schedule.{hour:02d}_{minute:02d}_{'_'.join(map(str, days))}",
+        f"{minute} {hour} * * {','.join(map(str, days))}",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bz_telebot schedule runner")
+    parser.add_argument("--schedules", type=int, default=5000, help="Schedule entries in the temporary database")
+    parser.add_argument("--probes", type=int, default=120, help="Per-second entries used to measure fire accuracy")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run the engine")
+    parser.add_argument("--ticks", type=int, default=5, help="Legacy polling ticks to measure")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_schedule_")
+    os.environ["DB_TYPE"] = "sqlite"
+    os.environ["SCRIPTS_STATUS_DB"] = os.path.join(workdir, "scripts_status.db")
+
+    # Импорт только после настройки окружения: база выбирается при загрузке модуля
+    import database_manager as dm
+    from croniter import croniter
+    from schedule_engine import ScheduleEngine, SCHEDULE_KEY_PATTERN
+
+    try:
+        dm.init_db()
+        rng = random.Random(45)
+        entries = dict(random_schedule(rng) for _ in range(args.schedules))
+        entries.update({f"probe{index}.schedule.s{index}": f"* * * * * {rng.randrange(60)}" for index in range(args.probes)})
+        dm.config_store.set_many(entries)
+        print(f"{len(entries)} schedules ({args.probes} per-second probes), DB: sqlite {dm.DB_PATH}")
+
+        tick_cpu = []
+        for _ in range(args.ticks):
+            started = time.process_time()
+            legacy_get_due_schedules(dm, croniter, datetime.now())
+            tick_cpu.append((time.process_time() - started) * 1000)
+        tick = statistics.median(tick_cpu)
+        print(f"Legacy poll: {tick:.1f} ms CPU per 60 s tick, {tick * 60 / 1000:.2f} s CPU per hour, fires 0-60 s late")
+
+        lateness = []
+
+        async def run_engine():
+            engine = ScheduleEngine(load_entries=lambda: dm.get_all_configs_like(SCHEDULE_KEY_PATTERN))
+            started = time.process_time()
+            engine.rebuild()
+            build = (time.process_time() - started) * 1000
+
+            async def consume():
+                while True:
+                    for task in await engine.wait_due():
+                        lateness.append((datetime.now() - task["scheduled_for"]).total_seconds() * 1000)
+
+            started_cpu, started_wall = time.process_time(), time.monotonic()
+            consumer = asyncio.ensure_future(consume())
+            await asyncio.sleep(args.duration)
+            consumer.cancel()
+            cpu = time.process_time() - started_cpu
+            return build, cpu, time.monotonic() - started_wall
+
+        build, cpu, wall = asyncio.run(run_engine())
+        print(f"ScheduleEngine: heap built in {build:.1f} ms CPU, {cpu * 1000:.0f} ms CPU over {wall:.0f} s "
+              f"({cpu / wall * 100:.2f}% of a core with {len(lateness)} fires)")
+        if lateness:
+            lateness.sort()
+            print(f"Fire lateness: median {statistics.median(lateness):.2f} ms, "
+                  f"p95 {lateness[int(len(lateness) * 0.95) - 1]:.2f} ms, max {lateness[-1]:.2f} ms")
+    finally:
+        dm.config_store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
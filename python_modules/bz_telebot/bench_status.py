@@ -0,0 +1,136 @@
+"""
+Замер задержки обработчика "📊 Статус": чтение статусов всех скриптов из config.
+
+Сравниваются прежний путь (get_script_info на каждый скрипт, отдельное
+соединение на каждый get_config) и ConfigStore (один get_scripts_info на все
+скрипты через общее соединение) - с пустым кешем и с прогретым.
+--with-logs добавляет к каждому прогону хвосты логов, как в обработчике, и
+замеряет StatusSnapshotService.get() - то, что теперь ждет обработчик.
+
+По умолчанию используется временная SQLite-база с --scripts скриптами;
+--configured-db читает базу из .env (только чтение настоящих ключей).
+
+Использование:
+    python bench_status.py --scripts 6 --runs 50
+    python bench_status.py --configured-db --with-logs
+"""
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+
+def legacy_get_config(dm, name):
+    """get_config до ConfigStore: новое соединение на каждый ключ"""
+    conn = dm.connect_to_db()
+    cursor = conn.cursor()
+    try:
+        query = "SELECT value FROM config WHERE name = %s" if dm.DB_TYPE == "mysql" else "SELECT value FROM config WHERE name = ?"
+        cursor.execute(query, (name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def legacy_scripts_info(dm, script_names):
+    return {
+        name: dm._build_script_info(
+            name,
+            legacy_get_config(dm, f"{name}.start_time"),
+            legacy_get_config(dm, f"{name}.end_time"),
+            legacy_get_config(dm, f"{name}.status"),
+        )
+        for name in script_names
+    }
+
+
+def measure(label, func, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{label:<28} median {statistics.median(timings):7.2f} ms, "
+        f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.2f} ms, max {max(timings):7.2f} ms"
+    )
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bz_telebot status handler latency")
+    parser.add_argument("--scripts", type=int, default=6, help="Number of scripts in the temporary database")
+    parser.add_argument("--runs", type=int, default=50, help="Handler runs per mode")
+    parser.add_argument("--configured-db", action="store_true", help="Read the database configured in .env")
+    parser.add_argument("--with-logs", action="store_true", help="Include log tails like the handler does")
+    args = parser.parse_args()
+
+    workdir = None
+    if not args.configured_db:
+        workdir = tempfile.mkdtemp(prefix="bench_status_")
+        os.environ["DB_TYPE"] = "sqlite"
+        os.environ["SCRIPTS_STATUS_DB"] = os.path.join(workdir, "scripts_status.db")
+
+    # Импорт только после настройки окружения: база выбирается при загрузке модуля
+    import database_manager as dm
+    if args.with_logs:
+        from log_manager import get_latest_log_tail
+
+    try:
+        if args.configured_db:
+            script_names = sorted({name.split(".")[0] for name, _ in dm.get_all_configs_like("%.status")})
+        else:
+            dm.init_db()
+            script_names = [f"script{index}" for index in range(args.scripts)]
+            for name in script_names:
+                dm.set_script_start(name)
+                dm.set_script_end(name)
+        print(f"{len(script_names)} scripts, {args.runs} runs, DB: {dm.DB_TYPE} {'' if dm.DB_TYPE == 'mysql' else dm.DB_PATH}")
+
+        def with_logs(func):
+            def run():
+                func()
+                if args.with_logs:
+                    for name in script_names:
+                        get_latest_log_tail(name)
+            return run
+
+        def store_cold():
+            dm.config_store.invalidate()
+            dm.get_scripts_info(script_names)
+
+        before = measure("per-key connections", with_logs(lambda: legacy_scripts_info(dm, script_names)), args.runs)
+        cold = measure("ConfigStore, cold cache", with_logs(store_cold), args.runs)
+        warm = measure("ConfigStore, warm cache", with_logs(lambda: dm.get_scripts_info(script_names)), args.runs)
+        print(f"Speedup: {before / cold:.1f}x cold, {before / warm:.1f}x warm")
+
+        if args.with_logs:
+            from status_snapshot import StatusSnapshotService
+
+            async def snapshot_runs():
+                service = StatusSnapshotService(script_names)
+                await service.get()
+                loop = asyncio.get_running_loop()
+                timings = []
+                for _ in range(args.runs):
+                    started = loop.time()
+                    await service.get()
+                    timings.append((loop.time() - started) * 1000)
+                service.close()
+                return timings
+
+            timings = asyncio.run(snapshot_runs())
+            print(f"{'StatusSnapshotService.get':<28} median {statistics.median(timings):7.2f} ms, max {max(timings):7.2f} ms")
+    finally:
+        dm.config_store.close()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
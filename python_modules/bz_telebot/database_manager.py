@@ -1,15 +1,34 @@
 import os
+import time
+import math
 import logging
 import sqlite3
+import threading
 import mysql.connector
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
 
 DB_TYPE = os.getenv("DB_TYPE", "sqlite")
-DB_PATH = os.path.join(BASE_DIR, "scripts_status.db")
+DB_PATH = os.getenv("SCRIPTS_STATUS_DB", os.path.join(BASE_DIR, "scripts_status.db"))
+# Сколько секунд значение из config читается из памяти процесса. Запись в этом процессе
+# сбрасывает кеш сразу, запись из других процессов (парсеров) видна не позже чем через TTL.
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", 2))
+# При DB_TYPE=mysql и недоступном MySQL процесс временно работает с SQLite и раз в столько секунд пробует MySQL снова
+MYSQL_RETRY_INTERVAL = float(os.getenv("MYSQL_RETRY_INTERVAL", 30))
+# Оповещение, если успешный запуск дольше p95 последних RUN_ALERT_WINDOW запусков в RUN_ALERT_FACTOR раз
+RUN_ALERT_FACTOR = float(os.getenv("RUN_ALERT_FACTOR", 1.5))
+RUN_ALERT_WINDOW = 20
+RUN_ALERT_MIN_RUNS = 5
+# Переменная окружения, через которую бот передает запускаемому скрипту id его записи в runs
+RUN_ID_ENV = "BZ_RUN_ID"
 
 MYSQL_CONFIG = {
     "host": os.getenv("MYSQL_HOST", "127.0.0.1"),
@@ -27,104 +46,351 @@ def connect_to_db():
             logging.error(f"Ошибка подключения к MySQL: {err}. Используем SQLite.")
     return sqlite3.connect(DB_PATH)
 
-def init_db():
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    if DB_TYPE == "mysql":
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS config (
-                name VARCHAR(255) PRIMARY KEY,
-                value TEXT
-            )
-        """)
-    else:
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS config (
-                name TEXT PRIMARY KEY,
-                value TEXT
+
+class ConfigStore:
+    """
+    Таблица config через одно долгоживущее соединение на процесс.
+
+    Соединение открывается при первом обращении и переиспользуется всеми вызовами
+    (доступ из потоков - под блокировкой), SQLite работает в режиме WAL.
+    set_many/get_many пишут и читают несколько ключей одним запросом в одной
+    транзакции. Чтения проходят через кеш с TTL, запись сбрасывает кеш своих ключей.
+
+    Если при DB_TYPE=mysql MySQL недоступен, используется SQLite, но не до конца
+    жизни процесса: раз в MYSQL_RETRY_INTERVAL секунд соединение с MySQL пробуется
+    снова и при успехе заменяет SQLite (таблицы из ensure_table создаются заново).
+    """
+
+    def __init__(self, cache_ttl=CONFIG_CACHE_TTL):
+        self.cache_ttl = cache_ttl
+        self._lock = threading.RLock()
+        self._conn = None
+        self._conn_pid = None
+        self._is_mysql = False
+        self._mysql_retry_at = None  # Когда снова пробовать MySQL вместо запасного SQLite
+        self._schema = []  # work(cursor, placeholder) с CREATE TABLE IF NOT EXISTS
+        self._cache = {}  # name -> (value, expires_at)
+
+    def _open(self):
+        if DB_TYPE == "mysql":
+            try:
+                conn = mysql.connector.connect(**MYSQL_CONFIG)
+                self._is_mysql = True
+                self._mysql_retry_at = None
+                return conn
+            except mysql.connector.Error as err:
+                logging.error(
+                    f"Ошибка подключения к MySQL: {err}. "
+                    f"Используем SQLite, повторим через {MYSQL_RETRY_INTERVAL:.0f} сек."
+                )
+                self._mysql_retry_at = time.monotonic() + MYSQL_RETRY_INTERVAL
+        self._is_mysql = False
+        conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self):
+        # После fork соединение родителя не используем
+        if self._conn is not None and self._conn_pid != os.getpid():
+            self._conn = None
+        if self._conn is not None and self._is_mysql:
+            try:
+                self._conn.ping(reconnect=True, attempts=2, delay=1)
+            except mysql.connector.Error as err:
+                logging.warning(f"Соединение с MySQL потеряно: {err}. Переподключаемся.")
+                self._conn = None
+        if self._conn is not None and self._mysql_retry_at is not None and time.monotonic() >= self._mysql_retry_at:
+            self._retry_mysql()
+        if self._conn is None:
+            self._conn = self._open()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _retry_mysql(self):
+        """Возвращается с запасного SQLite на MySQL, если он снова доступен"""
+        try:
+            # Короткий таймаут: попытка идет под блокировкой хранилища
+            conn = mysql.connector.connect(**MYSQL_CONFIG, connection_timeout=5)
+        except mysql.connector.Error:
+            self._mysql_retry_at = time.monotonic() + MYSQL_RETRY_INTERVAL
+            return
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = conn
+        self._is_mysql = True
+        self._mysql_retry_at = None
+        self._cache.clear()  # Значения читались из SQLite
+        for work in self._schema:
+            cursor = conn.cursor()
+            try:
+                work(cursor, "%s")
+            finally:
+                cursor.close()
+        conn.commit()
+        logging.warning("MySQL снова доступен, работа с SQLite прекращена. Записи, сделанные в SQLite, в MySQL не переносятся.")
+
+    def ensure_table(self, work):
+        """Создает таблицу (work выполняет CREATE TABLE IF NOT EXISTS) и повторяет это после возврата на MySQL"""
+        with self._lock:
+            if work not in self._schema:
+                self._schema.append(work)
+        self._run(work, write=True)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+            self._conn = None
+
+    def _run(self, work, write=False):
+        """Выполняет work(cursor, placeholder) в одной транзакции общего соединения"""
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.cursor()
+            try:
+                result = work(cursor, "%s" if self._is_mysql else "?")
+                if write:
+                    conn.commit()
+                elif self._is_mysql:
+                    conn.commit()  # Завершаем транзакцию чтения, иначе InnoDB показывает старый снимок
+                return result
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if self._is_mysql:
+                    self._conn = None  # Соединение могло оборваться - откроем заново при следующем вызове
+                raise
+            finally:
+                cursor.close()
+
+    def init_table(self):
+        def work(cursor, _):
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS config (
+                    name {"VARCHAR(255)" if self._is_mysql else "TEXT"} PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+        self.ensure_table(work)
+
+    def invalidate(self, names=None):
+        with self._lock:
+            if names is None:
+                self._cache.clear()
+            else:
+                for name in names:
+                    self._cache.pop(name, None)
+
+    def get_many(self, names):
+        """Значения нескольких ключей одним запросом: {name: value или None}"""
+        names = list(dict.fromkeys(names))
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with self._lock:
+            for name in names:
+                cached = self._cache.get(name)
+                if cached and cached[1] > now:
+                    result[name] = cached[0]
+                else:
+                    missing.append(name)
+        if not missing:
+            return result
+
+        def work(cursor, ph):
+            cursor.execute(
+                f"SELECT name, value FROM config WHERE name IN ({', '.join([ph] * len(missing))})",
+                tuple(missing)
             )
-        """)
-    conn.commit()
-    cursor.close()
-    conn.close()
+            return dict(cursor.fetchall())
+
+        with self._lock:
+            rows = self._run(work)
+            expires_at = time.monotonic() + self.cache_ttl
+            for name in missing:
+                result[name] = rows.get(name)
+                if self.cache_ttl > 0:
+                    self._cache[name] = (result[name], expires_at)
+        return result
+
+    def get(self, name):
+        return self.get_many([name])[name]
+
+    def set_many(self, values):
+        """Записывает несколько ключей в одной транзакции"""
+        if not values:
+            return
+
+        def work(cursor, ph):
+            if self._is_mysql:
+                query = f"""
+                    INSERT INTO config (name, value)
+                    VALUES ({ph}, {ph})
+                    ON DUPLICATE KEY UPDATE value = VALUES(value)
+                """
+            else:
+                query = f"""
+                    INSERT INTO config (name, value)
+                    VALUES ({ph}, {ph})
+                    ON CONFLICT(name) DO UPDATE SET value=excluded.value
+                """
+            cursor.executemany(query, list(values.items()))
+
+        with self._lock:
+            self.invalidate(values)
+            self._run(work, write=True)
+
+    def delete(self, name):
+        def work(cursor, ph):
+            cursor.execute(f"DELETE FROM config WHERE name = {ph}", (name,))
+
+        with self._lock:
+            self.invalidate([name])
+            self._run(work, write=True)
+
+    def get_like(self, pattern):
+        def work(cursor, ph):
+            cursor.execute(f"SELECT name, value FROM config WHERE name LIKE {ph}", (pattern,))
+            return cursor.fetchall()
+
+        return self._run(work)
+
+
+config_store = ConfigStore()
+
+
+def init_db():
+    config_store.init_table()
+
+def set_configs(values: dict):
+    try:
+        config_store.set_many(values)
+        for name, value in values.items():
+            logging.info(f"Параметр config['{name}'] установлен в '{value}'")
+    except Exception as e:
+        logging.error(f"Ошибка при записи параметров config {list(values)}: {e}")
 
 def set_config(name, value):
-    conn = connect_to_db()
-    cursor = conn.cursor()
+    set_configs({name: value})
+
+def get_configs(names) -> dict:
     try:
-        if DB_TYPE == "mysql":
-            query = """
-                INSERT INTO config (name, value)
-                VALUES (%s, %s)
-                ON DUPLICATE KEY UPDATE value = VALUES(value)
-            """
-        else:
-            query = """
-                INSERT INTO config (name, value)
-                VALUES (?, ?)
-                ON CONFLICT(name) DO UPDATE SET value=excluded.value
-            """
-        cursor.execute(query, (name, value))
-        conn.commit()
-        logging.info(f"Параметр config['{name}'] установлен в '{value}'")
+        return config_store.get_many(names)
     except Exception as e:
-        logging.error(f"Ошибка при записи параметра config['{name}']: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
+        logging.error(f"Ошибка при чтении config {list(names)}: {e}")
+        return {name: None for name in names}
 
 def get_config(name):
-    conn = connect_to_db()
-    cursor = conn.cursor()
+    return get_configs([name])[name]
+
+def set_script_start(script_name, launcher=False):
+    """
+    Отмечает запуск скрипта в config и открывает запись в runs; возвращает id записи.
+    launcher=True - запуск регистрирует бот до старта процесса скрипта: скрипт
+    получит id через RUN_ID_ENV и продолжит ту же запись.
+    """
+    now = datetime.now().isoformat()
+    run_id = None
     try:
-        query = "SELECT value FROM config WHERE name = %s" if DB_TYPE == "mysql" else "SELECT value FROM config WHERE name = ?"
-        cursor.execute(query, (name,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        inherited = os.getenv(RUN_ID_ENV, "")
+        if not launcher and inherited.startswith(f"{script_name}:"):
+            run_id = int(inherited.split(":", 1)[1])
+            update_run(run_id, start_time=now)
+        else:
+            run_id = add_run(script_name, now)
+        if not launcher:
+            _own_runs[script_name] = run_id
     except Exception as e:
-        logging.error(f"Ошибка при чтении config['{name}']: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+        logging.error(f"Ошибка записи запуска {script_name} в runs: {e}")
+    values = {
+        f"{script_name}.start_time": now,
+        f"{script_name}.status": "running",
+        f"{script_name}.end_time": "",
+    }
+    if run_id is not None:
+        values[f"{script_name}.run_id"] = str(run_id)
+    set_configs(values)
+    return run_id
 
-def set_script_start(script_name):
+def set_script_end(script_name, status="done", items=None, api_calls=None, cache_hit_rate=None):
+    """
+    Отмечает окончание скрипта в config и закрывает его запись в runs.
+    items, api_calls, cache_hit_rate (0..1) - метрики запуска, если скрипт их считает.
+    """
     now = datetime.now().isoformat()
-    set_config(f"{script_name}.start_time", now)
-    set_config(f"{script_name}.status", "running")
-    set_config(f"{script_name}.end_time", "")
+    set_configs({
+        f"{script_name}.end_time": now,
+        f"{script_name}.status": status,
+    })
+    try:
+        own = script_name in _own_runs
+        run_id = _own_runs.pop(script_name, None) or get_config(f"{script_name}.run_id")
+        if not run_id:
+            return
+        metrics = {"items": items, "api_calls": api_calls, "cache_hit_rate": cache_hit_rate}
+        if own and resource is not None:
+            # Пик памяти процесса скрипта и завершенных дочерних процессов (в Linux - в КБ)
+            metrics["peak_rss"] = max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            ) * 1024
+        run = finish_run(int(run_id), now, status, **{name: value for name, value in metrics.items() if value is not None})
+        if run and status == "done":
+            alert = check_run_regression(run)
+            if alert:
+                send_run_alert(alert)
+    except Exception as e:
+        logging.error(f"Ошибка записи окончания {script_name} в runs: {e}")
 
-def set_script_end(script_name, status="done"):
-    now = datetime.now().isoformat()
-    set_config(f"{script_name}.end_time", now)
-    set_config(f"{script_name}.status", status)
+def _build_script_info(script_name, start, end, status) -> dict:
+    duration = None
+    if start:
+        try:
+            start_dt = datetime.fromisoformat(start)
+            if status == "running" or not end:
+                end_dt = datetime.now()
+                end = None  # Скрипт еще выполняется, конец неизвестен
+            else:
+                end_dt = datetime.fromisoformat(end)
+            duration = (end_dt - start_dt).total_seconds()
+        except Exception as e:
+            logging.warning(f"Ошибка вычисления длительности для {script_name}: {e}")
 
-def get_script_info(script_name: str) -> dict:
-    try:
-        start = get_config(f"{script_name}.start_time")
-        end = get_config(f"{script_name}.end_time")
-        status = get_config(f"{script_name}.status")
+    return {
+        "start_time": start,
+        "end_time": end,
+        "status": status,
+        "duration": duration
+    }
 
-        duration = None
-        if start:
-            try:
-                start_dt = datetime.fromisoformat(start)
-                if status == "running" or not end:
-                    end_dt = datetime.now()
-                    end = None  # Скрипт еще выполняется, конец неизвестен
-                else:
-                    end_dt = datetime.fromisoformat(end)
-                duration = (end_dt - start_dt).total_seconds()
-            except Exception as e:
-                logging.warning(f"Ошибка вычисления длительности для {script_name}: {e}")
+def get_scripts_info(script_names) -> dict:
+    """
+    Информация о нескольких скриптах одним запросом к config.
+    Возвращает {script_name: dict как у get_script_info}.
+    """
+    keys = [f"{name}.{field}" for name in script_names for field in ("start_time", "end_time", "status")]
+    values = get_configs(keys)
+    return {
+        name: _build_script_info(
+            name,
+            values.get(f"{name}.start_time"),
+            values.get(f"{name}.end_time"),
+            values.get(f"{name}.status"),
+        )
+        for name in script_names
+    }
 
-        return {
-            "start_time": start,
-            "end_time": end,
-            "status": status,
-            "duration": duration
-        }
+def get_script_info(script_name: str) -> dict:
+    try:
+        return get_scripts_info([script_name])[script_name]
     except Exception as e:
         logging.error(f"Ошибка при получении информации о скрипте '{script_name}': {e}")
         return {
@@ -133,42 +399,263 @@ def get_script_info(script_name: str) -> dict:
             "status": None,
             "duration": None
         }
-    
+
 def get_all_configs_like(pattern: str):
     """
     Получает все пары (ключ, значение) из таблицы config, где имя соответствует шаблону.
     Шаблон должен использовать SQL-совместимые подстановки: % для любого количества символов.
     """
-    conn = connect_to_db()
-    cursor = conn.cursor()
     try:
-        if DB_TYPE == "mysql":
-            query = "SELECT name, value FROM config WHERE name LIKE %s"
-        else:
-            query = "SELECT name, value FROM config WHERE name LIKE ?"
-        cursor.execute(query, (pattern,))
-        return cursor.fetchall()
+        return config_store.get_like(pattern)
     except Exception as e:
         logging.error(f"Ошибка при получении параметров по шаблону '{pattern}': {e}")
         return []
-    finally:
-        cursor.close()
-        conn.close()
 
 def delete_config_key(key: str):
     """
     Удаляет запись из таблицы config по имени ключа.
     """
-    conn = connect_to_db()
-    cursor = conn.cursor()
     try:
-        query = "DELETE FROM config WHERE name = %s" if DB_TYPE == "mysql" else "DELETE FROM config WHERE name = ?"
-        cursor.execute(query, (key,))
-        conn.commit()
+        config_store.delete(key)
         logging.info(f"Параметр config['{key}'] удалён")
     except Exception as e:
         logging.error(f"Ошибка при удалении config['{key}']: {e}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
+
+# === Очередь запусков (job_orchestrator) ===
+JOB_FIELDS = ("id", "script_name", "source", "status", "after_id", "enqueued_at", "started_at", "finished_at", "pid", "note")
+
+def init_job_queue():
+    def work(cursor, _):
+        if config_store._is_mysql:
+            id_column = "id INT AUTO_INCREMENT PRIMARY KEY"
+            text_type = "VARCHAR(64)"
+        else:
+            id_column = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+            text_type = "TEXT"
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS job_queue (
+                {id_column},
+                script_name {text_type} NOT NULL,
+                source {text_type},
+                status {text_type} NOT NULL,
+                after_id INTEGER,
+                enqueued_at {text_type},
+                started_at {text_type},
+                finished_at {text_type},
+                pid INTEGER,
+                note TEXT
+            )
+        """)
+    config_store.ensure_table(work)
+
+def add_job(script_name, source, after_id=None) -> dict:
+    """Добавляет запуск в очередь со статусом queued; возвращает запись"""
+    job = {
+        "script_name": script_name,
+        "source": source,
+        "status": "queued",
+        "after_id": after_id,
+        "enqueued_at": datetime.now().isoformat(),
+    }
+
+    def work(cursor, ph):
+        cursor.execute(
+            f"INSERT INTO job_queue ({', '.join(job)}) VALUES ({', '.join([ph] * len(job))})",
+            tuple(job.values())
+        )
+        return cursor.lastrowid
+
+    job["id"] = config_store._run(work, write=True)
+    return {field: job.get(field) for field in JOB_FIELDS}
+
+def update_job(job_id, **fields):
+    def work(cursor, ph):
+        cursor.execute(
+            f"UPDATE job_queue SET {', '.join(f'{name} = {ph}' for name in fields)} WHERE id = {ph}",
+            (*fields.values(), job_id)
+        )
+    try:
+        config_store._run(work, write=True)
+    except Exception as e:
+        logging.error(f"Ошибка обновления запуска #{job_id} в очереди: {e}")
+
+def get_jobs(statuses=None, ids=None) -> list:
+    """Записи очереди по порядку id: с указанными статусами и/или id"""
+    def work(cursor, ph):
+        conditions, params = [], []
+        for column, values in (("status", statuses), ("id", ids)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join([ph] * len(values))})")
+                params.extend(values)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM job_queue{where} ORDER BY id", tuple(params))
+        return [dict(zip(JOB_FIELDS, row)) for row in cursor.fetchall()]
+    return config_store._run(work)
+
+def prune_jobs(before):
+    """Удаляет завершенные записи очереди, поставленные раньше before (ISO-время)"""
+    def work(cursor, ph):
+        cursor.execute(
+            f"DELETE FROM job_queue WHERE status NOT IN ('queued', 'running') AND enqueued_at < {ph}",
+            (before,)
+        )
+    config_store._run(work, write=True)
+
+# === История запусков (runs) ===
+RUN_FIELDS = (
+    "id", "script_name", "start_time", "end_time", "status", "duration",
+    "items", "api_calls", "cache_hit_rate", "peak_rss",
+)
+_own_runs = {}  # script_name -> id записи runs, открытой в этом процессе самим скриптом
+_runs_table_ready = False
+
+def _run_runs(work, write=False):
+    """config_store._run с созданием таблицы runs при первом обращении процесса"""
+    global _runs_table_ready
+    if not _runs_table_ready:
+        def create(cursor, _):
+            if config_store._is_mysql:
+                id_column, text_type, real_type = "id INT AUTO_INCREMENT PRIMARY KEY", "VARCHAR(64)", "DOUBLE"
+            else:
+                id_column, text_type, real_type = "id INTEGER PRIMARY KEY AUTOINCREMENT", "TEXT", "REAL"
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS runs (
+                    {id_column},
+                    script_name {text_type} NOT NULL,
+                    start_time {text_type},
+                    end_time {text_type},
+                    status {text_type},
+                    duration {real_type},
+                    items INTEGER,
+                    api_calls INTEGER,
+                    cache_hit_rate {real_type},
+                    peak_rss BIGINT
+                )
+            """)
+        config_store.ensure_table(create)
+        _runs_table_ready = True
+    return config_store._run(work, write=write)
+
+def add_run(script_name, start_time) -> int:
+    def work(cursor, ph):
+        cursor.execute(
+            f"INSERT INTO runs (script_name, start_time, status) VALUES ({ph}, {ph}, {ph})",
+            (script_name, start_time, "running")
+        )
+        return cursor.lastrowid
+    return _run_runs(work, write=True)
+
+def update_run(run_id, **fields):
+    def work(cursor, ph):
+        cursor.execute(
+            f"UPDATE runs SET {', '.join(f'{name} = {ph}' for name in fields)} WHERE id = {ph}",
+            (*fields.values(), run_id)
+        )
+    _run_runs(work, write=True)
+
+def get_runs(script_name=None, status=None, limit=None, since=None) -> list:
+    """Записи runs от новых к старым"""
+    def work(cursor, ph):
+        conditions, params = [], []
+        for column, value in (("script_name", script_name), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = {ph}")
+                params.append(value)
+        if since:
+            conditions.append(f"start_time >= {ph}")
+            params.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT {', '.join(RUN_FIELDS)} FROM runs{where} ORDER BY id DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        cursor.execute(query, tuple(params))
+        return [dict(zip(RUN_FIELDS, row)) for row in cursor.fetchall()]
+    return _run_runs(work)
+
+def get_runs_by_id(run_ids) -> list:
+    def work(cursor, ph):
+        cursor.execute(
+            f"SELECT {', '.join(RUN_FIELDS)} FROM runs WHERE id IN ({', '.join([ph] * len(run_ids))})",
+            tuple(run_ids)
+        )
+        return [dict(zip(RUN_FIELDS, row)) for row in cursor.fetchall()]
+    return _run_runs(work)
+
+def finish_run(run_id, end_time, status, **metrics):
+    """Закрывает запись runs; возвращает ее целиком"""
+    run = next(iter(get_runs_by_id([run_id])), None)
+    if not run:
+        return None
+    duration = None
+    if run["start_time"]:
+        duration = (datetime.fromisoformat(end_time) - datetime.fromisoformat(run["start_time"])).total_seconds()
+    update_run(run_id, end_time=end_time, status=status, duration=duration, **metrics)
+    run.update(end_time=end_time, status=status, duration=duration, **metrics)
+    return run
+
+def get_run_status(script_name, run_id=None):
+    """
+    Статус запуска мимо кеша config: итог пишет процесс скрипта, а кеш этого
+    процесса еще до CONFIG_CACHE_TTL может помнить "running".
+    С run_id - из записи runs этого запуска, без него (или без записи) - из config.
+    """
+    if run_id is not None:
+        try:
+            run = next(iter(get_runs_by_id([int(run_id)])), None)
+            if run:
+                return run["status"]
+        except Exception as e:
+            logging.error(f"Ошибка чтения запуска {script_name} #{run_id} из runs: {e}")
+    config_store.invalidate([f"{script_name}.status"])
+    return get_config(f"{script_name}.status")
+
+def record_run_peak_rss(script_name, peak_rss):
+    """Пик памяти всего дерева процессов (замер супервизора бота), если он больше записанного"""
+    try:
+        run_id = get_config(f"{script_name}.run_id")
+        if not run_id:
+            return
+        def work(cursor, ph):
+            greatest = "GREATEST" if config_store._is_mysql else "MAX"
+            cursor.execute(
+                f"UPDATE runs SET peak_rss = {greatest}(COALESCE(peak_rss, 0), {ph}) WHERE id = {ph}",
+                (int(peak_rss), int(run_id))
+            )
+        _run_runs(work, write=True)
+    except Exception as e:
+        logging.error(f"Ошибка записи пика памяти {script_name} в runs: {e}")
+
+def percentile(values, q):
+    """Перцентиль q (0..100) с линейной интерполяцией"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def check_run_regression(run) -> str:
+    """Текст оповещения, если успешный запуск дольше скользящего p95 в RUN_ALERT_FACTOR раз, иначе None"""
+    if run.get("duration") is None:
+        return None
+    previous = [
+        item["duration"] for item in get_runs(run["script_name"], status="done", limit=RUN_ALERT_WINDOW + 1)
+        if item["id"] != run["id"] and item["duration"] is not None
+    ][:RUN_ALERT_WINDOW]
+    if len(previous) < RUN_ALERT_MIN_RUNS:
+        return None
+    p95 = percentile(previous, 95)
+    if run["duration"] <= p95 * RUN_ALERT_FACTOR:
+        return None
+    return (
+        f"🐢 <b>{run['script_name']}</b>: запуск #{run['id']} длился {run['duration'] / 60:.1f} мин - "
+        f"в {run['duration'] / p95:.1f} раза дольше p95 последних {len(previous)} запусков ({p95 / 60:.1f} мин)"
+    )
+
+def send_run_alert(text):
+    logging.warning(text)
+    try:
+        from notification.main import TelegramNotifier
+    except ImportError:
+        return  # Модуль уведомлений не в sys.path - остается запись в лог
+    TelegramNotifier.notify(text)
@@ -0,0 +1,228 @@
+"""
+Очередь запусков скриптов с зависимостями и лимитом одновременных задач.
+
+Все запуски из бота (кнопка, расписание, автозапуск после перезапуска) ставятся
+в очередь job_queue в базе статусов и стартуют через ProcessSupervisor, когда
+это позволяют правила:
+- не больше ORCHESTRATOR_MAX_JOBS скриптов одновременно;
+- тяжелые скрипты (ORCHESTRATOR_EXCLUSIVE_JOBS, по умолчанию trast) работают
+  на машине одни; ожидающий тяжелый скрипт придерживает запуск задач,
+  поставленных после него, чтобы его не обгоняли бесконечно;
+- JOB_DEPENDENCIES - граф зависимостей: froza читает avito.xml, который
+  пишет avito. Зависимые скрипты никогда не работают одновременно, а froza,
+  поставленная в очередь, пока avito ждет или работает, стартует только после
+  успешного завершения avito (иначе запуск пропускается).
+
+Скрипт, который уже стоит в очереди или работает, второй раз не ставится.
+Очередь переживает перезапуск бота: ожидающие задачи продолжаются, работавшие
+сверяются с подхваченными супервизором процессами. Запросы к базе из цикла
+событий бота идут через run_in_executor.
+"""
+import os
+import asyncio
+import logging
+from functools import partial
+from datetime import datetime, timedelta
+
+from database_manager import (
+    init_job_queue, add_job, update_job, get_jobs, prune_jobs,
+    get_run_status, set_script_start, set_script_end, RUN_ID_ENV,
+)
+
+ORCHESTRATOR_MAX_JOBS = int(os.getenv("ORCHESTRATOR_MAX_JOBS", 2))
+ORCHESTRATOR_EXCLUSIVE_JOBS = {
+    name.strip() for name in os.getenv("ORCHESTRATOR_EXCLUSIVE_JOBS", "trast").split(",") if name.strip()
+}
+# Скрипт -> скрипты, после которых он запускается
+JOB_DEPENDENCIES = {
+    "froza": ["avito"],
+}
+JOB_QUEUE_RETENTION_DAYS = 7
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def related_jobs(script_name):
+    """Скрипты, связанные с данным ребром графа в любую сторону"""
+    related = set(JOB_DEPENDENCIES.get(script_name, []))
+    related.update(name for name, deps in JOB_DEPENDENCIES.items() if script_name in deps)
+    return related
+
+
+class JobOrchestrator:
+    def __init__(self, supervisor, scripts, is_running=None, notify=None, on_start=None,
+                 max_jobs=ORCHESTRATOR_MAX_JOBS, exclusive=ORCHESTRATOR_EXCLUSIVE_JOBS):
+        self.supervisor = supervisor
+        self.scripts = scripts  # имя -> путь к main.py
+        self.is_running = is_running  # is_running(name): скрипт запущен в обход бота
+        self.notify = notify  # async notify(text): сообщение администраторам
+        self.on_start = on_start  # on_start(name) после запуска скрипта
+        self.max_jobs = max(1, max_jobs)
+        self.exclusive = set(exclusive)
+        self.jobs = []  # Активные записи очереди (queued/running) по порядку id
+        self._finished = {}  # id -> статус завершенных задач, на которые могут ссылаться after_id
+        self._waiting = {}  # id -> причина ожидания (для статуса)
+        self._lock = None  # asyncio-примитивы создаются в load(), уже в цикле событий
+        self._wake = None
+
+    def load(self):
+        """Восстанавливает очередь из базы после перезапуска бота"""
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        init_job_queue()
+        prune_jobs((datetime.now() - timedelta(days=JOB_QUEUE_RETENTION_DAYS)).isoformat())
+        for job in get_jobs(ACTIVE_STATUSES):
+            if job["status"] == "running" and not self.supervisor.is_running(job["script_name"]):
+                # При старте бота, до приема сообщений - можно синхронно
+                status = self._result_status(job["script_name"])
+                update_job(job["id"], **self._drop(job, status, "процесс не найден после перезапуска бота"))
+                continue
+            self.jobs.append(job)
+        # Зависимости, завершившиеся до перезапуска, нужны для решения о запуске ожидающих задач
+        active_ids = {job["id"] for job in self.jobs}
+        dependency_ids = {job["after_id"] for job in self.jobs if job["after_id"] and job["after_id"] not in active_ids}
+        if dependency_ids:
+            self._finished.update({job["id"]: job["status"] for job in get_jobs(ids=list(dependency_ids))})
+        queued = sum(1 for job in self.jobs if job["status"] == "queued")
+        if self.jobs:
+            logging.info(f"Очередь запусков восстановлена: ожидают {queued}, работают {len(self.jobs) - queued}")
+
+    @staticmethod
+    async def _db(func, *args, **kwargs):
+        """Запрос к базе вне цикла событий: с MySQL ConfigStore может переподключаться секундами"""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+    @staticmethod
+    def _result_status(script_name, run_id=None):
+        # Не из кеша config: froza не должна стартовать после avito, успевшего записать "failed"
+        status = get_run_status(script_name, run_id)
+        return status if status in ("done", "failed", "stopped") else "failed"
+
+    def _drop(self, job, status, note=None):
+        """Снимает задачу с очереди в памяти; возвращает поля для update_job"""
+        job["status"] = status
+        job["finished_at"] = datetime.now().isoformat()
+        self._finished[job["id"]] = status
+        self._waiting.pop(job["id"], None)
+        if job in self.jobs:
+            self.jobs.remove(job)
+        return {"status": status, "finished_at": job["finished_at"], "note": note}
+
+    async def _close(self, job, status, note=None):
+        await self._db(update_job, job["id"], **self._drop(job, status, note))
+
+    def active_job(self, script_name):
+        return next((job for job in self.jobs if job["script_name"] == script_name), None)
+
+    def describe(self, script_name):
+        """Строка об ожидании скрипта в очереди для статуса или None"""
+        job = self.active_job(script_name)
+        if not job or job["status"] != "queued":
+            return None
+        position = [j for j in self.jobs if j["status"] == "queued"].index(job) + 1
+        reason = self._waiting.get(job["id"])
+        return f"⏳ В очереди: {position}-й" + (f", {reason}" if reason else "")
+
+    async def enqueue(self, script_name, source):
+        """
+        Ставит скрипт в очередь.
+        Возвращает (запись, True) или (уже стоящая/работающая запись, False).
+        """
+        async with self._lock:
+            existing = self.active_job(script_name)
+            if existing:
+                return existing, False
+            # Зависимость, которая ждет или работает, должна сначала успешно завершиться
+            after_id = max(
+                (job["id"] for job in self.jobs if job["script_name"] in JOB_DEPENDENCIES.get(script_name, [])),
+                default=None,
+            )
+            job = await self._db(add_job, script_name, source, after_id)
+            self.jobs.append(job)
+        logging.info(f"[QUEUE] {script_name} поставлен в очередь (#{job['id']}, {source})")
+        self._wake.set()
+        return job, True
+
+    async def job_finished(self, script_name, run_id=None):
+        """Вызывается супервизором после завершения процесса скрипта; run_id - его запись runs"""
+        async with self._lock:
+            job = self.active_job(script_name)
+            if not job or job["status"] != "running":
+                return
+            status = await self._db(self._result_status, script_name, run_id)
+            await self._close(job, status)
+        logging.info(f"[QUEUE] {script_name} (#{job['id']}) завершен: {status}")
+        self._wake.set()
+
+    async def _skip(self, job, reason):
+        await self._close(job, "skipped", reason)
+        logging.info(f"[QUEUE] Пропущен запуск {job['script_name']} (#{job['id']}): {reason}")
+        if self.notify:
+            await self.notify(f"⏭️ Запуск скрипта <b>{job['script_name']}</b> пропущен\nПричина: {reason}")
+
+    async def dispatch(self):
+        """Запускает все задачи очереди, которым это сейчас позволено"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            running = [job for job in self.jobs if job["status"] == "running"]
+            reserved = False  # Ожидающий эксклюзивный скрипт придерживает задачи после себя
+            for job in [job for job in self.jobs if job["status"] == "queued"]:
+                name = job["script_name"]
+                if any(j["script_name"] in self.exclusive for j in running):
+                    self._waiting[job["id"]] = "работает тяжелый скрипт"
+                    continue
+                if reserved:
+                    self._waiting[job["id"]] = "пропускает вперед тяжелый скрипт"
+                    continue
+
+                dependency = job["after_id"]
+                if dependency is not None and any(j["id"] == dependency for j in self.jobs):
+                    self._waiting[job["id"]] = f"ждет {', '.join(JOB_DEPENDENCIES.get(name, []))}"
+                    continue
+                if dependency is not None and self._finished.get(dependency, "done") != "done":
+                    await self._skip(job, f"зависимость завершилась со статусом {self._finished[dependency]}")
+                    continue
+
+                busy = {j["script_name"] for j in running} & related_jobs(name)
+                if busy:
+                    self._waiting[job["id"]] = f"ждет завершения {', '.join(sorted(busy))}"
+                    continue
+                if name in self.exclusive and running:
+                    self._waiting[job["id"]] = "ждет свободной машины"
+                    reserved = True
+                    continue
+                if len(running) >= self.max_jobs:
+                    self._waiting[job["id"]] = f"занято {len(running)} из {self.max_jobs} слотов"
+                    continue
+
+                script_path = self.scripts.get(name)
+                if not script_path or not os.path.exists(script_path):
+                    await self._skip(job, "скрипт не найден")
+                    continue
+                if self.is_running and await loop.run_in_executor(None, self.is_running, name):
+                    await self._skip(job, "скрипт уже работает (запущен не из бота)")
+                    continue
+                try:
+                    run_id = await self._db(set_script_start, name, launcher=True)
+                    env = {RUN_ID_ENV: f"{name}:{run_id}"} if run_id is not None else None
+                    run = await self.supervisor.start(name, script_path, env=env, run_id=run_id)
+                except Exception as e:
+                    logging.exception(f"[QUEUE] Ошибка запуска {name}")
+                    await self._db(set_script_end, name, status="failed")
+                    await self._close(job, "failed", f"ошибка запуска: {e}")
+                    continue
+                job.update(status="running", started_at=datetime.now().isoformat(), pid=run.pid)
+                await self._db(update_job, job["id"], status="running", started_at=job["started_at"], pid=run.pid)
+                self._waiting.pop(job["id"], None)
+                running.append(job)
+                if self.on_start:
+                    self.on_start(name)
+                logging.info(f"[QUEUE] {name} (#{job['id']}) запущен, работают {len(running)}/{self.max_jobs}")
+
+    async def run_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.dispatch()
+            except Exception as e:
+                logging.error(f"[QUEUE] Ошибка обработки очереди: {e}")
+            await self._wake.wait()
@@ -1,12 +1,20 @@
 import os
 import glob
+import time
+import codecs
+import struct
 import logging
+import threading
+import ctypes
+import ctypes.util
 from datetime import datetime
 
 
 LOGS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "storage", "app", "public", "output"))
 MAX_LOG_FILES = 30
 BOT_LOG_DIR = os.path.join(LOGS_DIR, "logs-telebot")
+TAIL_BLOCK_SIZE = 8192  # Блок чтения с конца файла
+LOG_INDEX_RESCAN_INTERVAL = 300  # Полное перечитывание папки не реже, чем раз в N секунд
 
 # Настройка логирования
 os.makedirs(BOT_LOG_DIR, exist_ok=True)
@@ -23,42 +31,218 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+def read_tail_lines(path: str, lines: int = 3, block_size: int = TAIL_BLOCK_SIZE) -> list:
+    """
+    Последние lines строк файла (с переводами строк, как у readlines()).
+    Файл читается блоками с конца, поэтому время не зависит от размера лога.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        # Нужно на один перевод строки больше: первая строка блока может быть обрезана
+        while pos > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    if pos > 0:
+        # Отбрасываем неполную первую строку; байт \n не встречается внутри
+        # многобайтовых символов UTF-8, так что дальше граница символов всегда целая
+        data = data[data.find(b"\n") + 1:]
+    elif data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    text = data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+    parts = text.split("\n")
+    result = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        result.append(parts[-1])
+    return result[-lines:] if lines > 0 else []
+
+
+class _Inotify:
+    """Минимальная обертка над inotify (Linux) через ctypes"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read_events(self) -> list:
+        """Накопившиеся события [(wd, mask, name)] без ожидания"""
+        events = []
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, name_len = self._EVENT.unpack_from(buffer, offset)
+                offset += self._EVENT.size
+                name = buffer[offset:offset + name_len].rstrip(b"\0").decode("utf-8", errors="replace")
+                offset += name_len
+                events.append((wd, mask, name))
+
+
+class LatestLogIndex:
+    """
+    Самый свежий файл в каждой папке логов без glob и сортировки папки при каждом запросе.
+
+    Папка перечитывается через os.scandir при первом обращении, затем индекс
+    обновляется по событиям inotify (создание, переименование, удаление файлов).
+    Без inotify папка перечитывается, только если изменилось mtime самой папки.
+    В обоих режимах - полное перечитывание не реже LOG_INDEX_RESCAN_INTERVAL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}  # folder -> (path, mtime) или None
+        self._scanned_at = {}  # folder -> (time.monotonic(), mtime папки)
+        self._watches = {}  # wd -> folder
+        try:
+            self._inotify = _Inotify()
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify недоступен ({e}), индекс логов проверяет mtime папок")
+            self._inotify = None
+
+    def _scan(self, folder: str):
+        latest = None
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if latest is None or mtime > latest[1]:
+                    latest = (entry.path, mtime)
+        self._latest[folder] = latest
+        self._scanned_at[folder] = (time.monotonic(), os.stat(folder).st_mtime)
+
+    def _consider(self, folder: str, path: str):
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return
+        if os.path.basename(path).startswith(".") or not os.path.isfile(path):
+            return
+        latest = self._latest.get(folder)
+        if latest is None or mtime >= latest[1] or latest[0] == path:
+            self._latest[folder] = (path, mtime)
+
+    def _apply_events(self):
+        for wd, mask, name in self._inotify.read_events():
+            if mask & _Inotify.IN_Q_OVERFLOW:
+                self._scanned_at.clear()  # События потеряны - перечитываем все папки
+                continue
+            folder = self._watches.get(wd)
+            if folder is None:
+                continue
+            if mask & (_Inotify.IN_IGNORED | _Inotify.IN_DELETE_SELF | _Inotify.IN_MOVE_SELF):
+                self._watches.pop(wd, None)
+                self._scanned_at.pop(folder, None)
+                continue
+            path = os.path.join(folder, name)
+            latest = self._latest.get(folder)
+            if mask & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM):
+                if latest and latest[0] == path:
+                    self._scanned_at.pop(folder, None)  # Удален самый свежий - нужен полный скан
+            else:
+                self._consider(folder, path)
+
+    def _is_stale(self, folder: str) -> bool:
+        scanned = self._scanned_at.get(folder)
+        if scanned is None or time.monotonic() - scanned[0] > LOG_INDEX_RESCAN_INTERVAL:
+            return True
+        if folder in self._watches.values():
+            return False
+        return os.stat(folder).st_mtime != scanned[1]
+
+    def latest(self, folder: str):
+        """Путь к самому свежему файлу папки или None"""
+        folder = os.path.abspath(folder)
+        with self._lock:
+            if self._inotify and self._watches:
+                self._apply_events()
+            if self._is_stale(folder):
+                if self._inotify and folder not in self._watches.values():
+                    try:
+                        self._watches[self._inotify.add_watch(folder)] = folder
+                    except OSError as e:
+                        logger.debug(f"Не удалось подписаться на {folder}: {e}")
+                self._scan(folder)
+            latest = self._latest.get(folder)
+            return latest[0] if latest else None
+
+    def forget(self, folder: str):
+        """Сбрасывает папку: следующий latest() перечитает ее целиком"""
+        with self._lock:
+            self._scanned_at.pop(os.path.abspath(folder), None)
+
+
+latest_log_index = LatestLogIndex()
+
+
+def _read_any_tail(path: str, lines: int) -> list:
+    if path.endswith((".gz", ".zst")):
+        from log_retention import read_compressed_tail  # log_retention сам импортирует log_manager
+        return read_compressed_tail(path, lines)
+    return read_tail_lines(path, lines)
+
+
 def get_latest_log_tail(script_key: str, lines: int = 3) -> str:
     log_folder = os.path.join(LOGS_DIR, f"logs-{script_key}")
     if not os.path.isdir(log_folder):
         return "Логов не найдено."
 
-    log_files = sorted(glob.glob(os.path.join(log_folder, "*")), key=os.path.getmtime, reverse=True)
-    if not log_files:
+    latest_file = latest_log_index.latest(log_folder)
+    if not latest_file:
         return "Лог-файлы отсутствуют."
 
-    latest_file = log_files[0]
     try:
-        with open(latest_file, 'r', encoding='utf-8', errors='ignore') as f:
-            content = "\n".join(f.readlines()[-lines:])
+        try:
+            tail = _read_any_tail(latest_file, lines)
+        except FileNotFoundError:
+            # Файл удалили или сжали между запросами (ротация логов) - перечитываем папку
+            latest_log_index.forget(log_folder)
+            latest_file = latest_log_index.latest(log_folder)
+            if not latest_file:
+                return "Лог-файлы отсутствуют."
+            tail = _read_any_tail(latest_file, lines)
+        content = "\n".join(tail)
         return f"{content}\n\n📁 Файл: {os.path.basename(latest_file)}"
     except Exception as e:
         return f"Ошибка чтения лога: {str(e)}"
 
 
 
-def cleanup_old_logs():
-    for entry in os.listdir(LOGS_DIR):
-        folder_path = os.path.join(LOGS_DIR, entry)
-        if not os.path.isdir(folder_path):
-            continue
-        if not entry.startswith("logs-"):
-            continue
-
-        log_files = sorted(glob.glob(os.path.join(folder_path, "*")), key=os.path.getmtime)
-        if len(log_files) > MAX_LOG_FILES:
-            to_delete = log_files[:len(log_files) - MAX_LOG_FILES]
-            for f in to_delete:
-                try:
-                    os.remove(f)
-                    logger.info(f"Удалён старый лог: {f}")
-                except Exception as e:
-                    logger.warning(f"Не удалось удалить {f}: {e}")
+def cleanup_old_logs() -> dict:
+    """Сжатие завершенных логов и бюджет папок (log_retention.py); возвращает статистику цикла"""
+    from log_retention import LogRetention
+    return LogRetention().run_cycle()
 
 
 if __name__ == "__main__":
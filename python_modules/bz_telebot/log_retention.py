@@ -0,0 +1,287 @@
+"""
+Хранение логов скриптов: сжатие завершенных логов и бюджет папки.
+
+За цикл для каждой папки logs-*:
+- завершенные логи (не самый свежий файл и без записи LOG_COMPRESS_MIN_AGE секунд)
+  сжимаются gzip или zstd (LOG_COMPRESSION=zstd, нужен пакет zstandard) с
+  сохранением mtime, чтобы порядок файлов по времени не менялся;
+- самые старые файлы удаляются, пока в папке больше MAX_LOG_FILES файлов или
+  больше LOG_FOLDER_MAX_BYTES байт (самый свежий лог не удаляется никогда).
+
+Обрабатываются только логи (LOG_FILE_PATTERNS, в том числе сжатые): файлы
+состояния, которые скрипты держат рядом с логами (*.json и прочие), не сжимаются
+и не удаляются.
+
+Для сжатых файлов в папке ведется индекс .log_index.json: исходное имя и
+размер, размер после сжатия, первая строка и последние строки. По нему хвост
+сжатого лога отдается без распаковки, а search_logs ищет и по сжатым файлам.
+
+Использование:
+    python log_retention.py                 # один цикл
+    python log_retention.py search trast "Traceback"
+"""
+import os
+import re
+import io
+import gzip
+import json
+import time
+import shutil
+import fnmatch
+import logging
+import argparse
+from collections import deque
+from datetime import datetime
+
+from log_manager import LOGS_DIR, MAX_LOG_FILES, read_tail_lines
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "gzip")  # gzip или zstd
+LOG_FOLDER_MAX_BYTES = int(os.getenv("LOG_FOLDER_MAX_BYTES", 1024 ** 3))  # Бюджет одной папки логов (1 ГБ)
+LOG_COMPRESS_MIN_AGE = 600  # Лог без записи дольше этого (секунды) считается завершенным
+LOG_INDEX_FILE = ".log_index.json"
+LOG_INDEX_TAIL_LINES = 20  # Сколько последних строк сжатого лога хранится в индексе
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+LOG_FILE_PATTERNS = ("*.log", "*.log.[0-9]*")  # Логи и их нумерованные ротации (trast.log.1)
+
+
+def is_compressed(path: str) -> bool:
+    return path.endswith(COMPRESSED_SUFFIXES)
+
+
+def is_log_file(name: str) -> bool:
+    """Лог (или сжатый лог) по имени файла"""
+    if is_compressed(name):
+        name = name.rsplit(".", 1)[0]
+    return any(fnmatch.fnmatch(name, pattern) for pattern in LOG_FILE_PATTERNS)
+
+
+def open_log_text(path: str):
+    """Текстовый поток лога: обычного, .gz или .zst"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", errors="ignore")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("для чтения .zst нужен пакет zstandard")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8-sig", errors="ignore")
+    return open(path, "r", encoding="utf-8-sig", errors="ignore")
+
+
+def load_index(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, LOG_INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Индекс логов {folder} поврежден, будет создан заново: {e}")
+        return {}
+
+
+def save_index(folder: str, index: dict):
+    path = os.path.join(folder, LOG_INDEX_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def read_compressed_tail(path: str, lines: int = 3) -> list:
+    """Последние строки сжатого лога: из индекса папки, иначе распаковкой потока"""
+    entry = load_index(os.path.dirname(path)).get(os.path.basename(path))
+    if entry and "tail" in entry and lines <= LOG_INDEX_TAIL_LINES:
+        return entry["tail"][-lines:] if lines > 0 else []
+    with open_log_text(path) as f:
+        return list(deque(f, maxlen=lines)) if lines > 0 else []
+
+
+def search_logs(script_key: str, pattern: str, max_results: int = 50, logs_dir: str = LOGS_DIR) -> list:
+    """
+    Строки логов скрипта, подходящие под регулярное выражение, от новых файлов к старым.
+    Возвращает [(имя файла, номер строки, строка)].
+    """
+    folder = os.path.join(logs_dir, f"logs-{script_key}")
+    if not os.path.isdir(folder):
+        return []
+    regex = re.compile(pattern)
+    files = sorted(
+        (entry for entry in os.scandir(folder) if entry.is_file() and is_log_file(entry.name)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    results = []
+    for entry in files:
+        try:
+            with open_log_text(entry.path) as f:
+                for number, line in enumerate(f, 1):
+                    if regex.search(line):
+                        results.append((entry.name, number, line.rstrip("\n")))
+                        if len(results) >= max_results:
+                            return results
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать {entry.path}: {e}")
+    return results
+
+
+class LogRetention:
+    def __init__(self, logs_dir: str = LOGS_DIR, max_files: int = MAX_LOG_FILES,
+                 max_bytes: int = LOG_FOLDER_MAX_BYTES, compression: str = LOG_COMPRESSION,
+                 min_age: float = LOG_COMPRESS_MIN_AGE):
+        self.logs_dir = logs_dir
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        if compression == "zstd" and zstandard is None:
+            logger.warning("LOG_COMPRESSION=zstd, но пакет zstandard не установлен - используем gzip")
+            compression = "gzip"
+        self.compression = compression
+
+    def _compress(self, path: str, index: dict) -> int:
+        """Сжимает файл, сохраняя mtime; возвращает освобожденные байты"""
+        stat = os.stat(path)
+        suffix = ".zst" if self.compression == "zstd" else ".gz"
+        target = path + suffix
+        # Временное имя с точкой: индекс последних логов (log_manager) его не видит
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(target)}.tmp")
+        try:
+            with open(path, "rb") as src:
+                if self.compression == "zstd":
+                    with open(tmp_path, "wb") as dst:
+                        zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+                else:
+                    with gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+            first_line = f.readline().rstrip("\n")
+        compressed_size = os.path.getsize(target)
+        index[os.path.basename(target)] = {
+            "original": os.path.basename(path),
+            "size": stat.st_size,
+            "compressed_size": compressed_size,
+            "mtime": stat.st_mtime,
+            "compressed_at": datetime.now().isoformat(timespec="seconds"),
+            "first_line": first_line,
+            "tail": read_tail_lines(path, LOG_INDEX_TAIL_LINES),
+        }
+        os.remove(path)
+        return stat.st_size - compressed_size
+
+    @staticmethod
+    def _delete_oldest(files: list, index: dict, stats: dict, over_budget):
+        """Удаляет самые старые файлы, пока over_budget() истинно (самый свежий остается)"""
+        while len(files) > 1 and over_budget():
+            path, _, size = files.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Не удалось удалить {path}: {e}")
+                continue
+            index.pop(os.path.basename(path), None)
+            stats["deleted"] += 1
+            stats["reclaimed"] += size
+            logger.info(f"Удалён старый лог: {path}")
+
+    def process_folder(self, folder: str) -> dict:
+        stats = {"compressed": 0, "deleted": 0, "reclaimed": 0}
+        index = load_index(folder)
+        files = []
+        for entry in os.scandir(folder):
+            if entry.name.startswith(".") or not entry.is_file() or not is_log_file(entry.name):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append([entry.path, stat.st_mtime, stat.st_size])
+        files.sort(key=lambda item: item[1])
+        if not files:
+            return stats
+
+        # Сначала лимит по числу файлов: лишние старые логи удаляются, не сжимаясь
+        self._delete_oldest(files, index, stats, lambda: len(files) > self.max_files)
+
+        now = time.time()
+        for item in files[:-1]:  # Самый свежий файл может еще писаться
+            path, mtime, _ = item
+            if is_compressed(path) or now - mtime < self.min_age:
+                continue
+            try:
+                stats["reclaimed"] += self._compress(path, index)
+                stats["compressed"] += 1
+                item[0] = path + (".zst" if self.compression == "zstd" else ".gz")
+                item[2] = index[os.path.basename(item[0])]["compressed_size"]
+            except Exception as e:
+                logger.warning(f"Не удалось сжать {path}: {e}")
+
+        self._delete_oldest(files, index, stats, lambda: sum(size for _, _, size in files) > self.max_bytes)
+
+        existing = {os.path.basename(path) for path, _, _ in files}
+        index = {name: entry for name, entry in index.items() if name in existing}
+        if index or os.path.exists(os.path.join(folder, LOG_INDEX_FILE)):
+            save_index(folder, index)
+        return stats
+
+    def run_cycle(self) -> dict:
+        """Один проход по всем папкам logs-*; возвращает суммарную статистику"""
+        started = time.monotonic()
+        totals = {"compressed": 0, "deleted": 0, "reclaimed": 0}
+        if not os.path.isdir(self.logs_dir):
+            return totals
+        for entry in sorted(os.listdir(self.logs_dir)):
+            folder = os.path.join(self.logs_dir, entry)
+            if not entry.startswith("logs-") or not os.path.isdir(folder):
+                continue
+            try:
+                stats = self.process_folder(folder)
+            except Exception as e:
+                logger.error(f"Ошибка обработки логов в {folder}: {e}")
+                continue
+            for key, value in stats.items():
+                totals[key] += value
+        totals["duration"] = round(time.monotonic() - started, 2)
+        if totals["compressed"] or totals["deleted"]:
+            logger.info(
+                f"Ротация логов: сжато {totals['compressed']}, удалено {totals['deleted']}, "
+                f"освобождено {totals['reclaimed'] / 1024 / 1024:.1f} МБ за {totals['duration']} сек"
+            )
+        return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress and trim script logs")
+    subparsers = parser.add_subparsers(dest="command")
+    search_parser = subparsers.add_parser("search", help="Search logs of a script, including compressed ones")
+    search_parser.add_argument("script")
+    search_parser.add_argument("pattern")
+    search_parser.add_argument("--max", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "search":
+        for name, number, line in search_logs(args.script, args.pattern, args.max):
+            print(f"{name}:{number}: {line}")
+        return
+    totals = LogRetention().run_cycle()
+    print(
+        f"Сжато {totals['compressed']}, удалено {totals['deleted']}, "
+        f"освобождено {totals['reclaimed'] / 1024 / 1024:.1f} МБ"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import os
 import time
 import logging
 import json
+import sys
 from datetime import datetime, timedelta
 from aiogram import Bot, Dispatcher, Router, F, types
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
@@ -17,10 +18,17 @@ import html
 from database_manager import *
 from user_state import set_user_state, get_user_state, clear_user_state
 from scheduler import router as schedule_router, handle_schedule_time_input
+from status_snapshot import StatusSnapshotService
+from schedule_engine import schedule_engine
+from process_supervisor import ProcessSupervisor
+from job_orchestrator import JobOrchestrator
 
 # === Настройки ===
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 load_dotenv(os.path.join(BASE_DIR, ".env"))
+sys.path.append(BASE_DIR)
+from notification.main import TelegramNotifier
+from notification.spool import SpoolReplayWorker, NOTIFY_REPLAY_INTERVAL
 API_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ADMIN_IDS = os.getenv("TELEGRAM_USER_IDS", "").split(",")
 
@@ -34,11 +42,28 @@ for item in os.listdir(BASE_DIR):
         SCRIPTS[item] = full_path
 
 AUTOSTART_CONFIG_KEY = "bz_telebot.autostart_scripts"
+RUN_HISTORY_DAYS = 30
+status_snapshot = StatusSnapshotService(SCRIPTS.keys())
+# Бот - единственный обработчик спула уведомлений: скрипты только дописывают в него
+notification_spool = TelegramNotifier.get_spool()
+spool_worker = SpoolReplayWorker(notification_spool, TelegramNotifier.create_sender())
+
+
+async def on_script_exit(name, run):
+    status_snapshot.invalidate()
+    await orchestrator.job_finished(name, run.run_id)
+
+
+supervisor = ProcessSupervisor(on_exit=on_script_exit)
 
 
 def collect_running_script_processes():
-    running = {}
-    script_items = list(SCRIPTS.items())
+    # Запущенные ботом скрипты известны по реестру супервизора, перебор процессов
+    # системы нужен только для остальных (запущенных в обход бота)
+    running = supervisor.running_processes()
+    script_items = [(name, path) for name, path in SCRIPTS.items() if name not in running]
+    if not script_items:
+        return running
     for proc in psutil.process_iter(["pid", "cmdline"]):
         try:
             cmdline = proc.info.get("cmdline") or []
@@ -75,9 +100,30 @@ def stop_running_scripts(process_map: dict):
                 errors.append(f"{name} (PID {proc.pid}) force kill: {exc}")
         set_script_end(name, status="stopped")
         stopped.append(name)
+    status_snapshot.invalidate()
     return stopped, errors
 
 
+async def notify_admins(text):
+    for uid in ADMIN_IDS:
+        uid = uid.strip()
+        if not uid:
+            continue
+        try:
+            await bot.send_message(uid, text, parse_mode="HTML")
+        except Exception as exc:
+            logging.warning(f"Не удалось отправить уведомление {uid}: {exc}")
+
+
+orchestrator = JobOrchestrator(
+    supervisor,
+    SCRIPTS,
+    is_running=lambda name: bool(collect_running_script_processes().get(name)),
+    notify=notify_admins,
+    on_start=lambda name: status_snapshot.invalidate(),
+)
+
+
 def remember_autostart_scripts(script_names):
     if script_names:
         try:
@@ -110,24 +156,15 @@ async def restore_autostart_scripts():
         if not script_path or not os.path.exists(script_path):
             failed.append(f"{name} (нет файла)")
             continue
-        try:
-            set_script_start(name)
-            subprocess.Popen(
-                ["nohup", "python3", script_path],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                preexec_fn=os.setpgrp
-            )
-            started.append(name)
-        except Exception as exc:
-            failed.append(f"{name}: {exc}")
+        await orchestrator.enqueue(name, "autostart")
+        started.append(name)
 
     if not started and not failed:
         return
 
     summary_lines = []
     if started:
-        summary_lines.append(f"♻️ Автозапущены скрипты: {', '.join(started)}")
+        summary_lines.append(f"♻️ Автозапуск скриптов (через очередь): {', '.join(started)}")
     if failed:
         summary_lines.append("⚠️ Не удалось запустить: " + ", ".join(failed))
 
@@ -152,7 +189,8 @@ dp.include_router(schedule_router)
 def get_main_keyboard():
     keyboard = [
         [KeyboardButton(text="📂 Службы"), KeyboardButton(text="📊 Статус")],
-        [KeyboardButton(text="⏰ Расписание"), KeyboardButton(text="🔄 Обновить/перезапустить бота")]
+        [KeyboardButton(text="⏰ Расписание"), KeyboardButton(text="📈 История запусков")],
+        [KeyboardButton(text="🔄 Обновить/перезапустить бота")]
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
@@ -226,8 +264,31 @@ def get_script_keyboard(script_name):
     )
 
 # === Утилиты ===
-def format_script_info(name):
-    info = get_script_info(name)
+def format_duration(seconds):
+    minutes = int(seconds) // 60
+    return f"{minutes} мин {int(seconds) % 60} сек" if minutes > 0 else f"{int(seconds)} сек"
+
+def format_bytes(size):
+    return f"{size / 1024 ** 3:.1f} ГБ" if size >= 1024 ** 3 else f"{size / 1024 ** 2:.0f} МБ"
+
+def format_resource_usage(summary):
+    """Ресурсы последнего запуска из супервизора: средние и пиковые CPU и память"""
+    if not summary or not summary["samples"]:
+        return None
+    text = (
+        f"Ресурсы{'' if summary['running'] else ' (последний запуск)'}: "
+        f"CPU ср. {summary['cpu_avg']:.0f}% / пик {summary['cpu_peak']:.0f}%, "
+        f"RAM ср. {format_bytes(summary['rss_avg'])} / пик {format_bytes(summary['rss_peak'])}, "
+        f"диск чт. {format_bytes(summary['io_read'])} / зап. {format_bytes(summary['io_write'])}"
+    )
+    if summary["children_peak"]:
+        text += f", дочерних процессов до {summary['children_peak']}"
+        if summary["browsers_peak"]:
+            text += f" (браузеров {summary['browsers_peak']})"
+    return text
+
+def format_script_info(name, info=None, tail=None):
+    info = info or get_script_info(name)
     status = info['status'] or "unknown"
     start = info['start_time']
     end = info['end_time']
@@ -243,9 +304,7 @@ def format_script_info(name):
 
     duration_text = "–"
     if duration:
-        minutes = int(duration) // 60
-        seconds = int(duration) % 60
-        duration_text = f"{minutes} мин {seconds} сек" if minutes > 0 else f"{seconds} сек"
+        duration_text = format_duration(duration)
 
     last_run_fmt = "–"
     if start:
@@ -254,9 +313,17 @@ def format_script_info(name):
         except:
             pass
 
-    tail = get_latest_log_tail(name)
+    if tail is None:
+        tail = get_latest_log_tail(name)
+    text = f"{name}\nПоследний запуск: {last_run_fmt}\nСтатус: {status_emoji}\nВремя выполнения: {duration_text}"
+    queued = orchestrator.describe(name)
+    if queued:
+        text += f"\n{queued}"
+    resources = format_resource_usage(supervisor.summary(name))
+    if resources:
+        text += f"\n{resources}"
     return {
-        "text": f"{name}\nПоследний запуск: {last_run_fmt}\nСтатус: {status_emoji}\nВремя выполнения: {duration_text}",
+        "text": text,
         "tail": html.escape(tail) if tail else None
     }
 
@@ -286,8 +353,15 @@ async def go_back(message: types.Message):
 @router.message(F.text == "📊 Статус")
 async def show_status(message: types.Message):
     lines = []
-    for name in SCRIPTS:
-        info = format_script_info(name)
+    snapshot = await status_snapshot.get()
+    if snapshot.get("error"):
+        await message.reply(
+            f"⚠️ Не удалось собрать статусы скриптов: {snapshot['error']}",
+            reply_markup=get_main_keyboard(), parse_mode=None
+        )
+        return
+    for name, entry in snapshot["scripts"].items():
+        info = format_script_info(name, entry["info"], entry["tail"])
         text = info["text"]
         tail = info["tail"]
         if tail:
@@ -296,8 +370,57 @@ async def show_status(message: types.Message):
     if not lines:
         await message.reply("Нет данных о статусах скриптов", reply_markup=get_main_keyboard())
     else:
+        try:
+            count, age = await asyncio.get_running_loop().run_in_executor(None, notification_spool.depth)
+        except Exception as e:
+            logging.warning(f"Не удалось прочитать спул уведомлений: {e}")
+        else:
+            if count:
+                lines.append(f"📨 Неотправленных уведомлений: {count}, самое старое {format_duration(age)} назад")
         await message.reply("\n\n".join(lines), reply_markup=get_main_keyboard(), parse_mode=None)
 
+def format_run_history(name, runs):
+    """Сводка истории запусков скрипта: p50/p95 длительности успешных запусков и последний запуск"""
+    durations = [run["duration"] for run in runs if run["status"] == "done" and run["duration"] is not None]
+    failed = sum(1 for run in runs if run["status"] not in ("done", "running"))
+    text = f"{name}: запусков {len(runs)}, с ошибкой {failed}"
+    if durations:
+        text += (
+            f"\nДлительность: p50 {format_duration(percentile(durations, 50))}, "
+            f"p95 {format_duration(percentile(durations, 95))}"
+        )
+    last = runs[0]
+    details = [last["status"] or "unknown"]
+    if last["duration"] is not None:
+        details.append(format_duration(last["duration"]))
+    if last["items"] is not None:
+        details.append(f"обработано {last['items']}")
+    if last["api_calls"] is not None:
+        details.append(f"запросов {last['api_calls']}")
+    if last["cache_hit_rate"] is not None:
+        details.append(f"кеш {last['cache_hit_rate'] * 100:.0f}%")
+    if last["peak_rss"]:
+        details.append(f"RAM пик {format_bytes(last['peak_rss'])}")
+    text += f"\nПоследний ({last['start_time'][:16].replace('T', ' ')}): {', '.join(details)}"
+    return text
+
+@router.message(F.text == "📈 История запусков")
+async def show_run_history(message: types.Message):
+    since = (datetime.now() - timedelta(days=RUN_HISTORY_DAYS)).isoformat()
+    loop = asyncio.get_running_loop()
+    runs = await loop.run_in_executor(None, lambda: get_runs(since=since))
+    by_script = {}
+    for run in runs:
+        by_script.setdefault(run["script_name"], []).append(run)
+    lines = [format_run_history(name, by_script[name]) for name in sorted(by_script)]
+    if not lines:
+        await message.reply(f"Нет запусков за {RUN_HISTORY_DAYS} дней", reply_markup=get_main_keyboard())
+    else:
+        await message.reply(
+            f"История запусков за {RUN_HISTORY_DAYS} дней:\n\n" + "\n\n".join(lines),
+            reply_markup=get_main_keyboard(), parse_mode=None
+        )
+
 @router.message(F.text.in_(SCRIPTS.keys()))
 async def show_script_controls(message: types.Message):
     await message.reply(f"Действия для {message.text}:", reply_markup=get_script_keyboard(message.text))
@@ -311,21 +434,17 @@ async def run_script(message: types.Message):
         await message.reply(f"❌ Скрипт {script_name} не найден по пути: {script_path}")
         return
 
-    await message.reply(f"⏳ Запуск скрипта: {script_name}\n🧩 Путь: {script_path}")
     logging.info(f"Запуск скрипта '{script_name}' по пути: {script_path}")
-    try:
-        set_script_start(script_name)
-        subprocess.Popen(
-            ["nohup", "python3", script_path],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            preexec_fn=os.setpgrp
-        )
-        await message.reply(f"✅ Скрипт {script_name} запущен", reply_markup=get_script_keyboard(script_name))
-    except Exception as e:
-        logging.exception(f"Ошибка запуска скрипта {script_name}")
-        set_script_end(script_name, status="failed")
-        await message.reply(f"❌ Ошибка запуска {script_name}: {str(e)}", reply_markup=get_script_keyboard(script_name))
+    job, created = await orchestrator.enqueue(script_name, "manual")
+    if created:
+        await orchestrator.dispatch()
+    if job["status"] == "running":
+        text = f"✅ Скрипт {script_name} запущен" if created else f"ℹ️ Скрипт {script_name} уже работает"
+    elif job["status"] == "queued":
+        text = f"⏳ Скрипт {script_name} поставлен в очередь\n{orchestrator.describe(script_name)}"
+    else:
+        text = f"❌ Скрипт {script_name} не запущен: {job['status']}, подробности в логе бота"
+    await message.reply(text, reply_markup=get_script_keyboard(script_name))
 
 @router.message(F.text.startswith("📄 Лог: "))
 async def show_log_tail(message: types.Message):
@@ -338,90 +457,66 @@ async def show_log_tail(message: types.Message):
 # === Фоновая очистка логов ===
 def periodic_log_cleanup(interval_seconds=1800):
     async def _loop():
+        loop = asyncio.get_running_loop()
         while True:
-            cleanup_old_logs()
+            # Сжатие логов занимает секунды и минуты - выполняем вне цикла событий
+            try:
+                await loop.run_in_executor(None, cleanup_old_logs)
+            except Exception as e:
+                logging.error(f"Ошибка ротации логов: {e}")
             await asyncio.sleep(interval_seconds)
     return _loop()
 
-# === Фоновый запуск по расписанию (из config с cron) ===
-from croniter import croniter
-
-def get_due_schedules(now: datetime) -> list:
-    result = []
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    try:
-        query = "SELECT name, value FROM config WHERE name LIKE %s" if DB_TYPE == "mysql" else "SELECT name, value FROM config WHERE name LIKE ?"
-        like_pattern = "%.schedule.%" if DB_TYPE == "mysql" else "%.schedule.%"
-        cursor.execute(query, (like_pattern,))
-        for name, cron_expr in cursor.fetchall():
+# === Отправка уведомлений, накопленных в спуле ===
+def periodic_spool_replay(interval_seconds=NOTIFY_REPLAY_INTERVAL):
+    async def _loop():
+        loop = asyncio.get_running_loop()
+        while True:
+            # Отправка идет синхронными запросами - вне цикла событий
             try:
-                script_name = name.split(".")[0]
-                base_time = now.replace(second=0, microsecond=0)
-                itr = croniter(cron_expr, base_time - timedelta(minutes=1))
-                next_time = itr.get_next(datetime)
-                if next_time == base_time:
-                    result.append({"script_name": script_name, "cron_expr": cron_expr})
+                await loop.run_in_executor(None, spool_worker.run_once)
             except Exception as e:
-                logging.warning(f"Некорректный cron-выражение '{cron_expr}' для '{name}': {e}")
-    finally:
-        cursor.close()
-        conn.close()
-    return result
+                logging.error(f"Ошибка отправки спула уведомлений: {e}")
+            await asyncio.sleep(interval_seconds)
+    return _loop()
 
-def periodic_schedule_runner(interval_seconds=60):
+# === Фоновый запуск по расписанию (из config с cron) ===
+def periodic_schedule_runner():
     async def _loop():
-        await asyncio.sleep(5)
         while True:
-            now = datetime.now()
-            due = get_due_schedules(now)
+            due = await schedule_engine.wait_due()
             for task in due:
                 script_name = task["script_name"]
-                script_path = SCRIPTS.get(script_name)
-                if script_path and os.path.exists(script_path):
-                    # Проверяем, запущен ли уже экземпляр скрипта через проверку реальных процессов
-                    running_processes = collect_running_script_processes()
-                    is_running = script_name in running_processes and len(running_processes[script_name]) > 0
-                    
-                    if is_running:
-                        # Скрипт уже работает, пропускаем плановый запуск
-                        logging.info(f"[SCHEDULE] Пропущен плановый запуск {script_name} - скрипт уже работает")
-                        notification_text = f"⏭️ Плановый запуск скрипта <b>{script_name}</b> пропущен\n" \
-                                          f"Причина: скрипт уже работает (статус: Работает)"
-                        
-                        # Отправляем уведомление всем администраторам
-                        for uid in ADMIN_IDS:
-                            uid = uid.strip()
-                            if not uid:
-                                continue
-                            try:
-                                await bot.send_message(uid, notification_text, parse_mode="HTML")
-                            except Exception as exc:
-                                logging.warning(f"Не удалось отправить уведомление {uid}: {exc}")
-                    else:
-                        # Скрипт не работает, запускаем по расписанию
-                        logging.info(f"[SCHEDULE] Запуск по cron: {script_name} ({task['cron_expr']})")
-                        set_script_start(script_name)
-                        subprocess.Popen(
-                            ["nohup", "python3", script_path],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL,
-                            preexec_fn=os.setpgrp
-                        )
-            await asyncio.sleep(interval_seconds)
+                if script_name not in SCRIPTS:
+                    continue
+                logging.info(f"[SCHEDULE] Запуск по cron: {script_name} ({task['cron_expr']})")
+                job, created = await orchestrator.enqueue(script_name, "schedule")
+                if not created:
+                    # Скрипт уже работает или ждет в очереди, пропускаем плановый запуск
+                    state = "работает" if job["status"] == "running" else "ожидает в очереди"
+                    logging.info(f"[SCHEDULE] Пропущен плановый запуск {script_name} - скрипт уже {state}")
+                    await notify_admins(
+                        f"⏭️ Плановый запуск скрипта <b>{script_name}</b> пропущен\n"
+                        f"Причина: скрипт уже {state}"
+                    )
     return _loop()
 
 # === Запуск ===
 async def main():
     init_db()
+    supervisor.adopt()
+    orchestrator.load()
     await restore_autostart_scripts()
+    status_snapshot.refresh()
     for uid in ADMIN_IDS:
         try:
             await bot.send_message(uid.strip(), "🤖 Бот запущен", reply_markup=get_main_keyboard())
         except Exception as e:
             logging.warning(f"Не удалось отправить сообщение {uid}: {e}")
     asyncio.create_task(periodic_log_cleanup())
+    asyncio.create_task(periodic_spool_replay())
     asyncio.create_task(periodic_schedule_runner())
+    asyncio.create_task(orchestrator.run_forever())
     await dp.start_polling(bot)
 
 if __name__ == "__main__":
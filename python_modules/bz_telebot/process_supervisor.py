@@ -0,0 +1,293 @@
+"""
+Запуск скриптов из бота и учет ресурсов каждого запуска.
+
+Скрипты стартуют через asyncio.create_subprocess_exec в отдельной сессии
+(как прежний nohup + setpgrp: перезапуск бота их не останавливает), PID
+запусков хранятся в реестре, поэтому бот не ищет свои скрипты перебором всех
+процессов системы. Реестр сохраняется в config: после перезапуска бота
+живые процессы подхватываются обратно по PID и времени создания.
+
+Раз в SUPERVISOR_SAMPLE_INTERVAL секунд для каждого запуска снимаются CPU%,
+RSS, счетчики ввода-вывода и число дочерних процессов (браузеры trast) по
+всему дереву процессов скрипта; выборки копятся во временном ряду запуска,
+пики и средние считаются по ходу. Данные последнего запуска каждого скрипта
+показываются в "📊 Статус". Запись в базу (реестр, итог запуска) идет в
+отдельном потоке: с MySQL ConfigStore может переподключаться секундами.
+
+Если скрипт завершился, не записав свой итог (упал, убит), статус
+"running" заменяется на done или failed по коду возврата. Итог сверяется с
+записью runs этого запуска, а не с кешем config бота.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import psutil
+
+from database_manager import (
+    get_config, set_config, delete_config_key, set_script_end, record_run_peak_rss, get_run_status,
+)
+
+SUPERVISOR_SAMPLE_INTERVAL = float(os.getenv("SUPERVISOR_SAMPLE_INTERVAL", 5))
+SUPERVISOR_MAX_SAMPLES = 4320  # 6 часов при выборке раз в 5 секунд; пики и средние считаются по всему запуску
+SUPERVISOR_REGISTRY_KEY = "bz_telebot.supervised_processes"
+BROWSER_PROCESS_NAMES = ("firefox", "geckodriver", "chrome", "chromedriver")
+
+
+class ScriptRun:
+    """Один запуск скрипта: процесс, выборки ресурсов и итог"""
+
+    def __init__(self, name, pid, create_time, process=None, run_id=None):
+        self.name = name
+        self.pid = pid
+        self.create_time = create_time
+        self.run_id = run_id  # id записи runs, открытой ботом при запуске
+        self.process = process  # asyncio.subprocess.Process; None для подхваченного после перезапуска бота
+        self.started_at = datetime.fromtimestamp(create_time)
+        self.ended_at = None
+        self.returncode = None
+        self.samples = deque(maxlen=SUPERVISOR_MAX_SAMPLES)  # (время, CPU%, RSS, прочитано, записано, дочерних, браузеров)
+        self.peak = {"cpu": 0.0, "rss": 0, "children": 0, "browsers": 0}
+        self.totals = {"cpu": 0.0, "rss": 0, "samples": 0}
+        self.io = {"read": 0, "write": 0}
+        self._procs = {}  # pid -> psutil.Process: cpu_percent считается между вызовами на одном объекте
+
+    @property
+    def running(self):
+        return self.ended_at is None
+
+    def sample(self):
+        """Снимает одну выборку по дереву процессов скрипта; False, если процесс уже завершился"""
+        root = self._procs.get(self.pid)
+        if root is None:
+            try:
+                root = psutil.Process(self.pid)
+            except psutil.NoSuchProcess:
+                return False
+            root.cpu_percent(None)
+            self._procs[self.pid] = root
+        try:
+            if not root.is_running() or root.status() == psutil.STATUS_ZOMBIE:
+                return False
+            tree = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return False
+
+        cpu = 0.0
+        rss = read_bytes = write_bytes = browsers = 0
+        alive = {}
+        for proc in tree:
+            known = self._procs.get(proc.pid)
+            if known is None:
+                known = proc
+                known.cpu_percent(None)  # Первый вызов только запоминает точку отсчета
+            try:
+                with known.oneshot():
+                    cpu += known.cpu_percent(None)
+                    rss += known.memory_info().rss
+                    if any(browser in known.name().lower() for browser in BROWSER_PROCESS_NAMES):
+                        browsers += 1
+                    try:
+                        io = known.io_counters()
+                        read_bytes += io.read_bytes
+                        write_bytes += io.write_bytes
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            except psutil.AccessDenied:
+                pass
+            alive[proc.pid] = known
+        self._procs = alive
+
+        children = len(alive) - 1
+        self.samples.append((time.time(), cpu, rss, read_bytes, write_bytes, children, browsers))
+        self.peak["cpu"] = max(self.peak["cpu"], cpu)
+        self.peak["rss"] = max(self.peak["rss"], rss)
+        self.peak["children"] = max(self.peak["children"], children)
+        self.peak["browsers"] = max(self.peak["browsers"], browsers)
+        self.totals["cpu"] += cpu
+        self.totals["rss"] += rss
+        self.totals["samples"] += 1
+        # Счетчики завершившихся дочерних процессов пропадают из суммы - берем максимум
+        self.io["read"] = max(self.io["read"], read_bytes)
+        self.io["write"] = max(self.io["write"], write_bytes)
+        return True
+
+    def summary(self):
+        """Пики и средние запуска для статуса"""
+        samples = self.totals["samples"]
+        return {
+            "pid": self.pid,
+            "running": self.running,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "returncode": self.returncode,
+            "samples": samples,
+            "cpu_avg": self.totals["cpu"] / samples if samples else 0.0,
+            "cpu_peak": self.peak["cpu"],
+            "rss_avg": self.totals["rss"] / samples if samples else 0,
+            "rss_peak": self.peak["rss"],
+            "children_peak": self.peak["children"],
+            "browsers_peak": self.peak["browsers"],
+            "io_read": self.io["read"],
+            "io_write": self.io["write"],
+        }
+
+
+class ProcessSupervisor:
+    def __init__(self, sample_interval=SUPERVISOR_SAMPLE_INTERVAL, on_exit=None):
+        self.sample_interval = sample_interval
+        self.on_exit = on_exit  # async on_exit(name, run) после завершения скрипта
+        self.runs = {}  # имя скрипта -> последний ScriptRun
+        self._tasks = set()
+        # Один поток: записи реестра ложатся в базу в том же порядке, в каком сделаны
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="supervisor")
+
+    def is_running(self, name):
+        run = self.runs.get(name)
+        return run is not None and run.running
+
+    def running_processes(self):
+        """{имя: [psutil.Process]} работающих запусков - в формате collect_running_script_processes"""
+        result = {}
+        for name, run in self.runs.items():
+            if not run.running:
+                continue
+            try:
+                result[name] = [psutil.Process(run.pid)]
+            except psutil.NoSuchProcess:
+                continue
+        return result
+
+    def summary(self, name):
+        run = self.runs.get(name)
+        return run.summary() if run else None
+
+    def _registry(self):
+        return {
+            name: {"pid": run.pid, "create_time": run.create_time, "run_id": run.run_id}
+            for name, run in self.runs.items() if run.running
+        }
+
+    @staticmethod
+    def _write_registry(registry):
+        if registry:
+            set_config(SUPERVISOR_REGISTRY_KEY, json.dumps(registry))
+        else:
+            delete_config_key(SUPERVISOR_REGISTRY_KEY)
+
+    async def _save_registry(self):
+        # Снимок реестра берется в цикле событий, в базу пишется в потоке супервизора
+        await asyncio.get_running_loop().run_in_executor(self._db, self._write_registry, self._registry())
+
+    async def start(self, name, script_path, env=None, run_id=None):
+        """
+        Запускает скрипт (env дополняет окружение бота) и ставит его на учет; возвращает ScriptRun.
+        run_id - запись runs запуска, по ней после завершения проверяется итог скрипта.
+        """
+        process = await asyncio.create_subprocess_exec(
+            "python3", script_path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+            env={**os.environ, **env} if env else None,
+        )
+        try:
+            create_time = psutil.Process(process.pid).create_time()
+        except psutil.NoSuchProcess:
+            create_time = time.time()
+        run = ScriptRun(name, process.pid, create_time, process, run_id)
+        self._track(run)
+        await self._save_registry()
+        logging.info(f"Скрипт '{name}' запущен, PID {process.pid}")
+        return run
+
+    def adopt(self):
+        """Подхватывает скрипты, запущенные до перезапуска бота и еще работающие (при старте бота)"""
+        raw = get_config(SUPERVISOR_REGISTRY_KEY)
+        if not raw:
+            return []
+        try:
+            registry = json.loads(raw)
+        except json.JSONDecodeError:
+            registry = {}
+        adopted = []
+        for name, entry in registry.items():
+            try:
+                proc = psutil.Process(entry["pid"])
+                # PID мог достаться другому процессу - сверяем время создания
+                if abs(proc.create_time() - entry["create_time"]) > 1 or proc.status() == psutil.STATUS_ZOMBIE:
+                    continue
+            except (psutil.NoSuchProcess, KeyError, TypeError):
+                continue
+            self._track(ScriptRun(name, entry["pid"], entry["create_time"], run_id=entry.get("run_id")))
+            adopted.append(name)
+        if adopted:
+            logging.info(f"Подхвачены работающие скрипты: {', '.join(adopted)}")
+        self._write_registry(self._registry())
+        return adopted
+
+    def _track(self, run):
+        self.runs[run.name] = run
+        task = asyncio.ensure_future(self._watch(run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _watch(self, run):
+        loop = asyncio.get_running_loop()
+        wait_exit = asyncio.ensure_future(run.process.wait()) if run.process else None
+        try:
+            while True:
+                try:
+                    # Обход дерева процессов (у trast - браузеры) не выполняем в цикле событий
+                    alive = await loop.run_in_executor(None, run.sample)
+                except Exception as e:
+                    logging.warning(f"Ошибка сбора ресурсов скрипта '{run.name}': {e}")
+                    alive = True
+                if wait_exit is not None:
+                    done, _ = await asyncio.wait({wait_exit}, timeout=self.sample_interval)
+                    if done:
+                        run.returncode = wait_exit.result()
+                        break
+                elif not alive:
+                    break
+                else:
+                    await asyncio.sleep(self.sample_interval)
+        finally:
+            run.ended_at = datetime.now()
+            if wait_exit is not None and not wait_exit.done():
+                wait_exit.cancel()
+        await self._finish(run)
+
+    async def _finish(self, run):
+        summary = run.summary()
+        logging.info(
+            f"Скрипт '{run.name}' (PID {run.pid}) завершился с кодом {run.returncode}: "
+            f"CPU ср. {summary['cpu_avg']:.0f}% / пик {summary['cpu_peak']:.0f}%, "
+            f"RSS пик {summary['rss_peak'] / 1024 / 1024:.0f} МБ, процессов до {summary['children_peak'] + 1}"
+        )
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._db, self._record_exit, run, summary, self._registry()
+            )
+        except Exception as e:
+            logging.error(f"Ошибка записи итога скрипта '{run.name}': {e}")
+        if self.on_exit:
+            await self.on_exit(run.name, run)
+
+    def _record_exit(self, run, summary, registry):
+        """Итог запуска и реестр в базу (в потоке супервизора)"""
+        # Скрипт сам пишет итог; если он упал или был убит, статус остается "running".
+        # Итог записан другим процессом - читаем мимо кеша, иначе "failed" скрипта затрется на "done"
+        if get_run_status(run.name, run.run_id) == "running":
+            set_script_end(run.name, status="done" if run.returncode == 0 else "failed")
+        if summary["samples"]:
+            # Скрипт сам пишет пик своей памяти, у супервизора - пик всего дерева (с браузерами)
+            record_run_peak_rss(run.name, summary["rss_peak"])
+        self._write_registry(registry)
@@ -0,0 +1,124 @@
+"""
+Запуск скриптов по расписанию без ежеминутного опроса config.
+
+Записи <script>.schedule.* читаются из config один раз и разбираются в кучу
+(heapq) ближайших времен запуска. wait_due() спит ровно до вершины кучи и
+возвращает наступившие записи, их следующие времена возвращаются в кучу.
+Куча перестраивается только после invalidate() - его вызывает роутер
+расписания при добавлении и удалении записей, - и раз в
+SCHEDULE_RESYNC_INTERVAL секунд на случай правки config в обход бота.
+
+Запуск, опоздавший больше чем на SCHEDULE_MISFIRE_GRACE секунд (бот стоял,
+система спала), пропускается, как и при прежнем ежеминутном опросе.
+"""
+import os
+import heapq
+import asyncio
+import logging
+from datetime import datetime
+from croniter import croniter
+
+from database_manager import get_all_configs_like
+
+SCHEDULE_KEY_PATTERN = "%.schedule.%"
+SCHEDULE_MISFIRE_GRACE = float(os.getenv("SCHEDULE_MISFIRE_GRACE", 60))
+SCHEDULE_RESYNC_INTERVAL = float(os.getenv("SCHEDULE_RESYNC_INTERVAL", 3600))
+SCHEDULE_MAX_SLEEP = 300  # Сон дольше не нужен: так переводы системных часов учитываются не позже чем через 5 минут
+
+
+class ScheduleEngine:
+    def __init__(self, load_entries=None, now=datetime.now,
+                 misfire_grace=SCHEDULE_MISFIRE_GRACE, resync_interval=SCHEDULE_RESYNC_INTERVAL):
+        self._load_entries = load_entries or (lambda: get_all_configs_like(SCHEDULE_KEY_PATTERN))
+        self._now = now
+        self.misfire_grace = misfire_grace
+        self.resync_interval = resync_interval
+        self._heap = []  # (время запуска, порядковый номер, ключ config)
+        self._entries = {}  # ключ config -> cron-выражение
+        self._dirty = True
+        self._loaded_at = None
+        self._changed = None  # asyncio.Event, создается в цикле событий
+
+    def invalidate(self):
+        """Расписание в config изменилось: куча будет перестроена, спящий wait_due() проснется"""
+        self._dirty = True
+        if self._changed is not None:
+            self._changed.set()
+
+    def _next_time(self, cron_expr, base):
+        return croniter(cron_expr, base).get_next(datetime)
+
+    def rebuild(self):
+        """Читает записи расписания из config и строит кучу ближайших запусков"""
+        now = self._now()
+        entries = {}
+        heap = []
+        for key, cron_expr in self._load_entries():
+            try:
+                heap.append((self._next_time(cron_expr, now), len(heap), key))
+                entries[key] = cron_expr
+            except Exception as e:
+                logging.warning(f"Некорректный cron-выражение '{cron_expr}' для '{key}': {e}")
+        heapq.heapify(heap)
+        self._heap, self._entries = heap, entries
+        self._dirty = False
+        self._loaded_at = now
+        logging.info(
+            f"[SCHEDULE] Загружено расписаний: {len(entries)}"
+            + (f", ближайший запуск {heap[0][0]:%d.%m %H:%M}" if heap else "")
+        )
+
+    def next_fire_time(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self):
+        """Записи, время которых наступило; их следующие запуски возвращаются в кучу"""
+        now = self._now()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_time, seq, key = heapq.heappop(self._heap)
+            cron_expr = self._entries[key]
+            lateness = (now - fire_time).total_seconds()
+            if lateness > self.misfire_grace:
+                logging.warning(f"[SCHEDULE] Пропущен запуск {key} на {fire_time:%d.%m %H:%M}: опоздание {lateness:.0f} сек")
+            else:
+                due.append({
+                    "script_name": key.split(".")[0],
+                    "cron_expr": cron_expr,
+                    "key": key,
+                    "scheduled_for": fire_time,
+                })
+            heapq.heappush(self._heap, (self._next_time(cron_expr, max(now, fire_time)), seq, key))
+        return due
+
+    def _sleep_seconds(self):
+        now = self._now()
+        timeout = min(SCHEDULE_MAX_SLEEP, self.resync_interval - (now - self._loaded_at).total_seconds())
+        if self._heap:
+            timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+        return max(timeout, 0)
+
+    async def wait_due(self):
+        """Ждет ближайшего запуска и возвращает наступившие записи (как минимум одну)"""
+        loop = asyncio.get_running_loop()
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        while True:
+            if self._dirty or (self._now() - self._loaded_at).total_seconds() >= self.resync_interval:
+                self._changed.clear()
+                try:
+                    await loop.run_in_executor(None, self.rebuild)
+                except Exception as e:
+                    logging.error(f"[SCHEDULE] Не удалось загрузить расписание: {e}")
+                    await asyncio.sleep(60)
+                    continue
+            due = self.pop_due()
+            if due:
+                return due
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self._sleep_seconds())
+            except asyncio.TimeoutError:
+                pass
+
+
+schedule_engine = ScheduleEngine()
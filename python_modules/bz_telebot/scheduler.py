@@ -4,6 +4,7 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from datetime import datetime
 from database_manager import set_config, get_all_configs_like, delete_config_key
 from user_state import user_state, set_user_state
+from schedule_engine import schedule_engine
 
 router = Router()
 AVAILABLE_SCRIPTS = ["avito", "zzap", "trast", "froza"]
@@ -125,6 +126,7 @@ async def process_days(call: CallbackQuery):
         cron_expr = f"{minute} {hour} * * {','.join(map(str, days))}"
         cron_key = f"{script}.schedule.{hour:02d}_{minute:02d}_{'_'.join(map(str, days))}"
         set_config(cron_key, cron_expr)
+        schedule_engine.invalidate()
 
         time_str = f"{hour:02d}:{minute:02d}"
         day_names = ", ".join(WEEKDAYS.get(int(d), str(d)) for d in days)
@@ -178,6 +180,7 @@ async def delete_schedule(call: CallbackQuery):
     entries = get_all_configs_like(key)
     expr = entries[0][1] if entries else None
     delete_config_key(key)
+    schedule_engine.invalidate()
 
     if expr:
         try:
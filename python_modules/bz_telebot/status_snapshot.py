@@ -0,0 +1,97 @@
+"""
+Снимок статусов скриптов для "📊 Статус".
+
+Статусы всех скриптов читаются одним get_scripts_info, хвосты логов - параллельно
+в пуле потоков; вся блокирующая работа идет в executor, а не в цикле событий
+aiogram. Снимок живет STATUS_SNAPSHOT_TTL секунд. Устаревший снимок отдается
+сразу, а новый собирается в фоне, поэтому обработчик ждет сбора только при
+первом обращении и после invalidate() (запуск или остановка скрипта из бота).
+Если собрать снимок не удалось, get() возвращает снимок с полем "error"
+(он не кешируется), чтобы обработчик мог ответить сообщением об ошибке.
+"""
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from database_manager import get_scripts_info
+from log_manager import get_latest_log_tail
+
+STATUS_SNAPSHOT_TTL = float(os.getenv("STATUS_SNAPSHOT_TTL", 5))
+STATUS_LOG_WORKERS = 4
+
+
+class StatusSnapshotService:
+    def __init__(self, script_names, ttl=STATUS_SNAPSHOT_TTL, workers=STATUS_LOG_WORKERS):
+        self.script_names = list(script_names)
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="status")
+        self._snapshot = None
+        self._refresh_task = None
+        self._generation = 0  # Растет при invalidate(): результат начатого раньше сбора не сохраняется
+        self._loop = None  # Цикл событий, в котором живет сервис (invalidate из других потоков идет через него)
+
+    def _collect(self):
+        started = time.monotonic()
+        infos = get_scripts_info(self.script_names)
+        tails = dict(zip(self.script_names, self._pool.map(get_latest_log_tail, self.script_names)))
+        scripts = {
+            name: {"info": infos[name], "tail": tails[name]}
+            for name in self.script_names
+        }
+        logging.debug(f"Снимок статусов собран за {time.monotonic() - started:.3f} сек")
+        return {"created_at": time.monotonic(), "scripts": scripts}
+
+    async def _refresh(self, generation):
+        loop = asyncio.get_running_loop()
+        try:
+            # Пул self._pool занят чтением логов внутри _collect, сам сбор идет в пуле по умолчанию
+            snapshot = await loop.run_in_executor(None, self._collect)
+        except Exception as e:
+            logging.error(f"Ошибка сбора статусов скриптов: {e}")
+            snapshot = {"created_at": time.monotonic(), "scripts": {}, "error": str(e)}
+        if generation == self._generation:
+            self._refresh_task = None
+            if not snapshot.get("error"):
+                self._snapshot = snapshot
+        return snapshot
+
+    def refresh(self):
+        """Запускает сбор снимка, если он еще не идет; возвращает задачу сбора"""
+        self._loop = asyncio.get_running_loop()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh(self._generation))
+        return self._refresh_task
+
+    def invalidate(self):
+        """Следующий get() дождется снимка, начатого после этого вызова (можно вызывать из любого потока)"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is not None and running is not self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._invalidate)
+        else:
+            self._invalidate()
+
+    def _invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+        self._refresh_task = None
+
+    async def get(self):
+        """
+        Снимок {"created_at", "scripts": {name: {"info", "tail"}}}, при ошибке сбора -
+        {"created_at", "scripts": {}, "error": текст}.
+        Свежий и устаревший отдаются сразу (устаревший - с обновлением в фоне).
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await asyncio.shield(self.refresh())
+        if time.monotonic() - snapshot["created_at"] > self.ttl:
+            self.refresh()
+        return snapshot
+
+    def close(self):
+        self._pool.shutdown(wait=False)
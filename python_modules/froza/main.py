@@ -255,7 +255,7 @@ if __name__ == "__main__":
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        set_script_end(script_name, status="done")
+        set_script_end(script_name, status="done", items=len(ads_data))
 
         TelegramNotifier.notify(
             f"[Froza] Update completed successfully — Duration: {duration:.2f}s"
@@ -1,14 +1,208 @@
-import requests
 import os
+import time
+import queue
+import atexit
+import threading
+import requests
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    from notification.spool import NotificationSpool, CircuitBreaker
+except ImportError:  # Запуск из каталога notification (stub_bot_api.py, spool.py)
+    from spool import NotificationSpool, CircuitBreaker
+
 # === Load .env ===
 load_dotenv()
 
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", 500))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", 1.0))  # Telegram: не чаще сообщения в секунду в один чат
+NOTIFY_FLUSH_TIMEOUT = float(os.getenv("NOTIFY_FLUSH_TIMEOUT", 10))  # Сколько ждать отправки очереди при выходе
+NOTIFY_TIMEOUT = (5, 15)  # Таймауты соединения и ответа Bot API
+NOTIFY_RETRIES = 3
+NOTIFY_EDIT_KEYS = 1000  # Сколько последних сообщений с ключом отправитель помнит для редактирования
+
+
+class TelegramSender:
+    """
+    Фоновая отправка уведомлений: notify() только кладет сообщение в очередь.
+
+    Поток-отправитель разбирает ограниченную очередь через одну requests.Session
+    (соединения переиспользуются), выдерживает интервал между сообщениями в чат
+    и retry_after из ответов 429. Сообщения с ключом (прогресс парсинга) не
+    копятся: из пачки, накопившейся за время отправки, уходит только последнее
+    по каждому ключу, и оно редактирует ранее отправленное сообщение с тем же
+    ключом, а не приходит новым. При выходе процесса очередь дожидается отправки
+    (не дольше NOTIFY_FLUSH_TIMEOUT секунд).
+
+    Если задан spool, неотправленное не теряется: сообщение, которое не удалось
+    доставить, и все сообщения, пока Telegram недоступен (breaker открыт),
+    записываются в спул и отправляются обработчиком спула позже.
+    """
+
+    def __init__(self, token, user_ids, api_base=TELEGRAM_API_BASE, queue_size=NOTIFY_QUEUE_SIZE,
+                 chat_interval=NOTIFY_CHAT_INTERVAL, spool=None):
+        self.api_url = f"{api_base.rstrip('/')}/bot{token}"
+        self.user_ids = list(user_ids)
+        self.chat_interval = chat_interval
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.spool = spool
+        self.breaker = CircuitBreaker()
+        self.stats = {"sent": 0, "edited": 0, "coalesced": 0, "dropped": 0, "rate_limited": 0, "failed": 0, "spooled": 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._messages = OrderedDict()  # (ключ, chat_id) -> message_id для редактирования, старые вытесняются
+        self._last_sent = {}  # chat_id -> время последнего запроса
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="telegram-sender", daemon=True)
+        self._thread.start()
+
+    def submit(self, text, key=None):
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait((text, key))
+        except queue.Full:
+            self._done(1)
+            self.stats["dropped"] += 1
+            if key is None:
+                print(f"[WARN] Telegram queue is full, message dropped: {text[:100]}")
+
+    def flush(self, timeout=NOTIFY_FLUSH_TIMEOUT):
+        """Ждет отправки всего, что поставлено в очередь; False, если не успели"""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            if not self._pending:
+                self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Из сообщений с ключом остается последнее, на месте последнего
+            last_index = {key: index for index, (_, key) in enumerate(batch) if key is not None}
+            for index, (text, key) in enumerate(batch):
+                if key is not None and last_index[key] != index:
+                    self.stats["coalesced"] += 1
+                    continue
+                for chat_id in self.user_ids:
+                    if self.spool is not None and not self.breaker.allow():
+                        self._spool(chat_id, text, key)
+                    elif not self.send(chat_id, text, key) and self.spool is not None:
+                        self._spool(chat_id, text, key)
+            self._done(len(batch))
+
+    def _spool(self, chat_id, text, key):
+        try:
+            self.spool.append([chat_id], text, key)
+            self.stats["spooled"] += 1
+        except OSError as e:
+            print(f"[ERROR] Failed to spool message for user {chat_id}: {e}")
+
+    def send(self, chat_id, text, key=None):
+        """Синхронно доставляет сообщение одному получателю; True, если доставлено"""
+        try:
+            delivered = self._deliver(chat_id, text, key)
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"[ERROR] Failed to send message to user {chat_id}: {e}")
+            delivered = False
+        if delivered:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return delivered
+
+    def _deliver(self, chat_id, text, key):
+        message_id = self._messages.get((key, chat_id)) if key is not None else None
+        if message_id is not None:
+            response = self._call("editMessageText", {
+                "chat_id": chat_id,
+                "message_id": message_id,
+                "text": text,
+                "parse_mode": "HTML",
+            })
+            if response is not None:
+                self.stats["edited"] += 1
+                return True
+            # Сообщение удалено или слишком старое для редактирования - отправляем новое
+            self._messages.pop((key, chat_id), None)
+        response = self._call("sendMessage", {"chat_id": chat_id, "text": text, "parse_mode": "HTML"})
+        if response is None:
+            self.stats["failed"] += 1
+            return False
+        self.stats["sent"] += 1
+        if key is not None:
+            self._messages[(key, chat_id)] = response.get("result", {}).get("message_id")
+            while len(self._messages) > NOTIFY_EDIT_KEYS:
+                self._messages.popitem(last=False)
+        return True
+
+    def _call(self, method, payload):
+        """Запрос к Bot API с учетом лимитов; ответ JSON или None при ошибке"""
+        chat_id = payload["chat_id"]
+        for attempt in range(1, NOTIFY_RETRIES + 1):
+            wait = self._last_sent.get(chat_id, 0) + self.chat_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_sent[chat_id] = time.monotonic()
+            try:
+                response = self.session.post(f"{self.api_url}/{method}", json=payload, timeout=NOTIFY_TIMEOUT)
+            except requests.RequestException as e:
+                print(f"[ERROR] Telegram {method} attempt {attempt}/{NOTIFY_RETRIES} failed: {e}")
+                time.sleep(attempt * 2)
+                continue
+            if response.status_code == 429:
+                self.stats["rate_limited"] += 1
+                try:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                except ValueError:
+                    retry_after = 1
+                time.sleep(retry_after)
+                continue
+            if response.status_code >= 500:
+                time.sleep(attempt * 2)
+                continue
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            if response.status_code == 400 and "message is not modified" in data.get("description", ""):
+                return data
+            if not response.ok:
+                print(f"[ERROR] Telegram {method} for {chat_id}: HTTP {response.status_code} {data.get('description', '')}")
+                return None
+            return data
+        return None
+
+
 class TelegramNotifier:
     __BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     __USER_IDS = []
-    
+    _sender = None
+    _sender_pid = None
+    _sender_lock = threading.Lock()
+    _spool = None
+    _scope = None  # (pid, метка запуска процесса) для ключей сообщений
+
     @classmethod
     def _get_user_ids(cls):
         """Получает список ID пользователей из переменной окружения"""
@@ -19,29 +213,75 @@ class TelegramNotifier:
             except ValueError:
                 return []
         return []
-    
+
     @classmethod
-    def notify(cls, text: str):
-        """Отправляет уведомление в Telegram"""
+    def _scoped_key(cls, key):
+        """
+        Ключ сообщения в пределах запуска процесса: отправитель бота (обработчик
+        спула) живет дольше скриптов, и прогресс нового запуска должен прийти
+        новым сообщением, а не редактировать сообщение прошлого запуска.
+        """
+        if key is None:
+            return None
+        if cls._scope is None or cls._scope[0] != os.getpid():
+            cls._scope = (os.getpid(), f"{os.getpid()}-{int(time.time())}")
+        return f"{key}@{cls._scope[1]}"
+
+    @classmethod
+    def get_spool(cls):
+        if cls._spool is None:
+            cls._spool = NotificationSpool()
+        return cls._spool
+
+    @classmethod
+    def create_sender(cls, spool=None):
+        """Отправитель с токеном и получателями из окружения (для обработчика спула - без spool)"""
+        return TelegramSender(cls.__BOT_TOKEN, cls._get_user_ids(), spool=spool)
+
+    @classmethod
+    def _get_sender(cls):
+        with cls._sender_lock:
+            # После fork поток-отправитель родителя в дочернем процессе не работает
+            if cls._sender is None or cls._sender_pid != os.getpid():
+                cls._sender = cls.create_sender(spool=cls.get_spool())
+                cls._sender_pid = os.getpid()
+                atexit.register(cls.flush)
+            return cls._sender
+
+    @classmethod
+    def notify(cls, text: str, key: str = None):
+        """
+        Ставит уведомление в очередь отправки в Telegram и сразу возвращается.
+        key - для повторяющихся сообщений (прогресс): новое сообщение с тем же
+        ключом редактирует предыдущее, а не приходит отдельным.
+        Пока работает обработчик спула (бот), уведомление только дописывается
+        в спул на диске, отправляет его бот.
+        """
         if not cls.__BOT_TOKEN:
             print(f"Telegram notification: {text}")
             return
-            
+
         user_ids = cls._get_user_ids()
         if not user_ids:
             print(f"Telegram notification: {text}")
             return
-            
-        api_url = f"https://api.telegram.org/bot{cls.__BOT_TOKEN}/sendMessage"
-        for user_id in user_ids:
-            payload = {
-                "chat_id": user_id,
-                "text": text,
-                "parse_mode": "HTML"
-            }
+
+        key = cls._scoped_key(key)
+        spool = cls.get_spool()
+        if spool.worker_alive():
             try:
-                response = requests.post(api_url, json=payload)
-                response.raise_for_status()
-                print(f"[OK] Message sent to user {user_id}")
-            except requests.RequestException as e:
-                print(f"[ERROR] Failed to send message to user {user_id}: {e}")
+                spool.append(user_ids, text, key)
+                return
+            except OSError as e:
+                print(f"[WARN] Notification spool unavailable, sending directly: {e}")
+        cls._get_sender().submit(text, key)
+
+    @classmethod
+    def flush(cls, timeout: float = NOTIFY_FLUSH_TIMEOUT) -> bool:
+        """Дожидается отправки очереди уведомлений (вызывается и при выходе процесса)"""
+        if cls._sender is None or cls._sender_pid != os.getpid():
+            return True
+        if not cls._sender.flush(timeout):
+            print(f"[WARN] Telegram notifications not sent within {timeout}s at exit")
+            return False
+        return True
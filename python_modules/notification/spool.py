@@ -0,0 +1,293 @@
+"""
+Спул неотправленных уведомлений Telegram на диске и их повторная отправка.
+
+spool.jsonl - журнал только на дозапись: строка {"id", "chat_id", "text", "key",
+"dedup", "created", "expires"} на каждое сообщение каждому получателю и
+строка {"ack": id} на доставленное или вытесненное сообщение. Дозапись идет
+под блокировкой spool.lock, поэтому журнал пишут одновременно несколько
+процессов (скрипты) и читает один обработчик.
+
+Уведомления попадают в спул, если:
+- работает обработчик спула (бот обновляет replay.heartbeat) - тогда процесс
+  скрипта вообще не ходит в сеть, уведомление стоит ему одной дозаписи в файл;
+- Telegram недоступен: отправитель в процессе скрипта после
+  NOTIFY_BREAKER_FAILURES ошибок подряд на NOTIFY_BREAKER_COOLDOWN секунд
+  перестает пытаться и сразу пишет в спул, не тратя таймауты соединения.
+
+SpoolReplayWorker (в процессе бота или "python spool.py replay --loop")
+отправляет накопившееся, как только Telegram снова доступен. Из сообщений с
+одинаковым dedup-ключом (ключ прогресса или текст) одному получателю уходит
+только последнее, сообщения старше NOTIFY_SPOOL_TTL отбрасываются. Одновременно
+работает только один обработчик (блокировка replay.lock).
+
+Использование:
+    python spool.py status
+    python spool.py replay [--loop]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки
+    fcntl = None
+
+NOTIFY_SPOOL_DIR = os.getenv(
+    "NOTIFY_SPOOL_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "storage", "app", "notification_spool")),
+)
+NOTIFY_SPOOL_TTL = float(os.getenv("NOTIFY_SPOOL_TTL", 24 * 3600))  # Старше - не отправляются
+NOTIFY_REPLAY_INTERVAL = float(os.getenv("NOTIFY_REPLAY_INTERVAL", 15))
+NOTIFY_WORKER_TIMEOUT = NOTIFY_REPLAY_INTERVAL * 4  # Без отметки обработчика дольше - скрипты отправляют сами
+NOTIFY_BREAKER_FAILURES = 3
+NOTIFY_BREAKER_COOLDOWN = 60
+NOTIFY_SPOOL_COMPACT_ACKS = 1000  # После стольких отметок о доставке журнал переписывается
+
+
+class CircuitBreaker:
+    """После failures ошибок подряд запросы не делаются cooldown секунд"""
+
+    def __init__(self, failures=NOTIFY_BREAKER_FAILURES, cooldown=NOTIFY_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                self._opened_at = None  # Пробный запрос: при ошибке снова открываемся
+                self._consecutive = self.failures - 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+class NotificationSpool:
+    def __init__(self, path=NOTIFY_SPOOL_DIR, ttl=NOTIFY_SPOOL_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.journal_path = os.path.join(path, "spool.jsonl")
+        self.lock_path = os.path.join(path, "spool.lock")
+        self.heartbeat_path = os.path.join(path, "replay.heartbeat")
+        self.worker_lock_path = os.path.join(path, "replay.lock")
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append_lines(self, records):
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self._locked():
+            # Файл открывается под блокировкой: compact() мог заменить его
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(data)
+
+    def append(self, chat_ids, text, key=None):
+        """Кладет уведомление в спул - по записи на получателя"""
+        now = time.time()
+        dedup = key or hashlib.sha1(text.encode("utf-8")).hexdigest()
+        self._append_lines([
+            {
+                "id": uuid.uuid4().hex,
+                "chat_id": chat_id,
+                "text": text,
+                "key": key,
+                "dedup": dedup,
+                "created": now,
+                "expires": now + self.ttl,
+            }
+            for chat_id in chat_ids
+        ])
+
+    def ack(self, ids):
+        if ids:
+            self._append_lines([{"ack": record_id} for record_id in ids])
+
+    def _read(self):
+        records, acked = [], set()
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Оборванная строка при аварийном завершении процесса
+                    if "ack" in entry:
+                        acked.add(entry["ack"])
+                    else:
+                        records.append(entry)
+        except FileNotFoundError:
+            pass
+        return records, acked
+
+    def pending(self):
+        """
+        (к отправке, вытесненные) неподтвержденные записи.
+        К отправке - последняя по (получатель, dedup) из неистекших, по порядку создания.
+        """
+        records, acked = self._read()
+        now = time.time()
+        latest = {}
+        superseded = []
+        for record in records:
+            if record["id"] in acked:
+                continue
+            if record.get("expires", 0) < now:
+                superseded.append(record)
+                continue
+            slot = (record["chat_id"], record["dedup"])
+            if slot in latest:
+                superseded.append(latest[slot])
+            latest[slot] = record
+        return sorted(latest.values(), key=lambda record: record["created"]), superseded
+
+    def depth(self):
+        """(неотправленных уведомлений, возраст самого старого в секундах)"""
+        pending, _ = self.pending()
+        if not pending:
+            return 0, 0
+        return len(pending), time.time() - pending[0]["created"]
+
+    def compact(self):
+        """Переписывает журнал, оставляя только неподтвержденные записи"""
+        with self._locked():
+            records, acked = self._read()
+            live = [record for record in records if record["id"] not in acked]
+            if len(live) == len(records) and not acked:
+                return
+            tmp_path = f"{self.journal_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in live:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.journal_path)
+
+    def heartbeat(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.heartbeat_path, "w") as f:
+            f.write(str(os.getpid()))
+
+    def worker_alive(self):
+        """Работает ли обработчик спула (свежая отметка replay.heartbeat)"""
+        try:
+            return time.time() - os.path.getmtime(self.heartbeat_path) < NOTIFY_WORKER_TIMEOUT
+        except OSError:
+            return False
+
+
+class SpoolReplayWorker:
+    """Отправляет накопившееся в спуле; безопасно запускать из нескольких процессов - работает один"""
+
+    def __init__(self, spool, sender, breaker=None):
+        self.spool = spool
+        self.sender = sender  # TelegramSender из notification.main
+        self.breaker = breaker or CircuitBreaker()
+        self._lock_file = None
+
+    def _acquire(self):
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return True
+        os.makedirs(self.spool.path, exist_ok=True)
+        lock_file = open(self.spool.worker_lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file  # Держим до конца процесса
+        return True
+
+    def run_once(self):
+        """Один проход по спулу; возвращает (отправлено, осталось)"""
+        if not self._acquire():
+            return 0, None  # Спул обрабатывает другой процесс
+        self.spool.heartbeat()
+        pending, superseded = self.spool.pending()
+        self.spool.ack([record["id"] for record in superseded])
+        delivered = 0
+        for record in pending:
+            if not self.breaker.allow():
+                break
+            if self.sender.send(record["chat_id"], record["text"], record.get("key")):
+                self.breaker.record_success()
+                self.spool.ack([record["id"]])
+                delivered += 1
+            else:
+                self.breaker.record_failure()
+        remaining = len(pending) - delivered
+        if not remaining or len(superseded) + delivered >= NOTIFY_SPOOL_COMPACT_ACKS:
+            self.spool.compact()
+        if delivered:
+            print(f"[OK] Notification spool: delivered {delivered}, {remaining} left")
+        return delivered, remaining
+
+    def run_forever(self, interval=NOTIFY_REPLAY_INTERVAL):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[ERROR] Notification spool replay failed: {e}")
+            time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telegram notification spool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show undelivered notifications")
+    replay_parser = subparsers.add_parser("replay", help="Deliver spooled notifications")
+    replay_parser.add_argument("--loop", action="store_true", help=f"Keep replaying every {NOTIFY_REPLAY_INTERVAL:.0f}s")
+    args = parser.parse_args()
+
+    spool = NotificationSpool()
+    if args.command == "status":
+        count, age = spool.depth()
+        print(f"{spool.journal_path}: {count} undelivered" + (f", oldest {age / 60:.0f} min" if count else ""))
+        print(f"Replay worker {'alive' if spool.worker_alive() else 'not running'}")
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from main import TelegramNotifier
+    worker = SpoolReplayWorker(spool, TelegramNotifier.create_sender())
+    if args.loop:
+        worker.run_forever()
+    else:
+        delivered, remaining = worker.run_once()
+        print(f"Delivered {delivered}, left {remaining}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Локальная заглушка Telegram Bot API для проверки TelegramNotifier без сети.
+
+Принимает POST /bot<token>/sendMessage и /bot<token>/editMessageText, хранит
+сообщения в памяти и, как настоящий API, отвечает 429 с retry_after, если в
+один чат пишут чаще --chat-interval секунд. --latency добавляет задержку
+каждому ответу (медленный API).
+
+Режим --demo поднимает заглушку, направляет на нее TelegramNotifier
+(TELEGRAM_API_BASE) и отправляет пачку как у парсинга trast: сообщение о старте,
+--progress сообщений прогресса с одним ключом и итог. Выводится, сколько
+блокировал вызов notify(), сколько запросов дошло до API и за сколько очередь
+отправилась при flush().
+
+Использование:
+    python stub_bot_api.py --port 8081          # затем TELEGRAM_API_BASE=http://127.0.0.1:8081
+    python stub_bot_api.py --demo --progress 200 --latency 0.3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubBotApi:
+    def __init__(self, latency=0.0, chat_interval=1.0):
+        self.latency = latency
+        self.chat_interval = chat_interval
+        self.messages = {}  # (chat_id, message_id) -> текст
+        self.calls = {"sendMessage": 0, "editMessageText": 0, "rate_limited": 0}
+        self._last_call = {}  # chat_id -> время последнего принятого запроса
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def handle(self, method, payload):
+        """(HTTP-статус, тело ответа) для метода Bot API; лимит считается по времени прихода запроса"""
+        response = self._respond(method, payload)
+        time.sleep(self.latency)
+        return response
+
+    def _respond(self, method, payload):
+        chat_id = payload.get("chat_id")
+        with self._lock:
+            now = time.monotonic()
+            last = self._last_call.get(chat_id)
+            if last is not None and now - last < self.chat_interval:
+                self.calls["rate_limited"] += 1
+                retry_after = max(1, round(self.chat_interval - (now - last)))
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                }
+            self._last_call[chat_id] = now
+            if method == "sendMessage":
+                self.calls[method] += 1
+                message_id = self._next_id
+                self._next_id += 1
+                self.messages[(chat_id, message_id)] = payload.get("text", "")
+                return 200, {"ok": True, "result": {"message_id": message_id, "chat": {"id": chat_id}, "text": payload.get("text")}}
+            if method == "editMessageText":
+                self.calls[method] += 1
+                key = (chat_id, payload.get("message_id"))
+                if key not in self.messages:
+                    return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message to edit not found"}
+                if self.messages[key] == payload.get("text"):
+                    return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message is not modified"}
+                self.messages[key] = payload.get("text", "")
+                return 200, {"ok": True, "result": {"message_id": key[1], "chat": {"id": chat_id}, "text": payload.get("text")}}
+        return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+    def serve(self, port=0):
+        """Запускает HTTP-сервер в фоновом потоке; возвращает его"""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                status, body = api.handle(self.path.rsplit("/", 1)[-1], payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def run_demo(api, server, progress):
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["TELEGRAM_BOT_TOKEN"] = os.environ.get("TELEGRAM_BOT_TOKEN") or "123:stub"
+    os.environ["TELEGRAM_USER_IDS"] = os.environ.get("TELEGRAM_USER_IDS") or "1001,1002"
+    # Импорт после настройки окружения: токен и адрес API читаются при загрузке модуля
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from main import TelegramNotifier
+
+    blocked = []
+
+    def notify(text, key=None):
+        started = time.perf_counter()
+        TelegramNotifier.notify(text, key=key)
+        blocked.append((time.perf_counter() - started) * 1000)
+
+    started = time.monotonic()
+    notify("[Demo] Update started")
+    for page in range(1, progress + 1):
+        notify(f"[Demo] Progress: {page} pages parsed", key="demo.progress")
+        time.sleep(0.005)
+    notify("[Demo] Update completed")
+    submitted = time.monotonic() - started
+    flushed = TelegramNotifier.flush(timeout=60)
+    total = time.monotonic() - started
+
+    users = len(TelegramNotifier._get_user_ids())
+    print(f"{len(blocked)} notify() calls for {users} users in {submitted:.2f}s: "
+          f"max {max(blocked):.2f} ms blocked, median {sorted(blocked)[len(blocked) // 2]:.3f} ms")
+    print(f"Bot API received: {api.calls['sendMessage']} sendMessage, {api.calls['editMessageText']} editMessageText, "
+          f"{api.calls['rate_limited']} rate-limited; sender stats {TelegramNotifier._sender.stats}")
+    print(f"Queue {'flushed' if flushed else 'NOT flushed'} {total:.2f}s after the first notify()")
+    print(f"The old blocking notify() would have spent >= {(progress + 2) * users * api.latency:.1f}s "
+          f"inside the caller and sent {(progress + 2) * users} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stub")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--chat-interval", type=float, default=1.0, help="Minimum seconds between calls per chat before 429")
+    parser.add_argument("--demo", action="store_true", help="Send a burst through TelegramNotifier and report")
+    parser.add_argument("--progress", type=int, default=200, help="Progress messages in --demo")
+    args = parser.parse_args()
+
+    api = StubBotApi(latency=args.latency, chat_interval=args.chat_interval)
+    server = api.serve(0 if args.demo else args.port)
+    if args.demo:
+        run_demo(api, server, args.progress)
+        server.shutdown()
+        return
+    print(f"Stub Bot API on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
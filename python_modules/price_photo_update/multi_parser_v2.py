@@ -5,6 +5,10 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 import os
+import json
+import shutil
+import platform
+import subprocess
 from openpyxl import Workbook, load_workbook
 import logging
 import requests
@@ -114,11 +118,52 @@ def fetch_with_fallback_proxy(url: str, timeout: int = 10):
         logger.warning(f"Ошибка без прокси: {e}. Пробуем с прокси...")
         return fetch_with_proxy(url, timeout)
 
+def get_chrome_version():
+    for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser"):
+        binary = shutil.which(name)
+        if not binary:
+            continue
+        try:
+            version = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=15).stdout.strip()
+        except Exception:
+            continue
+        if version:
+            return version
+    return None
+
 def get_stable_chrome_driver_path():
     os.environ["WDM_LOCAL"] = "1"
     os.environ["WDM_LOG_LEVEL"] = "0"
     os.environ["WDM_CACHE_DIR"] = os.path.join(os.getcwd(), "chrome_driver_cache")
-    return ChromeDriverManager().install()
+    # ChromeDriverManager вызываем только при смене хоста или версии Chrome
+    chrome_version = get_chrome_version()
+    if chrome_version is None:
+        # Без версии Chrome смену браузера не заметить - кешем не пользуемся
+        logger.warning("Версия Chrome не определена, ChromeDriver проверяется через ChromeDriverManager")
+        return ChromeDriverManager().install()
+    manifest_path = os.path.join(os.environ["WDM_CACHE_DIR"], "driver_manifest.json")
+    host = platform.node()
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception:
+        manifest = {}
+    driver_path = manifest.get("path")
+    if (
+        manifest.get("host") == host
+        and manifest.get("chrome_version") == chrome_version
+        and driver_path and os.access(driver_path, os.X_OK)
+    ):
+        logger.info(f"Используем закешированный ChromeDriver: {driver_path}")
+        return driver_path
+    driver_path = ChromeDriverManager().install()
+    try:
+        os.makedirs(os.environ["WDM_CACHE_DIR"], exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"host": host, "chrome_version": chrome_version, "path": driver_path}, f)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить кеш ChromeDriver: {e}")
+    return driver_path
 
 def create_chrome_driver(driver_path):
     options = Options()
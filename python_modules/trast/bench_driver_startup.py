@@ -0,0 +1,48 @@
+"""
+Замер времени создания драйвера Firefox: прежний путь (geckodriver_autoinstaller
+и настройки профиля на каждый драйвер) против кеша driver_bootstrap.
+
+Использование:
+    python bench_driver_startup.py --runs 5
+"""
+import time
+import argparse
+import statistics
+from loguru import logger
+
+import utils
+from utils import _create_firefox_driver
+
+
+def measure(runs: int, use_cache: bool):
+    utils.DRIVER_BOOTSTRAP_CACHE = use_cache
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        driver = _create_firefox_driver()
+        timings.append(time.perf_counter() - started)
+        driver.quit()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trast Firefox driver creation")
+    parser.add_argument("--runs", type=int, default=5, help="Number of drivers to create per mode")
+    args = parser.parse_args()
+
+    results = {}
+    for label, use_cache in (("without bootstrap cache", False), ("with bootstrap cache", True)):
+        timings = measure(args.runs, use_cache)
+        results[label] = timings
+        logger.info(
+            f"{label}: median {statistics.median(timings):.2f}s, "
+            f"min {min(timings):.2f}s, max {max(timings):.2f}s ({args.runs} runs)"
+        )
+
+    before = statistics.median(results["without bootstrap cache"])
+    after = statistics.median(results["with bootstrap cache"])
+    logger.info(f"Driver creation median: {before:.2f}s → {after:.2f}s ({(before - after) / before * 100:.0f}% faster)")
+
+
+if __name__ == "__main__":
+    main()
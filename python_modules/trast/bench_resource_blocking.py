@@ -0,0 +1,111 @@
+"""
+Замер трафика и времени загрузки страницы каталога с блокировкой ресурсов и без
+нее на локальном тестовом сайте (без прокси и без обращения к trast-zapchast.ru).
+
+Тестовый сайт отдает страницу с 16 карточками товаров, картинками, веб-шрифтом
+и "счетчиком" (скрипт с другого хоста - localhost, добавляется в список
+блокируемых хостов только на время замера). Трафик считается на стороне сервера.
+
+Шаблонный профиль Firefox (driver_bootstrap) уже отключает картинки и шрифты,
+поэтому для Firefox разница - в основном аналитика и медиа; для Chrome видна полностью.
+
+Использование:
+    python bench_resource_blocking.py --pages 5
+"""
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+import utils
+import resource_blocking
+from utils import create_driver, wait_for_page_ready
+
+IMAGE_SIZE = 40 * 1024
+FONT_SIZE = 80 * 1024
+ANALYTICS_SIZE = 120 * 1024
+
+
+def build_catalog_page(port: int) -> bytes:
+    cards = "".join(
+        f'<div class="product product-plate">'
+        f'<img src="/img/{i}.png"><a class="product-title" href="/product/{i}/">Товар {i}</a>'
+        f'<div class="product-attributes"><div class="item"><span class="value">ART-{i}</span></div>'
+        f'<div class="item"><span class="value">BRAND</span></div></div>'
+        f'<div class="product-price"><span class="woocommerce-Price-amount amount">{1000 + i} ₽</span></div>'
+        f'<div class="product-badge product-stock instock">В наличии</div></div>'
+        for i in range(16)
+    )
+    return (
+        "<html><head><title>Каталог</title><meta charset='utf-8'>"
+        "<style>@font-face{font-family:f;src:url(/fonts/f.woff2)} body{font-family:f}</style>"
+        f"<script src='http://localhost:{port}/analytics.js'></script></head>"
+        "<body><header>menu</header><div class='products'>" + cards + "</div>"
+        "<nav class='woocommerce-pagination'><a class='page-numbers'>2</a></nav>"
+        "<footer>footer</footer></body></html>"
+    ).encode("utf-8")
+
+
+class TestSiteHandler(BaseHTTPRequestHandler):
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith("/img/"):
+            body, content_type = b"\x89PNG" + b"\0" * IMAGE_SIZE, "image/png"
+        elif self.path.startswith("/fonts/"):
+            body, content_type = b"\0" * FONT_SIZE, "font/woff2"
+        elif self.path.startswith("/analytics.js"):
+            body, content_type = b"/*" + b" " * ANALYTICS_SIZE + b"*/", "application/javascript"
+        else:
+            body, content_type = build_catalog_page(self.server.server_port), "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+        with TestSiteHandler.lock:
+            TestSiteHandler.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(url: str, pages: int, blocking: bool):
+    utils.RESOURCE_BLOCKING = blocking
+    driver = create_driver(None)
+    try:
+        TestSiteHandler.bytes_sent = 0
+        load_times = []
+        for _ in range(pages):
+            started = time.perf_counter()
+            driver.get(url)
+            wait_for_page_ready(driver, max_wait=10)
+            load_times.append(time.perf_counter() - started)
+        return TestSiteHandler.bytes_sent / pages, sum(load_times) / pages
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark trast resource blocking on a local test site")
+    parser.add_argument("--pages", type=int, default=5, help="Page loads per mode")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TestSiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/shop/"
+    resource_blocking.RESOURCE_BLOCK_HOSTS = list(resource_blocking.RESOURCE_BLOCK_HOSTS) + ["localhost"]
+
+    try:
+        for label, blocking in (("blocking off", False), ("blocking on", True)):
+            bytes_per_page, load_time = measure(url, args.pages, blocking)
+            logger.info(f"{label}: {bytes_per_page / 1024:.0f} KB per page, {load_time:.2f}s per page ({args.pages} pages)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
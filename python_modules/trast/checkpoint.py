@@ -0,0 +1,198 @@
+"""
+Журнал контрольных точек парсинга trast для продолжения после сбоя.
+
+Журнал - JSONL-файл рядом с TEMP_CSV_FILE. Завершенные страницы (номер,
+количество товаров, хеш содержимого) копятся в памяти и записываются одной
+строкой "commit" сразу после сброса буфера в CSV: сначала fsync CSV, затем
+строка журнала с размером CSV и fsync журнала. Неполная последняя строка
+(обрыв при записи) при загрузке игнорируется, а CSV обрезается до размера
+из последнего commit, поэтому строки незафиксированных страниц не дублируются.
+Журнал удаляется вместе с временным CSV: finalize_output_files и
+cleanup_temp_files в utils.
+"""
+import os
+import csv
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+from loguru import logger
+
+from config import CHECKPOINT_FILE, TEMP_CSV_FILE
+
+
+def products_hash(products: List[Dict]) -> str:
+    """Хеш товаров страницы (по полям, которые пишутся в CSV)"""
+    rows = [
+        [p.get('article', ''), p.get('manufacturer', ''), p.get('description', ''), p.get('price', '')]
+        for p in products
+    ]
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _fsync_file(path: str):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+class CrawlCheckpoint:
+    """Журнал завершенных страниц с фиксацией вместе со сбросом CSV"""
+
+    def __init__(self, journal_path: str = CHECKPOINT_FILE, csv_path: str = TEMP_CSV_FILE):
+        self.journal_path = journal_path
+        self.csv_path = csv_path
+        self.completed_pages: Dict[int, Dict] = {}  # номер страницы -> запись журнала
+        self.commit_order: List[int] = []  # порядок страниц в CSV
+        self.pending: List[Dict] = []  # завершенные, но еще не зафиксированные страницы
+        self.csv_size = 0
+        self.state: Dict = {}  # счетчики парсинга на момент последнего commit
+
+    def _append(self, record: Dict):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self):
+        """Начинает новый журнал (вызывать сразу после создания пустого CSV)"""
+        self.completed_pages.clear()
+        self.commit_order.clear()
+        self.pending.clear()
+        self.state = {}
+        self.csv_size = os.path.getsize(self.csv_path) if os.path.exists(self.csv_path) else 0
+        with open(self.journal_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'type': 'start',
+                'started_at': datetime.now().isoformat(),
+                'csv_size': self.csv_size,
+            }) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self) -> bool:
+        """
+        Загружает журнал предыдущего запуска и приводит CSV к последнему commit.
+
+        Returns:
+            True, если можно продолжить парсинг с того же временного CSV
+        """
+        if not os.path.exists(self.journal_path) or not os.path.exists(self.csv_path):
+            logger.warning("No checkpoint journal or temporary CSV to resume from")
+            return False
+        started = False
+        valid_size = 0
+        with open(self.journal_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    logger.warning(f"Ignoring torn checkpoint record at line {line_number}")
+                    break
+                valid_size += len(line)
+                if record.get('type') == 'start':
+                    started = True
+                    self.csv_size = record.get('csv_size', 0)
+                elif record.get('type') == 'commit':
+                    for page in record.get('pages', []):
+                        self.completed_pages[page['page']] = page
+                        if page.get('products'):
+                            self.commit_order.append(page['page'])
+                    self.csv_size = record['csv_size']
+                    self.state = record.get('state', {})
+        if not started:
+            logger.warning("Checkpoint journal has no start record, cannot resume")
+            return False
+        if os.path.getsize(self.journal_path) > valid_size:
+            # Отрезаем оборванную запись, чтобы следующие commit не склеились с ней
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+                os.fsync(f.fileno())
+
+        actual_size = os.path.getsize(self.csv_path)
+        if actual_size < self.csv_size:
+            logger.warning(
+                f"Temporary CSV is shorter than committed ({actual_size} < {self.csv_size} bytes), cannot resume"
+            )
+            return False
+        if actual_size > self.csv_size:
+            # Строки страниц, которые не успели зафиксироваться, будут собраны заново
+            with open(self.csv_path, 'r+b') as f:
+                f.truncate(self.csv_size)
+                os.fsync(f.fileno())
+            logger.info(f"Truncated temporary CSV from {actual_size} to committed {self.csv_size} bytes")
+
+        logger.info(
+            f"Checkpoint loaded: {len(self.completed_pages)} pages completed, "
+            f"{self.state.get('total_products', 0)} products committed"
+        )
+        return True
+
+    def record_page(self, page: int, products: List[Dict], status: str):
+        """Отмечает страницу завершенной (фиксируется при следующем commit)"""
+        self.pending.append({
+            'page': page,
+            'products': len(products),
+            'hash': products_hash(products),
+            'status': status,
+        })
+
+    def commit(self, state: Optional[Dict] = None):
+        """Фиксирует завершенные страницы после сброса буфера в CSV"""
+        if not self.pending:
+            return
+        _fsync_file(self.csv_path)
+        self.csv_size = os.path.getsize(self.csv_path)
+        if state is not None:
+            self.state = dict(state)
+        self._append({
+            'type': 'commit',
+            'csv_size': self.csv_size,
+            'pages': self.pending,
+            'state': self.state,
+        })
+        for page in self.pending:
+            self.completed_pages[page['page']] = page
+            if page['products']:
+                self.commit_order.append(page['page'])
+        self.pending = []
+
+    def is_done(self, page: int) -> bool:
+        return page in self.completed_pages
+
+    def next_page(self, page: int) -> int:
+        """Первая незавершенная страница, начиная с page"""
+        while page in self.completed_pages:
+            page += 1
+        return page
+
+    def reorder_csv_if_needed(self):
+        """
+        Если после продолжения страницы попали в CSV не по порядку (дособраны
+        пропущенные), переупорядочивает строки по номеру страницы, чтобы итог
+        совпадал с непрерывным запуском.
+        """
+        if self.commit_order == sorted(self.commit_order):
+            return
+        with open(self.csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f, delimiter=';'))
+        header, body = rows[:1], rows[1:]
+        expected = sum(self.completed_pages[page]['products'] for page in self.commit_order)
+        if expected != len(body):
+            logger.warning(f"CSV has {len(body)} rows, journal expects {expected}; keeping original order")
+            return
+        rows_by_page = {}
+        offset = 0
+        for page in self.commit_order:
+            count = self.completed_pages[page]['products']
+            rows_by_page[page] = body[offset:offset + count]
+            offset += count
+        tmp_path = f"{self.csv_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerows(header)
+            for page in sorted(rows_by_page):
+                writer.writerows(rows_by_page[page])
+        os.replace(tmp_path, self.csv_path)
+        logger.info(f"Temporary CSV reordered by page number ({len(rows_by_page)} pages)")
@@ -2,26 +2,29 @@
 Конфигурация парсера trast-zapchast.ru
 """
 import os
+from urllib.parse import urljoin
 
 # Базовые пути (совместимо со старой версией)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-LOG_DIR = os.path.join(BASE_DIR, "..", "..", "storage", "app", "public", "output", "logs-trast")
+LOG_DIR = os.getenv("TRAST_LOG_DIR", os.path.join(BASE_DIR, "..", "..", "storage", "app", "public", "output", "logs-trast"))
 OUTPUT_FILE = os.path.join(LOG_DIR, "..", "trast.xlsx")
 TEMP_OUTPUT_FILE = os.path.join(LOG_DIR, "..", "trast_temp.xlsx")
 CSV_FILE = os.path.join(LOG_DIR, "..", "trast.csv")
 TEMP_CSV_FILE = os.path.join(LOG_DIR, "..", "trast_temp.csv")
 BACKUP_FILE = os.path.join(LOG_DIR, "..", "trast_backup.xlsx")
 BACKUP_CSV = os.path.join(LOG_DIR, "..", "trast_backup.csv")
+CHECKPOINT_FILE = os.path.join(LOG_DIR, "..", "trast_checkpoint.jsonl")  # Журнал завершенных страниц для --resume
 
 # Создаем директории если их нет
 os.makedirs(LOG_DIR, exist_ok=True)
 
 # Прокси (используем относительный путь от текущего файла)
-PROXY_CACHE_DIR = os.path.join(os.path.dirname(__file__), "proxy_cache")
+PROXY_CACHE_DIR = os.getenv("TRAST_PROXY_CACHE_DIR", os.path.join(os.path.dirname(__file__), "proxy_cache"))
 PROXIES_FILE = os.path.join(PROXY_CACHE_DIR, "proxies.json")
 SUCCESSFUL_PROXIES_FILE = os.path.join(PROXY_CACHE_DIR, "successful_proxies.json")
 LAST_UPDATE_FILE = os.path.join(PROXY_CACHE_DIR, "last_update.txt")
 PROXY_HEALTH_FILE = os.path.join(PROXY_CACHE_DIR, "proxy_health.json")
+PROXY_STATE_DB = os.path.join(PROXY_CACHE_DIR, "proxy_state.db")  # SQLite-хранилище состояния прокси (WAL)
 
 # Параметры отслеживания состояния прокси
 PROXY_HEALTH_HISTORY_SIZE = 10  # Количество последних событий, сохраняемых для каждого прокси
@@ -35,20 +38,38 @@ PROXY_COOLDOWN_SECONDS = {
     "default": 600
 }
 
+# Выбор прокси: "thompson" (Thompson sampling), "ucb" или "random" (прежнее поведение)
+PROXY_SELECTION_POLICY = os.getenv("TRAST_PROXY_SELECTION_POLICY", "thompson").lower()
+PROXY_LATENCY_EWMA_ALPHA = 0.3  # Вес нового замера в EWMA времени загрузки страницы
+PROXY_DEFAULT_PAGE_LATENCY = 15.0  # Ожидаемое время страницы для прокси без замеров (секунды)
+
 # Создаем директорию для прокси
 os.makedirs(PROXY_CACHE_DIR, exist_ok=True)
 
+# Параллельный сбор прокси из источников
+PROXY_SOURCE_CACHE_DIR = os.path.join(PROXY_CACHE_DIR, "sources")  # Кеш разобранного результата по каждому источнику
+PROXY_SOURCE_STATS_FILE = os.path.join(PROXY_CACHE_DIR, "source_stats.json")  # Статистика выхода по источникам
+PROXY_SOURCE_WORKERS = 6  # Количество источников, загружаемых одновременно
+PROXY_SOURCE_DEFAULT_TIMEOUT = 60  # Время ожидания результата источника по умолчанию (секунды)
+PROXY_SOURCE_DEFAULT_CACHE_TTL = 1800  # Время жизни кеша источника по умолчанию (секунды)
+os.makedirs(PROXY_SOURCE_CACHE_DIR, exist_ok=True)
+
 # Настройки парсинга
-TARGET_URL = "https://trast-zapchast.ru/shop/"
+TARGET_URL = os.getenv("TRAST_TARGET_URL", "https://trast-zapchast.ru/shop/")  # Переопределяется симулятором proxy_farm_sim.py
 MAX_EMPTY_PAGES = 2  # Остановка после 2 пустых страниц подряд
 PRODUCTS_PER_PAGE = 16  # Стандартное количество товаров на странице
 
+# Оракул пагинации: последнее известное число страниц каталога (pagination_oracle.py)
+PAGINATION_CACHE_FILE = os.path.join(PROXY_CACHE_DIR, "pagination_cache.json")  # Не в LOG_DIR: там его сжимает ротация логов
+PAGINATION_CACHE_MAX_AGE = 7 * 24 * 3600  # Старше - число страниц определяется заново полным поиском
+PAGINATION_MAX_OVERSHOOT = 50  # Сколько страниц сверх оценки можно пройти в поисках MAX_EMPTY_PAGES пустых
+
 # Таймауты (в секундах)
 PAGE_LOAD_TIMEOUT = 25
 CLOUDFLARE_WAIT_TIMEOUT = 30
 PROXY_TEST_TIMEOUT = 60
 BASIC_CHECK_TIMEOUT = 5
-PROXY_IP_CHECK_URL = "https://api.ipify.org"
+PROXY_IP_CHECK_URL = os.getenv("TRAST_PROXY_IP_CHECK_URL", "https://api.ipify.org")
 
 # Настройки прокси
 MIN_WORKING_PROXIES = 10  # Минимальное количество рабочих прокси перед началом парсинга
@@ -60,6 +81,64 @@ PROXY_PAGE_FAILURE_COOLDOWN = 900  # 15 минут блокировки для 
 USE_UNDETECTED_CHROME = True  # Использовать undetected-chrome для HTTP/HTTPS прокси
 FORCE_FIREFOX = os.getenv("TRAST_FORCE_FIREFOX", "1").lower() in ("1", "true", "yes", "on")  # Принудительно использовать Firefox (по умолчанию на сервере)
 
+# Кеш подготовки драйверов: путь к geckodriver/chromedriver (проверяется один раз на хост и версию
+# браузера) и шаблонный профиль Firefox со статическими настройками, который копируется для каждого драйвера
+DRIVER_BOOTSTRAP_CACHE = os.getenv("TRAST_DRIVER_BOOTSTRAP_CACHE", "1").lower() in ("1", "true", "yes", "on")
+DRIVER_CACHE_DIR = os.path.join(os.path.dirname(__file__), "driver_cache")
+DRIVER_MANIFEST_FILE = os.path.join(DRIVER_CACHE_DIR, "drivers.json")
+FIREFOX_TEMPLATE_PROFILE_DIR = os.path.join(DRIVER_CACHE_DIR, "firefox_template")
+FIREFOX_PROFILE_COPIES_DIR = os.path.join(DRIVER_CACHE_DIR, "firefox_profiles")
+FIREFOX_PROFILE_COPY_MAX_AGE = 6 * 3600  # Копии профилей старше этого (после аварийного завершения) удаляются
+FIREFOX_TEMPLATE_PREFS = {
+    # Обход Cloudflare
+    "dom.webdriver.enabled": False,
+    "useAutomationExtension": False,
+    # Картинки и шрифты не нужны для разбора каталога
+    "permissions.default.image": 2,
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    # Кеш: каждый драйвер получает свежий профиль, дисковый кеш бесполезен
+    "browser.cache.disk.enable": False,
+    "browser.cache.memory.capacity": 65536,
+    # Без фоновых запросов при старте
+    "app.update.auto": False,
+    "browser.shell.checkDefaultBrowser": False,
+    "browser.sessionstore.resume_from_crash": False,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "toolkit.telemetry.enabled": False,
+}
+
+# Блокировка ресурсов в браузере: для разбора нужен только HTML каталога
+RESOURCE_BLOCKING = os.getenv("TRAST_RESOURCE_BLOCKING", "1").lower() in ("1", "true", "yes", "on")
+RESOURCE_BLOCK_STYLESHEETS = False  # CSS влияет на innerText (скрытые блоки становятся видимыми) - не блокируем
+RESOURCE_BLOCK_EXTENSIONS = [
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp",
+    "woff", "woff2", "ttf", "otf", "eot",
+    "mp4", "webm", "mp3", "ogg",
+]
+RESOURCE_BLOCK_HOSTS = [  # Аналитика, счетчики, чаты
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "mc.yandex.ru", "mc.yandex.com", "top-fwz1.mail.ru", "connect.facebook.net",
+    "vk.com", "code.jivo.ru", "jivosite.com",
+]
+RESOURCE_ALLOWED_HOSTS = [  # Никогда не блокируются: скрипты и ресурсы проверок защиты
+    "challenges.cloudflare.com", "ngenix.net",
+]
+
+# Контроль памяти браузера: драйвер пересоздается (с переносом cookies) до того, как вкладка упадет
+DRIVER_RSS_LIMIT_MB = int(os.getenv("TRAST_DRIVER_RSS_LIMIT_MB", "1500"))  # RSS дерева процессов браузера; 0 - отключить
+DRIVER_HEALTH_CHECK_EVERY = 5  # Проверять память каждые N страниц
+DRIVER_HEALTH_STATS_FILE = os.path.join(PROXY_CACHE_DIR, "driver_health.json")  # История запусков для сравнения с базовым (не в LOG_DIR)
+DRIVER_HEALTH_HISTORY_SIZE = 30
+
+# Запасные драйверы: заранее запущенные браузеры со следующими лучшими прокси для мгновенной смены прокси
+SPARE_DRIVER_COUNT = int(os.getenv("TRAST_SPARE_DRIVERS", "1"))  # 0 - отключить
+SPARE_DRIVER_MAX_AGE = 600  # Запасной драйвер старше этого (секунды) пересоздается - cookies/challenge могли устареть
+SPARE_DRIVER_REFILL_INTERVAL = 5  # Пауза между попытками пополнить пул, если кандидатов нет (секунды)
+
 # Настройки мягкой прогрузки первой страницы
 FIRST_PAGE_SCROLL_STEPS = 3
 FIRST_PAGE_SCROLL_PAUSE = 1.2
@@ -82,7 +161,9 @@ PROXY_SOURCES = {
     'proxymania': {
         'url': 'https://proxymania.su/free-proxy',
         'type': 'proxymania',
-        'active': True
+        'active': True,
+        'timeout': 180,  # Многостраничный парсинг
+        'cache_ttl': 1200
     },
     'proxifly': {
         'url': 'https://cdn.jsdelivr.net/gh/proxifly/free-proxy-list@main/proxies/all/data.json',
@@ -122,17 +203,20 @@ PROXY_SOURCES = {
     'github_clarketm': {
         'url': 'https://raw.githubusercontent.com/clarketm/proxy-list/master/proxy-list-raw.txt',
         'type': 'github_text',
-        'active': True
+        'active': True,
+        'cache_ttl': 3600  # Списки на GitHub обновляются не чаще раза в час
     },
     'github_thespeedx': {
         'url': 'https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt',
         'type': 'github_text',
-        'active': True
+        'active': True,
+        'cache_ttl': 3600  # Списки на GitHub обновляются не чаще раза в час
     },
     'github_monosans': {
         'url': 'https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt',
         'type': 'github_text',
-        'active': True
+        'active': True,
+        'cache_ttl': 3600  # Списки на GitHub обновляются не чаще раза в час
     },
     'proxylist_me': {
         'url': 'https://www.proxylist.me/api/v1/get?type=http',
@@ -143,22 +227,30 @@ PROXY_SOURCES = {
     'proxy6': {
         'url': 'https://proxy6.net',
         'type': 'proxy6',
-        'active': True  # Парсинг с обходом nginx JS challenge
+        'active': True,  # Парсинг с обходом nginx JS challenge
+        'timeout': 120,  # Может понадобиться браузер
+        'cache_ttl': 3600
     },
     'proxys_io': {
         'url': 'https://proxys.io',
         'type': 'proxys_io',
-        'active': True  # Парсинг с обходом nginx JS challenge
+        'active': True,  # Парсинг с обходом nginx JS challenge
+        'timeout': 120,  # Может понадобиться браузер
+        'cache_ttl': 3600
     },
     'proxy_seller': {
         'url': 'https://proxy-seller.com',
         'type': 'proxy_seller',
-        'active': True  # Парсинг с обходом nginx JS challenge
+        'active': True,  # Парсинг с обходом nginx JS challenge
+        'timeout': 120,  # Может понадобиться браузер
+        'cache_ttl': 3600
     },
     'floppydata': {
         'url': 'https://floppydata.com',
         'type': 'floppydata',
-        'active': True  # Парсинг с обходом nginx JS challenge
+        'active': True,  # Парсинг с обходом nginx JS challenge
+        'timeout': 120,  # Может понадобиться браузер
+        'cache_ttl': 3600
     },
     'bright_data': {
         'url': 'https://brightdata.com',
@@ -168,7 +260,9 @@ PROXY_SOURCES = {
     'prosox': {
         'url': 'https://prosox.com',
         'type': 'prosox',
-        'active': True  # Парсинг с обходом nginx JS challenge
+        'active': True,  # Парсинг с обходом nginx JS challenge
+        'timeout': 120,  # Может понадобиться браузер
+        'cache_ttl': 3600
     }
 }
 
@@ -182,14 +276,43 @@ USER_AGENTS = [
 # Настройки задержек (в секундах)
 MIN_DELAY_BETWEEN_PAGES = 3
 MAX_DELAY_BETWEEN_PAGES = 6
-HUMAN_DELAY_MIN = 6   # Дополнительная пауза перед следующей страницей
-HUMAN_DELAY_MAX = 12
+HUMAN_DELAY_MIN = 1   # Случайная "человеческая" добавка поверх адаптивной паузы
+HUMAN_DELAY_MAX = 4
 HUMAN_LONG_PAUSE_EVERY = 10  # Каждая N-я страница вызывает дополнительный "перерыв"
 HUMAN_LONG_PAUSE_MIN = 15
 HUMAN_LONG_PAUSE_MAX = 30
 MIN_DELAY_AFTER_LOAD = 3
 MAX_DELAY_AFTER_LOAD = 6
 
+# Ожидание готовности страницы (MutationObserver + WebDriverWait); фиксированные паузы выше - верхняя граница
+PAGE_READY_SETTLE_MS = 600  # Сетка товаров/пагинация считаются стабильными после стольких мс без изменений DOM
+PAGE_READY_POLL_INTERVAL = 0.25  # Интервал опроса состояния страницы (секунды)
+
+# Извлечение товаров: "script" - один execute_script с компактным JSON, "source" - полный page_source (отладка)
+PAGE_EXTRACTION_MODE = os.getenv("TRAST_PAGE_EXTRACTION_MODE", "script")
+
+# Обход каталога через WooCommerce Store API (store_api.py); при ошибке - обычный парсинг HTML
+STORE_API_ENABLED = os.getenv("TRAST_STORE_API", "1").lower() in ("1", "true", "yes", "on")
+STORE_API_URL = os.getenv("TRAST_STORE_API_URL", urljoin(TARGET_URL, "/wp-json/wc/store/products"))
+STORE_API_PER_PAGE = 100  # Максимум, который отдает Store API за один запрос
+STORE_API_TIMEOUT = 30  # Таймаут одного запроса (секунды)
+STORE_API_RETRIES = 3  # Попыток на страницу API до перехода на парсинг HTML
+STORE_API_DELAY = 1.0  # Пауза между запросами страниц API (секунды)
+STORE_API_MIN_ARTICLE_SHARE = 0.5  # Доля товаров первой страницы с артикулом, ниже - формат API не подходит
+
+# Корпус HTML-фикстур для офлайн-проверки разбора (fixtures.py, replay_benchmark.py)
+FIXTURES_DIR = os.getenv("TRAST_FIXTURES_DIR", os.path.join(LOG_DIR, "fixtures"))
+FIXTURE_RECORDING = os.getenv("TRAST_RECORD_FIXTURES", "0").lower() in ("1", "true", "yes", "on")
+FIXTURE_RECORD_EVERY = 50  # Нормальные страницы каталога записываются выборочно: каждая N-я
+FIXTURE_MAX_PER_KIND = 200  # Не больше стольких фикстур одного вида (catalog/blocked/partial/empty)
+
+# Адаптивная пауза между страницами (AIMD, отдельно для каждого прокси)
+THROTTLE_INITIAL_DELAY = 6.0  # Базовая пауза для нового прокси
+THROTTLE_MIN_DELAY = 1.0  # Нижняя граница базовой паузы
+THROTTLE_MAX_DELAY = 60.0  # Верхняя граница базовой паузы
+THROTTLE_RATE_STEP = 0.5  # Аддитивный рост скорости после успешной страницы (страниц в минуту)
+THROTTLE_BACKOFF_FACTOR = 0.5  # Мультипликативное снижение скорости при блокировке
+
 # Настройки поиска прокси
 PROXY_SEARCH_TIMEOUT = 300  # Максимум 5 минут на поиск нового прокси
 PROXY_SEARCH_PROGRESS_LOG_INTERVAL = 30  # Интервал логирования прогресса поиска (секунды)
@@ -0,0 +1,214 @@
+"""
+Кеш подготовки браузерных драйверов trast.
+
+Путь к geckodriver/chromedriver определяется один раз на хост и версию
+браузера: результат (путь, версия драйвера) хранится в DRIVER_MANIFEST_FILE
+и при следующих запусках только проверяется (`<driver> --version`), без
+обращения к установщику. Внутри процесса проверенный путь держится в памяти.
+
+Статические настройки Firefox (FIREFOX_TEMPLATE_PREFS) записываются один раз
+в user.js шаблонного профиля; каждый драйвер получает копию шаблона, а
+динамические настройки (User-Agent, прокси) по-прежнему задаются через options.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import platform
+import threading
+import subprocess
+from typing import Callable, Dict, Iterable, Optional
+from loguru import logger
+
+from config import (
+    DRIVER_CACHE_DIR,
+    DRIVER_MANIFEST_FILE,
+    FIREFOX_TEMPLATE_PROFILE_DIR,
+    FIREFOX_PROFILE_COPIES_DIR,
+    FIREFOX_PROFILE_COPY_MAX_AGE,
+    FIREFOX_TEMPLATE_PREFS,
+)
+
+FIREFOX_BINARIES = ("firefox", "firefox-esr")
+CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")
+PROFILE_PRUNE_INTERVAL = 600  # Как часто проверять устаревшие копии профилей (секунды)
+
+_lock = threading.Lock()
+_resolved_paths: Dict[str, str] = {}  # драйвер -> проверенный в этом процессе путь
+_template_ready = False
+_last_prune = 0.0
+
+
+def _binary_version(binary: str) -> Optional[str]:
+    """Первая строка `<binary> --version` или None, если бинарник не запускается"""
+    try:
+        result = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=15)
+        output = result.stdout.strip()
+        return output.splitlines()[0] if result.returncode == 0 and output else None
+    except Exception:
+        return None
+
+
+def _browser_version(binaries: Iterable[str]) -> str:
+    for name in binaries:
+        path = shutil.which(name)
+        if path:
+            version = _binary_version(path)
+            if version:
+                return version
+    return "unknown"
+
+
+def _load_manifest() -> Dict:
+    try:
+        if os.path.exists(DRIVER_MANIFEST_FILE):
+            with open(DRIVER_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.debug(f"Failed to read driver manifest: {e}")
+    return {}
+
+
+def _save_manifest(manifest: Dict):
+    os.makedirs(DRIVER_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{DRIVER_MANIFEST_FILE}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, DRIVER_MANIFEST_FILE)
+    except Exception as e:
+        logger.debug(f"Failed to save driver manifest: {e}")
+
+
+def resolve_driver_path(name: str, install: Callable[[], Optional[str]], browser_binaries: Iterable[str]) -> Optional[str]:
+    """
+    Возвращает путь к драйверу, вызывая установщик только при смене хоста,
+    версии браузера или если закешированный бинарник не запускается.
+
+    Args:
+        name: Имя драйвера в манифесте ("geckodriver" / "chromedriver")
+        install: Установщик, возвращающий путь к драйверу
+        browser_binaries: Имена бинарников браузера для определения версии
+    """
+    with _lock:
+        if name in _resolved_paths:
+            return _resolved_paths[name]
+
+        host = platform.node()
+        browser_version = _browser_version(browser_binaries)
+        manifest = _load_manifest()
+        entry = manifest.get(name) or {}
+        path = entry.get('path')
+        if (
+            entry.get('host') == host
+            and entry.get('browser_version') == browser_version
+            and path and os.path.exists(path)
+            and _binary_version(path)
+        ):
+            logger.debug(f"Using cached {name}: {path}")
+            _resolved_paths[name] = path
+            return path
+
+        started = time.time()
+        path = install()
+        driver_version = _binary_version(path) if path else None
+        if not driver_version:
+            logger.warning(f"Installed {name} could not be verified: {path}")
+            return path
+        manifest[name] = {
+            'host': host,
+            'browser_version': browser_version,
+            'path': path,
+            'driver_version': driver_version,
+            'resolved_at': time.time(),
+        }
+        _save_manifest(manifest)
+        _resolved_paths[name] = path
+        logger.info(f"Resolved {name} ({driver_version}) for {browser_version} in {time.time() - started:.1f}s")
+        return path
+
+
+def get_geckodriver_path() -> Optional[str]:
+    """Путь к geckodriver (geckodriver_autoinstaller вызывается только при необходимости)"""
+    import geckodriver_autoinstaller
+    return resolve_driver_path("geckodriver", geckodriver_autoinstaller.install, FIREFOX_BINARIES)
+
+
+def get_chromedriver_path() -> Optional[str]:
+    """Путь к chromedriver (ChromeDriverManager вызывается только при необходимости)"""
+    from webdriver_manager.chrome import ChromeDriverManager
+    return resolve_driver_path("chromedriver", lambda: ChromeDriverManager().install(), CHROME_BINARIES)
+
+
+def _template_user_js() -> str:
+    return "".join(
+        f'user_pref("{name}", {json.dumps(value)});\n'
+        for name, value in FIREFOX_TEMPLATE_PREFS.items()
+    )
+
+
+def ensure_firefox_template() -> str:
+    """Создает (или обновляет при изменении настроек) шаблонный профиль Firefox"""
+    global _template_ready
+    with _lock:
+        if _template_ready:
+            return FIREFOX_TEMPLATE_PROFILE_DIR
+        user_js_path = os.path.join(FIREFOX_TEMPLATE_PROFILE_DIR, "user.js")
+        content = _template_user_js()
+        current = None
+        if os.path.exists(user_js_path):
+            with open(user_js_path, 'r', encoding='utf-8') as f:
+                current = f.read()
+        if current != content:
+            os.makedirs(FIREFOX_TEMPLATE_PROFILE_DIR, exist_ok=True)
+            tmp_path = f"{user_js_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, user_js_path)
+            logger.info(f"Firefox template profile updated ({len(FIREFOX_TEMPLATE_PREFS)} prefs)")
+        _template_ready = True
+        return FIREFOX_TEMPLATE_PROFILE_DIR
+
+
+def _prune_profile_copies():
+    """Удаляет копии профилей, оставшиеся после аварийно завершенных драйверов"""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < PROFILE_PRUNE_INTERVAL or not os.path.isdir(FIREFOX_PROFILE_COPIES_DIR):
+        return
+    _last_prune = now
+    for entry in os.scandir(FIREFOX_PROFILE_COPIES_DIR):
+        try:
+            if entry.is_dir() and now - entry.stat().st_mtime > FIREFOX_PROFILE_COPY_MAX_AGE:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            continue
+
+
+def create_firefox_profile_copy() -> str:
+    """Копия шаблонного профиля для нового драйвера (удаляется через remove_profile_copy)"""
+    template_dir = ensure_firefox_template()
+    _prune_profile_copies()
+    os.makedirs(FIREFOX_PROFILE_COPIES_DIR, exist_ok=True)
+    profile_dir = os.path.join(FIREFOX_PROFILE_COPIES_DIR, f"profile-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    shutil.copytree(template_dir, profile_dir)
+    return profile_dir
+
+
+def remove_profile_copy(profile_dir: Optional[str]):
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def attach_profile_cleanup(driver, profile_dir: str):
+    """Удаляет копию профиля при driver.quit()"""
+    original_quit = driver.quit
+
+    def quit_and_cleanup():
+        try:
+            original_quit()
+        finally:
+            remove_profile_copy(profile_dir)
+
+    driver.quit = quit_and_cleanup
@@ -0,0 +1,205 @@
+"""
+Контроль памяти браузера для trast.
+
+Долгоживущий headless-браузер растет по памяти до краша вкладки, а каждый краш
+стоит страницы и полного пересоздания драйвера. Монитор каждые
+DRIVER_HEALTH_CHECK_EVERY страниц суммирует RSS дерева процессов драйвера
+(geckodriver/chromedriver и браузер с дочерними процессами) через psutil и
+пересоздает драйвер с тем же прокси и cookies до превышения DRIVER_RSS_LIMIT_MB.
+
+Итоги запуска (страницы, пересоздания, краши) сохраняются в DRIVER_HEALTH_STATS_FILE;
+запуски с DRIVER_RSS_LIMIT_MB=0 служат базой для оценки предотвращенных крашей.
+"""
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from loguru import logger
+from selenium import webdriver
+
+from config import (
+    TARGET_URL,
+    DRIVER_RSS_LIMIT_MB,
+    DRIVER_HEALTH_CHECK_EVERY,
+    DRIVER_HEALTH_STATS_FILE,
+    DRIVER_HEALTH_HISTORY_SIZE,
+)
+from utils import create_driver
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+def get_driver_rss(driver: webdriver.Remote) -> Optional[int]:
+    """
+    Суммарный RSS (байты) процесса драйвера и всех его потомков.
+
+    Returns:
+        RSS в байтах или None, если процессы не найдены или psutil недоступен
+    """
+    if not HAS_PSUTIL:
+        return None
+    root_pids = []
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None) if service else None
+    if process is not None and getattr(process, 'pid', None):
+        root_pids.append(process.pid)
+    browser_pid = getattr(driver, 'browser_pid', None)  # undetected-chromedriver запускает браузер сам
+    if browser_pid:
+        root_pids.append(browser_pid)
+
+    seen = set()
+    total = 0
+    for pid in root_pids:
+        try:
+            root = psutil.Process(pid)
+            for proc in [root] + root.children(recursive=True):
+                if proc.pid in seen:
+                    continue
+                seen.add(proc.pid)
+                try:
+                    total += proc.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total if seen else None
+
+
+class DriverHealthMonitor:
+    """Проверка памяти драйвера и упреждающее пересоздание"""
+
+    def __init__(
+        self,
+        rss_limit_mb: int = DRIVER_RSS_LIMIT_MB,
+        check_every: int = DRIVER_HEALTH_CHECK_EVERY,
+        stats_file: str = DRIVER_HEALTH_STATS_FILE,
+    ):
+        self.rss_limit = rss_limit_mb * 1024 * 1024
+        self.check_every = max(1, check_every)
+        self.stats_file = stats_file
+        self.enabled = rss_limit_mb > 0 and HAS_PSUTIL
+        self.driver_id: Optional[int] = None
+        self.driver_pages = 0
+        self.pages = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.peak_rss = 0
+        if rss_limit_mb > 0 and not HAS_PSUTIL:
+            logger.warning("psutil is not installed, driver memory recycling disabled")
+
+    def should_recycle(self, driver: webdriver.Remote) -> bool:
+        """Отмечает загруженную страницу; True, если драйвер пора пересоздать"""
+        if id(driver) != self.driver_id:
+            self.driver_id = id(driver)
+            self.driver_pages = 0
+        self.driver_pages += 1
+        self.pages += 1
+        if not self.enabled or self.driver_pages % self.check_every:
+            return False
+        rss = get_driver_rss(driver)
+        if rss is None:
+            return False
+        self.peak_rss = max(self.peak_rss, rss)
+        logger.debug(f"Browser RSS {rss / 1048576:.0f} MB after {self.driver_pages} pages")
+        return rss >= self.rss_limit
+
+    def recycle(self, driver: webdriver.Remote, proxy: Optional[Dict]) -> Optional[webdriver.Remote]:
+        """
+        Пересоздает драйвер с тем же прокси и переносит cookies (чтобы не проходить защиту заново).
+
+        Returns:
+            Новый драйвер или None, если создать не удалось (старый в любом случае закрыт)
+        """
+        rss = get_driver_rss(driver) or 0
+        started = time.time()
+        try:
+            cookies = driver.get_cookies()
+        except Exception as e:
+            logger.debug(f"Failed to read cookies before recycle: {e}")
+            cookies = []
+        try:
+            driver.quit()
+        except:
+            pass
+
+        new_driver = create_driver(proxy)
+        if not new_driver:
+            logger.warning("Failed to create driver after memory recycle")
+            return None
+        if cookies:
+            # Cookies ставятся только для открытого домена - открываем легкую страницу сайта
+            parts = urlsplit(TARGET_URL)
+            try:
+                new_driver.get(f"{parts.scheme}://{parts.netloc}/robots.txt")
+                for cookie in cookies:
+                    if cookie.get('sameSite') not in (None, 'Strict', 'Lax', 'None'):
+                        cookie.pop('sameSite')  # Firefox отклоняет нестандартные значения
+                    try:
+                        new_driver.add_cookie(cookie)
+                    except Exception as cookie_error:
+                        logger.debug(f"Failed to restore cookie {cookie.get('name')}: {cookie_error}")
+            except Exception as e:
+                logger.warning(f"Failed to restore cookies after recycle: {e}")
+
+        self.recycles += 1
+        self.driver_id = id(new_driver)
+        self.driver_pages = 0
+        logger.info(
+            f"Recycled browser at {rss / 1048576:.0f} MB RSS (limit {self.rss_limit / 1048576:.0f} MB), "
+            f"{len(cookies)} cookies carried over, took {time.time() - started:.1f}s [recycle #{self.recycles}]"
+        )
+        return new_driver
+
+    def record_crash(self):
+        """Отмечает краш вкладки"""
+        self.crashes += 1
+
+    def _load_history(self) -> List[Dict]:
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.debug(f"Failed to read driver health history: {e}")
+        return []
+
+    def finish(self):
+        """Сохраняет итоги запуска и сравнивает частоту крашей с базовыми запусками (без пересоздания)"""
+        history = self._load_history()
+        baseline = [run for run in history if not run.get('recycling') and run.get('pages')]
+        run = {
+            'finished_at': datetime.now().isoformat(),
+            'recycling': self.enabled,
+            'rss_limit_mb': self.rss_limit // 1048576,
+            'pages': self.pages,
+            'recycles': self.recycles,
+            'crashes': self.crashes,
+            'peak_rss_mb': round(self.peak_rss / 1048576),
+        }
+        history = (history + [run])[-DRIVER_HEALTH_HISTORY_SIZE:]
+        tmp_path = f"{self.stats_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_file)
+        except Exception as e:
+            logger.debug(f"Failed to save driver health history: {e}")
+
+        summary = (
+            f"Driver health: {self.pages} pages, {self.recycles} memory recycles, "
+            f"{self.crashes} tab crashes, peak RSS {run['peak_rss_mb']} MB"
+        )
+        if self.enabled and baseline:
+            baseline_rate = sum(r['crashes'] for r in baseline) / sum(r['pages'] for r in baseline)
+            expected = baseline_rate * self.pages
+            summary += (
+                f"; baseline {baseline_rate * 1000:.1f} crashes/1000 pages over {len(baseline)} runs, "
+                f"~{max(0.0, expected - self.crashes):.1f} crashes avoided"
+            )
+        logger.info(summary)
@@ -0,0 +1,202 @@
+"""
+Пул запасных драйверов для быстрой смены прокси.
+
+Фоновый поток заранее запускает SPARE_DRIVER_COUNT браузеров со следующими
+по оценке селектора прокси и открывает в них каталог (get_pages_count_with_driver),
+то есть проходит защиту и определяет количество страниц. При смене прокси
+драйвер берется из пула без холодного старта браузера; пул сразу начинает
+готовить замену. Время каждой смены прокси (из пула и с холодным стартом)
+учитывается для сравнения.
+"""
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Tuple
+from loguru import logger
+from selenium import webdriver
+
+from config import (
+    TARGET_URL,
+    SPARE_DRIVER_COUNT,
+    SPARE_DRIVER_MAX_AGE,
+    SPARE_DRIVER_REFILL_INTERVAL,
+)
+from proxy_manager import ProxyManager
+from proxy_selector import OUTCOME_BLOCKED, OUTCOME_FAILURE
+from utils import create_driver, get_pages_count_with_driver, PaginationNotDetectedError
+
+
+def _proxy_key(proxy: Dict) -> str:
+    return f"{proxy.get('ip')}:{proxy.get('port')}"
+
+
+def _quit_driver(driver: Optional[webdriver.Remote]):
+    if driver:
+        try:
+            driver.quit()
+        except:
+            pass
+
+
+class SpareDriverPool:
+    """Заранее прогретые драйверы с прокси, готовые к мгновенной подмене"""
+
+    def __init__(
+        self,
+        proxy_manager: ProxyManager,
+        spare_count: int = SPARE_DRIVER_COUNT,
+        max_age: float = SPARE_DRIVER_MAX_AGE,
+        target_url: str = TARGET_URL,
+    ):
+        self.proxy_manager = proxy_manager
+        self.spare_count = max(0, spare_count)
+        self.max_age = max_age
+        self.target_url = target_url
+        self.spares: Deque[Tuple[Dict, webdriver.Remote, float]] = deque()  # (прокси, драйвер, время готовности)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.active_key: Optional[str] = None
+        self.warming_key: Optional[str] = None
+        self.switch_stats = {
+            'spare': {'count': 0, 'seconds': 0.0},
+            'cold': {'count': 0, 'seconds': 0.0},
+        }
+
+    def start(self):
+        """Запускает фоновое пополнение пула (при spare_count=0 только считает время смен)"""
+        if self.spare_count == 0 or self.thread:
+            return
+        self.thread = threading.Thread(target=self._run, name="SpareDriverPool", daemon=True)
+        self.thread.start()
+        logger.info(f"Spare driver pool started ({self.spare_count} spare drivers)")
+
+    def set_active(self, proxy: Optional[Dict]):
+        """Запоминает прокси рабочего драйвера, чтобы не готовить запасной с ним же"""
+        with self.lock:
+            self.active_key = _proxy_key(proxy) if proxy else None
+
+    def _reserved_keys(self) -> Set[str]:
+        with self.lock:
+            keys = {_proxy_key(proxy) for proxy, _, _ in self.spares}
+            keys.update(key for key in (self.active_key, self.warming_key) if key)
+            return keys
+
+    def _next_candidate(self) -> Optional[Dict]:
+        """Лучший по оценке селектора рабочий прокси, который еще не занят"""
+        reserved = self._reserved_keys()
+        for proxy in self.proxy_manager.rank_proxies(self.proxy_manager.successful_proxies):
+            if _proxy_key(proxy) in reserved or self.proxy_manager.is_proxy_in_cooldown(proxy):
+                continue
+            return proxy.copy()
+        return None
+
+    def _warm_spare(self, proxy: Dict) -> Optional[Tuple[Dict, webdriver.Remote]]:
+        """Запускает браузер с прокси и открывает каталог (проходит защиту)"""
+        proxy_key = _proxy_key(proxy)
+        started = time.time()
+        driver = None
+        try:
+            driver = create_driver(proxy)
+            if not driver:
+                self.proxy_manager.report_page_result(proxy, OUTCOME_FAILURE)
+                return None
+            total_pages = get_pages_count_with_driver(driver, self.target_url)
+            if not total_pages:
+                self.proxy_manager.report_page_result(proxy, OUTCOME_FAILURE)
+                _quit_driver(driver)
+                return None
+            proxy['total_pages'] = total_pages
+            logger.info(f"Spare driver ready with proxy {proxy_key} in {time.time() - started:.1f}s")
+            return proxy, driver
+        except PaginationNotDetectedError:
+            logger.debug(f"Spare driver with proxy {proxy_key} hit protection page")
+            self.proxy_manager.report_page_result(proxy, OUTCOME_BLOCKED)
+        except Exception as e:
+            logger.debug(f"Failed to warm spare driver with proxy {proxy_key}: {e}")
+            self.proxy_manager.report_page_result(proxy, OUTCOME_FAILURE)
+        _quit_driver(driver)
+        return None
+
+    def _is_usable(self, proxy: Dict, ready_at: float) -> bool:
+        return (
+            time.time() - ready_at <= self.max_age
+            and not self.proxy_manager.is_proxy_in_cooldown(proxy)
+        )
+
+    def _drop_stale(self):
+        with self.lock:
+            stale = [spare for spare in self.spares if not self._is_usable(spare[0], spare[2])]
+            for spare in stale:
+                self.spares.remove(spare)
+        for proxy, driver, _ in stale:
+            logger.debug(f"Dropping stale spare driver with proxy {_proxy_key(proxy)}")
+            _quit_driver(driver)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self._drop_stale()
+            with self.lock:
+                missing = self.spare_count - len(self.spares)
+            candidate = self._next_candidate() if missing > 0 else None
+            if candidate:
+                with self.lock:
+                    self.warming_key = _proxy_key(candidate)
+                result = self._warm_spare(candidate)
+                with self.lock:
+                    self.warming_key = None
+                    if result and not self.stop_event.is_set():
+                        self.spares.append((result[0], result[1], time.time()))
+                        result = None
+                if result:
+                    _quit_driver(result[1])
+                continue
+            self.wakeup.wait(SPARE_DRIVER_REFILL_INTERVAL)
+            self.wakeup.clear()
+
+    def acquire(self) -> Optional[Tuple[Dict, webdriver.Remote]]:
+        """
+        Забирает готовый запасной драйвер (без ожидания).
+
+        Returns:
+            (proxy, driver) или None, если готовых драйверов нет
+        """
+        self._drop_stale()
+        with self.lock:
+            if not self.spares:
+                return None
+            proxy, driver, _ = self.spares.popleft()
+            self.active_key = _proxy_key(proxy)
+        self.wakeup.set()  # Сразу готовим замену
+        return proxy, driver
+
+    def record_switch(self, seconds: float, from_spare: bool):
+        """Учитывает время смены прокси (поиск + создание драйвера)"""
+        with self.lock:
+            entry = self.switch_stats['spare' if from_spare else 'cold']
+            entry['count'] += 1
+            entry['seconds'] += seconds
+        logger.info(f"Proxy switch took {seconds:.1f}s ({'spare driver' if from_spare else 'cold start'})")
+
+    def log_summary(self):
+        """Выводит в лог среднее время смены прокси из пула и с холодным стартом"""
+        with self.lock:
+            parts = []
+            for name, entry in self.switch_stats.items():
+                if entry['count']:
+                    parts.append(f"{name}: {entry['count']} switches, avg {entry['seconds'] / entry['count']:.1f}s")
+        if parts:
+            logger.info(f"Proxy switch latency - {'; '.join(parts)}")
+
+    def shutdown(self):
+        """Останавливает пополнение и закрывает запасные драйверы"""
+        self.stop_event.set()
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=60)  # Дожидаемся прогрева, чтобы не оставить браузер
+        with self.lock:
+            spares = list(self.spares)
+            self.spares.clear()
+        for _, driver, _ in spares:
+            _quit_driver(driver)
@@ -0,0 +1,230 @@
+"""
+Корпус HTML-фикстур trast для офлайн-проверки разбора страниц.
+
+Фикстура - очищенный page_source (каталог, блокировка, частичная загрузка, пустая
+страница) и JSON с метаданными рядом: вид, причина, URL, время записи и то, что
+решил парсер на живом сайте (expected). Из HTML удаляются IP-адреса, прокси,
+cookie, nonce и идентификаторы challenge, чтобы корпус можно было хранить и
+передавать. Запись включается переменной TRAST_RECORD_FIXTURES; фикстуры также
+можно импортировать из уже сохраненных отладочных HTML (debug_proxy_html).
+
+Использование:
+    python fixtures.py import ../../storage/app/public/output/logs-trast/debug_proxy_html
+    python fixtures.py list
+"""
+import os
+import re
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+from loguru import logger
+
+from config import FIXTURES_DIR, FIXTURE_RECORDING, FIXTURE_RECORD_EVERY, FIXTURE_MAX_PER_KIND
+
+FIXTURE_KINDS = ("catalog", "blocked", "partial", "empty")
+
+# (шаблон, замена) - применяются по порядку
+SANITIZE_PATTERNS = [
+    # Cookie сессий и защиты (cf_clearance, __cf_bm, PHPSESSID, WordPress/WooCommerce)
+    (re.compile(r'((?:cf_clearance|__cf_bm|__cfruid|PHPSESSID|wordpress_[a-z0-9_]*|wp_woocommerce_session_[a-z0-9]*|woocommerce_[a-z_]+)=)[^;"\'\s&<]+', re.I),
+     r'\1REDACTED'),
+    (re.compile(r'(document\.cookie\s*=\s*["\'])[^"\']*', re.I), r'\1REDACTED'),
+    # Nonce WordPress/WooCommerce и FacetWP
+    (re.compile(r'("[a-z_]*nonce"\s*:\s*")[^"]*', re.I), r'\1REDACTED'),
+    (re.compile(r'(_wpnonce=)[^&"\'\s]+', re.I), r'\1REDACTED'),
+    (re.compile(r'((?:data-)?nonce=["\'])[^"\']*', re.I), r'\1REDACTED'),
+    (re.compile(r'(name=["\'][a-z_-]*nonce["\'][^>]*value=["\'])[^"\']*', re.I), r'\1REDACTED'),
+    # Токены и идентификаторы challenge Cloudflare
+    (re.compile(r'(__cf_chl_[a-z_]+=)[^&"\'\s]+', re.I), r'\1REDACTED'),
+    (re.compile(r'((?:cRay|cH|cUPMDTk|cFPWv|cTTimeMs|cRq|md|chlApiUrl)\s*[:=]\s*["\'])[^"\']*', re.I), r'\1REDACTED'),
+    (re.compile(r'(Ray ID:\s*(?:<[^>]+>\s*)?)[0-9a-f]{8,}', re.I), r'\1REDACTED'),
+    # IP-адреса (в том числе IP прокси на страницах блокировки) и e-mail
+    (re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b'), '0.0.0.0'),
+    (re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'), 'user@example.com'),
+]
+
+
+def sanitize_page_source(page_source: str, proxy: Optional[Dict] = None) -> str:
+    """Удаляет из HTML прокси, IP, cookie, nonce и идентификаторы challenge"""
+    if proxy and proxy.get('ip'):
+        page_source = page_source.replace(f"{proxy['ip']}:{proxy.get('port', '')}", "0.0.0.0:0")
+    for pattern, replacement in SANITIZE_PATTERNS:
+        page_source = pattern.sub(replacement, page_source)
+    return page_source
+
+
+def _kind_dir(kind: str, fixtures_dir: str = FIXTURES_DIR) -> str:
+    return os.path.join(fixtures_dir, kind)
+
+
+def count_fixtures(kind: str, fixtures_dir: str = FIXTURES_DIR) -> int:
+    """Количество фикстур вида kind в корпусе"""
+    kind_dir = _kind_dir(kind, fixtures_dir)
+    if not os.path.isdir(kind_dir):
+        return 0
+    return sum(1 for name in os.listdir(kind_dir) if name.endswith(".html"))
+
+
+def record_fixture(
+    page_source: str,
+    kind: str,
+    reason: str = "",
+    url: str = "",
+    proxy: Optional[Dict] = None,
+    expected: Optional[Dict] = None,
+    fixtures_dir: str = FIXTURES_DIR,
+) -> Optional[str]:
+    """
+    Сохраняет очищенный HTML страницы и метаданные в корпус фикстур.
+
+    Args:
+        page_source: HTML страницы
+        kind: catalog / blocked / partial / empty
+        reason: Причина записи (как в _save_debug_html)
+        url: URL страницы
+        proxy: Прокси, через который получена страница (в корпус попадает только протокол)
+        expected: Что решил парсер на живом сайте (статус, число товаров, число страниц)
+
+    Returns:
+        Путь к HTML фикстуры или None, если запись пропущена
+    """
+    if kind not in FIXTURE_KINDS:
+        raise ValueError(f"Unknown fixture kind: {kind}")
+    if not page_source:
+        return None
+    try:
+        if count_fixtures(kind, fixtures_dir) >= FIXTURE_MAX_PER_KIND:
+            logger.debug(f"Fixture corpus already has {FIXTURE_MAX_PER_KIND} '{kind}' pages, skipping")
+            return None
+
+        html = sanitize_page_source(page_source, proxy)
+        digest = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        kind_dir = _kind_dir(kind, fixtures_dir)
+        os.makedirs(kind_dir, exist_ok=True)
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        safe_reason = (reason or kind).replace(" ", "_").replace("/", "_")[:50]
+        fixture_id = f"{kind}_{safe_reason}_{timestamp}_{digest[:8]}"
+        html_path = os.path.join(kind_dir, f"{fixture_id}.html")
+        if os.path.exists(html_path):
+            return html_path
+
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        meta = {
+            'id': fixture_id,
+            'kind': kind,
+            'reason': reason,
+            'url': sanitize_page_source(url or "", proxy),
+            'proxy_protocol': (proxy or {}).get('protocol'),
+            'recorded_at': datetime.now().isoformat(),
+            'size': len(html),
+            'sha1': digest,
+            'expected': expected or {},
+        }
+        with open(os.path.join(kind_dir, f"{fixture_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        logger.debug(f"Fixture saved: {html_path} (kind: {kind}, reason: {reason})")
+        return html_path
+    except Exception as e:
+        logger.debug(f"Failed to save fixture ({kind}, {reason}): {e}")
+        return None
+
+
+def should_record_page(page_number: int, status: str) -> bool:
+    """Записывать ли страницу парсинга: все необычные и каждую FIXTURE_RECORD_EVERY-ю нормальную"""
+    if not FIXTURE_RECORDING:
+        return False
+    if status != "normal":
+        return True
+    return page_number % FIXTURE_RECORD_EVERY == 1
+
+
+def kind_for_status(status: str) -> str:
+    """Вид фикстуры по статусу страницы (is_page_empty / get_payload_page_status)"""
+    return "catalog" if status == "normal" else status
+
+
+def load_fixtures(fixtures_dir: str = FIXTURES_DIR) -> List[Dict]:
+    """
+    Загружает корпус фикстур.
+
+    Returns:
+        Список {"id", "path", "html", "meta"}, упорядоченный по id
+    """
+    fixtures = []
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for root, _, files in os.walk(fixtures_dir):
+        for name in files:
+            if not name.endswith(".html"):
+                continue
+            path = os.path.join(root, name)
+            fixture_id = name[:-len(".html")]
+            meta = {}
+            meta_path = os.path.join(root, f"{fixture_id}.json")
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                except ValueError as e:
+                    logger.warning(f"Broken fixture metadata {meta_path}: {e}")
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                html = f.read()
+            fixtures.append({'id': meta.get('id', fixture_id), 'path': path, 'html': html, 'meta': meta})
+    fixtures.sort(key=lambda fixture: fixture['id'])
+    return fixtures
+
+
+def import_debug_html(source_dir: str, fixtures_dir: str = FIXTURES_DIR) -> int:
+    """
+    Импортирует сохраненные отладочные HTML (_save_debug_html, debug_pagination_*)
+    в корпус; вид страницы определяется текущими классификаторами.
+
+    Returns:
+        Количество импортированных фикстур
+    """
+    from bs4 import BeautifulSoup
+    from utils import is_page_blocked, get_products_from_page_soup, is_page_empty
+
+    imported = 0
+    for name in sorted(os.listdir(source_dir)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(source_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+            page_source = f.read()
+        soup = BeautifulSoup(page_source, 'html.parser')
+        if is_page_blocked(soup, page_source)["blocked"]:
+            kind = "blocked"
+        else:
+            products, in_stock, total = get_products_from_page_soup(soup)
+            kind = kind_for_status(is_page_empty(soup, page_source, in_stock, total)["status"])
+        reason = os.path.splitext(name)[0].replace("proxy_", "imported_", 1)
+        # Имя отладочного файла содержит ip_port прокси - в причину он не попадает
+        reason = re.sub(r'\d{1,3}(?:\.\d{1,3}){3}_\d+_?', '', reason)
+        if record_fixture(page_source, kind, reason=reason, fixtures_dir=fixtures_dir):
+            imported += 1
+    logger.info(f"Imported {imported} fixtures from {source_dir}")
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage trast HTML fixture corpus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import saved debug HTML pages")
+    import_parser.add_argument("source_dir", help="Directory with debug HTML files")
+    subparsers.add_parser("list", help="Show corpus size by kind")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture corpus directory")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_debug_html(args.source_dir, args.fixtures)
+    for kind in FIXTURE_KINDS:
+        logger.info(f"{kind}: {count_fixtures(kind, args.fixtures)} fixtures")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,8 @@ from config import (
     HUMAN_LONG_PAUSE_MAX,
     MIN_DELAY_AFTER_LOAD,
     MAX_DELAY_AFTER_LOAD,
+    PAGE_EXTRACTION_MODE,
+    RESOURCE_BLOCKING,
     LOG_DIR,
     PARSING_THREADS,
     PROXY_SEARCH_TIMEOUT,
@@ -55,6 +57,7 @@ from config import (
     FORCE_FIREFOX,
     PROGRESS_NOTIFICATION_INTERVAL,
     PROXY_SEARCH_NOTIFICATION_INTERVAL,
+    STORE_API_ENABLED,
 )
 
 # Добавляем обработчики логирования после импорта config
@@ -71,14 +74,30 @@ if hasattr(sys.stderr, 'encoding') and sys.stderr.encoding != 'utf-8':
         pass  # Если не удалось, продолжаем с текущим stderr
 logger.add(sys.stderr, level='INFO')
 from proxy_manager import ProxyManager
+from proxy_selector import OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_BLOCKED
+from throttle import AdaptiveThrottle
+from checkpoint import CrawlCheckpoint
+from driver_pool import SpareDriverPool
+from resource_blocking import get_page_transfer_stats
+from driver_health import DriverHealthMonitor
+from fixtures import record_fixture, should_record_page, kind_for_status
+from store_api import crawl_store_api, StoreApiError
 from utils import (
     create_driver, get_pages_count_with_driver, get_products_from_page_soup,
     is_page_blocked, is_page_empty, create_new_csv, append_to_csv,
     finalize_output_files, cleanup_temp_files, create_backup,
     safe_get_page_source, is_tab_crashed_error, PaginationNotDetectedError,
-    wait_for_cloudflare
+    wait_for_cloudflare, wait_for_page_ready, extract_page_payload, is_payload_blocked,
+    get_payload_page_status
 )
 
+# Сколько времени сэкономило ожидание готовности страницы по сравнению с фиксированными паузами
+PAGE_READINESS_STATS = {'pages': 0, 'waited': 0.0, 'saved': 0.0}
+# Трафик и время загрузки страниц по Resource Timing API (с учетом блокировки ресурсов)
+PAGE_TRANSFER_STATS = {'pages': 0, 'bytes': 0, 'load_time': 0.0}
+# Объем данных, переданных из браузера, и CPU на разбор страницы (extract_page_payload)
+PAGE_EXTRACTION_STATS = {'pages': 0, 'bytes': 0, 'cpu': 0.0, 'fallbacks': 0}
+
 # Импорт Telegram уведомлений и БД
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 try:
@@ -87,7 +106,7 @@ except ImportError:
     # Если модуль не найден, создаем заглушку
     class TelegramNotifier:
         @classmethod
-        def notify(cls, text: str):
+        def notify(cls, text: str, key: str = None):
             logger.info(f"Telegram notification (not available): {text}")
 
 try:
@@ -97,7 +116,7 @@ except ImportError:
     def set_script_start(script_name: str):
         logger.debug(f"set_script_start({script_name}) - database module not available")
     
-    def set_script_end(script_name: str, status: str = "done"):
+    def set_script_end(script_name: str, status: str = "done", **run_metrics):
         logger.debug(f"set_script_end({script_name}, {status}) - database module not available")
 
 
@@ -213,13 +232,20 @@ def get_cookies_from_selenium(driver: webdriver.Remote) -> Dict[str, str]:
 def humanized_page_sleep(
     next_page_number: int,
     thread_name: str = "MainThread",
-    reason: str = "between pages"
+    reason: str = "between pages",
+    base_delay: Optional[float] = None
 ):
     """
     Добавляет паузы между страницами, имитируя поведение живого пользователя.
+    
+    Args:
+        base_delay: Базовая пауза от AdaptiveThrottle; если не задана -
+            случайная в пределах MIN/MAX_DELAY_BETWEEN_PAGES
     """
-    delay = random.uniform(MIN_DELAY_BETWEEN_PAGES, MAX_DELAY_BETWEEN_PAGES)
-    delay += random.uniform(HUMAN_DELAY_MIN, HUMAN_DELAY_MAX)
+    if base_delay is None:
+        base_delay = random.uniform(MIN_DELAY_BETWEEN_PAGES, MAX_DELAY_BETWEEN_PAGES)
+    jitter = random.uniform(HUMAN_DELAY_MIN, HUMAN_DELAY_MAX)
+    delay = base_delay + jitter
 
     if (
         HUMAN_LONG_PAUSE_EVERY
@@ -234,7 +260,8 @@ def humanized_page_sleep(
         )
 
     logger.debug(
-        f"[{thread_name}] Sleeping {delay:.2f}s {reason}. "
+        f"[{thread_name}] Sleeping {delay:.2f}s {reason} "
+        f"(base {base_delay:.2f}s + jitter {jitter:.2f}s). "
         f"Next target page: {next_page_number}"
     )
     time.sleep(delay)
@@ -252,6 +279,86 @@ def parse_page_with_cloudscraper(
     return None, False
 
 
+def load_page_with_selenium(
+    driver: webdriver.Remote,
+    page_url: str,
+    wait_for_content: bool = True
+) -> bool:
+    """
+    Открывает страницу и ждет ее готовности (wait_for_page_ready) вместо фиксированных пауз:
+    прежние паузы после загрузки и после скролла используются как верхняя граница.
+    
+    Returns:
+        True, если страница загружена и не осталась на странице защиты.
+        Краш вкладки пробрасывается вызывающему коду.
+    """
+    driver.set_page_load_timeout(25)
+    driver.get(page_url)
+    
+    # Прежние фиксированные паузы: после загрузки и после трех скроллов + 5с на AJAX
+    load_budget = random.uniform(MIN_DELAY_AFTER_LOAD, MAX_DELAY_AFTER_LOAD)
+    scroll_budget = random.uniform(4, 7) + 5 if wait_for_content else 0.0
+    readiness = wait_for_page_ready(driver, max_wait=load_budget, context="after load")
+    waited = readiness["elapsed"]
+    
+    if not readiness["ready"]:
+        # Каталога нет или страница защиты - используем единую функцию wait_for_cloudflare
+        page_source = safe_get_page_source(driver)
+        if not page_source:
+            # Краш вкладки
+            logger.error("[TAB CRASH] Tab crash while getting page_source after load")
+            return False
+        
+        cloudflare_success, page_source = wait_for_cloudflare(driver, max_wait=30, context="parse_page")
+        if not cloudflare_success or not page_source:
+            return False
+    
+    # Если нужно ждать полной загрузки контента (как при валидации прокси)
+    if wait_for_content:
+        # Скроллим вниз для активации lazy-load и ждем, пока сетка товаров перестанет меняться
+        try:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            readiness = wait_for_page_ready(driver, max_wait=scroll_budget, context="after scroll")
+            waited += readiness["elapsed"]
+        except Exception as scroll_error:
+            if is_tab_crashed_error(scroll_error):
+                raise
+            logger.warning(f"Error during scroll: {scroll_error}")
+            # Продолжаем с текущим состоянием страницы
+    
+    transfer = get_page_transfer_stats(driver)
+    if transfer:
+        PAGE_TRANSFER_STATS['pages'] += 1
+        PAGE_TRANSFER_STATS['bytes'] += transfer.get('bytes') or 0
+        PAGE_TRANSFER_STATS['load_time'] += transfer.get('load_time') or 0.0
+        logger.debug(
+            f"Page transfer: {(transfer.get('bytes') or 0) / 1024:.0f} KB in {transfer.get('requests')} requests, "
+            f"load {transfer.get('load_time') or 0:.1f}s"
+        )
+    
+    saved = max(0.0, load_budget + scroll_budget - waited)
+    PAGE_READINESS_STATS['pages'] += 1
+    PAGE_READINESS_STATS['waited'] += waited
+    PAGE_READINESS_STATS['saved'] += saved
+    logger.debug(
+        f"Page ready in {waited:.1f}s ({readiness['reason']}, {readiness['cards']} cards), "
+        f"saved {saved:.1f}s vs fixed waits, total saved {PAGE_READINESS_STATS['saved']:.0f}s"
+    )
+    return True
+
+
+def _log_selenium_error(e: Exception):
+    # Проверяем тип ошибки
+    if is_tab_crashed_error(e):
+        logger.error(f"[TAB CRASH] Tab crash while parsing with Selenium: {e}")
+        # Пробрасываем, чтобы вызвавший код мог пересоздать драйвер
+        raise e
+    elif is_proxy_error(e):
+        logger.warning(f"[PROXY ERROR] Proxy error while parsing with Selenium: {e}")
+    else:
+        logger.debug(f"Error parsing with Selenium: {e}")
+
+
 def parse_page_with_selenium(
     driver: webdriver.Remote,
     page_url: str,
@@ -269,62 +376,114 @@ def parse_page_with_selenium(
         (soup, success) - BeautifulSoup объект и флаг успеха
     """
     try:
-        driver.set_page_load_timeout(25)
-        driver.get(page_url)
-        time.sleep(random.uniform(MIN_DELAY_AFTER_LOAD, MAX_DELAY_AFTER_LOAD))
+        if not load_page_with_selenium(driver, page_url, wait_for_content):
+            return None, False
         
-        # Проверяем защиту (nginx/cloudflare/другие) - используем безопасное получение page_source
         page_source = safe_get_page_source(driver)
         if not page_source:
-            # Краш вкладки
-            logger.error("[TAB CRASH] Tab crash while getting page_source after load")
+            logger.error("[TAB CRASH] Tab crash while getting page_source")
             return None, False
         
-        # Используем единую функцию wait_for_cloudflare для обработки защиты
-        cloudflare_success, page_source = wait_for_cloudflare(driver, max_wait=30, context="parse_page")
+        soup = BeautifulSoup(page_source, 'html.parser')
+        return soup, True
         
-        if not cloudflare_success or not page_source:
+    except Exception as e:
+        _log_selenium_error(e)
+        return None, False
+
+
+def extract_page_with_selenium(
+    driver: webdriver.Remote,
+    page_url: str,
+    wait_for_content: bool = True
+) -> Tuple[Optional[Dict], bool]:
+    """
+    Загружает страницу и извлекает товары одним execute_script (extract_page_payload),
+    без передачи полного page_source.
+    
+    Returns:
+        (payload, success) - payload страницы и флаг успеха
+    """
+    try:
+        if not load_page_with_selenium(driver, page_url, wait_for_content):
             return None, False
         
-        # Если нужно ждать полной загрузки контента (как при валидации прокси)
-        if wait_for_content:
-            # Скроллим для активации динамического контента (как в get_pages_count_with_driver)
-            try:
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
-                time.sleep(random.uniform(1, 2))
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-                time.sleep(random.uniform(1, 2))
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(random.uniform(2, 3))
-                
-                # Дополнительное ожидание для полной загрузки динамического контента
-                time.sleep(5)  # Даем время на загрузку товаров через AJAX
-                
-                # Обновляем page_source после скролла
-                page_source = safe_get_page_source(driver)
-                if not page_source:
-                    logger.error("[TAB CRASH] Tab crash after scroll")
-                    return None, False
-            except Exception as scroll_error:
-                logger.warning(f"Error during scroll: {scroll_error}")
-                # Продолжаем с текущим page_source
+        payload = extract_page_payload(driver)
+        if not payload:
+            logger.error("[TAB CRASH] Tab crash while extracting page payload")
+            return None, False
         
-        soup = BeautifulSoup(page_source, 'html.parser')
-        return soup, True
+        record_page_extraction(payload)
+        return payload, True
         
     except Exception as e:
-        # Проверяем тип ошибки
-        if is_tab_crashed_error(e):
-            logger.error(f"[TAB CRASH] Tab crash while parsing with Selenium: {e}")
-            # Пробрасываем, чтобы вызвавший код мог пересоздать драйвер
-            raise e
-        elif is_proxy_error(e):
-            logger.warning(f"[PROXY ERROR] Proxy error while parsing with Selenium: {e}")
-        else:
-            logger.debug(f"Error parsing with Selenium: {e}")
+        _log_selenium_error(e)
         return None, False
 
 
+def record_page_fixture(driver: webdriver.Remote, page_url: str, proxy: Dict, kind: str, reason: str, expected: Dict):
+    """Сохраняет текущую страницу в корпус фикстур (включается TRAST_RECORD_FIXTURES)"""
+    page_source = safe_get_page_source(driver)
+    if page_source:
+        record_fixture(page_source, kind, reason=reason, url=page_url, proxy=proxy, expected=expected)
+
+
+def record_page_extraction(payload: Dict):
+    """Учитывает объем переданных данных и CPU на разбор страницы"""
+    PAGE_EXTRACTION_STATS['pages'] += 1
+    PAGE_EXTRACTION_STATS['bytes'] += payload['bytes']
+    PAGE_EXTRACTION_STATS['cpu'] += payload['cpu']
+    if payload['mode'] != PAGE_EXTRACTION_MODE:
+        PAGE_EXTRACTION_STATS['fallbacks'] += 1
+    logger.debug(
+        f"Page extracted via {payload['mode']}: {payload['bytes'] / 1024:.1f} KB transferred, "
+        f"{payload['cpu'] * 1000:.0f} ms CPU, {payload['total_products']} cards"
+    )
+
+
+def start_proxy_harvest(
+    proxy_manager: ProxyManager,
+    proxies_list: List[Dict],
+    proxies_lock: threading.Lock,
+    force_update: bool = False
+) -> threading.Event:
+    """Запускает параллельный сбор прокси в фоне и дописывает кандидатов в proxies_list
+    по мере готовности каждого источника (не дожидаясь остальных).
+    
+    Args:
+        proxy_manager: Менеджер прокси
+        proxies_list: Общий список прокси для проверки (thread-safe)
+        proxies_lock: Lock для доступа к proxies_list
+        force_update: Игнорировать кеш источников
+    
+    Returns:
+        Event, который устанавливается после завершения сбора
+    """
+    thread_name = "HarvestThread"
+    harvest_done = threading.Event()
+    
+    def on_batch(source_name: str, batch: List[Dict]):
+        with proxies_lock:
+            proxies_list.extend(batch)
+            total = len(proxies_list)
+        logger.info(f"[{thread_name}] +{len(batch)} candidates from {source_name} (queue: {total})")
+    
+    def run():
+        started = time.time()
+        try:
+            proxy_manager.download_proxies(force_update=force_update, on_batch=on_batch)
+        except Exception as e:
+            logger.warning(f"[{thread_name}] Error downloading proxies: {e}")
+            logger.debug(traceback.format_exc())
+        finally:
+            logger.info(f"[{thread_name}] Proxy harvest finished in {time.time() - started:.1f}s")
+            proxy_manager.source_stats.log_summary()
+            harvest_done.set()
+    
+    threading.Thread(target=run, name=thread_name, daemon=True).start()
+    return harvest_done
+
+
 def download_proxies_thread(
     proxy_manager: ProxyManager,
     proxies_list: List[Dict],
@@ -343,20 +502,16 @@ def download_proxies_thread(
     logger.info(f"[{thread_name}] Proxy download thread started")
     
     try:
-        # Первоначальная загрузка прокси
+        # Первоначальная загрузка прокси: кандидаты попадают в общий список по мере готовности источников
         logger.info(f"[{thread_name}] Starting proxy download from all sources...")
-        if proxy_manager.download_proxies(force_update=True):
-            # Загружаем скачанные прокси
-            downloaded_proxies = proxy_manager._load_proxies()
-            if downloaded_proxies:
-                with proxies_lock:
-                    proxies_list.clear()
-                    proxies_list.extend(downloaded_proxies)
-                    logger.info(f"[{thread_name}] Loaded {len(proxies_list)} proxies into shared list")
-            else:
-                logger.warning(f"[{thread_name}] Failed to load proxies from file")
-        else:
-            logger.warning(f"[{thread_name}] Failed to download proxies")
+        with proxies_lock:
+            proxies_list.clear()
+        harvest_done = start_proxy_harvest(proxy_manager, proxies_list, proxies_lock)
+        harvest_done.wait()
+        with proxies_lock:
+            if not proxies_list:
+                proxies_list.extend(proxy_manager._load_proxies())
+            logger.info(f"[{thread_name}] Loaded {len(proxies_list)} proxies into shared list")
         
         # Периодическое обновление (каждые 30 минут)
         update_interval = 1800  # 30 минут
@@ -369,7 +524,7 @@ def download_proxies_thread(
             if time.time() - last_update >= update_interval:
                 logger.info(f"[{thread_name}] Periodic proxy list update...")
                 try:
-                    if proxy_manager.download_proxies(force_update=True):
+                    if proxy_manager.download_proxies():
                         downloaded_proxies = proxy_manager._load_proxies()
                         if downloaded_proxies:
                             with proxies_lock:
@@ -431,8 +586,11 @@ def find_new_working_proxy(
         nonlocal proxies_checked
         if not proxy:
             return None
-        proxies_checked += 1
         proxy_key = f"{proxy['ip']}:{proxy['port']}"
+        if source_label != "priority" and proxy_manager.is_proxy_in_cooldown(proxy):
+            logger.debug(f"[{thread_name}] Skipping {source_label} proxy {proxy_key}: in cooldown")
+            return None
+        proxies_checked += 1
         protocol = proxy.get('protocol', 'http').upper()
         logger.info(f"[{thread_name}] Checking {source_label} proxy {proxy_key} ({protocol}){context_suffix} [{proxies_checked} checked, {int(time.time() - proxy_search_start)}s elapsed]...")
         try:
@@ -449,6 +607,8 @@ def find_new_working_proxy(
                     logger.warning(f"[{thread_name}] Failed to create driver with {source_label} proxy {proxy_key}")
             else:
                 logger.debug(f"[{thread_name}] Proxy {proxy_key} ({source_label}) validation failed: ok={trast_ok}, info={trast_info}")
+                if source_label != "priority":
+                    proxy_manager.remove_failed_proxy(proxy, reason=trast_info.get('reason'))
         except Exception as e:
             error_type = type(e).__name__
             logger.debug(f"[{thread_name}] Error checking proxy {proxy_key} ({source_label}): {error_type}: {str(e)[:100]}")
@@ -627,6 +787,7 @@ def worker_thread(
     search_start_time = time.time()
     last_list_size = 0
     consecutive_empty_checks = 0
+    proxies_checked_count = 0
     
     while True:
         # Проверяем таймаут - но не останавливаемся, продолжаем пытаться
@@ -636,12 +797,13 @@ def worker_thread(
             # Сбрасываем таймер, продолжаем поиск
             search_start_time = time.time()
         
-        # Проверяем, есть ли уже total_pages от другого потока
-        with total_pages_lock:
-            if total_pages_shared.get('value') and total_pages_shared['value'] > 0:
-                total_pages = total_pages_shared['value']
-                logger.info(f"[{thread_name}] Using total_pages={total_pages} from another thread")
-                break
+        # total_pages от другого потока или из кеша пагинации - только оценка,
+        # прокси для парсинга этот поток все равно ищет сам
+        if not total_pages:
+            with total_pages_lock:
+                total_pages = total_pages_shared.get('value') or proxy_manager.pagination.estimate()
+            if total_pages:
+                logger.info(f"[{thread_name}] Using estimated total_pages={total_pages}, still searching for own proxy")
         
         # Получаем прокси из списка
         with proxies_lock:
@@ -766,8 +928,9 @@ def worker_thread(
     # Основной цикл парсинга
     logger.info(f"[{thread_name}] Starting main parsing loop (pages {page_start} to {total_pages}, step {page_step})...")
     
-    while current_page <= total_pages:
+    while proxy_manager.pagination.should_continue(current_page, empty_pages_count):
         try:
+            total_pages = proxy_manager.pagination.estimate() or total_pages
             page_url = f"{TARGET_URL}?_paged={current_page}"
             logger.info(f"[{thread_name}] {'-'*60}")
             logger.info(f"[{thread_name}] Parsing page {current_page}/{total_pages} ({'even' if current_page % 2 == 0 else 'odd'})...")
@@ -958,7 +1121,8 @@ def worker_thread(
                     f"[Trast] [{thread_name}] Progress: {pages_parsed} pages parsed "
                     f"(current: {current_page}/{total_pages}), "
                     f"products: {len(local_buffer)} in buffer, "
-                    f"total collected: {products_collected}"
+                    f"total collected: {products_collected}",
+                    key=f"trast.progress.{thread_name}"
                 )
             
             # Задержка между страницами
@@ -1054,20 +1218,66 @@ def worker_thread(
     logger.info(f"[{thread_name}] {'='*60}")
 
 
+def crawl_via_store_api(
+    current_proxy: Dict,
+    checkpoint: Optional[CrawlCheckpoint] = None
+) -> Optional[Tuple[int, Dict]]:
+    """
+    Обходит каталог через WooCommerce Store API (store_api.py) и пишет товары в TEMP_CSV_FILE.
+    
+    Args:
+        current_proxy: Рабочий прокси
+        checkpoint: Журнал контрольных точек (при продолжении HTML-парсинга режим API не используется)
+    
+    Returns:
+        (total_products, metrics) или None, если каталог нужно парсить через HTML
+    """
+    if not STORE_API_ENABLED:
+        return None
+    if checkpoint and checkpoint.completed_pages:
+        logger.info("Checkpoint has HTML pages, skipping Store API crawl")
+        return None
+    
+    csv_size = os.path.getsize(TEMP_CSV_FILE)
+    started = time.time()
+    try:
+        stats = crawl_store_api(current_proxy, lambda products: append_to_csv(TEMP_CSV_FILE, products))
+    except StoreApiError as e:
+        logger.warning(f"Store API crawl failed after {time.time() - started:.0f}s: {e}, falling back to HTML crawl")
+        # Убираем товары, записанные до ошибки: HTML-парсинг соберет каталог заново
+        with open(TEMP_CSV_FILE, 'r+b') as f:
+            f.truncate(csv_size)
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected Store API error: {e}, falling back to HTML crawl")
+        logger.debug(traceback.format_exc())
+        with open(TEMP_CSV_FILE, 'r+b') as f:
+            f.truncate(csv_size)
+        return None
+    
+    return stats['products'], {
+        "pages_checked": stats['pages'],
+        "proxy_switches": 0,
+        "protection_blocks": stats['blocks']
+    }
+
+
 def parse_all_pages_simple(
     proxy_manager: ProxyManager,
     total_pages: int,
     initial_proxy: Dict,
-    proxies_list: List[Dict]
+    proxies_list: List[Dict],
+    checkpoint: Optional[CrawlCheckpoint] = None
 ) -> Tuple[int, Dict]:
     """
     Упрощенная однопоточная версия парсинга всех страниц
     
     Args:
         proxy_manager: Менеджер прокси
-        total_pages: Общее количество страниц
+        total_pages: Общее количество страниц (начальная оценка, уточняется по ходу парсинга)
         initial_proxy: Начальный прокси для начала парсинга
         proxies_list: Список всех прокси для поиска новых при необходимости
+        checkpoint: Журнал контрольных точек (при продолжении уже содержит завершенные страницы)
     
     Returns:
         (total_products, metrics) - количество товаров и метрики
@@ -1097,7 +1307,7 @@ def parse_all_pages_simple(
             cached_working_proxies.popleft()
     
     cache_proxy(current_proxy)
-    for cached_proxy in proxy_manager.successful_proxies[:50]:
+    for cached_proxy in proxy_manager.rank_proxies(proxy_manager.successful_proxies)[:50]:
         cache_proxy(cached_proxy)
     
     # Получаем cookies через Selenium (один раз)
@@ -1149,370 +1359,367 @@ def parse_all_pages_simple(
     # Буфер для товаров
     products_buffer = []
     
+    # Адаптивная пауза между страницами
+    throttle = AdaptiveThrottle()
+    # Контроль памяти браузера (пересоздание драйвера до краша вкладки)
+    health = DriverHealthMonitor()
+    
+    def flush_products_buffer():
+        """Сбрасывает буфер в CSV и фиксирует завершенные страницы в журнале"""
+        if products_buffer:
+            append_to_csv(TEMP_CSV_FILE, products_buffer)
+            products_buffer.clear()
+        if checkpoint:
+            checkpoint.commit({'total_products': total_products, 'empty_pages_count': empty_pages_count})
+    
+    def advance_page(page: int) -> int:
+        """Следующая страница для парсинга (завершенные по журналу пропускаются)"""
+        return checkpoint.next_page(page + 1) if checkpoint else page + 1
+    
+    # Запасные драйверы с прокси для мгновенной смены (при SPARE_DRIVER_COUNT=0 только считаем время смен)
+    spare_pool = SpareDriverPool(proxy_manager)
+    spare_pool.set_active(current_proxy)
+    spare_pool.start()
+    
+    def switch_proxy(context: str) -> bool:
+        """
+        Меняет прокси и драйвер: берет готовый запасной драйвер из пула,
+        иначе ищет и проверяет новый прокси (find_new_working_proxy).
+        
+        Returns:
+            True, если драйвер заменен
+        """
+        nonlocal current_proxy, driver, proxy_index
+        switch_started = time.time()
+        spare = spare_pool.acquire()
+        if spare:
+            new_proxy, new_driver = spare
+            new_proxy_index = proxy_index
+            logger.info(f"[{thread_name}] Switched to spare driver with proxy {new_proxy['ip']}:{new_proxy['port']} {context}")
+        else:
+            new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
+                proxy_manager, proxies_list, None, proxy_index, thread_name,
+                context=context,
+                cached_proxies=cached_working_proxies
+            )
+            if not new_proxy or not new_driver:
+                logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
+                time.sleep(10)
+                return False
+        
+        # Закрываем старый драйвер
+        if driver:
+            try:
+                driver.quit()
+            except:
+                pass
+        
+        current_proxy = new_proxy
+        driver = new_driver
+        proxy_index = new_proxy_index
+        # Отмечаем, что новый прокси только что прошел валидацию
+        proxy_validation_time[f"{current_proxy['ip']}:{current_proxy['port']}"] = time.time()
+        cache_proxy(current_proxy)
+        proxy_manager.record_successful_proxy(current_proxy)
+        spare_pool.set_active(current_proxy)
+        spare_pool.record_switch(time.time() - switch_started, from_spare=bool(spare))
+        return True
+    
     # Основной цикл парсинга - парсим страницы последовательно
     current_page = 1
+    if checkpoint and checkpoint.completed_pages:
+        total_products = checkpoint.state.get('total_products', 0)
+        empty_pages_count = checkpoint.state.get('empty_pages_count', 0)
+        current_page = checkpoint.next_page(1)
+        logger.info(
+            f"[{thread_name}] Resuming from checkpoint: {len(checkpoint.completed_pages)} pages done, "
+            f"{total_products} products, continuing at page {current_page}"
+        )
     driver = None  # Инициализируем драйвер
     proxy_index = 0  # Индекс для поиска нового прокси
     
-    while current_page <= total_pages:
-        try:
-            page_url = f"{TARGET_URL}?_paged={current_page}"
-            logger.info(f"[{thread_name}] Parsing page {current_page}/{total_pages}...")
-            
-            # Периодически сохраняем буфер для защиты от потери данных
-            if products_buffer and len(products_buffer) >= CSV_BUFFER_SAVE_SIZE:
-                try:
-                    append_to_csv(TEMP_CSV_FILE, products_buffer)
-                    products_buffer.clear()
-                except Exception as save_error:
-                    logger.warning(f"Error during periodic buffer save: {save_error}")
+    # Число страниц - оценка (кеш или проверка прокси), уточняется по пагинации загруженных страниц;
+    # за оценкой парсинг идет до MAX_EMPTY_PAGES пустых страниц подряд
+    pagination = proxy_manager.pagination
+    if not pagination.estimate():
+        pagination.confirm(total_pages)
+    
+    try:
+        while pagination.should_continue(current_page, empty_pages_count):
+            try:
+                total_pages = pagination.estimate() or total_pages
+                page_url = f"{TARGET_URL}?_paged={current_page}"
+                logger.info(f"[{thread_name}] Parsing page {current_page}/{total_pages}...")
             
-            logger.info(f"Using Selenium for page {current_page}...")
-            soup = None
-            success = False
+                # Периодически сохраняем буфер для защиты от потери данных
+                if products_buffer and len(products_buffer) >= CSV_BUFFER_SAVE_SIZE:
+                    try:
+                        flush_products_buffer()
+                    except Exception as save_error:
+                        logger.warning(f"Error during periodic buffer save: {save_error}")
             
-            if not driver:
-                driver = create_driver(current_proxy)
+                logger.info(f"Using Selenium for page {current_page}...")
+                payload = None
+                success = False
             
-            if driver:
-                try:
-                    wait_for_content = (current_page <= 3)
-                    soup, success = parse_page_with_selenium(
-                        driver, page_url, wait_for_content=wait_for_content
-                    )
-                    if success:
-                        try:
-                            cookies = get_cookies_from_selenium(driver)
-                        except Exception as cookie_error:
-                            if is_tab_crashed_error(cookie_error):
-                                logger.error(f"[TAB CRASH] Tab crash while updating cookies: {cookie_error}")
-                                try:
-                                    driver.quit()
-                                except:
-                                    pass
-                                driver = None
-                                success = False
-                            else:
-                                logger.warning(f"Error updating cookies: {cookie_error}")
-                except Exception as selenium_error:
-                    if is_tab_crashed_error(selenium_error):
-                        logger.error(f"[TAB CRASH] Tab crash while parsing with Selenium, recreating driver...")
-                        try:
-                            driver.quit()
-                        except:
-                            pass
-                        driver = None
-                        success = False
-                    elif is_proxy_error(selenium_error):
-                        logger.warning(f"[PROXY ERROR] Proxy error while parsing: {selenium_error}")
-                        success = False
-                    else:
-                        logger.warning(f"Error parsing with Selenium: {selenium_error}")
-                        success = False
+                if not driver:
+                    driver = create_driver(current_proxy)
             
-            if not success or not soup:
-                logger.warning(f"Failed to load page {current_page}, trying new proxy...")
-                proxy_switches += 1
-                
-                # Ищем новый прокси
-                new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
-                    proxy_manager, proxies_list, None, proxy_index, thread_name,
-                    context=f"after page load failure (page {current_page})",
-                    cached_proxies=cached_working_proxies
-                )
-                
-                if not new_proxy or not new_driver:
-                    logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
-                    time.sleep(10)
-                    continue
-                
-                # Закрываем старый драйвер
+                page_started = time.time()
                 if driver:
                     try:
-                        driver.quit()
-                    except:
-                        pass
-                
-                current_proxy = new_proxy
-                driver = new_driver
-                proxy_index = new_proxy_index
-                cache_proxy(current_proxy)
-                proxy_manager.record_successful_proxy(current_proxy)
-                
-                # Продолжаем с той же страницы
-                continue
-                
-            # Проверяем блокировку
-            if driver:
-                page_source = safe_get_page_source(driver)
-                if not page_source:
-                    logger.error(f"[TAB CRASH] Tab crash while getting page_source for page {current_page}, recreating driver...")
-                    proxy_switches += 1
-                    
-                    new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
-                        proxy_manager, proxies_list, None, proxy_index, thread_name,
-                        context=f"after tab crash (page {current_page})",
-                        cached_proxies=cached_working_proxies
-                    )
-                    
-                    if not new_proxy or not new_driver:
-                        logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
-                        time.sleep(10)
-                        continue
-                    
-                    if driver:
-                        try:
-                            driver.quit()
-                        except:
-                            pass
-                    
-                    current_proxy = new_proxy
-                    driver = new_driver
-                    proxy_index = new_proxy_index
-                    # Отмечаем, что новый прокси только что прошел валидацию
-                    new_proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
-                    proxy_validation_time[new_proxy_key] = time.time()
-                    cache_proxy(current_proxy)
-                    proxy_manager.record_successful_proxy(current_proxy)
-                    continue
-            else:
-                page_source = str(soup) if soup else ""
-            
-            if not page_source:
-                logger.warning(f"Failed to get page {current_page} content")
-                current_page += 1
-                continue
-            
-            block_check = is_page_blocked(soup, page_source)
+                        wait_for_content = (current_page <= 3)
+                        payload, success = extract_page_with_selenium(
+                            driver, page_url, wait_for_content=wait_for_content
+                        )
+                        if success:
+                            try:
+                                cookies = get_cookies_from_selenium(driver)
+                            except Exception as cookie_error:
+                                if is_tab_crashed_error(cookie_error):
+                                    logger.error(f"[TAB CRASH] Tab crash while updating cookies: {cookie_error}")
+                                    health.record_crash()
+                                    try:
+                                        driver.quit()
+                                    except:
+                                        pass
+                                    driver = None
+                                    success = False
+                                else:
+                                    logger.warning(f"Error updating cookies: {cookie_error}")
+                    except Exception as selenium_error:
+                        if is_tab_crashed_error(selenium_error):
+                            logger.error(f"[TAB CRASH] Tab crash while parsing with Selenium, recreating driver...")
+                            health.record_crash()
+                            try:
+                                driver.quit()
+                            except:
+                                pass
+                            driver = None
+                            success = False
+                        elif is_proxy_error(selenium_error):
+                            logger.warning(f"[PROXY ERROR] Proxy error while parsing: {selenium_error}")
+                            success = False
+                        else:
+                            logger.warning(f"Error parsing with Selenium: {selenium_error}")
+                            success = False
             
-            if block_check["blocked"]:
-                # Если прокси только что прошел валидацию и это первые страницы - даем ему несколько попыток
-                is_first_pages = current_page <= 5  # Первые 5 страниц
-                max_retries_for_validated_proxy = 3  # Количество попыток для валидированного прокси (увеличено до 3)
-                validation_timeout = 300  # Прокси считается "недавно валидированным" если валидация была менее 5 минут назад
-                
-                # Используем атрибут функции для хранения счетчика попыток
-                if not hasattr(parse_all_pages_simple, '_proxy_retry_count'):
-                    parse_all_pages_simple._proxy_retry_count = {}
+                if not success or not payload:
+                    logger.warning(f"Failed to load page {current_page}, trying new proxy...")
+                    proxy_manager.report_page_result(current_proxy, OUTCOME_FAILURE)
+                    proxy_switches += 1
                 
-                proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
-                if proxy_key not in parse_all_pages_simple._proxy_retry_count:
-                    parse_all_pages_simple._proxy_retry_count[proxy_key] = 0
+                    # Ищем новый прокси
+                    switch_proxy(f"after page load failure (page {current_page})")
+                    # Продолжаем с той же страницы
+                    continue
                 
-                # Проверяем, был ли прокси недавно валидирован
-                proxy_was_recently_validated = (
-                    proxy_key in proxy_validation_time and 
-                    (time.time() - proxy_validation_time[proxy_key]) < validation_timeout
-                )
+                # Проверяем блокировку (по признакам из payload, без полного page_source)
+                block_check = is_payload_blocked(payload)
+                if block_check["blocked"] and should_record_page(current_page, "blocked"):
+                    record_page_fixture(driver, page_url, current_proxy, "blocked", block_check["reason"] or "blocked", {
+                        'blocked': True, 'block_reason': block_check["reason"],
+                    })
+            
+                if block_check["blocked"]:
+                    # Если прокси только что прошел валидацию и это первые страницы - даем ему несколько попыток
+                    is_first_pages = current_page <= 5  # Первые 5 страниц
+                    max_retries_for_validated_proxy = 3  # Количество попыток для валидированного прокси (увеличено до 3)
+                    validation_timeout = 300  # Прокси считается "недавно валидированным" если валидация была менее 5 минут назад
+                
+                    # Используем атрибут функции для хранения счетчика попыток
+                    if not hasattr(parse_all_pages_simple, '_proxy_retry_count'):
+                        parse_all_pages_simple._proxy_retry_count = {}
+                
+                    proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
+                    if proxy_key not in parse_all_pages_simple._proxy_retry_count:
+                        parse_all_pages_simple._proxy_retry_count[proxy_key] = 0
+                
+                    # Проверяем, был ли прокси недавно валидирован
+                    proxy_was_recently_validated = (
+                        proxy_key in proxy_validation_time and 
+                        (time.time() - proxy_validation_time[proxy_key]) < validation_timeout
+                    )
                 
-                if is_first_pages and proxy_was_recently_validated and parse_all_pages_simple._proxy_retry_count[proxy_key] < max_retries_for_validated_proxy:
-                    parse_all_pages_simple._proxy_retry_count[proxy_key] += 1
-                    logger.warning(f"Page {current_page} blocked: {block_check['reason']}, but proxy was validated recently. Retry {parse_all_pages_simple._proxy_retry_count[proxy_key]}/{max_retries_for_validated_proxy}...")
+                    if is_first_pages and proxy_was_recently_validated and parse_all_pages_simple._proxy_retry_count[proxy_key] < max_retries_for_validated_proxy:
+                        parse_all_pages_simple._proxy_retry_count[proxy_key] += 1
+                        logger.warning(f"Page {current_page} blocked: {block_check['reason']}, but proxy was validated recently. Retry {parse_all_pages_simple._proxy_retry_count[proxy_key]}/{max_retries_for_validated_proxy}...")
+                        throttle.on_block(proxy_key, block_check['reason'])
                     
-                    # Пробуем перезагрузить страницу с ожиданием полной загрузки
-                    if driver:
-                        try:
-                            logger.info(f"Reloading page {current_page} with full content wait...")
-                            time.sleep(3)  # Небольшая пауза перед перезагрузкой
-                            driver.refresh()
-                            time.sleep(5)  # Ожидание после refresh
+                        # Пробуем перезагрузить страницу с ожиданием полной загрузки
+                        if driver:
+                            try:
+                                logger.info(f"Reloading page {current_page} with full content wait...")
+                                time.sleep(3)  # Небольшая пауза перед перезагрузкой
+                                driver.refresh()
+                                time.sleep(5)  # Ожидание после refresh
                             
-                            # Скроллим и ждем загрузки
-                            driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
-                            time.sleep(2)
-                            driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
-                            time.sleep(2)
-                            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                            time.sleep(5)  # Даем время на загрузку товаров
+                                # Скроллим и ждем загрузки
+                                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
+                                time.sleep(2)
+                                driver.execute_script("window.scrollTo(0, document.body.scrollHeight/2);")
+                                time.sleep(2)
+                                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                                time.sleep(5)  # Даем время на загрузку товаров
                             
-                            # Получаем обновленный page_source
-                            page_source = safe_get_page_source(driver)
-                            if page_source:
-                                soup = BeautifulSoup(page_source, 'html.parser')
-                                block_check = is_page_blocked(soup, page_source)
+                                # Получаем обновленный payload страницы
+                                payload = extract_page_payload(driver)
+                                if payload:
+                                    record_page_extraction(payload)
+                                    block_check = is_payload_blocked(payload)
                                 
-                                if not block_check["blocked"]:
-                                    logger.info(f"Page {current_page} loaded successfully after reload!")
-                                    parse_all_pages_simple._proxy_retry_count[proxy_key] = 0  # Сбрасываем счетчик
-                                    # Продолжаем парсинг ниже
+                                    if not block_check["blocked"]:
+                                        logger.info(f"Page {current_page} loaded successfully after reload!")
+                                        parse_all_pages_simple._proxy_retry_count[proxy_key] = 0  # Сбрасываем счетчик
+                                        # Продолжаем парсинг ниже
+                                    else:
+                                        logger.warning(f"Page still blocked after reload: {block_check['reason']}")
+                                        # Продолжаем цикл, попробуем еще раз
+                                        continue
                                 else:
-                                    logger.warning(f"Page still blocked after reload: {block_check['reason']}")
-                                    # Продолжаем цикл, попробуем еще раз
+                                    logger.warning(f"Failed to get page content after reload")
                                     continue
-                            else:
-                                logger.warning(f"Failed to get page_source after reload")
+                            except Exception as reload_error:
+                                logger.warning(f"Error reloading page: {reload_error}")
                                 continue
-                        except Exception as reload_error:
-                            logger.warning(f"Error reloading page: {reload_error}")
+                        else:
+                            # Если нет драйвера, просто пропускаем эту попытку
+                            time.sleep(3)
                             continue
                     else:
-                        # Если нет драйвера, просто пропускаем эту попытку
-                        time.sleep(3)
-                        continue
-                else:
-                    # Исчерпали попытки или это не первые страницы - ищем новый прокси
-                    logger.warning(f"Page {current_page} blocked: {block_check['reason']} → switching proxy")
-                    parse_all_pages_simple._proxy_retry_count[proxy_key] = 0  # Сбрасываем счетчик
-                    protection_blocks += 1
-                    proxy_switches += 1
+                        # Исчерпали попытки или это не первые страницы - ищем новый прокси
+                        logger.warning(f"Page {current_page} blocked: {block_check['reason']} → switching proxy")
+                        parse_all_pages_simple._proxy_retry_count[proxy_key] = 0  # Сбрасываем счетчик
+                        proxy_manager.report_page_result(current_proxy, OUTCOME_BLOCKED)
+                        throttle.on_block(proxy_key, block_check['reason'])
+                        protection_blocks += 1
+                        proxy_switches += 1
                     
-                    new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
-                        proxy_manager, proxies_list, None, proxy_index, thread_name,
-                        context=f"after blocking (page {current_page}, reason: {block_check['reason']})",
-                        cached_proxies=cached_working_proxies
-                    )
-                    
-                    if not new_proxy or not new_driver:
-                        logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
-                        time.sleep(10)
+                        switch_proxy(f"after blocking (page {current_page}, reason: {block_check['reason']})")
                         continue
-                    
-                    if driver:
-                        try:
-                            driver.quit()
-                        except:
-                            pass
-                    
-                    current_proxy = new_proxy
-                    driver = new_driver
-                    proxy_index = new_proxy_index
-                    # Отмечаем, что новый прокси только что прошел валидацию
-                    new_proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
-                    proxy_validation_time[new_proxy_key] = time.time()
-                    cache_proxy(current_proxy)
-                    proxy_manager.record_successful_proxy(current_proxy)
-                    continue
             
-            # Парсим товары
-            products, products_in_stock, total_products_on_page = get_products_from_page_soup(soup)
-            
-            # Проверяем статус страницы
-            page_status = is_page_empty(soup, page_source, products_in_stock, total_products_on_page)
+                # Парсим товары
+                products = payload["products"]
+                products_in_stock = payload["products_in_stock"]
+                total_products_on_page = payload["total_products"]
+                total_pages = pagination.observe_pagination(payload.get("last_page")) or total_pages
+                proxy_manager.report_page_result(current_proxy, OUTCOME_SUCCESS, latency=time.time() - page_started)
+                current_proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
+                throttle.on_success(current_proxy_key)
+            
+                # Проверяем статус страницы
+                page_status = get_payload_page_status(payload)
+                if should_record_page(current_page, page_status["status"]):
+                    record_page_fixture(
+                        driver, page_url, current_proxy, kind_for_status(page_status["status"]),
+                        page_status["reason"] or f"page_{current_page}", {
+                            'blocked': False,
+                            'status': page_status["status"],
+                            'products_in_stock': products_in_stock,
+                            'total_products': total_products_on_page,
+                        }
+                    )
+                if checkpoint:
+                    page_products = products if page_status["status"] == "normal" and products else []
+                    checkpoint.record_page(current_page, page_products, page_status["status"])
             
-            if page_status["status"] == "normal" and products:
-                products_buffer.extend(products)
-                total_products += len(products)
-                empty_pages_count = 0
-                
-                logger.info(f"[{thread_name}] {'='*60}")
-                logger.info(f"[{thread_name}] Page {current_page}: SUCCESS! Added {len(products)} products")
-                logger.info(f"[{thread_name}] Total products collected so far: {total_products}")
-                logger.info(f"[{thread_name}] Products on this page:")
-                for i, product in enumerate(products, 1):
-                    logger.info(f"[{thread_name}]   {i}. {product.get('description', 'N/A')[:80]}... | Art: {product.get('article', 'N/A')} | Manuf: {product.get('manufacturer', 'N/A')} | Price: {product.get('price', 'N/A')}")
-                logger.info(f"[{thread_name}] {'='*60}")
-                
-                if len(products_buffer) >= CSV_BUFFER_FULL_SIZE:
-                    append_to_csv(TEMP_CSV_FILE, products_buffer)
-                    products_buffer.clear()
+                if page_status["status"] == "normal" and products:
+                    products_buffer.extend(products)
+                    total_products += len(products)
+                    empty_pages_count = 0
+                    total_pages = pagination.observe_products(current_page) or total_pages
+                
+                    logger.info(f"[{thread_name}] {'='*60}")
+                    logger.info(f"[{thread_name}] Page {current_page}: SUCCESS! Added {len(products)} products")
+                    logger.info(f"[{thread_name}] Total products collected so far: {total_products}")
+                    logger.info(f"[{thread_name}] Products on this page:")
+                    for i, product in enumerate(products, 1):
+                        logger.info(f"[{thread_name}]   {i}. {product.get('description', 'N/A')[:80]}... | Art: {product.get('article', 'N/A')} | Manuf: {product.get('manufacturer', 'N/A')} | Price: {product.get('price', 'N/A')}")
+                    logger.info(f"[{thread_name}] {'='*60}")
+                
+                    if len(products_buffer) >= CSV_BUFFER_FULL_SIZE:
+                        flush_products_buffer()
                     
-            elif page_status["status"] == "empty":
-                if products_in_stock == 0:
-                    empty_pages_count += 1
-                    logger.warning(f"Page {current_page}: no products IN STOCK (empty in a row: {empty_pages_count})")
+                elif page_status["status"] == "empty":
+                    if products_in_stock == 0:
+                        empty_pages_count += 1
+                        logger.warning(f"Page {current_page}: no products IN STOCK (empty in a row: {empty_pages_count})")
                     
-                    if empty_pages_count >= MAX_EMPTY_PAGES:
-                        logger.info(f"Found {MAX_EMPTY_PAGES} consecutive pages without products IN STOCK. Stopping parsing.")
-                        break
-                else:
-                    empty_pages_count = 0
+                        if empty_pages_count >= MAX_EMPTY_PAGES:
+                            logger.info(f"Found {MAX_EMPTY_PAGES} consecutive pages without products IN STOCK. Stopping parsing.")
+                            break
+                    else:
+                        empty_pages_count = 0
+            
+                pages_checked += 1
+                current_page = advance_page(current_page)
+            
+                # Уведомление о прогрессе каждые N страниц
+                if pages_checked % PROGRESS_NOTIFICATION_INTERVAL == 0:
+                    TelegramNotifier.notify(
+                        f"[Trast] Progress: {pages_checked} pages parsed "
+                        f"(current: {current_page}/{total_pages}), "
+                        f"products: {len(products_buffer)} in buffer, "
+                        f"rate: {throttle.describe(current_proxy_key)}",
+                        key="trast.progress"
+                    )
             
-            pages_checked += 1
-            current_page += 1
+                # Пересоздаем разросшийся по памяти браузер до краша вкладки
+                if driver and health.should_recycle(driver):
+                    driver = health.recycle(driver, current_proxy)
             
-            # Уведомление о прогрессе каждые N страниц
-            if pages_checked % PROGRESS_NOTIFICATION_INTERVAL == 0:
-                TelegramNotifier.notify(
-                    f"[Trast] Progress: {pages_checked} pages parsed "
-                    f"(current: {current_page}/{total_pages}), "
-                    f"products: {len(products_buffer)} in buffer"
+                # Задержка между страницами: адаптивная база + случайная добавка
+                logger.info(f"[{thread_name}] Throttle for {current_proxy_key}: {throttle.describe(current_proxy_key)}")
+                humanized_page_sleep(
+                    current_page,
+                    thread_name=thread_name,
+                    base_delay=throttle.get_delay(current_proxy_key)
                 )
             
-            # Задержка между страницами
-            humanized_page_sleep(current_page, thread_name=thread_name)
-            
-        except Exception as e:
-            if is_tab_crashed_error(e):
-                logger.error(f"[TAB CRASH] Tab crash detected on page {current_page}, recreating driver...")
-                proxy_switches += 1
-                
-                new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
-                    proxy_manager, proxies_list, None, proxy_index, thread_name,
-                    context=f"after tab crash (page {current_page})",
-                    cached_proxies=cached_working_proxies
-                )
+            except Exception as e:
+                if is_tab_crashed_error(e):
+                    logger.error(f"[TAB CRASH] Tab crash detected on page {current_page}, recreating driver...")
+                    health.record_crash()
+                    proxy_switches += 1
                 
-                if not new_proxy or not new_driver:
-                    logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
-                    time.sleep(10)
+                    switch_proxy(f"after tab crash (page {current_page})")
                     continue
+                elif is_proxy_error(e):
+                    logger.warning(f"[PROXY ERROR] Proxy error on page {current_page}: {e}")
+                    proxy_manager.report_page_result(current_proxy, OUTCOME_FAILURE)
+                    proxy_switches += 1
                 
-                if driver:
-                    try:
-                        driver.quit()
-                    except:
-                        pass
-                
-                current_proxy = new_proxy
-                driver = new_driver
-                proxy_index = new_proxy_index
-                # Отмечаем, что новый прокси только что прошел валидацию
-                new_proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
-                proxy_validation_time[new_proxy_key] = time.time()
-                cache_proxy(current_proxy)
-                proxy_manager.record_successful_proxy(current_proxy)
-                continue
-            elif is_proxy_error(e):
-                logger.warning(f"[PROXY ERROR] Proxy error on page {current_page}: {e}")
-                proxy_switches += 1
-                
-                new_proxy, new_driver, proxies_checked, new_proxy_index = find_new_working_proxy(
-                    proxy_manager, proxies_list, None, proxy_index, thread_name,
-                    context=f"after proxy error (page {current_page})",
-                    cached_proxies=cached_working_proxies
-                )
-                
-                if not new_proxy or not new_driver:
-                    logger.warning(f"Failed to find new working proxy after checking {proxies_checked} proxies, will retry on next iteration")
-                    time.sleep(10)
+                    switch_proxy(f"after proxy error (page {current_page})")
+                    continue
+                else:
+                    logger.error(f"Error parsing page {current_page}: {e}")
+                    logger.debug(traceback.format_exc())
+                    if checkpoint:
+                        # Пропуск тоже фиксируется: продолжение не должно дособирать страницу, которой нет в непрерывном запуске
+                        checkpoint.record_page(current_page, [], "error")
+                    current_page = advance_page(current_page)
                     continue
-                
-                if driver:
-                    try:
-                        driver.quit()
-                    except:
-                        pass
-                
-                current_proxy = new_proxy
-                driver = new_driver
-                proxy_index = new_proxy_index
-                # Отмечаем, что новый прокси только что прошел валидацию
-                new_proxy_key = f"{current_proxy['ip']}:{current_proxy['port']}"
-                proxy_validation_time[new_proxy_key] = time.time()
-                cache_proxy(current_proxy)
-                proxy_manager.record_successful_proxy(current_proxy)
-                continue
-            else:
-                logger.error(f"Error parsing page {current_page}: {e}")
-                logger.debug(traceback.format_exc())
-                current_page += 1
-                continue
-    
-    # Записываем оставшиеся товары из буфера
-    if products_buffer:
-        try:
-            append_to_csv(TEMP_CSV_FILE, products_buffer)
-            logger.info(f"Written remaining products from buffer: {len(products_buffer)}")
-            products_buffer.clear()
-        except Exception as buffer_error:
-            logger.error(f"Error writing remaining products: {buffer_error}")
     
-    # Закрываем драйвер
-    if driver:
-        try:
-            driver.quit()
-        except:
-            pass
+        # Записываем оставшиеся товары из буфера
+        if products_buffer or (checkpoint and checkpoint.pending):
+            try:
+                remaining = len(products_buffer)
+                flush_products_buffer()
+                logger.info(f"Written remaining products from buffer: {remaining}")
+            except Exception as buffer_error:
+                logger.error(f"Error writing remaining products: {buffer_error}")
+    finally:
+        # Драйвер и запасные браузеры закрываются и при исключении в цикле
+        if driver:
+            try:
+                driver.quit()
+            except:
+                pass
+        spare_pool.shutdown()
+    spare_pool.log_summary()
+    health.finish()
+    pagination.save()
+    proxy_manager.source_stats.flush()  # Рабочие прокси, найденные во время парсинга
     
     logger.info(f"Parsing completed: collected {total_products} products, checked {pages_checked} pages")
     
@@ -1896,7 +2103,8 @@ def parse_all_pages(
                     f"[Trast] Progress: {pages_checked} pages parsed "
                     f"(current: {current_page}/{total_pages}), "
                     f"products: {len(products_buffer)} in buffer, "
-                    f"total: {total_products}"
+                    f"total: {total_products}",
+                    key="trast.progress"
                 )
             
             # Задержка между страницами
@@ -1943,7 +2151,8 @@ def parse_all_pages(
                                         f"[Trast] Progress: {pages_checked} pages parsed "
                                         f"(current: {current_page}/{total_pages}), "
                                         f"products: {len(products_buffer)} in buffer, "
-                                        f"total: {total_products}"
+                                        f"total: {total_products}",
+                                        key="trast.progress"
                                     )
                                 
                                 humanized_page_sleep(current_page, thread_name=thread_name)
@@ -2011,8 +2220,12 @@ def parse_all_pages(
     }
 
 
-def main():
-    """Главная функция - однопоточный парсинг"""
+def main(resume: bool = False):
+    """Главная функция - однопоточный парсинг
+    
+    Args:
+        resume: Продолжить прерванный запуск по журналу контрольных точек
+    """
     script_name = "trast"
     main_thread_name = "MainThread"
     logger.info("=" * 80)
@@ -2038,11 +2251,22 @@ def main():
     error_message = None
     total_pages = None
     total_products = 0
+    metrics = {}
     
+    checkpoint = CrawlCheckpoint()
     try:
-        # Создаем временный CSV файл
-        create_new_csv(TEMP_CSV_FILE)
-        logger.info(f"[{main_thread_name}] Temporary CSV file created for data writing")
+        resumed = False
+        if resume:
+            resumed = checkpoint.load()
+            if resumed:
+                logger.info(f"[{main_thread_name}] Resuming previous run with existing temporary CSV")
+            else:
+                logger.warning(f"[{main_thread_name}] Nothing to resume, starting a new run")
+        if not resumed:
+            # Создаем временный CSV файл
+            create_new_csv(TEMP_CSV_FILE)
+            checkpoint.start()
+            logger.info(f"[{main_thread_name}] Temporary CSV file created for data writing")
     except Exception as e:
         logger.error(f"[{main_thread_name}] Error creating temporary files: {e}")
         logger.error(traceback.format_exc())
@@ -2062,24 +2286,11 @@ def main():
         TelegramNotifier.notify(f"[Trast] Update failed — <code>{error_message}</code>")
         sys.exit(1)
     
-    # Загружаем прокси синхронно
-    logger.info(f"[{main_thread_name}] Downloading proxies from all sources...")
-    try:
-        if proxy_manager.download_proxies(force_update=True):
-            downloaded_proxies = proxy_manager._load_proxies()
-            logger.info(f"[{main_thread_name}] Loaded {len(downloaded_proxies) if downloaded_proxies else 0} proxies")
-        else:
-            logger.warning(f"[{main_thread_name}] Failed to download proxies, using cached")
-            downloaded_proxies = proxy_manager._load_proxies()
-    except Exception as e:
-        logger.warning(f"[{main_thread_name}] Error downloading proxies: {e}, using cached")
-        downloaded_proxies = proxy_manager._load_proxies()
-    
-    if not downloaded_proxies:
-        logger.error(f"[{main_thread_name}] No proxies available!")
-        error_message = "No proxies available"
-        TelegramNotifier.notify(f"[Trast] Update failed — <code>{error_message}</code>")
-        sys.exit(1)
+    # Загружаем прокси в фоне: проверка начинается, как только ответит первый источник
+    logger.info(f"[{main_thread_name}] Downloading proxies from all sources in background...")
+    downloaded_proxies: List[Dict] = []
+    proxies_lock = threading.Lock()
+    harvest_done = start_proxy_harvest(proxy_manager, downloaded_proxies, proxies_lock)
     
     # Ищем рабочий прокси и получаем количество страниц
     logger.info(f"[{main_thread_name}] Searching for working proxy...")
@@ -2097,6 +2308,9 @@ def main():
         if not proxy:
             return False
         proxy_key = f"{proxy.get('ip')}:{proxy.get('port')}"
+        if source != "priority" and proxy_manager.is_proxy_in_cooldown(proxy):
+            logger.debug(f"[{main_thread_name}] Skipping {source} proxy {proxy_key}: in cooldown")
+            return False
         logger.info(f"[{main_thread_name}] Checking {source} proxy {proxy_key} ({proxy.get('protocol', 'http').upper()})...")
         try:
             trast_ok, trast_info = proxy_manager.validate_proxy_for_trast(proxy)
@@ -2127,6 +2341,8 @@ def main():
                 elif trast_info.get('total_pages', 0) <= 0:
                     reason = f"invalid page count: {trast_info.get('total_pages')}"
                 logger.debug(f"[{main_thread_name}] Proxy {proxy_key} from {source} not working ({reason})")
+                if source != "priority":
+                    proxy_manager.remove_failed_proxy(proxy, reason=trast_info.get('reason'))
         except Exception as e:
             error_type = type(e).__name__
             logger.debug(f"[{main_thread_name}] Error checking proxy {proxy_key} from {source}: {error_type}: {str(e)[:150]}")
@@ -2142,7 +2358,7 @@ def main():
     
     # Затем пробуем кэшированные успешные прокси
     if not current_proxy:
-        cached_successful = proxy_manager.successful_proxies.copy()
+        cached_successful = proxy_manager.rank_proxies(proxy_manager.successful_proxies)
         if cached_successful:
             logger.info(f"[{main_thread_name}] Trying {len(cached_successful)} cached successful proxies before full scan...")
             for proxy in cached_successful:
@@ -2150,6 +2366,19 @@ def main():
                     break
     
     if not current_proxy:
+        # Ждем первых кандидатов от источников
+        while not downloaded_proxies and not harvest_done.is_set():
+            harvest_done.wait(timeout=1)
+        if not downloaded_proxies:
+            logger.warning(f"[{main_thread_name}] Failed to download proxies, using cached")
+            with proxies_lock:
+                downloaded_proxies.extend(proxy_manager._load_proxies())
+        if not downloaded_proxies:
+            logger.error(f"[{main_thread_name}] No proxies available!")
+            error_message = "No proxies available"
+            TelegramNotifier.notify(f"[Trast] Update failed — <code>{error_message}</code>")
+            sys.exit(1)
+        
         while True:
             elapsed = time.time() - search_start_time
             if elapsed >= max_search_time:
@@ -2162,6 +2391,11 @@ def main():
                 )
                 search_start_time = time.time()
             
+            if proxy_index >= len(downloaded_proxies) and not harvest_done.is_set():
+                # Источники еще загружаются - ждем следующую порцию кандидатов
+                harvest_done.wait(timeout=1)
+                continue
+            
             if proxy_index >= len(downloaded_proxies):
                 passes_without_refresh += 1
                 logger.debug(f"[{main_thread_name}] Reached end of proxy list (passes without refresh: {passes_without_refresh})")
@@ -2174,15 +2408,19 @@ def main():
                 if should_refresh:
                     logger.info(f"[{main_thread_name}] Refreshing proxy list after {passes_without_refresh} passes...")
                     try:
-                        if proxy_manager.download_proxies(force_update=True):
-                            downloaded_proxies = proxy_manager._load_proxies() or downloaded_proxies
+                        if proxy_manager.download_proxies():
+                            refreshed = proxy_manager._load_proxies()
+                            if refreshed:
+                                with proxies_lock:
+                                    downloaded_proxies[:] = refreshed
                             last_proxy_refresh = time.time()
                             passes_without_refresh = 0
                             logger.info(f"[{main_thread_name}] Proxy list refreshed ({len(downloaded_proxies)} entries)")
                     except Exception as refresh_error:
                         logger.warning(f"[{main_thread_name}] Failed to refresh proxies: {refresh_error}")
                 else:
-                    random.shuffle(downloaded_proxies)
+                    with proxies_lock:
+                        random.shuffle(downloaded_proxies)
                     logger.debug(f"[{main_thread_name}] Proxy list reshuffled (waiting {PROXY_LIST_WAIT_DELAY}s)...")
                     time.sleep(PROXY_LIST_WAIT_DELAY)
                 
@@ -2191,6 +2429,8 @@ def main():
             
             proxy = downloaded_proxies[proxy_index]
             proxy_index += 1
+            if proxy_manager.is_proxy_in_cooldown(proxy):
+                continue
             proxy_key = f"{proxy['ip']}:{proxy['port']}"
             elapsed_search = int(time.time() - search_start_time)
             remaining = len(downloaded_proxies) - proxy_index
@@ -2204,7 +2444,8 @@ def main():
                 TelegramNotifier.notify(
                     f"[Trast] Proxy search progress: {proxy_index} proxies checked "
                     f"({elapsed_minutes}m {elapsed_seconds}s elapsed), "
-                    f"{remaining} remaining"
+                    f"{remaining} remaining",
+                    key="trast.proxy_search"
                 )
             
             if try_candidate_proxy(proxy, "downloaded"):
@@ -2216,15 +2457,20 @@ def main():
         TelegramNotifier.notify(f"[Trast] Update failed — <code>{error_message}</code>")
         sys.exit(1)
     
-    # Запускаем последовательный парсинг
+    # Запускаем последовательный парсинг (сначала через Store API, при ошибке - HTML)
     logger.info(f"[{main_thread_name}] Starting sequential parsing...")
     try:
-        total_products, metrics = parse_all_pages_simple(
-            proxy_manager=proxy_manager,
-            total_pages=total_pages,
-            initial_proxy=current_proxy,
-            proxies_list=downloaded_proxies
-        )
+        store_api_result = crawl_via_store_api(current_proxy, checkpoint)
+        if store_api_result:
+            total_products, metrics = store_api_result
+        else:
+            total_products, metrics = parse_all_pages_simple(
+                proxy_manager=proxy_manager,
+                total_pages=total_pages,
+                initial_proxy=current_proxy,
+                proxies_list=downloaded_proxies,
+                checkpoint=checkpoint
+            )
     except Exception as e:
         logger.error(f"[{main_thread_name}] Error during parsing: {e}")
         logger.error(traceback.format_exc())
@@ -2232,6 +2478,26 @@ def main():
     
     # Финализация
     duration = (datetime.now() - start_time).total_seconds()
+    total_pages = proxy_manager.pagination.estimate() or total_pages
+    if PAGE_READINESS_STATS['pages']:
+        logger.info(
+            f"[{main_thread_name}] Page readiness: {PAGE_READINESS_STATS['pages']} pages, "
+            f"avg wait {PAGE_READINESS_STATS['waited'] / PAGE_READINESS_STATS['pages']:.1f}s, "
+            f"saved {PAGE_READINESS_STATS['saved']:.0f}s vs fixed waits"
+        )
+    if PAGE_TRANSFER_STATS['pages']:
+        logger.info(
+            f"[{main_thread_name}] Page transfer (resource blocking {'on' if RESOURCE_BLOCKING else 'off'}): "
+            f"avg {PAGE_TRANSFER_STATS['bytes'] / PAGE_TRANSFER_STATS['pages'] / 1024:.0f} KB and "
+            f"{PAGE_TRANSFER_STATS['load_time'] / PAGE_TRANSFER_STATS['pages']:.1f}s load per page"
+        )
+    if PAGE_EXTRACTION_STATS['pages']:
+        logger.info(
+            f"[{main_thread_name}] Page extraction ({PAGE_EXTRACTION_MODE}): {PAGE_EXTRACTION_STATS['pages']} pages, "
+            f"avg {PAGE_EXTRACTION_STATS['bytes'] / PAGE_EXTRACTION_STATS['pages'] / 1024:.1f} KB and "
+            f"{PAGE_EXTRACTION_STATS['cpu'] / PAGE_EXTRACTION_STATS['pages'] * 1000:.0f} ms CPU per page, "
+            f"{PAGE_EXTRACTION_STATS['fallbacks']} page_source fallbacks"
+        )
     
     # Подсчитываем количество товаров из CSV файла
     if total_products == 0:
@@ -2249,20 +2515,24 @@ def main():
         if os.path.exists(TEMP_CSV_FILE) and os.path.getsize(TEMP_CSV_FILE) > 0:
             file_size = os.path.getsize(TEMP_CSV_FILE)
             logger.info(f"[{main_thread_name}] Found data to save (file size: {file_size} bytes)")
-            finalize_output_files()
+            checkpoint.reorder_csv_if_needed()
+            # После ошибки парсинга временный CSV и журнал остаются для --resume
+            finalize_output_files(keep_temp=error_message is not None)
             logger.info(f"[{main_thread_name}] Data saved successfully")
             status = 'done' if total_products >= 100 else 'insufficient_data'
-        else:
+        elif error_message is None:
             logger.warning(f"[{main_thread_name}] No data to save")
             cleanup_temp_files()
             status = 'insufficient_data'
+        else:
+            logger.warning(f"[{main_thread_name}] No data to save, checkpoint journal kept for --resume")
+            status = 'insufficient_data'
     except Exception as save_error:
         logger.error(f"[{main_thread_name}] Error saving data: {save_error}")
         error_message = error_message or str(save_error)
         status = 'error'
-        # При ошибке сохранения удаляем только временные файлы, основной файл не трогаем
-        cleanup_temp_files()
-        logger.info(f"[{main_thread_name}] Temporary files cleaned up, main file unchanged")
+        # Основной файл не трогаем; временный CSV и журнал остаются для --resume
+        logger.info(f"[{main_thread_name}] Main file unchanged, run can be continued with --resume")
     
     # Формируем метрики для уведомления
     metrics_suffix = ""
@@ -2280,7 +2550,8 @@ def main():
     
     # Записываем окончание скрипта в БД
     try:
-        set_script_end(script_name, status=status)
+        # Запросы страниц каталога (HTML или Store API) - для истории запусков в боте
+        set_script_end(script_name, status=status, items=total_products, api_calls=metrics.get("pages_checked"))
     except Exception as db_end_error:
         logger.warning(f"[{main_thread_name}] Error saving script end to database: {db_end_error}")
     
@@ -2294,16 +2565,26 @@ def main():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    arg_parser = argparse.ArgumentParser(description="Парсер trast-zapchast.ru")
+    arg_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="продолжить прерванный запуск с временного CSV по журналу контрольных точек"
+    )
+    args = arg_parser.parse_args()
+    
     try:
-        main()
+        main(resume=args.resume)
     except KeyboardInterrupt:
         logger.warning("Parsing interrupted by user (Ctrl+C)")
         # Сохраняем то, что уже собрано
         try:
             if os.path.exists(TEMP_CSV_FILE) and os.path.getsize(TEMP_CSV_FILE) > 0:
                 logger.info("Saving collected data...")
-                finalize_output_files()
-                logger.info("Data saved successfully")
+                finalize_output_files(keep_temp=True)
+                logger.info("Data saved successfully, run can be continued with --resume")
                 TelegramNotifier.notify("[Trast] Update interrupted by user — Data saved")
             else:
                 TelegramNotifier.notify("[Trast] Update interrupted by user — No data to save")
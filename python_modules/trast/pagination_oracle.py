@@ -0,0 +1,128 @@
+"""
+Оракул пагинации каталога trast.
+
+Хранит последнее известное число страниц с отметкой времени в PAGINATION_CACHE_FILE.
+Пока кеш свежий, проверка прокси не запускает полный get_pages_count_with_driver
+(ожидания, прокрутка, запасные селекторы): число страниц берется из уже
+загруженного HTML, а если пагинация еще не отрисована - из кеша. Парсинг
+стартует сразу с этой оценкой и уточняет ее по ходу: номер последней страницы
+из пагинации каждой загруженной страницы и страницы с товарами за пределами
+оценки увеличивают ее. За оценкой парсинг продолжается до MAX_EMPTY_PAGES
+пустых страниц подряд (но не дальше PAGINATION_MAX_OVERSHOOT страниц).
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional
+from loguru import logger
+
+from config import (
+    PAGINATION_CACHE_FILE,
+    PAGINATION_CACHE_MAX_AGE,
+    PAGINATION_MAX_OVERSHOOT,
+    MAX_EMPTY_PAGES,
+)
+
+SOURCE_CACHE = "cache"  # Значение из кеша прошлого запуска
+SOURCE_VALIDATION = "validation"  # Определено при проверке прокси (get_pages_count_*)
+SOURCE_PAGINATION = "pagination"  # Номер последней страницы в пагинации загруженной страницы
+SOURCE_CRAWL = "crawl"  # Товары найдены на странице за пределами оценки
+
+
+class PaginationOracle:
+    """Последнее известное число страниц каталога: кеш на диске и уточнения по ходу парсинга"""
+
+    def __init__(self, cache_file: str = PAGINATION_CACHE_FILE, max_age: float = PAGINATION_CACHE_MAX_AGE):
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.total_pages: Optional[int] = None
+        self.source: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            age = time.time() - float(data.get('updated_at', 0))
+            if age > self.max_age:
+                logger.info(f"Cached page count {data.get('total_pages')} is {age / 3600:.0f}h old, ignoring")
+                return
+            if int(data.get('total_pages') or 0) > 0:
+                self.total_pages = int(data['total_pages'])
+                self.source = SOURCE_CACHE
+                self.updated_at = float(data['updated_at'])
+                logger.info(
+                    f"Cached page count: {self.total_pages} "
+                    f"({age / 3600:.1f}h old, from {data.get('source', 'unknown')})"
+                )
+        except Exception as e:
+            logger.warning(f"Failed to load pagination cache: {e}")
+
+    def save(self):
+        """Сохраняет текущую оценку в PAGINATION_CACHE_FILE"""
+        with self.lock:
+            if not self.total_pages or self.source == SOURCE_CACHE:
+                return
+            snapshot = {'total_pages': self.total_pages, 'source': self.source, 'updated_at': self.updated_at}
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Failed to save pagination cache: {e}")
+
+    def estimate(self) -> Optional[int]:
+        """Текущая оценка числа страниц (None, если ее нет)"""
+        with self.lock:
+            return self.total_pages
+
+    def _update(self, total_pages: int, source: str, allow_decrease: bool) -> int:
+        with self.lock:
+            previous = self.total_pages
+            previous_source = self.source
+            if previous and total_pages < previous and not allow_decrease:
+                return previous
+            self.total_pages = total_pages
+            self.source = source
+            self.updated_at = time.time()
+        if previous != total_pages:
+            logger.info(f"Page count {previous or 'unknown'} → {total_pages} ({source})")
+            self.save()
+        elif previous_source == SOURCE_CACHE:
+            self.save()  # Значение из кеша подтверждено в этом запуске - обновляем его возраст
+        return total_pages
+
+    def confirm(self, total_pages: Optional[int]) -> Optional[int]:
+        """Число страниц, определенное при проверке прокси (заменяет оценку)"""
+        if not total_pages or total_pages <= 0:
+            return self.estimate()
+        return self._update(total_pages, SOURCE_VALIDATION, allow_decrease=True)
+
+    def observe_pagination(self, last_page: Optional[int]) -> Optional[int]:
+        """Номер последней страницы из пагинации загруженной страницы (только увеличивает оценку)"""
+        if not last_page or last_page <= 0:
+            return self.estimate()
+        return self._update(last_page, SOURCE_PAGINATION, allow_decrease=False)
+
+    def observe_products(self, page: int) -> Optional[int]:
+        """Страница с товарами: если она за пределами оценки, оценка растет до нее"""
+        estimate = self.estimate()
+        if estimate and page <= estimate:
+            return estimate
+        return self._update(page, SOURCE_CRAWL, allow_decrease=False)
+
+    def should_continue(self, page: int, empty_pages: int) -> bool:
+        """
+        Нужно ли парсить страницу page: в пределах оценки - всегда, за ней - пока
+        не встретилось MAX_EMPTY_PAGES пустых подряд и не исчерпан запас PAGINATION_MAX_OVERSHOOT.
+        """
+        estimate = self.estimate() or 0
+        if page <= estimate:
+            return True
+        return empty_pages < MAX_EMPTY_PAGES and page <= estimate + PAGINATION_MAX_OVERSHOOT
@@ -0,0 +1,716 @@
+"""
+Локальный симулятор прокси-фермы и сайта trast для офлайн-сравнения алгоритмов
+поиска, выбора прокси и ограничения скорости.
+
+Три части:
+- FakeProxy: HTTP/SOCKS4/SOCKS5-прокси на localhost с настраиваемой задержкой,
+  обрывами соединения, зависаниями и "мертвыми" портами. Каждый прокси выходит к
+  сайту со своего адреса 127.0.x.y, поэтому сайт различает прокси по IP, как настоящий.
+- FakeCatalogSite: каталог с разметкой trast-zapchast.ru (карточки product-plate,
+  пагинация FacetWP), тот же каталог в JSON WooCommerce Store API
+  (/wp-json/wc/store/products), JS challenge с cookie, страницы 403 и лимит
+  запросов на IP.
+- Харнесс: для каждого варианта (набор переменных окружения TRAST_*) в отдельном
+  процессе запускает ProxyManager.get_working_proxies и короткий парсинг
+  parse_all_pages_simple против фермы и выводит прокси в минуту, страницы в час
+  и долю блокировок.
+
+Вариант запускается в отдельном процессе, потому что config читает переменные
+окружения при импорте. Кеш прокси, логи и CSV варианта пишутся во временный каталог.
+Режим Store API по умолчанию выключен (сравниваются алгоритмы HTML-парсинга);
+вариант с TRAST_STORE_API=1 сначала обходит каталог через JSON.
+Нужен установленный Firefox (используется тот же create_driver, что и в работе).
+
+Использование:
+    python proxy_farm_sim.py --mix good:4,slow:4,flaky:6,timeout:4,dead:10,blocked:4,burned:4 --pages 15 \\
+        --variant thompson TRAST_PROXY_SELECTION_POLICY=thompson \\
+        --variant random TRAST_PROXY_SELECTION_POLICY=random --output sim_results.json
+    python proxy_farm_sim.py --mix good:4,challenge:2 --pages 40 \\
+        --variant html TRAST_STORE_API=0 --variant store_api TRAST_STORE_API=1
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import random
+import select
+import shutil
+import socket
+import struct
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import socketserver
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+from loguru import logger
+
+# Поведение прокси; незаданные параметры берутся из DEFAULT_PROFILE
+PROFILES = {
+    "good": {"latency": 0.05},
+    "slow": {"latency": 1.5, "jitter": 1.0},
+    "flaky": {"latency": 0.2, "failure_rate": 0.3},
+    "timeout": {"timeout_rate": 1.0},
+    "dead": {"dead": True},
+    "blocked": {"block_rate": 1.0},
+    "challenge": {"challenge_rate": 1.0},
+    "burned": {"block_after": 8},
+}
+DEFAULT_PROFILE = {
+    "latency": 0.1,  # Задержка установки соединения и первого ответа (секунды)
+    "jitter": 0.1,  # Случайная добавка к задержке (секунды)
+    "failure_rate": 0.0,  # Доля соединений, обрываемых сразу
+    "timeout_rate": 0.0,  # Доля соединений, которые принимаются и зависают
+    "dead": False,  # Порт закрыт (connection refused)
+    "block_rate": 0.0,  # Доля страниц каталога, на которые сайт отвечает 403 для этого IP
+    "challenge_rate": 0.1,  # Доля первых заходов без cookie, получающих JS challenge
+    "block_after": 0,  # Сайт банит IP после стольких страниц каталога (0 - не банит)
+}
+PROTOCOLS = ("http", "socks5", "socks4")
+PROXY_HANG_SECONDS = 120
+SITE_RATE_LIMIT = 20  # Страниц каталога в минуту с одного IP до бана
+SITE_BAN_SECONDS = 120
+PRODUCTS_PER_PAGE = 16
+OUT_OF_STOCK_EVERY = 5  # Каждая N-я карточка на обычной странице - "Под заказ"
+CHALLENGE_DELAY_MS = 1500
+CLEARANCE_SECRET = b"trast-sim"
+
+
+def parse_mix(mix: str) -> List[str]:
+    """'good:4,dead:10' -> список имен профилей по одному на прокси"""
+    profiles = []
+    for part in mix.split(","):
+        name, _, count = part.strip().partition(":")
+        if name not in PROFILES:
+            raise ValueError(f"Unknown proxy profile: {name} (known: {', '.join(PROFILES)})")
+        profiles.extend([name] * int(count or 1))
+    return profiles
+
+
+# ---------------------------------------------------------------------------
+# Сайт
+# ---------------------------------------------------------------------------
+
+def _clearance_token(ip: str) -> str:
+    return hmac.new(CLEARANCE_SECRET, ip.encode(), hashlib.sha1).hexdigest()[:16]
+
+
+class FakeCatalogSite:
+    """Каталог с разметкой trast-zapchast.ru, challenge-страницами и блокировками по IP"""
+
+    def __init__(self, total_pages: int, profiles_by_ip: Dict[str, Dict], seed: int = 0,
+                 rate_limit: int = SITE_RATE_LIMIT, ban_seconds: int = SITE_BAN_SECONDS):
+        self.total_pages = total_pages
+        self.profiles_by_ip = profiles_by_ip
+        self.rng = random.Random(seed)
+        self.rate_limit = rate_limit
+        self.ban_seconds = ban_seconds
+        self.lock = threading.Lock()
+        self.recent_requests: Dict[str, deque] = defaultdict(deque)
+        self.banned_until: Dict[str, float] = {}
+        self.pages_served: Dict[str, int] = defaultdict(int)
+        self.stats = defaultdict(int)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/shop/"
+
+    @property
+    def ip_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/ip"
+
+    @property
+    def expected_products(self) -> int:
+        """Сколько товаров в наличии должен собрать полный парсинг"""
+        return sum(
+            1 for page in range(1, self.total_pages + 1) for index in range(PRODUCTS_PER_PAGE)
+            if self._in_stock(page, index)
+        )
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="FakeSite").start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _in_stock(self, page: int, index: int) -> bool:
+        return page <= self.total_pages and (page * PRODUCTS_PER_PAGE + index) % OUT_OF_STOCK_EVERY != 0
+
+    def decide(self, ip: str, cookies: str) -> str:
+        """Ответ на запрос страницы каталога: ok / challenge / blocked / rate_limited"""
+        profile = self.profiles_by_ip.get(ip, DEFAULT_PROFILE)
+        now = time.time()
+        with self.lock:
+            self.stats['catalog_requests'] += 1
+            if self.banned_until.get(ip, 0) > now:
+                outcome = "rate_limited"
+            else:
+                window = self.recent_requests[ip]
+                window.append(now)
+                while window and window[0] < now - 60:
+                    window.popleft()
+                if self.rate_limit and len(window) > self.rate_limit:
+                    self.banned_until[ip] = now + self.ban_seconds
+                    outcome = "rate_limited"
+                elif profile["block_after"] and self.pages_served[ip] >= profile["block_after"]:
+                    outcome = "blocked"
+                elif self.rng.random() < profile["block_rate"]:
+                    outcome = "blocked"
+                elif f"sim_clearance={_clearance_token(ip)}" not in cookies and self.rng.random() < profile["challenge_rate"]:
+                    outcome = "challenge"
+                else:
+                    outcome = "ok"
+                    self.pages_served[ip] += 1
+            self.stats[outcome] += 1
+        return outcome
+
+    def render_store_products(self, page: int, per_page: int) -> Tuple[str, int, int]:
+        """Страница каталога в формате WooCommerce Store API: (JSON, всего товаров, всего страниц)"""
+        total = self.total_pages * PRODUCTS_PER_PAGE
+        items = []
+        for position in range((page - 1) * per_page, min(page * per_page, total)):
+            catalog_page, index = position // PRODUCTS_PER_PAGE + 1, position % PRODUCTS_PER_PAGE
+            number = catalog_page * PRODUCTS_PER_PAGE + index
+            in_stock = self._in_stock(catalog_page, index)
+            price = 1000 + number % 9000
+            items.append({
+                "id": number,
+                "name": f"Фильтр масляный SIM-{number}",
+                "sku": "",
+                "permalink": f"/product/sim-{number}/",
+                "prices": {"price": str(price * 100), "currency_code": "RUB", "currency_minor_unit": 2},
+                "price_html": f'<span class="woocommerce-Price-amount amount">{price}&nbsp;₽</span>',
+                "is_in_stock": True,  # В WooCommerce товар под заказ тоже is_in_stock
+                "stock_availability": (
+                    {"text": "В наличии", "class": "in-stock"} if in_stock
+                    else {"text": "Под заказ", "class": "available-on-backorder"}
+                ),
+                "attributes": [
+                    {"name": "Артикул", "terms": [{"name": f"SIM-{number:06d}"}]},
+                    {"name": "Производитель", "terms": [{"name": "Simparts"}]},
+                ],
+            })
+        return json.dumps(items, ensure_ascii=False), total, -(-total // per_page)
+
+    def render_catalog(self, page: int) -> str:
+        cards = []
+        for index in range(PRODUCTS_PER_PAGE):
+            number = page * PRODUCTS_PER_PAGE + index
+            if self._in_stock(page, index):
+                badge = '<div class="product-badge product-stock instock">В наличии</div>'
+            else:
+                badge = '<div class="product-badge product-stock onbackorder">Под заказ</div>'
+            cards.append(
+                f'<div class="product product-plate">{badge}'
+                f'<a class="product-title" href="/product/sim-{number}/">Фильтр масляный SIM-{number}</a>'
+                f'<div class="product-attributes">'
+                f'<div class="item"><span class="name">Артикул</span><span class="value">SIM-{number:06d}</span></div>'
+                f'<div class="item"><span class="name">Производитель</span><span class="value">Simparts</span></div>'
+                f'</div><div class="product-price"><span class="woocommerce-Price-amount amount">'
+                f'{1000 + number % 9000}&nbsp;₽</span></div></div>'
+            )
+        last = max(self.total_pages, 1)
+        pages = sorted({1, max(1, page - 1), page, min(last, page + 1), last})
+        pager = "".join(
+            f'<a class="facetwp-page{" active" if number == page else ""}{" last" if number == last else ""}" '
+            f'data-page="{number}">{number}</a>'
+            for number in pages
+        )
+        return (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Каталог запчастей</title>"
+            "<script>window.FWP_JSON = {};</script></head><body>"
+            "<header class='site-header'><nav class='main-navigation'><a href='/shop/'>Каталог</a></nav></header>"
+            "<div class='shop-container'><div class='products products-grid'>" + "".join(cards) + "</div>"
+            "<div class='facetwp-pager'>" + pager + "</div></div>"
+            "<footer class='site-footer'>Симулятор каталога</footer></body></html>"
+        )
+
+    @staticmethod
+    def render_challenge(ip: str) -> str:
+        return (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Just a moment...</title></head><body>"
+            "<h1>Checking your browser before accessing the site</h1>"
+            "<script>setTimeout(function () {"
+            f"document.cookie = 'sim_clearance={_clearance_token(ip)}; path=/'; location.reload();"
+            f"}}, {CHALLENGE_DELAY_MS});</script></body></html>"
+        )
+
+    @staticmethod
+    def render_blocked() -> str:
+        return (
+            "<html><head><title>403 Forbidden</title></head><body>"
+            "<center><h1>403 Forbidden</h1></center><hr><center>nginx</center></body></html>"
+        )
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)  # Через HTTP-прокси путь может прийти в абсолютной форме
+                ip = self.client_address[0]
+                if parts.path == "/ip":
+                    self._send(200, ip, "text/plain")
+                elif parts.path.startswith("/shop") or parts.path.rstrip("/") == "/wp-json/wc/store/products":
+                    outcome = site.decide(ip, self.headers.get("Cookie", ""))
+                    query = parse_qs(parts.query)
+                    if outcome == "ok" and parts.path.startswith("/wp-json"):
+                        page = int(query.get("page", ["1"])[0] or 1)
+                        per_page = min(int(query.get("per_page", ["10"])[0] or 10), 100)
+                        body, total, total_pages = site.render_store_products(page, per_page)
+                        self._send(200, body, "application/json; charset=utf-8",
+                                   {"X-WP-Total": str(total), "X-WP-TotalPages": str(total_pages)})
+                    elif outcome == "ok":
+                        page = int(query.get("_paged", ["1"])[0] or 1)
+                        self._send(200, site.render_catalog(page))
+                    elif outcome == "challenge":
+                        self._send(503, site.render_challenge(ip))
+                    else:
+                        self._send(403, site.render_blocked())
+                elif parts.path == "/robots.txt":
+                    self._send(200, "User-agent: *\nDisallow:\n", "text/plain")
+                else:
+                    self._send(404, "not found", "text/plain")
+
+            def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8",
+                      headers: Optional[Dict[str, str]] = None):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# ---------------------------------------------------------------------------
+# Прокси
+# ---------------------------------------------------------------------------
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed connection")
+        data += chunk
+    return data
+
+
+def _recv_until(sock: socket.socket, marker: bytes, limit: int = 65536) -> bytes:
+    data = b""
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("client closed connection")
+        data += chunk
+        if len(data) > limit:
+            raise ConnectionError("request too large")
+    return data
+
+
+class FakeProxy:
+    """Прокси на 127.0.0.1 с поведением из профиля; к сайту выходит с адреса egress_ip"""
+
+    def __init__(self, index: int, protocol: str, profile_name: str, allowed_port: int, seed: int = 0):
+        self.index = index
+        self.protocol = protocol
+        self.profile_name = profile_name
+        self.profile = dict(DEFAULT_PROFILE, **PROFILES[profile_name])
+        self.allowed_port = allowed_port
+        self.egress_ip = f"127.0.{index // 250 + 1}.{index % 250 + 2}"
+        self.rng = random.Random(seed * 1000 + index)
+        self.lock = threading.Lock()
+        self.stats = defaultdict(int)
+        self.server = None
+        if self.profile["dead"]:
+            # Занимаем и сразу освобождаем порт: подключение к нему будет отклонено
+            probe = socket.socket()
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+            probe.close()
+        else:
+            self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._handler_class())
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]
+
+    def as_candidate(self, country: str) -> Dict:
+        return {
+            'ip': "127.0.0.1", 'port': str(self.port), 'protocol': self.protocol,
+            'country': country, 'source': 'simulated', 'sim_profile': self.profile_name,
+        }
+
+    def start(self):
+        if self.server:
+            threading.Thread(target=self.server.serve_forever, daemon=True, name=f"FakeProxy-{self.index}").start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.rng.random() < rate
+
+    def _delay(self) -> float:
+        with self.lock:
+            return self.profile["latency"] + self.profile["jitter"] * self.rng.random()
+
+    def _connect_upstream(self, host: str, port: int) -> Optional[socket.socket]:
+        if host not in ("127.0.0.1", "localhost") or port != self.allowed_port:
+            self._count('refused_targets')
+            return None
+        time.sleep(self._delay())
+        try:
+            return socket.create_connection(("127.0.0.1", port), timeout=30, source_address=(self.egress_ip, 0))
+        except OSError:
+            # Другие адреса 127/8 доступны не везде: тогда сайт не различает прокси по IP
+            return socket.create_connection(("127.0.0.1", port), timeout=30)
+
+    def _relay(self, client: socket.socket, upstream: socket.socket):
+        first_response = True
+        sockets = [client, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 60)
+                if not readable:
+                    return
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    if sock is upstream and first_response:
+                        time.sleep(self._delay())
+                        first_response = False
+                    (upstream if sock is client else client).sendall(data)
+        except OSError:
+            return
+        finally:
+            upstream.close()
+
+    def _serve_http(self, client: socket.socket):
+        head = _recv_until(client, b"\r\n\r\n")
+        header_block, _, rest = head.partition(b"\r\n\r\n")
+        lines = header_block.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+            upstream = self._connect_upstream(host, int(port))
+            if not upstream:
+                client.sendall(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+                return
+            client.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            self._relay(client, upstream)
+            return
+        parts = urlsplit(target)
+        upstream = self._connect_upstream(parts.hostname or "", parts.port or 80)
+        if not upstream:
+            client.sendall(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+            return
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = [
+            line for line in lines[1:]
+            if not line.lower().startswith(("connection:", "proxy-connection:", "keep-alive:"))
+        ]
+        request = "\r\n".join([f"{method} {path} {version}"] + headers + ["Connection: close", "", ""])
+        upstream.sendall(request.encode("latin-1") + rest)
+        self._relay(client, upstream)
+
+    def _serve_socks5(self, client: socket.socket):
+        _, methods_count = _recv_exact(client, 2)
+        _recv_exact(client, methods_count)
+        client.sendall(b"\x05\x00")
+        _, command, _, address_type = _recv_exact(client, 4)
+        if address_type == 1:
+            host = socket.inet_ntoa(_recv_exact(client, 4))
+        elif address_type == 3:
+            host = _recv_exact(client, _recv_exact(client, 1)[0]).decode()
+        else:
+            host = socket.inet_ntop(socket.AF_INET6, _recv_exact(client, 16))
+        port = struct.unpack(">H", _recv_exact(client, 2))[0]
+        upstream = self._connect_upstream(host, port) if command == 1 else None
+        if not upstream:
+            client.sendall(b"\x05\x02\x00\x01" + b"\x00" * 6)
+            return
+        client.sendall(b"\x05\x00\x00\x01" + b"\x00" * 6)
+        self._relay(client, upstream)
+
+    def _serve_socks4(self, client: socket.socket):
+        _, command = _recv_exact(client, 2)
+        port = struct.unpack(">H", _recv_exact(client, 2))[0]
+        raw_ip = _recv_exact(client, 4)
+        _recv_until(client, b"\x00", limit=512)  # user id
+        if raw_ip[:3] == b"\x00\x00\x00" and raw_ip[3] != 0:
+            host = _recv_until(client, b"\x00", limit=512)[:-1].decode()  # SOCKS4a: имя хоста
+        else:
+            host = socket.inet_ntoa(raw_ip)
+        upstream = self._connect_upstream(host, port) if command == 1 else None
+        if not upstream:
+            client.sendall(b"\x00\x5b" + b"\x00" * 6)
+            return
+        client.sendall(b"\x00\x5a" + b"\x00" * 6)
+        self._relay(client, upstream)
+
+    def _handler_class(self):
+        proxy = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                client = self.request
+                proxy._count('connections')
+                if proxy._roll(proxy.profile["failure_rate"]):
+                    proxy._count('dropped')
+                    client.close()
+                    return
+                if proxy._roll(proxy.profile["timeout_rate"]):
+                    proxy._count('hung')
+                    time.sleep(PROXY_HANG_SECONDS)
+                    client.close()
+                    return
+                try:
+                    if proxy.protocol == "socks5":
+                        proxy._serve_socks5(client)
+                    elif proxy.protocol == "socks4":
+                        proxy._serve_socks4(client)
+                    else:
+                        proxy._serve_http(client)
+                except (OSError, ConnectionError, ValueError):
+                    pass
+
+        return Handler
+
+
+class ProxyFarm:
+    """Набор FakeProxy по смеси профилей (протоколы чередуются http/socks5/socks4)"""
+
+    def __init__(self, mix: str, allowed_port: int, seed: int = 0):
+        profile_names = parse_mix(mix)
+        random.Random(seed).shuffle(profile_names)
+        self.proxies = [
+            FakeProxy(index, PROTOCOLS[index % len(PROTOCOLS)], name, allowed_port, seed)
+            for index, name in enumerate(profile_names)
+        ]
+
+    def profiles_by_ip(self) -> Dict[str, Dict]:
+        return {proxy.egress_ip: proxy.profile for proxy in self.proxies}
+
+    def candidates(self, country: str) -> List[Dict]:
+        return [proxy.as_candidate(country) for proxy in self.proxies]
+
+    def start(self):
+        for proxy in self.proxies:
+            proxy.start()
+
+    def stop(self):
+        for proxy in self.proxies:
+            proxy.stop()
+
+
+# ---------------------------------------------------------------------------
+# Харнесс
+# ---------------------------------------------------------------------------
+
+class SilentNotifier:
+    """Уведомления в Telegram из симуляции не отправляются"""
+
+    @staticmethod
+    def notify(*args, **kwargs):
+        return None
+
+
+def run_variant(args, name: str) -> Dict:
+    """Один вариант: ферма + сайт, поиск прокси и короткий парсинг (в текущем процессе)"""
+    # Порт сайта нужен ферме заранее, профили ферм - сайту: создаем сайт с пустыми профилями и дополняем
+    site = FakeCatalogSite(args.pages, {}, seed=args.seed, rate_limit=args.rate_limit)
+    farm = ProxyFarm(args.mix, site.server.server_port, seed=args.seed)
+    site.profiles_by_ip.update(farm.profiles_by_ip())
+    site.start()
+    farm.start()
+
+    workdir = tempfile.mkdtemp(prefix=f"trast_sim_{name}_")
+    os.environ.update({
+        "TRAST_TARGET_URL": site.url,
+        "TRAST_PROXY_IP_CHECK_URL": site.ip_url,
+        "TRAST_PROXY_CACHE_DIR": os.path.join(workdir, "proxy_cache"),
+        "TRAST_LOG_DIR": os.path.join(workdir, "logs"),
+        "TRAST_FORCE_FIREFOX": "1",
+    })
+    os.environ.setdefault("TRAST_STORE_API", "0")
+
+    # Импорт только после настройки окружения: config читает его при загрузке
+    import main as trast_main
+    from config import PREFERRED_COUNTRIES, TEMP_CSV_FILE
+    from proxy_manager import ProxyManager
+    from utils import create_new_csv
+
+    candidates = farm.candidates(PREFERRED_COUNTRIES[0])
+
+    class SimulatedProxyManager(ProxyManager):
+        def load_priority_proxies(self) -> List[Dict]:
+            return []
+
+        def _get_source_fetchers(self):
+            return {'simulated': lambda: [proxy.copy() for proxy in candidates]}
+
+    trast_main.TelegramNotifier = SilentNotifier
+    result = {'variant': name, 'candidates': len(candidates), 'mix': args.mix, 'seed': args.seed}
+    try:
+        manager = SimulatedProxyManager()
+        manager.download_proxies(force_update=True, clean_old=False)
+
+        started = time.time()
+        found = manager.get_working_proxies(min_count=args.min_proxies, max_to_check=None)
+        search_seconds = time.time() - started
+        result.update({
+            'proxies_found': len(found),
+            'search_seconds': round(search_seconds, 1),
+            'proxies_found_per_minute': round(len(found) / (search_seconds / 60), 2) if search_seconds else None,
+            'found_profiles': sorted(proxy.get('sim_profile', '?') for proxy in found),
+        })
+
+        if found and not args.skip_crawl:
+            create_new_csv(TEMP_CSV_FILE)
+            initial_proxy = found[0]
+            total_pages = initial_proxy.get('total_pages') or args.pages
+            started = time.time()
+            store_api_result = trast_main.crawl_via_store_api(initial_proxy)
+            result['crawl_mode'] = "store_api" if store_api_result else "html"
+            total_products, metrics = store_api_result or trast_main.parse_all_pages_simple(
+                manager, total_pages, initial_proxy, [proxy.copy() for proxy in candidates]
+            )
+            crawl_seconds = time.time() - started
+            result.update({
+                'crawl_seconds': round(crawl_seconds, 1),
+                'pages_checked': metrics.get('pages_checked', 0),
+                'pages_per_hour': round(metrics.get('pages_checked', 0) / (crawl_seconds / 3600), 1) if crawl_seconds else None,
+                'products': total_products,
+                'expected_products': site.expected_products,
+                'proxy_switches': metrics.get('proxy_switches', 0),
+                'protection_blocks': metrics.get('protection_blocks', 0),
+            })
+    finally:
+        farm.stop()
+        site.stop()
+        site_stats = dict(site.stats)
+        catalog_requests = site_stats.get('catalog_requests', 0)
+        denied = sum(site_stats.get(key, 0) for key in ("challenge", "blocked", "rate_limited"))
+        result.update({
+            'site': site_stats,
+            'block_rate': round(denied / catalog_requests, 3) if catalog_requests else None,
+            'proxy_stats': {
+                f"{proxy.profile_name}-{proxy.protocol}-{proxy.port}": dict(proxy.stats) for proxy in farm.proxies
+            },
+        })
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            result['workdir'] = workdir
+    return result
+
+
+def run_variant_subprocess(name: str, env_overrides: Dict[str, str]) -> Dict:
+    """Запускает вариант в отдельном процессе с его переменными окружения"""
+    fd, result_path = tempfile.mkstemp(prefix="trast_sim_result_", suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, **env_overrides)
+    command = [sys.executable, os.path.abspath(__file__)] + sys.argv[1:] + ["--run-variant", name, "--result", result_path]
+    try:
+        completed = subprocess.run(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        with open(result_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if completed.returncode != 0 or not content:
+            return {'variant': name, 'error': f"exit code {completed.returncode}"}
+        result = json.loads(content)
+        result['env'] = env_overrides
+        return result
+    finally:
+        os.remove(result_path)
+
+
+def log_comparison(results: List[Dict]):
+    columns = (
+        ("proxies_found_per_minute", "proxies/min"),
+        ("pages_per_hour", "pages/hour"),
+        ("crawl_seconds", "crawl s"),
+        ("block_rate", "block rate"),
+        ("proxies_found", "found"),
+        ("proxy_switches", "switches"),
+        ("products", "products"),
+    )
+    logger.info("=" * 80)
+    logger.info("Variant".ljust(16) + "".join(label.rjust(13) for _, label in columns))
+    for result in results:
+        if result.get('error'):
+            logger.info(f"{result['variant'].ljust(16)} failed: {result['error']}")
+            continue
+        row = "".join(
+            (str(result.get(key)) if result.get(key) is not None else "-").rjust(13) for key, _ in columns
+        )
+        logger.info(result['variant'].ljust(16) + row)
+    logger.info("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local proxy farm simulator for trast proxy search and crawl benchmarks")
+    parser.add_argument("--mix", default="good:4,slow:4,flaky:6,timeout:4,dead:10,blocked:4,burned:4",
+                        help=f"Proxy profiles as name:count ({', '.join(PROFILES)})")
+    parser.add_argument("--pages", type=int, default=15, help="Catalog pages on the fake site")
+    parser.add_argument("--min-proxies", type=int, default=3, help="min_count for get_working_proxies")
+    parser.add_argument("--rate-limit", type=int, default=SITE_RATE_LIMIT, help="Catalog pages per minute per IP before ban (0 - off)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for proxy behavior (same for all variants)")
+    parser.add_argument("--skip-crawl", action="store_true", help="Only measure proxy search")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep proxy cache, logs and CSV of each variant")
+    parser.add_argument("--variant", nargs="+", action="append", metavar=("NAME", "KEY=VALUE"),
+                        help="Variant name followed by TRAST_* environment overrides (repeatable)")
+    parser.add_argument("--output", help="Save all variant results to this JSON file")
+    parser.add_argument("--run-variant", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_variant:
+        result = {}
+        try:
+            result = run_variant(args, args.run_variant)
+        finally:
+            with open(args.result, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        return
+
+    variants = args.variant or [["baseline"]]
+    results = []
+    for variant in variants:
+        name, overrides = variant[0], {}
+        for item in variant[1:]:
+            key, _, value = item.partition("=")
+            overrides[key] = value
+        logger.info(f"Running variant {name} {overrides or ''}...")
+        results.append(run_variant_subprocess(name, overrides))
+
+    log_comparison(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        logger.info(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
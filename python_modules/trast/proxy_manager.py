@@ -6,12 +6,13 @@ import os
 import json
 import re
 import time
-import random
 import requests
 import threading
 import queue
 import traceback
-from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from bs4 import BeautifulSoup
 from loguru import logger
@@ -25,16 +26,28 @@ from config import (
     LAST_UPDATE_FILE,
     PREFERRED_COUNTRIES,
     PROXY_SOURCES,
+    PROXY_SOURCE_WORKERS,
+    PROXY_COOLDOWN_SECONDS,
     PROXY_TEST_TIMEOUT,
     BASIC_CHECK_TIMEOUT,
+    PROXY_IP_CHECK_URL,
     TARGET_URL,
     PROXY_CHECK_THREADS,
     USE_UNDETECTED_CHROME,
     FORCE_FIREFOX,
     BROWSER_RETRY_DELAY,
+    FIXTURE_RECORDING,
 )
 
-from utils import create_driver, get_pages_count_with_driver, PaginationNotDetectedError
+from utils import (
+    create_driver, get_pages_count_with_driver, get_pages_count_from_soup, PaginationNotDetectedError,
+    PRODUCT_CARD_CSS
+)
+from proxy_sources import SourceResultCache, SourceYieldStats, get_source_timeout
+from proxy_store import ProxyStateStore
+from proxy_selector import ProxySelector, OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_BLOCKED
+from fixtures import record_fixture
+from pagination_oracle import PaginationOracle
 
 
 def is_proxy_connection_error(error: Exception) -> bool:
@@ -143,18 +156,36 @@ class ProxyManager:
             country_filter: Фильтр по странам (список кодов стран)
         """
         self.country_filter = [c.upper() for c in country_filter] if country_filter else PREFERRED_COUNTRIES
-        self.failed_proxies = set()
-        self.successful_proxies = []
+        self.failed_proxies: Dict[str, float] = {}  # "ip:port" -> время окончания охлаждения (unix time)
+        self._successful_index: "OrderedDict[str, Dict]" = OrderedDict()  # "ip:port" -> прокси, в порядке ротации
         self.priority_proxies = []  # Приоритетные прокси из proxies_credentials.json или proxies_data.json
         
         # Thread-safety: блокировка для доступа к критическим данным
         self.lock = threading.Lock()
         
+        # Кеш результатов источников и статистика их выхода
+        self.source_cache = SourceResultCache()
+        self.source_stats = SourceYieldStats()
+        
         # Загружаем приоритетные прокси (сначала из proxies_credentials.json, затем из proxies_data.json)
         self.priority_proxies = self.load_priority_proxies()
         if self.priority_proxies:
             logger.info(f"Loaded {len(self.priority_proxies)} priority proxies")
         
+        # Состояние прокси хранится в SQLite (однократно переносим старый successful_proxies.json)
+        self.store = ProxyStateStore()
+        self.store.migrate_from_json(SUCCESSFUL_PROXIES_FILE)
+        # Оценки скорости/надежности прокси для выбора следующего (история - из proxy_events)
+        self.selector = ProxySelector(self.store)
+        # Последнее известное число страниц каталога (общее для проверок прокси и парсинга)
+        self.pagination = PaginationOracle()
+        for (ip, port, _protocol), (_reason, expires_at) in self.store.load_negative_cache().items():
+            proxy_key = f"{ip}:{port}"
+            self.failed_proxies[proxy_key] = max(expires_at, self.failed_proxies.get(proxy_key, 0))
+            self.selector.cool_down(proxy_key, expires_at)
+        if self.failed_proxies:
+            logger.info(f"Loaded {len(self.failed_proxies)} proxies in cooldown from negative cache")
+        
         # Загружаем успешные прокси при инициализации (с автоматической очисткой устаревших)
         from config import SUCCESSFUL_PROXY_TTL_HOURS
         self.successful_proxies = self.load_successful_proxies(max_age_hours=SUCCESSFUL_PROXY_TTL_HOURS)
@@ -163,6 +194,49 @@ class ProxyManager:
         
         logger.info(f"ProxyManager initialized with country filter: {', '.join(self.country_filter[:10])}...")
     
+    @property
+    def successful_proxies(self) -> List[Dict]:
+        """Снимок списка успешных прокси (в порядке ротации)"""
+        return list(self._successful_index.values())
+    
+    @successful_proxies.setter
+    def successful_proxies(self, proxies: List[Dict]):
+        self._successful_index = OrderedDict(
+            (f"{p.get('ip')}:{p.get('port')}", p) for p in proxies
+        )
+    
+    def rank_proxies(self, proxies: List[Dict]) -> List[Dict]:
+        """Упорядочивает прокси по оценке селектора (лучшие первыми, на охлаждении - в конце)"""
+        return self.selector.rank(proxies)
+    
+    def report_page_result(self, proxy: Dict, outcome: str, latency: Optional[float] = None):
+        """
+        Сообщает селектору исход загрузки страницы каталога через прокси.
+        Заблокированный или неотвечающий прокси отправляется на охлаждение.
+        
+        Args:
+            proxy: Прокси, через который грузилась страница
+            outcome: OUTCOME_SUCCESS / OUTCOME_FAILURE / OUTCOME_BLOCKED
+            latency: Время загрузки страницы в секундах
+        """
+        if not proxy or not proxy.get('ip') or not proxy.get('port'):
+            return
+        if outcome == OUTCOME_SUCCESS:
+            self.selector.report(f"{proxy.get('ip')}:{proxy.get('port')}", OUTCOME_SUCCESS, latency)
+            try:
+                self.store.record_event(proxy, 'success', latency=latency)
+            except Exception as e:
+                logger.warning(f"Failed to save proxy page result {proxy.get('ip')}:{proxy.get('port')}: {e}")
+        elif outcome == OUTCOME_BLOCKED:
+            self.remove_failed_proxy(proxy, reason='cloudflare_block')
+        else:
+            self.remove_failed_proxy(proxy, reason='connection_failure')
+    
+    def is_proxy_in_cooldown(self, proxy: Dict) -> bool:
+        """Проверяет, находится ли прокси в негативном кеше (охлаждение еще не истекло)"""
+        expires_at = self.failed_proxies.get(f"{proxy.get('ip')}:{proxy.get('port')}")
+        return bool(expires_at and expires_at > time.time())
+    
     def load_priority_proxies(self) -> List[Dict]:
         """
         Загружает приоритетные прокси из proxies_credentials.json или proxies_data.json.
@@ -273,7 +347,7 @@ class ProxyManager:
     
     def load_successful_proxies(self, max_age_hours: int = 24) -> List[Dict]:
         """
-        Загружает успешные прокси из файла и удаляет устаревшие (старше max_age_hours).
+        Загружает успешные прокси из хранилища и снимает флаг с устаревших (старше max_age_hours).
         
         Args:
             max_age_hours: Максимальный возраст прокси в часах (по умолчанию 24 часа)
@@ -282,84 +356,41 @@ class ProxyManager:
             Список актуальных успешных прокси
         """
         try:
-            if os.path.exists(SUCCESSFUL_PROXIES_FILE):
-                with open(SUCCESSFUL_PROXIES_FILE, 'r', encoding='utf-8') as f:
-                    proxies = json.load(f)
-                    
-                    # Фильтруем устаревшие прокси
-                    if max_age_hours > 0:
-                        current_time = datetime.now()
-                        valid_proxies = []
-                        removed_count = 0
-                        
-                        for proxy in proxies:
-                            last_verified = proxy.get('last_verified')
-                            if last_verified:
-                                try:
-                                    verified_time = datetime.fromisoformat(last_verified)
-                                    age_hours = (current_time - verified_time).total_seconds() / 3600
-                                    if age_hours <= max_age_hours:
-                                        valid_proxies.append(proxy)
-                                    else:
-                                        removed_count += 1
-                                except (ValueError, TypeError):
-                                    # Если не удалось распарсить дату, оставляем прокси (для обратной совместимости)
-                                    valid_proxies.append(proxy)
-                            else:
-                                # Для старых прокси без временной метки добавляем её
-                                proxy['last_verified'] = current_time.isoformat()
-                                valid_proxies.append(proxy)
-                        
-                        if removed_count > 0:
-                            logger.info(f"Removed {removed_count} expired proxies (older than {max_age_hours}h)")
-                            # Сохраняем очищенный список
-                            self.successful_proxies = valid_proxies
-                            self.save_successful_proxies()
-                            return valid_proxies
-                        
-                        return proxies
-                    return proxies
+            return self.store.load_successful(max_age_hours=max_age_hours)
         except Exception as e:
             logger.warning(f"Failed to load successful proxies: {e}")
         return []
     
-    def save_successful_proxies(self):
-        """Сохраняет успешные прокси в файл"""
-        try:
-            with open(SUCCESSFUL_PROXIES_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.successful_proxies, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save successful proxies: {e}")
-    
     def record_successful_proxy(self, proxy: Dict):
         """Добавляет прокси в список успешных (без дублей) с временной меткой"""
-        if not proxy:
+        if not proxy or not proxy.get('ip') or not proxy.get('port'):
             return
         proxy_key = f"{proxy.get('ip')}:{proxy.get('port')}"
-        if not proxy_key:
-            return
+        now_iso = datetime.now().isoformat()  # Временная метка для TTL
         with self.lock:
-            existing_keys = {f"{p.get('ip')}:{p.get('port')}" for p in self.successful_proxies}
-            if proxy_key in existing_keys:
-                # Обновляем временную метку для существующего прокси
-                for p in self.successful_proxies:
-                    if f"{p.get('ip')}:{p.get('port')}" == proxy_key:
-                        p['last_verified'] = datetime.now().isoformat()
-                        break
-                self.save_successful_proxies()
-                return
-            proxy_copy = {
-                'ip': proxy.get('ip'),
-                'port': proxy.get('port'),
-                'protocol': proxy.get('protocol', 'http'),
-                'country': proxy.get('country', ''),
-                'source': proxy.get('source', 'unknown'),
-                'last_verified': datetime.now().isoformat()  # Временная метка для TTL
-            }
+            proxy_copy = self._successful_index.get(proxy_key)
+            is_new = proxy_copy is None
+            if is_new:
+                proxy_copy = {
+                    'ip': proxy.get('ip'),
+                    'port': proxy.get('port'),
+                    'protocol': proxy.get('protocol', 'http'),
+                    'country': proxy.get('country', ''),
+                    'source': proxy.get('source', 'unknown'),
+                }
+                self._successful_index[proxy_key] = proxy_copy
+            proxy_copy['last_verified'] = now_iso
             if 'total_pages' in proxy:
                 proxy_copy['total_pages'] = proxy['total_pages']
-            self.successful_proxies.append(proxy_copy)
-            self.save_successful_proxies()
+            self.failed_proxies.pop(proxy_key, None)
+        self.selector.release(proxy_key)
+        self.selector.report(proxy_key, OUTCOME_SUCCESS)
+        try:
+            self.store.record_success(proxy_copy)
+        except Exception as e:
+            logger.warning(f"Failed to save successful proxy {proxy_key}: {e}")
+        if is_new:
+            self.source_stats.record_working(proxy_copy['source'])
     
     def clean_failed_proxies_from_cache(self, max_to_check: int = 50) -> int:
         """
@@ -388,47 +419,40 @@ class ProxyManager:
             basic_ok, _ = self.validate_proxy_basic(proxy, timeout=5)
             if not basic_ok:
                 logger.warning(f"Removing failed proxy from cache: {proxy_key}")
-                with self.lock:
-                    self.successful_proxies = [p for p in self.successful_proxies 
-                                             if f"{p.get('ip')}:{p.get('port')}" != proxy_key]
-                    self.failed_proxies.add(proxy_key)
-                    removed_count += 1
+                self.remove_failed_proxy(proxy, reason='basic_check_failed')
+                removed_count += 1
         
         if removed_count > 0:
-            self.save_successful_proxies()
             logger.info(f"Cleaned {removed_count} failed proxies from cache. Remaining: {len(self.successful_proxies)}")
         else:
             logger.info(f"No failed proxies found in cache. All {len(proxies_to_check)} checked proxies are working.")
         
         return removed_count
     
-    def remove_failed_proxy(self, proxy: Dict):
+    def remove_failed_proxy(self, proxy: Dict, reason: Optional[str] = None):
         """
-        Удаляет прокси из списка успешных и добавляет в список неработающих.
+        Удаляет прокси из списка успешных и добавляет в негативный кеш.
         
         Args:
             proxy: Прокси для удаления
+            reason: Причина неудачи (ключ PROXY_COOLDOWN_SECONDS), определяет длительность охлаждения
         """
-        if not proxy:
+        if not proxy or not proxy.get('ip') or not proxy.get('port'):
             return
         
         proxy_key = f"{proxy.get('ip')}:{proxy.get('port')}"
-        if not proxy_key:
-            return
+        try:
+            expires_at = self.store.record_failure(proxy, reason)
+        except Exception as e:
+            logger.warning(f"Failed to save proxy failure {proxy_key}: {e}")
+            expires_at = time.time() + PROXY_COOLDOWN_SECONDS['default']
+        self.selector.report(proxy_key, OUTCOME_BLOCKED if reason == 'cloudflare_block' else OUTCOME_FAILURE)
+        self.selector.cool_down(proxy_key, expires_at)
         
         with self.lock:
-            # Удаляем из успешных
-            before_count = len(self.successful_proxies)
-            self.successful_proxies = [p for p in self.successful_proxies 
-                                     if f"{p.get('ip')}:{p.get('port')}" != proxy_key]
-            after_count = len(self.successful_proxies)
-            
-            # Добавляем в неработающие
-            self.failed_proxies.add(proxy_key)
-            
-            if before_count != after_count:
-                self.save_successful_proxies()
+            if self._successful_index.pop(proxy_key, None) is not None:
                 logger.debug(f"Removed failed proxy {proxy_key} from successful list")
+            self.failed_proxies[proxy_key] = expires_at
     
     def _parse_proxymania_page(self, page_num: int = 1) -> List[Dict]:
         """Парсит одну страницу прокси с proxymania.su"""
@@ -1366,8 +1390,67 @@ class ProxyManager:
             logger.warning(f"Error loading proxies from Prosox: {e}")
             return []
     
-    def download_proxies(self, force_update: bool = False, clean_old: bool = True) -> bool:
-        """Скачивает свежие прокси из всех источников"""
+    def _get_source_fetchers(self) -> Dict[str, Callable[[], List[Dict]]]:
+        """Реестр загрузчиков: имя источника из PROXY_SOURCES -> функция загрузки"""
+        fetchers = {
+            'proxymania': self._download_proxies_from_proxymania,
+            'proxifly': self._download_proxies_from_proxifly,
+            'proxyscrape': self._download_proxies_from_proxyscrape,
+            'spysone': self._download_proxies_from_spysone,
+            'freeproxylist': self._download_proxies_from_free_proxy_list,
+            'geonode': self._download_proxies_from_geonode,
+            'proxylist_download': self._download_proxies_from_proxylist_download,
+            'proxylist_icu': self._download_proxies_from_proxylist_icu,
+            'proxylist_me': self._download_proxies_from_proxylist_me,
+            'proxy6': self._download_proxies_from_proxy6,
+            'proxys_io': self._download_proxies_from_proxys_io,
+            'proxy_seller': self._download_proxies_from_proxy_seller,
+            'floppydata': self._download_proxies_from_floppydata,
+            'prosox': self._download_proxies_from_prosox,
+        }
+        for source_name, source in PROXY_SOURCES.items():
+            if source.get('type') == 'github_text':
+                fetchers[source_name] = (
+                    lambda url=source['url'], name=source_name: self._download_proxies_from_github_text(url, name)
+                )
+        return {
+            name: fetcher for name, fetcher in fetchers.items()
+            if PROXY_SOURCES.get(name, {}).get('active', False)
+        }
+    
+    def _fetch_source(self, source_name: str, fetcher: Callable[[], List[Dict]]) -> List[Dict]:
+        """
+        Загружает один источник и кладет результат в дисковый кеш.
+        Кеш пишется и в том случае, если результат пришел уже после таймаута,
+        чтобы следующее обновление его использовало.
+        """
+        proxies = fetcher() or []
+        if proxies:
+            self.source_cache.put(source_name, proxies, self.country_filter)
+        return proxies
+    
+    def download_proxies(
+        self,
+        force_update: bool = False,
+        clean_old: bool = True,
+        on_batch: Optional[Callable[[str, List[Dict]], None]] = None
+    ) -> bool:
+        """
+        Скачивает свежие прокси из всех активных источников параллельно.
+        
+        Каждый источник ограничен своим таймаутом (PROXY_SOURCES[...]['timeout']),
+        а его разобранный результат кешируется на диске со своим TTL
+        (PROXY_SOURCES[...]['cache_ttl']).
+        
+        Args:
+            force_update: Игнорировать кеш источников и загрузить все заново
+            clean_old: Проверить и очистить неработающие прокси из кеша успешных
+            on_batch: Callback (source_name, new_proxies), вызывается по мере готовности
+                каждого источника с новыми уникальными прокси (после фильтра по странам)
+        
+        Returns:
+            True, если получен хотя бы один прокси
+        """
         try:
             if force_update:
                 logger.info("Forced proxy list update...")
@@ -1379,117 +1462,95 @@ class ProxyManager:
                 if removed > 0:
                     logger.info(f"Removed {removed} failed proxies from cache")
             
-            all_proxies = []
-            
-            # Загружаем с proxymania
-            if PROXY_SOURCES['proxymania']['active']:
-                proxymania_proxies = self._download_proxies_from_proxymania()
-                all_proxies.extend(proxymania_proxies)
-            
-            # Загружаем с proxifly
-            if PROXY_SOURCES['proxifly']['active']:
-                proxifly_proxies = self._download_proxies_from_proxifly()
-                all_proxies.extend(proxifly_proxies)
-            
-            # Загружаем с proxyscrape
-            if PROXY_SOURCES.get('proxyscrape', {}).get('active', False):
-                proxyscrape_proxies = self._download_proxies_from_proxyscrape()
-                all_proxies.extend(proxyscrape_proxies)
-            
-            # Загружаем с spys.one
-            if PROXY_SOURCES.get('spysone', {}).get('active', False):
-                spysone_proxies = self._download_proxies_from_spysone()
-                all_proxies.extend(spysone_proxies)
-            
-            # Загружаем с free-proxy-list.net
-            if PROXY_SOURCES.get('freeproxylist', {}).get('active', False):
-                freeproxylist_proxies = self._download_proxies_from_free_proxy_list()
-                all_proxies.extend(freeproxylist_proxies)
-            
-            # Загружаем с geonode.com
-            if PROXY_SOURCES.get('geonode', {}).get('active', False):
-                geonode_proxies = self._download_proxies_from_geonode()
-                all_proxies.extend(geonode_proxies)
-            
-            # Загружаем с proxy-list.download
-            if PROXY_SOURCES.get('proxylist_download', {}).get('active', False):
-                proxylist_download_proxies = self._download_proxies_from_proxylist_download()
-                all_proxies.extend(proxylist_download_proxies)
-            
-            # Загружаем с proxylist.icu
-            if PROXY_SOURCES.get('proxylist_icu', {}).get('active', False):
-                proxylist_icu_proxies = self._download_proxies_from_proxylist_icu()
-                all_proxies.extend(proxylist_icu_proxies)
-            
-            # Загружаем с GitHub (clarketm)
-            if PROXY_SOURCES.get('github_clarketm', {}).get('active', False):
-                github_clarketm_proxies = self._download_proxies_from_github_text(
-                    PROXY_SOURCES['github_clarketm']['url'], 'github_clarketm'
-                )
-                all_proxies.extend(github_clarketm_proxies)
+            seen = set()
+            filtered_proxies = []
             
-            # Загружаем с GitHub (thespeedx)
-            if PROXY_SOURCES.get('github_thespeedx', {}).get('active', False):
-                github_thespeedx_proxies = self._download_proxies_from_github_text(
-                    PROXY_SOURCES['github_thespeedx']['url'], 'github_thespeedx'
+            def accept(source_name: str, proxies: List[Dict], duration: float,
+                       from_cache: bool = False, timed_out: bool = False, error: bool = False):
+                # Удаляем дубликаты по IP:PORT и фильтруем по странам СНГ
+                batch = []
+                for proxy in proxies:
+                    proxy_key = f"{proxy.get('ip')}:{proxy.get('port')}"
+                    if proxy_key in seen:
+                        continue
+                    seen.add(proxy_key)
+                    batch.append(proxy)
+                if self.country_filter and batch:
+                    batch = filter_proxies_by_country(batch, self.country_filter)
+                filtered_proxies.extend(batch)
+                self.source_stats.record_fetch(
+                    source_name, len(proxies), len(batch), duration,
+                    from_cache=from_cache, timed_out=timed_out, error=error
                 )
-                all_proxies.extend(github_thespeedx_proxies)
+                if batch and on_batch:
+                    try:
+                        on_batch(source_name, batch)
+                    except Exception as callback_error:
+                        logger.warning(f"Proxy batch callback failed for {source_name}: {callback_error}")
+            
+            fetchers = self._get_source_fetchers()
+            pending_sources = {}
+            for source_name, fetcher in fetchers.items():
+                cached = None if force_update else self.source_cache.get(source_name, self.country_filter)
+                if cached is not None:
+                    logger.info(f"Using cached proxies from {source_name}: {len(cached)}")
+                    accept(source_name, cached, 0.0, from_cache=True)
+                else:
+                    pending_sources[source_name] = fetcher
             
-            # Загружаем с GitHub (monosans)
-            if PROXY_SOURCES.get('github_monosans', {}).get('active', False):
-                github_monosans_proxies = self._download_proxies_from_github_text(
-                    PROXY_SOURCES['github_monosans']['url'], 'github_monosans'
+            if pending_sources:
+                logger.info(f"Downloading proxies from {len(pending_sources)} sources concurrently...")
+                executor = ThreadPoolExecutor(
+                    max_workers=min(PROXY_SOURCE_WORKERS, len(pending_sources)),
+                    thread_name_prefix="ProxySource"
                 )
-                all_proxies.extend(github_monosans_proxies)
-            
-            # Загружаем с proxylist.me
-            if PROXY_SOURCES.get('proxylist_me', {}).get('active', False):
-                proxylist_me_proxies = self._download_proxies_from_proxylist_me()
-                all_proxies.extend(proxylist_me_proxies)
-            
-            # Загружаем с Proxy6 (может требовать обход nginx JS challenge)
-            if PROXY_SOURCES.get('proxy6', {}).get('active', False):
-                proxy6_proxies = self._download_proxies_from_proxy6()
-                all_proxies.extend(proxy6_proxies)
-            
-            # Загружаем с Proxys.io (может требовать обход nginx JS challenge)
-            if PROXY_SOURCES.get('proxys_io', {}).get('active', False):
-                proxys_io_proxies = self._download_proxies_from_proxys_io()
-                all_proxies.extend(proxys_io_proxies)
-            
-            # Загружаем с Proxy-Seller (может требовать обход nginx JS challenge)
-            if PROXY_SOURCES.get('proxy_seller', {}).get('active', False):
-                proxy_seller_proxies = self._download_proxies_from_proxy_seller()
-                all_proxies.extend(proxy_seller_proxies)
-            
-            # Загружаем с Floppydata (может требовать обход nginx JS challenge)
-            if PROXY_SOURCES.get('floppydata', {}).get('active', False):
-                floppydata_proxies = self._download_proxies_from_floppydata()
-                all_proxies.extend(floppydata_proxies)
-            
-            # Загружаем с Prosox (может требовать обход nginx JS challenge)
-            if PROXY_SOURCES.get('prosox', {}).get('active', False):
-                prosox_proxies = self._download_proxies_from_prosox()
-                all_proxies.extend(prosox_proxies)
-            
-            # Удаляем дубликаты по IP:PORT
-            seen = set()
-            filtered_proxies = []
-            for proxy in all_proxies:
-                proxy_key = f"{proxy['ip']}:{proxy['port']}"
-                if proxy_key not in seen:
-                    seen.add(proxy_key)
-                    filtered_proxies.append(proxy)
+                started_at = time.time()
+                futures = {
+                    executor.submit(self._fetch_source, source_name, fetcher): source_name
+                    for source_name, fetcher in pending_sources.items()
+                }
+                deadlines = {
+                    future: started_at + get_source_timeout(source_name)
+                    for future, source_name in futures.items()
+                }
+                pending = set(futures)
+                try:
+                    while pending:
+                        nearest_deadline = min(deadlines[future] for future in pending)
+                        done, pending = wait(
+                            pending,
+                            timeout=max(0.0, nearest_deadline - time.time()),
+                            return_when=FIRST_COMPLETED
+                        )
+                        for future in done:
+                            source_name = futures[future]
+                            duration = time.time() - started_at
+                            try:
+                                proxies = future.result()
+                                accept(source_name, proxies, duration)
+                                logger.info(f"Source {source_name} finished in {duration:.1f}s: {len(proxies)} proxies")
+                            except Exception as e:
+                                logger.warning(f"Error loading proxies from {source_name}: {e}")
+                                accept(source_name, [], duration, error=True)
+                        
+                        now = time.time()
+                        expired = {future for future in pending if deadlines[future] <= now}
+                        for future in expired:
+                            source_name = futures[future]
+                            future.cancel()
+                            logger.warning(f"Source {source_name} timed out after {get_source_timeout(source_name)}s, skipping")
+                            accept(source_name, [], now - started_at, timed_out=True)
+                        pending -= expired
+                finally:
+                    # Зависшие загрузчики не ждем: их результат попадет в дисковый кеш позже
+                    executor.shutdown(wait=False)
             
-            logger.info(f"After removing duplicates: {len(filtered_proxies)} unique proxies")
+            self.source_stats.flush()
+            logger.info(f"After removing duplicates and country filter: {len(filtered_proxies)} unique proxies")
             
-            # Фильтруем по странам СНГ
-            if self.country_filter:
-                before_filter = len(filtered_proxies)
-                filtered_proxies = filter_proxies_by_country(filtered_proxies, self.country_filter)
-                after_filter = len(filtered_proxies)
-                if before_filter != after_filter:
-                    logger.info(f"Filtered proxies by CIS countries: {before_filter} → {after_filter} (removed {before_filter - after_filter})")
+            if not filtered_proxies:
+                logger.warning("No proxies received from any source, keeping previous proxy list")
+                return False
             
             # Сохраняем прокси
             with open(PROXIES_FILE, 'w', encoding='utf-8') as f:
@@ -1516,7 +1577,7 @@ class ProxyManager:
         return []
     
     def validate_proxy_basic(self, proxy: Dict, timeout: int = None) -> Tuple[bool, Dict]:
-        """Базовая проверка работоспособности прокси через ifconfig.me/ip"""
+        """Базовая проверка работоспособности прокси через PROXY_IP_CHECK_URL"""
         if timeout is None:
             timeout = BASIC_CHECK_TIMEOUT
         
@@ -1534,7 +1595,7 @@ class ProxyManager:
             else:
                 return False, {}
             
-            response = requests.get('https://ifconfig.me/ip', proxies=proxies, timeout=timeout, verify=False)
+            response = requests.get(PROXY_IP_CHECK_URL, proxies=proxies, timeout=timeout, verify=False)
             if response.status_code == 200:
                 external_ip = response.text.strip()
                 if external_ip and len(external_ip.split('.')) == 4:
@@ -1594,7 +1655,7 @@ class ProxyManager:
                 precheck_ok, precheck_reason = self._precheck_proxy_connection(proxy, timeout=8)
                 if not precheck_ok:
                     logger.debug(f"[{proxy_key}] SOCKS pre-check failed: {precheck_reason}")
-                    return False, {}
+                    return False, {'reason': 'connection_failure'}
             
             prefer_chrome = (
                 USE_UNDETECTED_CHROME
@@ -1608,6 +1669,7 @@ class ProxyManager:
             attempt_order.append("firefox")
             
             last_error = None
+            failure_reason = 'default'  # Ключ PROXY_COOLDOWN_SECONDS для негативного кеша
             from utils import safe_get_page_source
             
             for browser_name in attempt_order:
@@ -1648,6 +1710,7 @@ class ProxyManager:
                             self._save_debug_html(proxy_key, page_source, f"{browser_name}_cloudflare_timeout")
                             debug_html_saved = True
                         last_error = RuntimeError("protection_timeout")
+                        failure_reason = 'cloudflare_block'
                         continue
                     
                     if not page_source:
@@ -1656,12 +1719,17 @@ class ProxyManager:
                         continue
                     
                     logger.debug(f"Getting page count via proxy {proxy_key} ({browser_name})...")
-                    total_pages = get_pages_count_with_driver(driver)
+                    total_pages = self._detect_pages_count(driver, page_source)
                     if total_pages and total_pages > 0:
                         logger.info(
                             f"[{proxy_key}] PROXY WORKS via {browser_name.upper()}! "
                             f"Page count: {total_pages}"
                         )
+                        if FIXTURE_RECORDING:
+                            record_fixture(
+                                safe_get_page_source(driver), "catalog", reason=f"{browser_name}_validation",
+                                url=TARGET_URL, proxy=proxy, expected={'blocked': False, 'pages_count': total_pages}
+                            )
                         return True, {'total_pages': total_pages, 'browser': browser_name}
                     
                     logger.warning(
@@ -1672,7 +1740,7 @@ class ProxyManager:
                         if page_source:
                             self._save_debug_html(proxy_key, page_source, f"{browser_name}_no_page_count")
                             debug_html_saved = True
-                    return False, {}
+                    return False, {'reason': 'no_page_count'}
                 
                 except PaginationNotDetectedError as e:
                     logger.warning(f"Proxy {proxy_key} blocked on site via {browser_name}: {e}")
@@ -1683,7 +1751,7 @@ class ProxyManager:
                                 proxy_key, page_source, f"{browser_name}_blocked_{str(e)[:40]}"
                             )
                             debug_html_saved = True
-                    return False, {}
+                    return False, {'reason': 'cloudflare_block'}
                 except Exception as e:
                     last_error = e
                     if browser_name == "chrome" and is_proxy_connection_error(e) and not FORCE_FIREFOX:
@@ -1701,6 +1769,10 @@ class ProxyManager:
                                 proxy_key, page_source, f"{browser_name}_exception_{type(e).__name__}"
                             )
                             debug_html_saved = True
+                    if isinstance(e, TimeoutException) or 'timeout' in str(e).lower():
+                        return False, {'reason': 'timeout'}
+                    if is_proxy_connection_error(e):
+                        return False, {'reason': 'connection_failure'}
                     return False, {}
                 finally:
                     if driver:
@@ -1711,12 +1783,41 @@ class ProxyManager:
             
             if last_error:
                 logger.debug(f"Last error for proxy {proxy_key}: {last_error}")
-            return False, {}
+            return False, {'reason': failure_reason}
         
         except Exception as e:
             logger.debug(f"Error checking proxy {proxy_key} on trast: {e}")
             return False, {}
     
+    def _detect_pages_count(self, driver: webdriver.Remote, page_source: str) -> Optional[int]:
+        """
+        Число страниц каталога для проверки прокси.
+        
+        При известной оценке (кеш или предыдущая проверка) число берется из уже
+        загруженного HTML, а если пагинация еще не отрисована - из оценки. Полный
+        get_pages_count_with_driver запускается, только если оценки нет или на
+        странице еще нет карточек.
+        
+        Raises:
+            PaginationNotDetectedError: если страница заблокирована
+        """
+        estimate = self.pagination.estimate()
+        if estimate:
+            soup = BeautifulSoup(page_source, 'html.parser')
+            total_pages = get_pages_count_from_soup(soup, page_source)
+            if total_pages and total_pages > 1:
+                return self.pagination.confirm(total_pages)
+            if soup.select(PRODUCT_CARD_CSS):
+                # Карточки уже есть, пагинация еще не отрисована - ее уточнит парсинг
+                logger.debug(f"Pagination not rendered yet, using page count estimate {estimate}")
+                return estimate
+        
+        # Нет оценки или на странице еще нет карточек - полный поиск с ожиданиями
+        total_pages = get_pages_count_with_driver(driver)
+        if total_pages:
+            self.pagination.confirm(total_pages)
+        return total_pages
+    
     def _save_debug_html(self, proxy_key: str, page_source: str, reason: str):
         """Сохраняет HTML страницы для отладки при неудачных проверках прокси"""
         try:
@@ -1740,6 +1841,9 @@ class ProxyManager:
                 f.write(page_source)
             
             logger.debug(f"Debug HTML saved for proxy {proxy_key}: {filepath} (reason: {reason})")
+            
+            if FIXTURE_RECORDING:
+                record_fixture(page_source, "blocked", reason=reason, url=TARGET_URL, expected={'pages_count': None})
         except Exception as e:
             logger.debug(f"Failed to save debug HTML for proxy {proxy_key}: {e}")
     
@@ -1786,8 +1890,8 @@ class ProxyManager:
                 # Базовая проверка
                 basic_ok, basic_info = self.validate_proxy_basic(proxy)
                 if not basic_ok:
+                    self.remove_failed_proxy(proxy, reason='basic_check_failed')
                     with self.lock:
-                        self.failed_proxies.add(proxy_key)
                         stats['failed'] += 1
                     proxy_queue.task_done()
                     failed_count += 1
@@ -1805,13 +1909,14 @@ class ProxyManager:
                     }
                     working_proxy.update(trast_info)
                     
+                    self.record_successful_proxy(working_proxy)
+                    
                     # Thread-safe добавление
                     with self.lock:
                         # Проверяем, не добавили ли уже этот прокси другой поток
                         existing_keys = {f"{p['ip']}:{p['port']}" for p in found_proxies}
                         if proxy_key not in existing_keys:
                             found_proxies.append(working_proxy)
-                            self.successful_proxies.append(working_proxy)
                             stats['found'] += 1
                             current_count = len(found_proxies)
                             
@@ -1821,8 +1926,8 @@ class ProxyManager:
                             if current_count >= min_count:
                                 stop_event.set()
                 else:
+                    self.remove_failed_proxy(proxy, reason=trast_info.get('reason'))
                     with self.lock:
-                        self.failed_proxies.add(proxy_key)
                         stats['failed'] += 1
                     failed_count += 1
                 
@@ -1876,7 +1981,7 @@ class ProxyManager:
         proxies = self._load_proxies()
         if not proxies:
             logger.warning("No proxies to check, loading...")
-            if not self.download_proxies(force_update=True):
+            if not self.download_proxies():
                 return []
             proxies = self._load_proxies()
         
@@ -1888,7 +1993,7 @@ class ProxyManager:
         
         if shuffled_successful:
             logger.info(f"Checking {len(shuffled_successful)} old successful proxies (priority)...")
-            random.shuffle(shuffled_successful)
+            shuffled_successful = self.rank_proxies(shuffled_successful)
             
             for proxy in shuffled_successful:
                 if len(working_proxies) >= min_count:
@@ -1910,18 +2015,14 @@ class ProxyManager:
                     }
                     working_proxy.update(trast_info)
                     working_proxies.append(working_proxy)
+                    self.record_successful_proxy(working_proxy)
                 else:
                     logger.warning(f"Old proxy {proxy_key} stopped working")
-                    with self.lock:
-                        # Удаляем из успешных
-                        self.successful_proxies = [p for p in self.successful_proxies 
-                                                   if f"{p['ip']}:{p['port']}" != proxy_key]
-                        self.failed_proxies.add(proxy_key)
+                    self.remove_failed_proxy(proxy, reason=trast_info.get('reason'))
         
         # Если нашли достаточно старых прокси, возвращаем их
         if len(working_proxies) >= min_count:
             logger.info(f"Found enough old successful proxies: {len(working_proxies)}")
-            self.save_successful_proxies()
             return working_proxies[:min_count]
         
         # ШАГ 2: Многопоточный поиск новых прокси (если нужно)
@@ -1929,8 +2030,9 @@ class ProxyManager:
         
         # Фильтруем уже проверенные
         with self.lock:
-            successful_keys = {f"{p['ip']}:{p['port']}" for p in self.successful_proxies}
-            failed_keys = self.failed_proxies.copy()
+            successful_keys = set(self._successful_index)
+            now = time.time()
+            failed_keys = {key for key, expires_at in self.failed_proxies.items() if expires_at > now}
         
         proxies_to_check = []
         for proxy in proxies:
@@ -1947,10 +2049,10 @@ class ProxyManager:
         
         if not proxies_to_check:
             logger.warning("No new proxies to check")
-            self.save_successful_proxies()
             return working_proxies
         
-        random.shuffle(proxies_to_check)
+        # Непроверенные прокси получают одинаковую априорную оценку, поэтому порядок среди них случайный
+        proxies_to_check = self.rank_proxies(proxies_to_check)
         
         if use_parallel and num_threads > 1:
             # Многопоточная проверка
@@ -2001,9 +2103,7 @@ class ProxyManager:
                 # Базовая проверка
                 basic_ok, basic_info = self.validate_proxy_basic(proxy)
                 if not basic_ok:
-                    proxy_key = f"{proxy['ip']}:{proxy['port']}"
-                    with self.lock:
-                        self.failed_proxies.add(proxy_key)
+                    self.remove_failed_proxy(proxy, reason='basic_check_failed')
                     continue
                 
                 # Проверка на trast
@@ -2018,27 +2118,25 @@ class ProxyManager:
                     }
                     working_proxy.update(trast_info)
                     working_proxies.append(working_proxy)
-                    with self.lock:
-                        self.successful_proxies.append(working_proxy)
+                    self.record_successful_proxy(working_proxy)
                     logger.success(f"✓ Найден рабочий прокси: {proxy['ip']}:{proxy['port']} ({len(working_proxies)}/{min_count})")
                 else:
-                    proxy_key = f"{proxy['ip']}:{proxy['port']}"
-                    with self.lock:
-                        self.failed_proxies.add(proxy_key)
-        
-        # Сохраняем успешные прокси
-        self.save_successful_proxies()
+                    self.remove_failed_proxy(proxy, reason=trast_info.get('reason'))
         
+        self.source_stats.flush()
         logger.info(f"Total found {len(working_proxies)} working proxies")
         return working_proxies[:min_count] if len(working_proxies) > min_count else working_proxies
     
     def get_next_proxy(self) -> Optional[Dict]:
-        """Получает следующий рабочий прокси из списка"""
+        """Получает лучший по оценке селектора рабочий прокси (не находящийся на охлаждении)"""
         with self.lock:
-            if not self.successful_proxies:
+            if not self._successful_index:
                 return None
             
-            proxy = self.successful_proxies[0]
-            self.successful_proxies = self.successful_proxies[1:] + [proxy]
-            return proxy.copy()
+            proxy_key = self.selector.choose(self._successful_index.keys())
+            if proxy_key is None:
+                # Все на охлаждении - возвращаемся к простой ротации
+                proxy_key = next(iter(self._successful_index))
+            self._successful_index.move_to_end(proxy_key)
+            return self._successful_index[proxy_key].copy()
 
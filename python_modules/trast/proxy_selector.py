@@ -0,0 +1,212 @@
+"""
+Выбор прокси с учетом скорости и надежности.
+
+Для каждого прокси хранится EWMA времени загрузки страницы и последние
+PROXY_HEALTH_HISTORY_SIZE исходов (success / failure / blocked). Между запусками
+статистика не сохраняется отдельно: при старте она восстанавливается из таблицы
+proxy_events хранилища состояния прокси. Выбор делается
+по бандитной политике (по умолчанию Thompson sampling): оценка прокси -
+выборка вероятности успеха из Beta-распределения, деленная на ожидаемое время
+страницы, то есть ожидаемое число страниц в секунду. Прокси на охлаждении
+хранятся в куче по времени окончания охлаждения и возвращаются в выбор
+по мере его истечения.
+
+Выбор оценивает всех доступных кандидатов (O(n)): выборка Thompson sampling
+и бонус UCB меняются при каждом выборе, поэтому кучу по оценке поддерживать
+нельзя. За O(log n) выполняется возврат прокси с охлаждения.
+"""
+import math
+import time
+import heapq
+import random
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from config import (
+    PROXY_HEALTH_HISTORY_SIZE,
+    PROXY_SELECTION_POLICY,
+    PROXY_LATENCY_EWMA_ALPHA,
+    PROXY_DEFAULT_PAGE_LATENCY,
+)
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+OUTCOME_BLOCKED = "blocked"
+
+BLOCK_WEIGHT = 2  # Блокировка дороже обычной неудачи: за ней следует смена прокси и охлаждение
+
+
+class ProxyHealth:
+    """Статистика одного прокси"""
+
+    __slots__ = ("ewma_latency", "history")
+
+    def __init__(self, ewma_latency: Optional[float] = None, history: Iterable[str] = ()):
+        self.ewma_latency = ewma_latency
+        self.history: Deque[str] = deque(history, maxlen=PROXY_HEALTH_HISTORY_SIZE)
+
+    def counts(self) -> Tuple[int, int, int]:
+        """(успехи, неудачи, блокировки) в окне истории"""
+        successes = failures = blocks = 0
+        for outcome in self.history:
+            if outcome == OUTCOME_SUCCESS:
+                successes += 1
+            elif outcome == OUTCOME_BLOCKED:
+                blocks += 1
+            else:
+                failures += 1
+        return successes, failures, blocks
+
+
+class ProxySelector:
+    """Бандитный выбор прокси с охлаждением на куче"""
+
+    def __init__(self, store=None, policy: str = PROXY_SELECTION_POLICY,
+                 rng: Optional[random.Random] = None):
+        self.policy = policy
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.health: Dict[str, ProxyHealth] = {}
+        self.cooldown_heap: List[Tuple[float, str]] = []
+        self.cooldown_until: Dict[str, float] = {}
+        self.total_reports = 0
+        if store is not None:
+            self._load(store)
+
+    def _load(self, store):
+        """Восстанавливает статистику из proxy_events (ProxyStateStore)"""
+        try:
+            events = store.load_events()
+        except Exception as e:
+            logger.warning(f"Failed to load proxy health history: {e}")
+            return
+        for key, key_events in events.items():
+            for outcome, reason, latency in key_events:
+                if outcome != OUTCOME_SUCCESS:
+                    outcome = OUTCOME_BLOCKED if reason == 'cloudflare_block' else OUTCOME_FAILURE
+                self._record(key, outcome, latency)
+        if self.health:
+            logger.info(f"Loaded health history for {len(self.health)} proxies")
+
+    def _record(self, key: str, outcome: str, latency: Optional[float]):
+        """Добавляет исход в историю и EWMA (вызывать под lock)"""
+        health = self.health.get(key)
+        if health is None:
+            health = self.health[key] = ProxyHealth()
+        health.history.append(outcome)
+        if latency is not None and latency > 0:
+            if health.ewma_latency is None:
+                health.ewma_latency = latency
+            else:
+                health.ewma_latency = (
+                    PROXY_LATENCY_EWMA_ALPHA * latency
+                    + (1 - PROXY_LATENCY_EWMA_ALPHA) * health.ewma_latency
+                )
+        self.total_reports += 1
+
+    def report(self, key: str, outcome: str, latency: Optional[float] = None):
+        """
+        Фиксирует исход использования прокси.
+
+        Args:
+            key: "ip:port"
+            outcome: OUTCOME_SUCCESS / OUTCOME_FAILURE / OUTCOME_BLOCKED
+            latency: Время загрузки страницы в секундах (только для успешных)
+        """
+        with self.lock:
+            self._record(key, outcome, latency)
+
+    def cool_down(self, key: str, until: float):
+        """Отправляет прокси на охлаждение до указанного времени (unix time)"""
+        with self.lock:
+            if until <= self.cooldown_until.get(key, 0):
+                return
+            self.cooldown_until[key] = until
+            heapq.heappush(self.cooldown_heap, (until, key))
+
+    def release(self, key: str):
+        """Досрочно снимает охлаждение (например, после успешной проверки)"""
+        with self.lock:
+            self.cooldown_until.pop(key, None)
+
+    def _release_expired(self, now: float):
+        """Снимает истекшие охлаждения: O(log n) на каждую запись (вызывать под lock)"""
+        while self.cooldown_heap and self.cooldown_heap[0][0] <= now:
+            until, key = heapq.heappop(self.cooldown_heap)
+            # Устаревшие записи кучи (охлаждение продлено или снято) пропускаем
+            if self.cooldown_until.get(key) == until:
+                del self.cooldown_until[key]
+
+    def is_cooling(self, key: str) -> bool:
+        with self.lock:
+            self._release_expired(time.time())
+            return key in self.cooldown_until
+
+    def _expected_latency(self, health: Optional[ProxyHealth]) -> float:
+        if health is not None and health.ewma_latency:
+            return max(health.ewma_latency, 0.5)
+        return PROXY_DEFAULT_PAGE_LATENCY
+
+    def _score(self, key: str) -> float:
+        """Оценка прокси (ожидаемые страницы в секунду) по текущей политике (вызывать под lock)"""
+        if self.policy == "random":
+            return self.rng.random()
+        health = self.health.get(key)
+        successes, failures, blocks = health.counts() if health is not None else (0, 0, 0)
+        penalties = failures + BLOCK_WEIGHT * blocks
+        if self.policy == "ucb":
+            trials = successes + penalties
+            mean = (successes + 1) / (trials + 2)
+            bonus = math.sqrt(2 * math.log(self.total_reports + 2) / (trials + 1))
+            success_estimate = min(1.0, mean + bonus)
+        else:
+            success_estimate = self.rng.betavariate(1 + successes, 1 + penalties)
+        return success_estimate / self._expected_latency(health)
+
+    def choose(self, keys: Iterable[str]) -> Optional[str]:
+        """
+        Выбирает лучший прокси среди кандидатов, пропуская прокси на охлаждении.
+
+        Returns:
+            Ключ выбранного прокси или None, если доступных нет
+        """
+        with self.lock:
+            self._release_expired(time.time())
+            best_key = None
+            best_score = -1.0
+            for key in keys:
+                if key in self.cooldown_until:
+                    continue
+                score = self._score(key)
+                if score > best_score:
+                    best_key, best_score = key, score
+            return best_key
+
+    def rank(self, items: List, key_func: Callable = lambda p: f"{p.get('ip')}:{p.get('port')}") -> List:
+        """Упорядочивает кандидатов по оценке (прокси на охлаждении - в конце)"""
+        with self.lock:
+            self._release_expired(time.time())
+            scored = []
+            for item in items:
+                key = key_func(item)
+                score = -1.0 if key in self.cooldown_until else self._score(key)
+                scored.append((score, item))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [item for _, item in scored]
+
+    def summary(self, key: str) -> Dict:
+        """Сводка по прокси для логов"""
+        with self.lock:
+            health = self.health.get(key)
+            if health is None or not health.history:
+                return {'samples': 0, 'success_rate': None, 'block_rate': None, 'ewma_latency': None}
+            successes, failures, blocks = health.counts()
+            total = len(health.history)
+            return {
+                'samples': total,
+                'success_rate': round(successes / total, 2),
+                'block_rate': round(blocks / total, 2),
+                'ewma_latency': round(health.ewma_latency, 2) if health.ewma_latency else None,
+            }
@@ -0,0 +1,186 @@
+"""
+Кеш результатов источников прокси и статистика их выхода.
+
+Каждый источник из PROXY_SOURCES кешируется в отдельном файле со своим TTL,
+чтобы при обновлении списка заново загружались только устаревшие источники.
+"""
+import os
+import json
+import time
+import threading
+from typing import List, Dict, Optional
+from datetime import datetime
+from loguru import logger
+
+from config import (
+    PROXY_SOURCE_CACHE_DIR,
+    PROXY_SOURCE_STATS_FILE,
+    PROXY_SOURCE_DEFAULT_TIMEOUT,
+    PROXY_SOURCE_DEFAULT_CACHE_TTL,
+    PROXY_SOURCES,
+)
+
+
+def get_source_timeout(source_name: str) -> float:
+    """Возвращает время ожидания результата источника (секунды)"""
+    return PROXY_SOURCES.get(source_name, {}).get('timeout', PROXY_SOURCE_DEFAULT_TIMEOUT)
+
+
+def get_source_cache_ttl(source_name: str) -> float:
+    """Возвращает время жизни кеша источника (секунды)"""
+    return PROXY_SOURCES.get(source_name, {}).get('cache_ttl', PROXY_SOURCE_DEFAULT_CACHE_TTL)
+
+
+class SourceResultCache:
+    """Дисковый кеш разобранных прокси по источникам (один JSON-файл на источник)"""
+
+    def __init__(self, cache_dir: str = PROXY_SOURCE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, source_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{source_name}.json")
+
+    def get(self, source_name: str, country_filter: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        """
+        Возвращает закешированные прокси источника, если кеш не устарел.
+
+        Args:
+            source_name: Имя источника из PROXY_SOURCES
+            country_filter: Фильтр по странам, с которым был получен результат
+
+        Returns:
+            Список прокси или None, если кеша нет или он устарел
+        """
+        path = self._path(source_name)
+        try:
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            age = time.time() - float(data.get('fetched_at', 0))
+            if age > get_source_cache_ttl(source_name):
+                return None
+            if sorted(data.get('country_filter') or []) != sorted(country_filter or []):
+                return None
+            return data.get('proxies', [])
+        except Exception as e:
+            logger.debug(f"Failed to read source cache for {source_name}: {e}")
+            return None
+
+    def put(self, source_name: str, proxies: List[Dict], country_filter: Optional[List[str]] = None):
+        """Сохраняет результат источника (атомарно, через временный файл)"""
+        path = self._path(source_name)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fetched_at': time.time(),
+                    'country_filter': list(country_filter or []),
+                    'proxies': proxies,
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.debug(f"Failed to write source cache for {source_name}: {e}")
+
+
+class SourceYieldStats:
+    """
+    Накопительная статистика по источникам: сколько кандидатов дал источник,
+    сколько из них уникальных и сколько в итоге оказались рабочими.
+    """
+
+    def __init__(self, stats_file: str = PROXY_SOURCE_STATS_FILE):
+        self.stats_file = stats_file
+        self.lock = threading.Lock()
+        self.stats = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.debug(f"Failed to load source stats: {e}")
+        return {}
+
+    def _save(self):
+        tmp_path = f"{self.stats_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.stats, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.stats_file)
+        except Exception as e:
+            logger.debug(f"Failed to save source stats: {e}")
+
+    def _entry(self, source_name: str) -> Dict:
+        return self.stats.setdefault(source_name, {
+            'fetches': 0,
+            'cache_hits': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'candidates': 0,
+            'unique_candidates': 0,
+            'working': 0,
+            'last_fetch_seconds': None,
+            'last_fetch_at': None,
+            'last_working_at': None,
+        })
+
+    def record_fetch(
+        self,
+        source_name: str,
+        candidates: int,
+        unique_candidates: int,
+        duration: float,
+        from_cache: bool = False,
+        timed_out: bool = False,
+        error: bool = False,
+    ):
+        """Фиксирует результат одной загрузки источника"""
+        with self.lock:
+            entry = self._entry(source_name)
+            if from_cache:
+                entry['cache_hits'] += 1
+            else:
+                entry['fetches'] += 1
+                entry['last_fetch_seconds'] = round(duration, 2)
+                entry['last_fetch_at'] = datetime.now().isoformat()
+            if timed_out:
+                entry['timeouts'] += 1
+            if error:
+                entry['errors'] += 1
+            entry['candidates'] += candidates
+            entry['unique_candidates'] += unique_candidates
+
+    def record_working(self, source_name: str):
+        """Увеличивает счетчик рабочих прокси источника (на диск - при flush)"""
+        if not source_name or source_name not in PROXY_SOURCES:
+            return
+        with self.lock:
+            entry = self._entry(source_name)
+            entry['working'] += 1
+            entry['last_working_at'] = datetime.now().isoformat()
+
+    def flush(self):
+        """Сохраняет статистику на диск"""
+        with self.lock:
+            self._save()
+
+    def log_summary(self):
+        """Выводит в лог выход по источникам (рабочих на 1000 уникальных кандидатов)"""
+        with self.lock:
+            rows = []
+            for name, entry in self.stats.items():
+                unique = entry.get('unique_candidates', 0)
+                working = entry.get('working', 0)
+                per_thousand = (working * 1000 / unique) if unique else 0.0
+                rows.append((per_thousand, name, entry))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        for per_thousand, name, entry in rows:
+            logger.info(
+                f"Source {name}: {entry.get('unique_candidates', 0)} unique candidates, "
+                f"{entry.get('working', 0)} working ({per_thousand:.2f}/1000), "
+                f"last fetch {entry.get('last_fetch_seconds')}s, "
+                f"timeouts {entry.get('timeouts', 0)}, cache hits {entry.get('cache_hits', 0)}"
+            )
@@ -0,0 +1,330 @@
+"""
+Хранилище состояния прокси на SQLite (режим WAL).
+
+Хранит по каждому прокси (ip, port, protocol): время последней проверки,
+количество страниц, историю исходов и записи негативного кеша с временем
+окончания охлаждения. Каждая операция затрагивает одну строку по первичному
+ключу, поэтому не требует перезаписи всего состояния. Соединения открываются
+отдельно для каждого потока, читатели в WAL не блокируют писателя.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+from loguru import logger
+
+from config import (
+    PROXY_STATE_DB,
+    PROXY_HEALTH_HISTORY_SIZE,
+    PROXY_FAILURE_COOLDOWN_THRESHOLD,
+    PROXY_COOLDOWN_SECONDS,
+)
+
+MAX_COOLDOWN_SECONDS = 24 * 3600  # Верхняя граница охлаждения при повторных неудачах
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxies (
+    ip TEXT NOT NULL,
+    port TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    country TEXT DEFAULT '',
+    source TEXT DEFAULT 'unknown',
+    is_successful INTEGER NOT NULL DEFAULT 0,
+    last_verified TEXT,
+    total_pages INTEGER,
+    successes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ip, port, protocol)
+);
+CREATE INDEX IF NOT EXISTS idx_proxies_successful ON proxies (is_successful, last_verified);
+
+CREATE TABLE IF NOT EXISTS proxy_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ip TEXT NOT NULL,
+    port TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    ts REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    reason TEXT,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_proxy_events_key ON proxy_events (ip, port, protocol, id);
+
+CREATE TABLE IF NOT EXISTS negative_cache (
+    ip TEXT NOT NULL,
+    port TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (ip, port, protocol)
+);
+CREATE INDEX IF NOT EXISTS idx_negative_cache_expires ON negative_cache (expires_at);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def proxy_db_key(proxy: Dict) -> Tuple[str, str, str]:
+    """Ключ прокси в хранилище: (ip, port, protocol)"""
+    return (
+        str(proxy.get('ip', '')),
+        str(proxy.get('port', '')),
+        str(proxy.get('protocol', 'http')).lower(),
+    )
+
+
+def get_cooldown_seconds(reason: Optional[str], consecutive_failures: int = 1) -> int:
+    """
+    Длительность охлаждения для причины неудачи.
+    После PROXY_FAILURE_COOLDOWN_THRESHOLD неудач подряд охлаждение удваивается
+    с каждой следующей неудачей (но не больше MAX_COOLDOWN_SECONDS).
+    """
+    base = PROXY_COOLDOWN_SECONDS.get(reason or 'default', PROXY_COOLDOWN_SECONDS['default'])
+    extra = max(0, consecutive_failures - PROXY_FAILURE_COOLDOWN_THRESHOLD + 1)
+    return int(min(base * (2 ** extra), MAX_COOLDOWN_SECONDS))
+
+
+class ProxyStateStore:
+    """Хранилище состояния прокси (успешные, история, негативный кеш)"""
+
+    def __init__(self, db_path: str = PROXY_STATE_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция записи (BEGIN IMMEDIATE): чтения внутри видят состояние, которое никто не изменит до COMMIT"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            raise
+
+    def _write(self, statements: List[Tuple[str, tuple]]):
+        """Выполняет несколько операторов одной транзакцией"""
+        with self._transaction() as conn:
+            for sql, params in statements:
+                conn.execute(sql, params)
+
+    @staticmethod
+    def _event_statements(key: Tuple[str, str, str], outcome: str,
+                          reason: Optional[str], latency: Optional[float]) -> List[Tuple[str, tuple]]:
+        """Вставка события и обрезка истории до PROXY_HEALTH_HISTORY_SIZE последних записей"""
+        return [
+            (
+                "INSERT INTO proxy_events (ip, port, protocol, ts, outcome, reason, latency) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (time.time(), outcome, reason, latency),
+            ),
+            (
+                "DELETE FROM proxy_events WHERE ip = ? AND port = ? AND protocol = ? AND id <= ("
+                "SELECT id FROM proxy_events WHERE ip = ? AND port = ? AND protocol = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                key + key + (PROXY_HEALTH_HISTORY_SIZE,),
+            ),
+        ]
+
+    def record_success(self, proxy: Dict, latency: Optional[float] = None):
+        """Отмечает успешную проверку: обновляет last_verified, total_pages и снимает охлаждение"""
+        key = proxy_db_key(proxy)
+        now_iso = datetime.now().isoformat()
+        statements = [
+            (
+                "INSERT INTO proxies (ip, port, protocol, country, source, is_successful, last_verified, "
+                "total_pages, successes, failures, consecutive_failures) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?, ?, 1, 0, 0) "
+                "ON CONFLICT (ip, port, protocol) DO UPDATE SET "
+                "is_successful = 1, last_verified = excluded.last_verified, "
+                "total_pages = COALESCE(excluded.total_pages, proxies.total_pages), "
+                "country = CASE WHEN excluded.country != '' THEN excluded.country ELSE proxies.country END, "
+                "successes = proxies.successes + 1, consecutive_failures = 0",
+                key + (proxy.get('country', '') or '', proxy.get('source', 'unknown') or 'unknown',
+                       now_iso, proxy.get('total_pages')),
+            ),
+            ("DELETE FROM negative_cache WHERE ip = ? AND port = ? AND protocol = ?", key),
+        ]
+        statements.extend(self._event_statements(key, 'success', None, latency))
+        self._write(statements)
+
+    def record_failure(self, proxy: Dict, reason: Optional[str] = None) -> float:
+        """
+        Отмечает неудачу: снимает флаг успешного и добавляет запись в негативный кеш.
+
+        Returns:
+            Время окончания охлаждения (unix time)
+        """
+        key = proxy_db_key(proxy)
+        reason = reason if reason in PROXY_COOLDOWN_SECONDS else 'default'
+        # Счетчик читается в той же транзакции, что и увеличивается: две одновременные
+        # неудачи одного прокси получают разные шаги охлаждения
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO proxies (ip, port, protocol, country, source, is_successful, "
+                "successes, failures, consecutive_failures) "
+                "VALUES (?, ?, ?, ?, ?, 0, 0, 1, 1) "
+                "ON CONFLICT (ip, port, protocol) DO UPDATE SET "
+                "is_successful = 0, failures = proxies.failures + 1, "
+                "consecutive_failures = proxies.consecutive_failures + 1",
+                key + (proxy.get('country', '') or '', proxy.get('source', 'unknown') or 'unknown'),
+            )
+            consecutive = conn.execute(
+                "SELECT consecutive_failures FROM proxies WHERE ip = ? AND port = ? AND protocol = ?", key
+            ).fetchone()['consecutive_failures']
+            expires_at = time.time() + get_cooldown_seconds(reason, consecutive)
+            conn.execute(
+                "INSERT INTO negative_cache (ip, port, protocol, reason, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (ip, port, protocol) DO UPDATE SET "
+                "reason = excluded.reason, expires_at = excluded.expires_at",
+                key + (reason, expires_at),
+            )
+            for sql, params in self._event_statements(key, 'failure', reason, None):
+                conn.execute(sql, params)
+        return expires_at
+
+    def record_event(self, proxy: Dict, outcome: str, reason: Optional[str] = None,
+                     latency: Optional[float] = None):
+        """Добавляет исход в историю прокси, не меняя его статус (например, загрузка страницы каталога)"""
+        self._write(self._event_statements(proxy_db_key(proxy), outcome, reason, latency))
+
+    def load_successful(self, max_age_hours: int = 24) -> List[Dict]:
+        """
+        Возвращает успешные прокси (свежие первыми) и снимает флаг с устаревших.
+
+        Args:
+            max_age_hours: Максимальный возраст проверки в часах (0 = без ограничения)
+        """
+        if max_age_hours > 0:
+            cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+            cursor = self._conn().execute(
+                "UPDATE proxies SET is_successful = 0 WHERE is_successful = 1 AND last_verified < ?",
+                (cutoff,)
+            )
+            if cursor.rowcount:
+                logger.info(f"Removed {cursor.rowcount} expired proxies (older than {max_age_hours}h)")
+        rows = self._conn().execute(
+            "SELECT ip, port, protocol, country, source, last_verified, total_pages FROM proxies "
+            "WHERE is_successful = 1 ORDER BY last_verified DESC"
+        ).fetchall()
+        proxies = []
+        for row in rows:
+            proxy = {
+                'ip': row['ip'],
+                'port': row['port'],
+                'protocol': row['protocol'],
+                'country': row['country'] or '',
+                'source': row['source'] or 'unknown',
+                'last_verified': row['last_verified'],
+            }
+            if row['total_pages'] is not None:
+                proxy['total_pages'] = row['total_pages']
+            proxies.append(proxy)
+        return proxies
+
+    def load_negative_cache(self) -> Dict[Tuple[str, str, str], Tuple[str, float]]:
+        """Возвращает действующие записи негативного кеша и удаляет истекшие"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM negative_cache WHERE expires_at <= ?", (now,))
+        rows = conn.execute("SELECT ip, port, protocol, reason, expires_at FROM negative_cache").fetchall()
+        return {
+            (row['ip'], row['port'], row['protocol']): (row['reason'], row['expires_at'])
+            for row in rows
+        }
+
+    def get_history(self, proxy: Dict) -> List[Dict]:
+        """История последних исходов прокси (старые первыми)"""
+        rows = self._conn().execute(
+            "SELECT ts, outcome, reason, latency FROM proxy_events "
+            "WHERE ip = ? AND port = ? AND protocol = ? ORDER BY id",
+            proxy_db_key(proxy)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_events(self) -> Dict[str, List[Tuple[str, Optional[str], Optional[float]]]]:
+        """История исходов всех прокси: "ip:port" -> [(outcome, reason, latency)] (старые первыми)"""
+        rows = self._conn().execute(
+            "SELECT ip, port, outcome, reason, latency FROM proxy_events ORDER BY id"
+        ).fetchall()
+        events: Dict[str, List[Tuple[str, Optional[str], Optional[float]]]] = {}
+        for row in rows:
+            events.setdefault(f"{row['ip']}:{row['port']}", []).append(
+                (row['outcome'], row['reason'], row['latency'])
+            )
+        return events
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key: str, value: str):
+        self._conn().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Однократно переносит successful_proxies.json в хранилище.
+
+        Returns:
+            Количество перенесенных прокси
+        """
+        if self.get_meta('json_migrated') or not os.path.exists(json_path):
+            return 0
+        migrated = 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                proxies = json.load(f)
+            statements = []
+            for proxy in proxies:
+                if not proxy.get('ip') or not proxy.get('port'):
+                    continue
+                statements.append((
+                    "INSERT OR IGNORE INTO proxies (ip, port, protocol, country, source, is_successful, "
+                    "last_verified, total_pages, successes) VALUES (?, ?, ?, ?, ?, 1, ?, ?, 1)",
+                    proxy_db_key(proxy) + (
+                        proxy.get('country', '') or '',
+                        proxy.get('source', 'unknown') or 'unknown',
+                        proxy.get('last_verified') or datetime.now().isoformat(),
+                        proxy.get('total_pages'),
+                    ),
+                ))
+            if statements:
+                self._write(statements)
+            migrated = len(statements)
+            logger.info(f"Migrated {migrated} successful proxies from {json_path} to {self.db_path}")
+        except Exception as e:
+            logger.warning(f"Failed to migrate successful proxies from JSON: {e}")
+        self.set_meta('json_migrated', datetime.now().isoformat())
+        return migrated
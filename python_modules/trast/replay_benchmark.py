@@ -0,0 +1,221 @@
+"""
+Офлайн-прогон классификации и извлечения trast по корпусу HTML-фикстур (fixtures.py).
+
+Для каждой фикстуры выполняются те же функции, что и при парсинге живого сайта:
+разбор BeautifulSoup, has_catalog_structure, is_page_blocked,
+get_products_from_page_soup, is_page_empty, get_pages_count_from_soup и
+page_payload_from_source. Выводится скорость (страниц в секунду), время каждой
+функции, расхождения с решением парсера при записи фикстуры (expected) и с
+результатами предыдущей версии (--compare).
+
+Использование:
+    python replay_benchmark.py --repeat 3 --save replay_new.json
+    python replay_benchmark.py --compare replay_old.json --fail-on-diff
+"""
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from config import FIXTURES_DIR
+from checkpoint import products_hash
+from fixtures import load_fixtures
+from utils import (
+    has_catalog_structure, is_page_blocked, get_products_from_page_soup, is_page_empty,
+    get_pages_count_from_soup, page_payload_from_source, is_payload_blocked,
+    get_payload_page_status, PaginationNotDetectedError
+)
+
+STAGES = (
+    "soup",
+    "has_catalog_structure",
+    "is_page_blocked",
+    "get_products_from_page_soup",
+    "is_page_empty",
+    "get_pages_count_from_soup",
+    "page_payload_from_source",
+)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def replay_fixture(html: str, timings: Dict[str, float]) -> Dict:
+    """Прогоняет одну страницу через весь стек разбора, добавляя время функций в timings"""
+    def timed(stage, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[stage] += time.perf_counter() - started
+
+    soup = timed("soup", BeautifulSoup, html, 'html.parser')
+    structure = timed("has_catalog_structure", has_catalog_structure, soup)
+    block_check = timed("is_page_blocked", is_page_blocked, soup, html)
+    products, products_in_stock, total_products = timed("get_products_from_page_soup", get_products_from_page_soup, soup)
+    page_status = timed("is_page_empty", is_page_empty, soup, html, products_in_stock, total_products)
+    try:
+        pages_count = timed("get_pages_count_from_soup", get_pages_count_from_soup, soup, html)
+        pages_outcome = "partial" if pages_count is None else ("count" if pages_count else "undetermined")
+    except PaginationNotDetectedError:
+        pages_count = None
+        pages_outcome = "blocked"
+    payload = timed("page_payload_from_source", page_payload_from_source, html)
+    payload_status = get_payload_page_status(payload)
+
+    return {
+        'has_structure': structure,
+        'blocked': block_check["blocked"],
+        'block_reason': block_check["reason"],
+        'status': page_status["status"],
+        'status_reason': page_status["reason"],
+        'products_in_stock': products_in_stock,
+        'total_products': total_products,
+        'products_hash': products_hash(products),
+        'pages_count': pages_count or None,
+        'pages_outcome': pages_outcome,
+        'payload_blocked': is_payload_blocked(payload)["blocked"],
+        'payload_status': payload_status["status"],
+        'payload_products_hash': products_hash(payload["products"]),
+    }
+
+
+def run_replay(fixtures: List[Dict], repeat: int = 1) -> Dict:
+    """
+    Прогоняет корпус repeat раз.
+
+    Returns:
+        {"created_at", "git_rev", "fixtures", "repeat", "pages_per_second", "timings", "results"}
+    """
+    timings = OrderedDict((stage, 0.0) for stage in STAGES)
+    results = {}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for fixture in fixtures:
+            results[fixture['id']] = replay_fixture(fixture['html'], timings)
+    elapsed = time.perf_counter() - started
+    pages = len(fixtures) * repeat
+    return {
+        'created_at': datetime.now().isoformat(),
+        'git_rev': _git_revision(),
+        'fixtures': len(fixtures),
+        'repeat': repeat,
+        'elapsed': round(elapsed, 4),
+        'pages_per_second': round(pages / elapsed, 2) if elapsed else None,
+        'timings': {stage: round(seconds, 6) for stage, seconds in timings.items()},
+        'results': results,
+    }
+
+
+def check_expected(fixtures: List[Dict], results: Dict[str, Dict]) -> List[str]:
+    """Сравнивает результаты с решениями парсера, записанными вместе с фикстурами"""
+    mismatches = []
+    for fixture in fixtures:
+        result = results[fixture['id']]
+        for key, expected in (fixture['meta'].get('expected') or {}).items():
+            if key in result and result[key] != expected:
+                mismatches.append(f"{fixture['id']}: {key} expected {expected!r}, got {result[key]!r}")
+    return mismatches
+
+
+def diff_results(previous: Dict, current: Dict) -> List[str]:
+    """Расхождения результатов между двумя прогонами (по id фикстур)"""
+    diffs = []
+    old_results, new_results = previous.get('results', {}), current.get('results', {})
+    for fixture_id in sorted(set(old_results) | set(new_results)):
+        if fixture_id not in new_results:
+            diffs.append(f"{fixture_id}: missing in current corpus")
+            continue
+        if fixture_id not in old_results:
+            diffs.append(f"{fixture_id}: new fixture")
+            continue
+        old, new = old_results[fixture_id], new_results[fixture_id]
+        for key in sorted(set(old) | set(new)):
+            if old.get(key) != new.get(key):
+                diffs.append(f"{fixture_id}: {key} {old.get(key)!r} -> {new.get(key)!r}")
+    return diffs
+
+
+def log_report(report: Dict, previous: Optional[Dict] = None):
+    pages = report['fixtures'] * report['repeat']
+    total = sum(report['timings'].values()) or 1.0
+    logger.info(
+        f"Replayed {report['fixtures']} fixtures x{report['repeat']} in {report['elapsed']:.2f}s: "
+        f"{report['pages_per_second']} pages/s (rev {report['git_rev'] or 'unknown'})"
+    )
+    for stage, seconds in report['timings'].items():
+        line = (
+            f"  {stage}: {seconds * 1000 / max(pages, 1):.2f} ms/page "
+            f"({seconds / total * 100:.0f}% of stack)"
+        )
+        old_seconds = (previous or {}).get('timings', {}).get(stage)
+        if old_seconds:
+            old_pages = previous['fixtures'] * previous['repeat']
+            old_per_page = old_seconds / max(old_pages, 1)
+            line += f", was {old_per_page * 1000:.2f} ms/page ({seconds / max(pages, 1) / old_per_page:.2f}x)"
+        logger.info(line)
+    if previous and previous.get('pages_per_second'):
+        logger.info(
+            f"Throughput vs {previous.get('git_rev') or previous.get('created_at')}: "
+            f"{previous['pages_per_second']} -> {report['pages_per_second']} pages/s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay trast parsing stack over the HTML fixture corpus")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture corpus directory")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the corpus N times for stable timings")
+    parser.add_argument("--save", help="Save results JSON to this file")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit with code 1 on result diffs or expected mismatches")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        logger.error(f"No fixtures found in {args.fixtures}")
+        sys.exit(1)
+
+    # Логи классификаторов на каждую страницу искажают замер
+    logger.disable("utils")
+    try:
+        report = run_replay(fixtures, max(1, args.repeat))
+    finally:
+        logger.enable("utils")
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    log_report(report, previous)
+
+    mismatches = check_expected(fixtures, report['results'])
+    for mismatch in mismatches:
+        logger.warning(f"Expected mismatch: {mismatch}")
+    diffs = diff_results(previous, report) if previous else []
+    for diff in diffs:
+        logger.warning(f"Result diff: {diff}")
+    logger.info(f"{len(mismatches)} expected mismatches, {len(diffs)} result diffs")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Results saved to {args.save}")
+
+    if args.fail_on_diff and (mismatches or diffs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Блокировка лишних ресурсов в браузерах trast.
+
+Блокируются запросы к хостам аналитики (RESOURCE_BLOCK_HOSTS) и файлы с
+расширениями из RESOURCE_BLOCK_EXTENSIONS (картинки, шрифты, медиа). HTML,
+скрипты и XHR не трогаются, поэтому JS challenge продолжает работать; хосты
+из RESOURCE_ALLOWED_HOSTS не блокируются никогда.
+
+- Chrome: CDP Network.setBlockedURLs (шаблоны URL). CDP не поддерживает
+  исключения, поэтому allowlist только убирает хосты из списка блокировки,
+  а шаблоны расширений действуют для всех хостов.
+- Firefox: временное WebExtension-дополнение с webRequest, которое проверяет
+  allowlist перед блокировкой.
+"""
+import os
+import json
+import zipfile
+import threading
+from typing import Dict, List, Optional
+from loguru import logger
+
+from config import (
+    DRIVER_CACHE_DIR,
+    RESOURCE_BLOCK_STYLESHEETS,
+    RESOURCE_BLOCK_EXTENSIONS,
+    RESOURCE_BLOCK_HOSTS,
+    RESOURCE_ALLOWED_HOSTS,
+)
+
+FIREFOX_BLOCKER_XPI = os.path.join(DRIVER_CACHE_DIR, "trast_resource_blocker.xpi")
+
+FIREFOX_BLOCKER_MANIFEST = {
+    "manifest_version": 2,
+    "name": "trast resource blocker",
+    "version": "1.0",
+    "browser_specific_settings": {"gecko": {"id": "resource-blocker@trast"}},
+    "permissions": ["webRequest", "webRequestBlocking", "<all_urls>"],
+    "background": {"scripts": ["background.js"]},
+}
+
+FIREFOX_BLOCKER_JS = """
+const CONFIG = %s;
+const BLOCKED_TYPES = new Set(CONFIG.types);
+function hostMatches(host, hosts) {
+    return hosts.some(function (h) { return host === h || host.endsWith('.' + h); });
+}
+browser.webRequest.onBeforeRequest.addListener(function (details) {
+    let url;
+    try { url = new URL(details.url); } catch (e) { return {}; }
+    if (hostMatches(url.hostname, CONFIG.allowed_hosts)) return {};
+    if (hostMatches(url.hostname, CONFIG.blocked_hosts)) return {cancel: true};
+    if (BLOCKED_TYPES.has(details.type)) return {cancel: true};
+    const path = url.pathname.toLowerCase();
+    if (CONFIG.extensions.some(function (ext) { return path.endsWith('.' + ext); })) return {cancel: true};
+    return {};
+}, {urls: ['<all_urls>']}, ['blocking']);
+"""
+
+PAGE_TRANSFER_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? (nav.transferSize || nav.encodedBodySize || 0) : 0;
+resources.forEach(function (r) { bytes += r.transferSize || r.encodedBodySize || 0; });
+return {
+    bytes: bytes,
+    requests: resources.length + (nav ? 1 : 0),
+    load_time: nav ? (nav.loadEventEnd || nav.duration) / 1000 : null
+};
+"""
+
+_xpi_lock = threading.Lock()
+
+
+def _blocked_hosts() -> List[str]:
+    return [host for host in RESOURCE_BLOCK_HOSTS if host not in RESOURCE_ALLOWED_HOSTS]
+
+
+def _blocked_extensions() -> List[str]:
+    return list(RESOURCE_BLOCK_EXTENSIONS) + (["css"] if RESOURCE_BLOCK_STYLESHEETS else [])
+
+
+def chrome_blocked_url_patterns() -> List[str]:
+    """Шаблоны для CDP Network.setBlockedURLs"""
+    patterns = []
+    for ext in _blocked_extensions():
+        patterns.extend([f"*.{ext}", f"*.{ext}?*"])
+    for host in _blocked_hosts():
+        patterns.extend([f"*://{host}/*", f"*://*.{host}/*"])
+    return patterns
+
+
+def apply_chrome_resource_blocking(driver) -> bool:
+    """Включает блокировку ресурсов в Chrome через CDP"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": chrome_blocked_url_patterns()})
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to enable Chrome resource blocking: {e}")
+        return False
+
+
+def get_firefox_blocker_extension() -> str:
+    """Собирает (при изменении настроек) XPI-дополнение для блокировки ресурсов"""
+    config = {
+        "types": ["image", "imageset", "font", "media"] + (["stylesheet"] if RESOURCE_BLOCK_STYLESHEETS else []),
+        "extensions": _blocked_extensions(),
+        "blocked_hosts": _blocked_hosts(),
+        "allowed_hosts": list(RESOURCE_ALLOWED_HOSTS),
+    }
+    background_js = FIREFOX_BLOCKER_JS % json.dumps(config)
+    manifest_json = json.dumps(FIREFOX_BLOCKER_MANIFEST, indent=2)
+    with _xpi_lock:
+        if os.path.exists(FIREFOX_BLOCKER_XPI):
+            try:
+                with zipfile.ZipFile(FIREFOX_BLOCKER_XPI) as xpi:
+                    if xpi.read("background.js").decode("utf-8") == background_js:
+                        return FIREFOX_BLOCKER_XPI
+            except Exception:
+                pass
+        os.makedirs(DRIVER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{FIREFOX_BLOCKER_XPI}.tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as xpi:
+            xpi.writestr("manifest.json", manifest_json)
+            xpi.writestr("background.js", background_js)
+        os.replace(tmp_path, FIREFOX_BLOCKER_XPI)
+    return FIREFOX_BLOCKER_XPI
+
+
+def apply_firefox_resource_blocking(driver) -> bool:
+    """Устанавливает в Firefox временное дополнение блокировки ресурсов"""
+    try:
+        driver.install_addon(get_firefox_blocker_extension(), temporary=True)
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to install Firefox resource blocker: {e}")
+        return False
+
+
+def get_page_transfer_stats(driver) -> Optional[Dict]:
+    """
+    Объем и время загрузки текущей страницы по Resource Timing API.
+
+    Returns:
+        {"bytes": int, "requests": int, "load_time": float | None} или None при ошибке
+    """
+    try:
+        return driver.execute_script(PAGE_TRANSFER_JS)
+    except Exception as e:
+        logger.debug(f"Failed to read page transfer stats: {e}")
+        return None
@@ -0,0 +1,262 @@
+"""
+Обход каталога trast через WooCommerce Store API вместо постраничного HTML.
+
+trast-zapchast.ru - магазин WooCommerce, и /wp-json/wc/store/products отдает
+каталог JSON-страницами по STORE_API_PER_PAGE товаров (HTML - по 16 карточек
+через браузер). Товары приводятся к тем же полям, что и get_products_from_page_soup
+(build_product), с тем же отбором "В наличии". Запросы идут через requests с
+тем же прокси; если сайт отвечает страницей защиты, cookie и User-Agent
+берутся из браузера, прошедшего защиту, и запрос повторяется.
+
+Любая ошибка (нет эндпоинта, формат без артикулов, повторная блокировка,
+исчерпаны попытки) поднимает StoreApiError - вызывающий код переходит на
+обычный парсинг HTML. Локально режим проверяется симулятором proxy_farm_sim.py,
+который отдает тот же каталог и в JSON.
+"""
+import html
+import time
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from bs4 import BeautifulSoup
+from loguru import logger
+
+from config import (
+    TARGET_URL,
+    USER_AGENTS,
+    STORE_API_URL,
+    STORE_API_PER_PAGE,
+    STORE_API_TIMEOUT,
+    STORE_API_RETRIES,
+    STORE_API_DELAY,
+    STORE_API_MIN_ARTICLE_SHARE,
+)
+from utils import build_product, create_driver, wait_for_cloudflare
+
+ARTICLE_ATTRIBUTES = ("артикул", "article", "sku")
+MANUFACTURER_ATTRIBUTES = ("производитель", "бренд", "brand", "manufacturer")
+
+
+class StoreApiError(Exception):
+    """Store API недоступен или отвечает не так, как ожидается (нужен парсинг HTML)"""
+    pass
+
+
+class StoreApiBlocked(StoreApiError):
+    """Вместо JSON сайт вернул страницу защиты"""
+    pass
+
+
+def requests_proxies(proxy: Optional[Dict]) -> Optional[Dict[str, str]]:
+    """Прокси в формате requests (как в validate_proxy_basic)"""
+    if not proxy:
+        return None
+    protocol = proxy.get('protocol', 'http').lower()
+    if protocol == 'socks5':
+        proxy_url = f"socks5h://{proxy['ip']}:{proxy['port']}"
+    elif protocol == 'socks4':
+        proxy_url = f"socks4://{proxy['ip']}:{proxy['port']}"
+    else:
+        proxy_url = f"http://{proxy['ip']}:{proxy['port']}"
+    return {'http': proxy_url, 'https': proxy_url}
+
+
+def _attribute_value(item: Dict, names: Tuple[str, ...]) -> str:
+    for attribute in item.get('attributes') or []:
+        if (attribute.get('name') or "").strip().lower() in names:
+            terms = [html.unescape(term.get('name') or "") for term in attribute.get('terms') or []]
+            return ", ".join(term for term in terms if term)
+    return ""
+
+
+def _price_text(item: Dict) -> Optional[str]:
+    """Цена как в карточке: первая .woocommerce-Price-amount из price_html, иначе из prices"""
+    price_html = item.get('price_html')
+    if price_html:
+        amount = BeautifulSoup(price_html, 'html.parser').select_one(".woocommerce-Price-amount.amount")
+        if amount:
+            return amount.get_text()
+    prices = item.get('prices') or {}
+    if not prices.get('price'):
+        return None
+    minor_unit = int(prices.get('currency_minor_unit') or 0)
+    value = int(prices['price']) // (10 ** minor_unit)
+    return f"{value:,}".replace(",", prices.get('currency_thousand_separator') or " ")
+
+
+def is_store_item_in_stock(item: Dict) -> bool:
+    """Отбор как на странице: текст наличия "В наличии"; без текста - статус наличия без предзаказа"""
+    availability = item.get('stock_availability') or {}
+    text = (availability.get('text') or "").lower()
+    if text:
+        return "в наличии" in text
+    css_class = availability.get('class') or ""
+    return bool(item.get('is_in_stock')) and "backorder" not in css_class and "out-of-stock" not in css_class
+
+
+def get_products_from_store_items(items: List[Dict]) -> Tuple[List[Dict], int, int]:
+    """
+    Товары страницы Store API.
+
+    Returns:
+        tuple: (список товаров в наличии, количество товаров в наличии, общее количество товаров)
+    """
+    results = []
+    for item in items:
+        if not is_store_item_in_stock(item):
+            continue  # Пропускаем товары не в наличии
+        title = html.unescape(item.get('name') or "")
+        if not title:
+            logger.debug("Product skipped: title not found")
+            continue
+        brands = item.get('brands') or []
+        product = build_product(
+            title,
+            _attribute_value(item, ARTICLE_ATTRIBUTES) or item.get('sku') or "",
+            _attribute_value(item, MANUFACTURER_ATTRIBUTES) or (html.unescape(brands[0].get('name') or "") if brands else ""),
+            _price_text(item),
+        )
+        if product:
+            results.append(product)
+    return results, len(results), len(items)
+
+
+class StoreApiClient:
+    """Сессия requests к Store API через прокси с cookie из браузера при необходимости"""
+
+    def __init__(self, proxy: Optional[Dict] = None, api_url: str = STORE_API_URL):
+        self.proxy = proxy
+        self.api_url = api_url
+        self.session = requests.Session()
+        self.session.proxies = requests_proxies(proxy) or {}
+        self.session.headers.update({
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept': 'application/json',
+            'Referer': TARGET_URL,
+        })
+        self.cookies_harvested = False
+        self.blocks = 0
+
+    def harvest_cookies(self) -> bool:
+        """Проходит защиту сайта в браузере с тем же прокси и переносит cookie и User-Agent в сессию"""
+        self.cookies_harvested = True
+        driver = create_driver(self.proxy)
+        if not driver:
+            return False
+        try:
+            driver.set_page_load_timeout(STORE_API_TIMEOUT)
+            driver.get(TARGET_URL)
+            success, _ = wait_for_cloudflare(driver, context="Store API cookies")
+            if not success:
+                return False
+            for cookie in driver.get_cookies():
+                self.session.cookies.set(cookie['name'], cookie['value'])
+            self.session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+            logger.info(f"Store API: using {len(self.session.cookies)} cookies from browser")
+            return True
+        except Exception as e:
+            logger.warning(f"Store API: failed to harvest cookies: {e}")
+            return False
+        finally:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def _get(self, page: int) -> requests.Response:
+        params = {'per_page': STORE_API_PER_PAGE, 'page': page}
+        last_error = None
+        for attempt in range(1, STORE_API_RETRIES + 1):
+            try:
+                return self.session.get(self.api_url, params=params, timeout=STORE_API_TIMEOUT)
+            except requests.RequestException as e:
+                last_error = e
+                logger.debug(f"Store API page {page} attempt {attempt}/{STORE_API_RETRIES} failed: {e}")
+                time.sleep(STORE_API_DELAY * attempt)
+        raise StoreApiError(f"page {page}: {type(last_error).__name__}: {str(last_error)[:150]}")
+
+    def fetch_page(self, page: int) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Одна страница API.
+
+        Returns:
+            (товары в формате Store API, всего страниц из X-WP-TotalPages или None)
+        """
+        while True:
+            response = self._get(page)
+            content_type = response.headers.get('Content-Type', "")
+            if response.status_code in (401, 404):
+                raise StoreApiError(f"endpoint unavailable (HTTP {response.status_code})")
+            if response.status_code == 200 and "json" in content_type:
+                try:
+                    items = response.json()
+                except ValueError as e:
+                    raise StoreApiError(f"page {page}: broken JSON: {e}")
+                if not isinstance(items, list):
+                    raise StoreApiError(f"page {page}: unexpected response {type(items).__name__}")
+                total_pages = response.headers.get('X-WP-TotalPages')
+                return items, int(total_pages) if total_pages and total_pages.isdigit() else None
+
+            # HTML вместо JSON (403/503 защиты или challenge) - пробуем cookie из браузера один раз
+            self.blocks += 1
+            reason = f"HTTP {response.status_code}, {content_type or 'no content type'}"
+            if self.cookies_harvested:
+                raise StoreApiBlocked(f"page {page}: still blocked with browser cookies ({reason})")
+            logger.info(f"Store API page {page} blocked ({reason}), harvesting cookies via browser...")
+            if not self.harvest_cookies():
+                raise StoreApiBlocked(f"page {page}: blocked ({reason}) and browser did not pass protection")
+
+
+def crawl_store_api(
+    proxy: Optional[Dict],
+    on_products: Callable[[List[Dict]], None],
+    api_url: str = STORE_API_URL,
+) -> Dict[str, int]:
+    """
+    Обходит весь каталог через Store API.
+
+    Args:
+        proxy: Рабочий прокси (как для парсинга HTML)
+        on_products: Вызывается с товарами в наличии каждой страницы (запись в CSV)
+
+    Returns:
+        {"pages", "products", "total_products", "blocks"}
+
+    Raises:
+        StoreApiError: режим недоступен - каталог нужно парсить через HTML
+    """
+    client = StoreApiClient(proxy, api_url)
+    stats = {'pages': 0, 'products': 0, 'total_products': 0, 'blocks': 0}
+    page, total_pages = 1, None
+    started = time.time()
+    logger.info(f"Store API crawl: {api_url} ({STORE_API_PER_PAGE} products per page)")
+    while total_pages is None or page <= total_pages:
+        items, header_pages = client.fetch_page(page)
+        total_pages = header_pages or total_pages
+        if not items:
+            if page == 1:
+                raise StoreApiError("empty catalog on page 1")
+            break
+        products, products_in_stock, total_on_page = get_products_from_store_items(items)
+        if page == 1 and products_in_stock:
+            with_article = sum(1 for product in products if product['article'])
+            if with_article / products_in_stock < STORE_API_MIN_ARTICLE_SHARE:
+                raise StoreApiError(f"only {with_article}/{products_in_stock} products have an article")
+        on_products(products)
+        stats['pages'] += 1
+        stats['products'] += products_in_stock
+        stats['total_products'] += total_on_page
+        logger.info(
+            f"Store API page {page}/{total_pages or '?'}: {products_in_stock}/{total_on_page} in stock, "
+            f"{stats['products']} products so far"
+        )
+        page += 1
+        if total_pages is None and len(items) < STORE_API_PER_PAGE:
+            break
+        time.sleep(STORE_API_DELAY)
+    stats['blocks'] = client.blocks
+    logger.info(
+        f"Store API crawl completed: {stats['products']} products in stock out of {stats['total_products']} "
+        f"from {stats['pages']} pages in {time.time() - started:.0f}s"
+    )
+    return stats
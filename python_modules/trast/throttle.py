@@ -0,0 +1,77 @@
+"""
+Адаптивное ограничение скорости парсинга (AIMD) для trast-zapchast.ru.
+
+Для каждого прокси хранится текущая скорость (страниц в минуту). Пока страницы
+загружаются успешно, скорость растет аддитивно (+THROTTLE_RATE_STEP), при блокировке
+или challenge-странице - уменьшается мультипликативно (×THROTTLE_BACKOFF_FACTOR).
+Базовая пауза между страницами = 60 / скорость, ограничена THROTTLE_MIN_DELAY и
+THROTTLE_MAX_DELAY. Случайная "человеческая" пауза добавляется поверх базовой
+в humanized_page_sleep.
+"""
+import threading
+from typing import Dict
+from loguru import logger
+
+from config import (
+    THROTTLE_INITIAL_DELAY,
+    THROTTLE_MIN_DELAY,
+    THROTTLE_MAX_DELAY,
+    THROTTLE_RATE_STEP,
+    THROTTLE_BACKOFF_FACTOR,
+)
+
+
+class AdaptiveThrottle:
+    """AIMD-регулятор паузы между страницами (отдельно для каждого прокси)"""
+
+    def __init__(
+        self,
+        initial_delay: float = THROTTLE_INITIAL_DELAY,
+        min_delay: float = THROTTLE_MIN_DELAY,
+        max_delay: float = THROTTLE_MAX_DELAY,
+        rate_step: float = THROTTLE_RATE_STEP,
+        backoff_factor: float = THROTTLE_BACKOFF_FACTOR,
+    ):
+        self.min_rate = 60.0 / max_delay
+        self.max_rate = 60.0 / min_delay
+        self.initial_rate = self._clamp(60.0 / initial_delay)
+        self.rate_step = rate_step
+        self.backoff_factor = backoff_factor
+        self.rates: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def _clamp(self, rate: float) -> float:
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    def current_rate(self, proxy_key: str) -> float:
+        """Текущая скорость для прокси (страниц в минуту)"""
+        with self.lock:
+            return self.rates.get(proxy_key, self.initial_rate)
+
+    def get_delay(self, proxy_key: str) -> float:
+        """Базовая пауза перед следующей страницей (секунды), без случайной добавки"""
+        return 60.0 / self.current_rate(proxy_key)
+
+    def on_success(self, proxy_key: str) -> float:
+        """Страница загружена без блокировки: аддитивно увеличиваем скорость"""
+        with self.lock:
+            rate = self._clamp(self.rates.get(proxy_key, self.initial_rate) + self.rate_step)
+            self.rates[proxy_key] = rate
+        return rate
+
+    def on_block(self, proxy_key: str, reason: str = "") -> float:
+        """Блокировка или challenge: мультипликативно снижаем скорость"""
+        with self.lock:
+            previous = self.rates.get(proxy_key, self.initial_rate)
+            rate = self._clamp(previous * self.backoff_factor)
+            self.rates[proxy_key] = rate
+        logger.info(
+            f"Throttle backoff for {proxy_key}{f' ({reason})' if reason else ''}: "
+            f"{previous:.1f} → {rate:.1f} pages/min (base delay {60.0 / rate:.1f}s)"
+        )
+        return rate
+
+    def describe(self, proxy_key: str) -> str:
+        """Строка состояния для логов и уведомлений"""
+        rate = self.current_rate(proxy_key)
+        return f"{rate:.1f} pages/min (base delay {60.0 / rate:.1f}s)"
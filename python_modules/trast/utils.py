@@ -7,6 +7,7 @@ import time
 import random
 import shutil
 import csv
+import json
 import traceback
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
@@ -53,6 +54,7 @@ from config import (
     TEMP_CSV_FILE,
     BACKUP_FILE,
     BACKUP_CSV,
+    CHECKPOINT_FILE,
     LOG_DIR,
     CLOUDFLARE_REFRESH_DELAY,
     CLOUDFLARE_REFRESH_WAIT,
@@ -64,7 +66,18 @@ from config import (
     FIRST_PAGE_FINAL_WAIT,
     FIRST_PAGE_RELOAD_DELAY,
     BROWSER_RETRY_DELAY,
+    PAGE_READY_SETTLE_MS,
+    PAGE_READY_POLL_INTERVAL,
+    PAGE_EXTRACTION_MODE,
+    DRIVER_BOOTSTRAP_CACHE,
+    FIREFOX_TEMPLATE_PREFS,
+    RESOURCE_BLOCKING,
 )
+from driver_bootstrap import (
+    get_geckodriver_path, get_chromedriver_path, create_firefox_profile_copy,
+    remove_profile_copy, attach_profile_cleanup,
+)
+from resource_blocking import apply_chrome_resource_blocking, apply_firefox_resource_blocking
 
 
 class PaginationNotDetectedError(Exception):
@@ -181,6 +194,96 @@ def warm_up_first_page(driver: webdriver.Remote, allow_reload: bool = True) -> b
     return bool(has_body)
 
 
+PRODUCT_CARD_CSS = "div.product.product-plate, .products-grid .product, .products .product, .shop-container .product"
+PAGINATION_CSS = ".facetwp-pager, .woocommerce-pagination, .page-numbers, .pagination"
+PAGE_NUMBER_CSS = ".facetwp-pager .facetwp-page, .woocommerce-pagination .page-numbers, .page-numbers a, .facetwp-pager a"
+CHALLENGE_MARKERS = [
+    "checking your browser", "just a moment", "verifying you are human",
+    "js challenge", "javascript challenge", "403 forbidden", "access denied", "доступ запрещен",
+]
+
+# Наблюдатель за DOM: запоминает время последней мутации (ставится один раз на документ)
+PAGE_READY_OBSERVER_JS = """
+if (!window.__trastReady) {
+    window.__trastReady = {lastMutation: performance.now()};
+    var target = document.body || document.documentElement;
+    new MutationObserver(function () {
+        window.__trastReady.lastMutation = performance.now();
+    }).observe(target, {childList: true, subtree: true, attributes: true});
+}
+return true;
+"""
+
+PAGE_READY_STATE_JS = """
+var state = window.__trastReady || {lastMutation: 0};
+var text = ((document.title || '') + ' ' +
+    (document.body ? document.body.innerText.slice(0, 2000) : '')).toLowerCase();
+return {
+    readyState: document.readyState,
+    cards: document.querySelectorAll(arguments[0]).length,
+    pagination: document.querySelectorAll(arguments[1]).length > 0,
+    quietMs: performance.now() - state.lastMutation,
+    challenge: arguments[2].some(function (marker) { return text.indexOf(marker) !== -1; })
+};
+"""
+
+
+def wait_for_page_ready(
+    driver: webdriver.Remote,
+    max_wait: float,
+    settle_ms: int = PAGE_READY_SETTLE_MS,
+    context: str = ""
+) -> Dict[str, any]:
+    """
+    Ждет, пока сетка товаров и пагинация появятся и перестанут меняться.
+    
+    Возвращается сразу, как только DOM спокоен settle_ms миллисекунд, или если
+    обнаружена страница защиты (ее обрабатывает wait_for_cloudflare).
+    max_wait - верхняя граница (прежняя фиксированная пауза).
+    
+    Returns:
+        dict: {"ready": bool, "reason": "stable" | "challenge" | "timeout" | "error",
+               "elapsed": float, "cards": int, "pagination": bool}
+    """
+    started = time.time()
+    last_state = {}
+    
+    def page_settled(drv):
+        nonlocal last_state
+        drv.execute_script(PAGE_READY_OBSERVER_JS)
+        state = drv.execute_script(PAGE_READY_STATE_JS, PRODUCT_CARD_CSS, PAGINATION_CSS, CHALLENGE_MARKERS)
+        last_state = state or {}
+        if last_state.get('challenge'):
+            return "challenge"
+        has_catalog = last_state.get('cards', 0) > 0 or last_state.get('pagination')
+        if (
+            last_state.get('readyState') != 'loading'
+            and has_catalog
+            and last_state.get('quietMs', 0) >= settle_ms
+        ):
+            return "stable"
+        return False
+    
+    result = {"ready": False, "reason": "timeout", "elapsed": 0.0, "cards": 0, "pagination": False}
+    try:
+        reason = WebDriverWait(driver, max(max_wait, PAGE_READY_POLL_INTERVAL),
+                               poll_frequency=PAGE_READY_POLL_INTERVAL).until(page_settled)
+        result["ready"] = reason == "stable"
+        result["reason"] = reason
+    except TimeoutException:
+        pass
+    except Exception as e:
+        if is_tab_crashed_error(e):
+            raise
+        logger.debug(f"Page readiness check failed{f' ({context})' if context else ''}: {e}")
+        result["reason"] = "error"
+    
+    result["elapsed"] = time.time() - started
+    result["cards"] = last_state.get('cards', 0)
+    result["pagination"] = bool(last_state.get('pagination'))
+    return result
+
+
 def wait_for_cloudflare(
     driver: webdriver.Remote,
     max_wait: int = None,
@@ -241,11 +344,18 @@ def wait_for_cloudflare(
         
         logger.info(f"{log_prefix}{protection_type.capitalize()} check{context_suffix}... waiting {wait_time}/{max_wait} sec")
         
-        # Для JS challenge даем больше времени на выполнение JavaScript
+        # Для JS challenge даем больше времени на выполнение JavaScript,
+        # но выходим раньше, если после challenge уже появился каталог
         if "challenge" in protection_type.lower():
-            time.sleep(CLOUDFLARE_REFRESH_DELAY + 2)  # Дополнительное время для JS
+            delay = CLOUDFLARE_REFRESH_DELAY + 2
+            readiness = wait_for_page_ready(driver, max_wait=delay, context="js challenge")
         else:
-            time.sleep(CLOUDFLARE_REFRESH_DELAY)
+            delay = CLOUDFLARE_REFRESH_DELAY
+            readiness = wait_for_page_ready(driver, max_wait=delay, context="protection")
+        if not readiness["ready"] and readiness["elapsed"] < delay:
+            # Пока на странице маркеры защиты, wait_for_page_ready возвращается сразу -
+            # досыпаем паузу, чтобы общее время ожидания challenge осталось прежним
+            time.sleep(delay - readiness["elapsed"])
         
         try:
             # Устанавливаем таймаут для операций Selenium
@@ -255,7 +365,9 @@ def wait_for_cloudflare(
                 pass  # Если не удалось установить, продолжаем
             
             # Для JS challenge не делаем refresh сразу, даем время на выполнение
-            if "challenge" in protection_type.lower():
+            if readiness["ready"]:
+                pass  # Каталог уже загрузился - перепроверяем страницу без refresh
+            elif "challenge" in protection_type.lower():
                 time.sleep(3)  # Дополнительное ожидание для выполнения JS
             else:
                 try:
@@ -296,6 +408,71 @@ def wait_for_cloudflare(
     return True, page_source
 
 
+BLOCKER_KEYWORDS = [
+    # Nginx/Ngenix CDN JS Challenge блокировки
+    "nginx", "ngenix", "nginx/", "nginx cdn", "nginx js challenge",
+    "nginx error", "nginx blocking", "access denied by nginx",
+    "nginx access forbidden", "403 forbidden",
+    # JS Challenge признаки
+    "js challenge", "javascript challenge", "challenge", "verifying you are human",
+    "please wait", "please enable javascript", "executing javascript",
+    # Общие блокировки
+    "cloudflare", "attention required", "checking your browser", "just a moment",
+    "access denied", "forbidden", "service temporarily unavailable",
+    "temporarily unavailable", "maintenance", "запрос отклонен",
+    "доступ запрещен", "ошибка 403", "ошибка 503", "error 403", "error 503",
+    "captcha", "varnish cache server",
+    "bad gateway", "gateway timeout", "502 bad gateway", "504 gateway timeout",
+    "too many requests", "rate limit", "blocked", "banned",
+    # Дополнительные признаки блокировки
+    "the page you are looking for is temporarily unavailable",
+    "this page isn't working", "refused to connect"
+]
+
+# Селекторы структуры страницы (общие для BeautifulSoup и для скрипта в браузере)
+STRUCTURE_SELECTORS = {
+    "has_products_grid": ".products-grid, .products, .shop-container, .woocommerce-products-header",
+    "has_pagination": ".woocommerce-pagination, .page-numbers, .facetwp-pager, .facetwp-pager .facetwp-page",
+    "has_menu": "header, .site-header, .main-navigation, nav, .menu, .navigation",
+    "has_footer": "footer, .site-footer, .footer",
+    "has_title": "title",
+    "has_meta": "meta",
+}
+BLOCK_PRODUCT_SELECTORS = [
+    "div.product.product-plate",
+    ".product.product-plate",
+    "div.product",
+    ".products-grid .product",
+    ".products .product",
+    ".shop-container .product",
+    ".woocommerce ul.products li.product"
+]
+BLOCK_PAGINATION_SELECTORS = [
+    ".facetwp-pager",
+    ".facetwp-pager .facetwp-page",
+    ".woocommerce-pagination",
+    ".page-numbers",
+    ".pagination"
+]
+
+
+def get_page_signals(soup: BeautifulSoup) -> Dict[str, bool]:
+    """
+    Собирает признаки структуры страницы из BeautifulSoup
+    (те же признаки возвращает PAGE_PAYLOAD_JS прямо из браузера).
+    """
+    signals = {name: bool(soup.select(selector)) for name, selector in STRUCTURE_SELECTORS.items()}
+    signals["has_products"] = any(soup.select(selector) for selector in BLOCK_PRODUCT_SELECTORS)
+    signals["has_any_pagination"] = any(soup.select(selector) for selector in BLOCK_PAGINATION_SELECTORS)
+    signals["has_scripts"] = bool(soup.select("script"))
+    signals["has_body"] = bool(soup.select("body"))
+    return signals
+
+
+def _has_structure(signals: Dict[str, bool]) -> bool:
+    return sum(bool(signals.get(name)) for name in STRUCTURE_SELECTORS) >= 3
+
+
 def has_catalog_structure(soup: BeautifulSoup) -> bool:
     """
     Проверяет наличие структуры каталога на странице.
@@ -306,99 +483,33 @@ def has_catalog_structure(soup: BeautifulSoup) -> bool:
     Returns:
         bool: True если структура каталога присутствует, False иначе
     """
-    has_products_grid = bool(soup.select(".products-grid, .products, .shop-container, .woocommerce-products-header"))
-    has_pagination = bool(soup.select(".woocommerce-pagination, .page-numbers, .facetwp-pager, .facetwp-pager .facetwp-page"))
-    has_menu = bool(soup.select("header, .site-header, .main-navigation, nav, .menu, .navigation"))
-    has_footer = bool(soup.select("footer, .site-footer, .footer"))
-    has_title = bool(soup.select("title"))
-    has_meta = bool(soup.select("meta"))
-    
-    structure_count = sum([has_products_grid, has_pagination, has_menu, has_footer, has_title, has_meta])
-    return structure_count >= 3
+    return _has_structure({name: bool(soup.select(selector)) for name, selector in STRUCTURE_SELECTORS.items()})
 
 
-def is_page_blocked(soup: BeautifulSoup, page_source: str) -> Dict[str, any]:
+def classify_page_block(text_lower: str, signals: Dict[str, bool]) -> Dict[str, any]:
     """
-    Проверяет, заблокирована ли страница nginx или другими механизмами защиты.
-    Улучшенная версия с проверкой на частичную загрузку и альтернативными селекторами.
+    Определяет блокировку по тексту страницы и признакам структуры.
     
     Args:
-        soup: BeautifulSoup объект страницы
-        page_source: Исходный HTML страницы (строка)
+        text_lower: HTML или текст страницы в нижнем регистре (поиск ключевых слов защиты)
+        signals: Признаки структуры (get_page_signals или PAGE_PAYLOAD_JS)
         
     Returns:
         dict: {"blocked": bool, "reason": str | None, "partial_load": bool}
     """
-    page_source_lower = page_source.lower() if page_source else ""
-    
-    blocker_keywords = [
-        # Nginx/Ngenix CDN JS Challenge блокировки
-        "nginx", "ngenix", "nginx/", "nginx cdn", "nginx js challenge",
-        "nginx error", "nginx blocking", "access denied by nginx",
-        "nginx access forbidden", "403 forbidden",
-        # JS Challenge признаки
-        "js challenge", "javascript challenge", "challenge", "verifying you are human",
-        "please wait", "please enable javascript", "executing javascript",
-        # Общие блокировки
-        "cloudflare", "attention required", "checking your browser", "just a moment",
-        "access denied", "forbidden", "service temporarily unavailable",
-        "temporarily unavailable", "maintenance", "запрос отклонен",
-        "доступ запрещен", "ошибка 403", "ошибка 503", "error 403", "error 503",
-        "captcha", "varnish cache server",
-        "bad gateway", "gateway timeout", "502 bad gateway", "504 gateway timeout",
-        "too many requests", "rate limit", "blocked", "banned",
-        # Дополнительные признаки блокировки
-        "the page you are looking for is temporarily unavailable",
-        "this page isn't working", "refused to connect"
-    ]
-    
-    for keyword in blocker_keywords:
-        if keyword in page_source_lower:
+    for keyword in BLOCKER_KEYWORDS:
+        if keyword in text_lower:
             return {"blocked": True, "reason": keyword, "partial_load": False}
     
-    # Проверяем структуру каталога с альтернативными селекторами
-    has_structure = has_catalog_structure(soup)
-    
-    # Проверяем наличие товаров с альтернативными селекторами
-    product_selectors = [
-        "div.product.product-plate",
-        ".product.product-plate",
-        "div.product",
-        ".products-grid .product",
-        ".products .product",
-        ".shop-container .product",
-        ".woocommerce ul.products li.product"
-    ]
-    
-    has_products = False
-    for selector in product_selectors:
-        if soup.select(selector):
-            has_products = True
-            break
-    
-    # Проверяем наличие пагинации с альтернативными селекторами
-    pagination_selectors = [
-        ".facetwp-pager",
-        ".facetwp-pager .facetwp-page",
-        ".woocommerce-pagination",
-        ".page-numbers",
-        ".pagination"
-    ]
-    
-    has_pagination = False
-    for selector in pagination_selectors:
-        if soup.select(selector):
-            has_pagination = True
-            break
+    has_structure = _has_structure(signals)
+    has_products = signals.get("has_products", False)
+    has_pagination = signals.get("has_any_pagination", False)
     
     # Проверяем на частичную загрузку
     # Если есть структура каталога, но нет товаров и пагинации - возможно частичная загрузка
     if has_structure and not has_products and not has_pagination:
         # Проверяем наличие JavaScript-контента (признак динамической загрузки)
-        has_scripts = bool(soup.select("script"))
-        has_body = bool(soup.select("body"))
-        
-        if has_scripts and has_body:
+        if signals.get("has_scripts") and signals.get("has_body"):
             # Возможно частичная загрузка - даем шанс
             return {"blocked": False, "reason": "possible_partial_load", "partial_load": True}
         else:
@@ -417,23 +528,18 @@ def is_page_blocked(soup: BeautifulSoup, page_source: str) -> Dict[str, any]:
     return {"blocked": True, "reason": "no_products_no_pagination", "partial_load": False}
 
 
-def is_page_empty(soup: BeautifulSoup, page_source: str, products_in_stock: int, total_products: int = 0) -> Dict[str, any]:
+def classify_page_status(
+    block_check: Dict[str, any],
+    has_structure: bool,
+    products_in_stock: int,
+    total_products: int = 0
+) -> Dict[str, any]:
     """
-    Определяет статус страницы: пустая (конец данных), заблокированная или частично загруженная.
+    Определяет статус страницы по результату проверки блокировки и числу товаров.
     
-    ВАЖНО: Пустая страница = страница с 16 товарами, но все НЕ в наличии.
-    
-    Args:
-        soup: BeautifulSoup объект страницы
-        page_source: Исходный HTML страницы (строка)
-        products_in_stock: Количество товаров В НАЛИЧИИ
-        total_products: Общее количество товаров на странице (включая не в наличии)
-        
     Returns:
         dict: {"status": str, "reason": str | None}
     """
-    # Сначала проверяем на блокировку
-    block_check = is_page_blocked(soup, page_source)
     if block_check["blocked"]:
         return {"status": "blocked", "reason": block_check["reason"] or "no_dom"}
     
@@ -444,10 +550,10 @@ def is_page_empty(soup: BeautifulSoup, page_source: str, products_in_stock: int,
     # Проверяем количество товаров В НАЛИЧИИ
     if products_in_stock == 0:
         # Если есть структура каталога и товары (но не в наличии) - это пустая страница
-        if has_catalog_structure(soup) and total_products >= PRODUCTS_PER_PAGE:
+        if has_structure and total_products >= PRODUCTS_PER_PAGE:
             # 16 товаров, но все не в наличии - это пустая страница
             return {"status": "empty", "reason": "all_out_of_stock"}
-        elif has_catalog_structure(soup):
+        elif has_structure:
             # Есть структура, но нет товаров вообще - это конец данных
             return {"status": "empty", "reason": "no_items"}
         else:
@@ -461,6 +567,41 @@ def is_page_empty(soup: BeautifulSoup, page_source: str, products_in_stock: int,
         return {"status": "normal", "reason": None}
 
 
+def is_page_blocked(soup: BeautifulSoup, page_source: str) -> Dict[str, any]:
+    """
+    Проверяет, заблокирована ли страница nginx или другими механизмами защиты.
+    Улучшенная версия с проверкой на частичную загрузку и альтернативными селекторами.
+    
+    Args:
+        soup: BeautifulSoup объект страницы
+        page_source: Исходный HTML страницы (строка)
+        
+    Returns:
+        dict: {"blocked": bool, "reason": str | None, "partial_load": bool}
+    """
+    page_source_lower = page_source.lower() if page_source else ""
+    return classify_page_block(page_source_lower, get_page_signals(soup))
+
+
+def is_page_empty(soup: BeautifulSoup, page_source: str, products_in_stock: int, total_products: int = 0) -> Dict[str, any]:
+    """
+    Определяет статус страницы: пустая (конец данных), заблокированная или частично загруженная.
+    
+    ВАЖНО: Пустая страница = страница с 16 товарами, но все НЕ в наличии.
+    
+    Args:
+        soup: BeautifulSoup объект страницы
+        page_source: Исходный HTML страницы (строка)
+        products_in_stock: Количество товаров В НАЛИЧИИ
+        total_products: Общее количество товаров на странице (включая не в наличии)
+        
+    Returns:
+        dict: {"status": str, "reason": str | None}
+    """
+    block_check = is_page_blocked(soup, page_source)
+    return classify_page_status(block_check, has_catalog_structure(soup), products_in_stock, total_products)
+
+
 def get_products_from_page_soup(soup: BeautifulSoup) -> Tuple[List[Dict], int, int]:
     """
     Парсит товары со страницы с улучшенными селекторами и fallback логикой.
@@ -593,46 +734,237 @@ def get_products_from_page_soup(soup: BeautifulSoup) -> Tuple[List[Dict], int, i
             logger.debug("Product skipped: title not found")
             continue
         
-        title = title_el.get_text().strip() if hasattr(title_el, 'get_text') else str(title_el).strip()
-        
-        # Артикул и производитель могут быть необязательными, но желательны
-        article = ""
-        if article_el:
-            article = article_el.get_text().strip() if hasattr(article_el, 'get_text') else str(article_el).strip()
-            # Убираем префикс "Артикул:" если есть
-            article = re.sub(r'^Артикул[:\s]+', '', article, flags=re.IGNORECASE).strip()
-        
-        manufacturer = ""
-        if manufacturer_el:
-            manufacturer = manufacturer_el.get_text().strip() if hasattr(manufacturer_el, 'get_text') else str(manufacturer_el).strip()
-            # Убираем префикс "Производитель:" если есть
-            manufacturer = re.sub(r'^Производитель[:\s]+', '', manufacturer, flags=re.IGNORECASE).strip()
-        
-        if not price_el:
-            logger.debug(f"Product skipped: price not found for {title[:50]}")
-            continue
-        
-        raw_price = price_el.get_text().strip() if hasattr(price_el, 'get_text') else str(price_el).strip()
-        raw_price = raw_price.replace("\xa0", " ").replace("\u00a0", " ")
-        clean_price = re.sub(r"[^\d\s]", "", raw_price).strip()
-        
-        # Если цена не найдена, пропускаем товар
-        if not clean_price:
-            logger.debug(f"Product skipped: empty price for {title[:50]}")
-            continue
-        
-        product = {
-            "manufacturer": manufacturer,
-            "article": article,
-            "description": title,
-            "price": clean_price
-        }
-        results.append(product)
-        logger.debug(f"Product parsed: {title[:60]}... | Art: {article} | Manuf: {manufacturer} | Price: {clean_price}")
+        product = build_product(
+            title_el.get_text() if hasattr(title_el, 'get_text') else str(title_el),
+            (article_el.get_text() if hasattr(article_el, 'get_text') else str(article_el)) if article_el else "",
+            (manufacturer_el.get_text() if hasattr(manufacturer_el, 'get_text') else str(manufacturer_el)) if manufacturer_el else "",
+            (price_el.get_text() if hasattr(price_el, 'get_text') else str(price_el)) if price_el else None,
+        )
+        if product:
+            results.append(product)
     
     return results, len(results), total_products
 
 
+def build_product(title: str, article: str, manufacturer: str, raw_price: Optional[str]) -> Optional[Dict]:
+    """
+    Нормализует поля карточки товара (общая часть для BeautifulSoup и PAGE_PAYLOAD_JS).
+    
+    Returns:
+        dict товара или None, если нет цены
+    """
+    title = title.strip()
+    
+    # Артикул и производитель могут быть необязательными, но желательны
+    # Убираем префиксы "Артикул:" / "Производитель:" если есть
+    article = re.sub(r'^Артикул[:\s]+', '', (article or "").strip(), flags=re.IGNORECASE).strip()
+    manufacturer = re.sub(r'^Производитель[:\s]+', '', (manufacturer or "").strip(), flags=re.IGNORECASE).strip()
+    
+    if raw_price is None:
+        logger.debug(f"Product skipped: price not found for {title[:50]}")
+        return None
+    
+    raw_price = raw_price.strip().replace("\xa0", " ").replace("\u00a0", " ")
+    clean_price = re.sub(r"[^\d\s]", "", raw_price).strip()
+    
+    # Если цена не найдена, пропускаем товар
+    if not clean_price:
+        logger.debug(f"Product skipped: empty price for {title[:50]}")
+        return None
+    
+    logger.debug(f"Product parsed: {title[:60]}... | Art: {article} | Manuf: {manufacturer} | Price: {clean_price}")
+    return {
+        "manufacturer": manufacturer,
+        "article": article,
+        "description": title,
+        "price": clean_price
+    }
+
+
+# Извлечение карточек и признаков блокировки одним execute_script (вместо полного page_source).
+# Селекторы повторяют get_products_from_page_soup / get_page_signals. Ключевые слова защиты
+# ищутся в браузере по всему HTML страницы в порядке BLOCKER_KEYWORDS - как в is_page_blocked
+# по page_source; возвращается только первое найденное.
+PAGE_PAYLOAD_JS = """
+var structure = arguments[0], productSelectors = arguments[1], paginationSelectors = arguments[2],
+    blockerKeywords = arguments[3], pageNumberCss = arguments[4];
+function first(root, selectors) {
+    for (var i = 0; i < selectors.length; i++) {
+        var el = root.querySelector(selectors[i]);
+        if (el) return el;
+    }
+    return null;
+}
+function any(selectors) {
+    return selectors.some(function (sel) { return document.querySelector(sel) !== null; });
+}
+function match(text, re) { var m = text.match(re); return m ? m : null; }
+
+var signals = {};
+Object.keys(structure).forEach(function (name) {
+    signals[name] = document.querySelector(structure[name]) !== null;
+});
+signals.has_products = any(productSelectors);
+signals.has_any_pagination = any(paginationSelectors);
+signals.has_scripts = document.querySelector('script') !== null;
+signals.has_body = document.body !== null;
+
+var cards = [];
+var cardSelectors = ['div.product.product-plate', '.product.product-plate', 'div.product',
+                     '.products-grid .product', '.products .product'];
+for (var i = 0; i < cardSelectors.length && !cards.length; i++) {
+    cards = Array.prototype.slice.call(document.querySelectorAll(cardSelectors[i]));
+}
+var items = cards.map(function (card) {
+    var text = card.textContent || '';
+    var stock = first(card, ['div.product-badge.product-stock.instock', '.product-badge.product-stock.instock',
+                             "[class*='stock'][class*='instock']", "[class*='наличи']"]);
+    var stockText = ((stock ? stock.textContent : text) || '').toLowerCase();
+    var title = first(card, ['a.product-title', '.product-title', "a[href*='/product/']", 'h2 a', 'h3 a']);
+    var article = first(card, ['div.product-attributes .item:nth-child(1) .value',
+                               '.product-attributes .item:nth-child(1) .value',
+                               "[class*='article']", "[class*='Артикул']"]);
+    var manufacturer = first(card, ['div.product-attributes .item:nth-child(2) .value',
+                                    '.product-attributes .item:nth-child(2) .value',
+                                    "[class*='manufacturer']", "[class*='Производитель']"]);
+    var price = first(card, ['div.product-price .woocommerce-Price-amount.amount',
+                             '.product-price .woocommerce-Price-amount.amount',
+                             "[class*='price'] .amount", "[class*='price']"]);
+    var articleMatch = article ? null : match(text, /Артикул[:\\s]+([^\\n\\r]+)/);
+    var manufacturerMatch = manufacturer ? null : match(text, /Производитель[:\\s]+([^\\n\\r]+)/);
+    var priceMatch = price ? null : match(text, /([\\d\\s]+)\\s*₽/);
+    return {
+        in_stock: stockText.indexOf('в наличии') !== -1,
+        title: title ? title.textContent : null,
+        article: article ? article.textContent : (articleMatch ? articleMatch[1].trim() : ''),
+        manufacturer: manufacturer ? manufacturer.textContent : (manufacturerMatch ? manufacturerMatch[1].trim() : ''),
+        price: price ? price.textContent : (priceMatch ? priceMatch[0] : null)
+    };
+});
+
+var lastPage = 0;
+Array.prototype.forEach.call(document.querySelectorAll(pageNumberCss), function (el) {
+    var number = parseInt(el.getAttribute('data-page') || (el.textContent || '').trim(), 10);
+    if (number > lastPage) lastPage = number;
+});
+
+var html = (document.documentElement ? document.documentElement.outerHTML : '').toLowerCase();
+var blocker = null;
+for (var k = 0; k < blockerKeywords.length && blocker === null; k++) {
+    if (html.indexOf(blockerKeywords[k]) !== -1) blocker = blockerKeywords[k];
+}
+return {
+    signals: signals,
+    cards: items,
+    total_cards: cards.length,
+    last_page: lastPage,
+    blocker: blocker
+};
+"""
+
+
+def _products_from_cards(cards: List[Dict]) -> List[Dict]:
+    results = []
+    for card in cards:
+        if not card.get('in_stock'):
+            continue  # Пропускаем товары не в наличии
+        if not card.get('title'):
+            logger.debug("Product skipped: title not found")
+            continue
+        product = build_product(card['title'], card.get('article') or "", card.get('manufacturer') or "", card.get('price'))
+        if product:
+            results.append(product)
+    return results
+
+
+def get_last_page_number(soup: BeautifulSoup) -> Optional[int]:
+    """Наибольший номер страницы в пагинации (data-page или текст ссылки), None если пагинации нет"""
+    last_page = 0
+    for page_el in soup.select(PAGE_NUMBER_CSS):
+        value = page_el.get("data-page") or page_el.get_text(strip=True)
+        if value and value.isdigit():
+            last_page = max(last_page, int(value))
+    return last_page or None
+
+
+def page_payload_from_source(page_source: str) -> Dict[str, any]:
+    """Строит payload страницы из полного HTML (режим отладки и fallback)"""
+    soup = BeautifulSoup(page_source, 'html.parser')
+    products, products_in_stock, total_products = get_products_from_page_soup(soup)
+    return {
+        "mode": "source",
+        "signals": get_page_signals(soup),
+        "text": page_source.lower(),
+        "products": products,
+        "products_in_stock": products_in_stock,
+        "total_products": total_products,
+        "last_page": get_last_page_number(soup),
+        "bytes": len(page_source.encode('utf-8')),
+    }
+
+
+def extract_page_payload(driver: webdriver.Remote, mode: str = PAGE_EXTRACTION_MODE) -> Optional[Dict[str, any]]:
+    """
+    Извлекает товары и признаки блокировки текущей страницы.
+    
+    В режиме "script" выполняет один execute_script и получает компактный JSON;
+    полный page_source запрашивается только в режиме "source" (отладка) или если
+    скрипт не сработал.
+    
+    Returns:
+        dict: {"mode", "signals", "text", "products", "products_in_stock", "total_products",
+               "last_page", "bytes", "cpu"} или None при краше вкладки
+    """
+    cpu_started = time.process_time()
+    payload = None
+    if mode == "script":
+        try:
+            raw = driver.execute_script(
+                PAGE_PAYLOAD_JS, STRUCTURE_SELECTORS, BLOCK_PRODUCT_SELECTORS,
+                BLOCK_PAGINATION_SELECTORS, BLOCKER_KEYWORDS, PAGE_NUMBER_CSS
+            )
+            products = _products_from_cards(raw.get('cards') or [])
+            payload = {
+                "mode": "script",
+                "signals": raw.get('signals') or {},
+                # Первое ключевое слово защиты из BLOCKER_KEYWORDS: classify_page_block найдет то же, что в HTML
+                "text": raw.get('blocker') or "",
+                "products": products,
+                "products_in_stock": len(products),
+                "total_products": raw.get('total_cards', 0),
+                "last_page": raw.get('last_page') or None,
+                "bytes": len(json.dumps(raw, ensure_ascii=False).encode('utf-8')),
+            }
+        except Exception as e:
+            if is_tab_crashed_error(e):
+                raise
+            logger.warning(f"Page payload script failed, falling back to page_source: {e}")
+    
+    if payload is None:
+        page_source = safe_get_page_source(driver)
+        if not page_source:
+            return None
+        payload = page_payload_from_source(page_source)
+    
+    payload["cpu"] = time.process_time() - cpu_started
+    return payload
+
+
+def is_payload_blocked(payload: Dict[str, any]) -> Dict[str, any]:
+    """is_page_blocked для payload из extract_page_payload"""
+    return classify_page_block(payload.get("text", ""), payload.get("signals", {}))
+
+
+def get_payload_page_status(payload: Dict[str, any]) -> Dict[str, any]:
+    """is_page_empty для payload из extract_page_payload"""
+    return classify_page_status(
+        is_payload_blocked(payload),
+        _has_structure(payload.get("signals", {})),
+        payload.get("products_in_stock", 0),
+        payload.get("total_products", 0),
+    )
+
+
 def create_driver(proxy: Optional[Dict] = None, prefer_chrome: bool = True) -> Optional[webdriver.Remote]:
     """
     Создает WebDriver с учетом типа прокси.
@@ -658,6 +990,8 @@ def create_driver(proxy: Optional[Dict] = None, prefer_chrome: bool = True) -> O
         try:
             driver = _create_chrome_driver(proxy)
             logger.debug("Using undetected Chrome driver")
+            if RESOURCE_BLOCKING:
+                apply_chrome_resource_blocking(driver)
             return driver
         except Exception as chrome_error:
             logger.warning(f"Failed to initialize undetected Chrome: {chrome_error}. Falling back to Firefox.")
@@ -670,7 +1004,10 @@ def create_driver(proxy: Optional[Dict] = None, prefer_chrome: bool = True) -> O
             logger.debug("undetected-chromedriver disabled or unavailable, using Firefox")
     
     logger.debug("Using Firefox driver (supports all proxy types including SOCKS)")
-    return _create_firefox_driver(proxy)
+    driver = _create_firefox_driver(proxy)
+    if RESOURCE_BLOCKING:
+        apply_firefox_resource_blocking(driver)
+    return driver
 
 
 def _create_chrome_driver(proxy: Optional[Dict] = None) -> webdriver.Chrome:
@@ -685,9 +1022,12 @@ def _create_chrome_driver(proxy: Optional[Dict] = None) -> webdriver.Chrome:
         
         # Настройки кодировки для правильного отображения UTF-8
         options.add_argument("--lang=ru-RU,ru")
-        options.add_experimental_option('prefs', {
+        prefs = {
             'intl.accept_languages': 'ru-RU,ru,en-US,en'
-        })
+        }
+        if RESOURCE_BLOCKING:
+            prefs['profile.managed_default_content_settings.images'] = 2
+        options.add_experimental_option('prefs', prefs)
         
         # Игнорируем ошибки SSL-сертификата (для прокси с самоподписанными сертификатами)
         options.add_argument("--ignore-certificate-errors")
@@ -749,7 +1089,7 @@ def _create_chrome_driver(proxy: Optional[Dict] = None) -> webdriver.Chrome:
         from selenium import webdriver as selenium_webdriver
         from webdriver_manager.chrome import ChromeDriverManager
         
-        driver_path = ChromeDriverManager().install()
+        driver_path = get_chromedriver_path() if DRIVER_BOOTSTRAP_CACHE else ChromeDriverManager().install()
         options = ChromeOptions()
         options.add_argument("--headless=new")
         options.add_argument("--no-sandbox")
@@ -763,6 +1103,8 @@ def _create_chrome_driver(proxy: Optional[Dict] = None) -> webdriver.Chrome:
         prefs = {
             'intl.accept_languages': 'ru-RU,ru,en-US,en'
         }
+        if RESOURCE_BLOCKING:
+            prefs['profile.managed_default_content_settings.images'] = 2
         
         # Игнорируем ошибки SSL-сертификата (для прокси с самоподписанными сертификатами)
         options.add_argument("--ignore-certificate-errors")
@@ -813,8 +1155,12 @@ def _create_chrome_driver(proxy: Optional[Dict] = None) -> webdriver.Chrome:
 
 def _create_firefox_driver(proxy: Optional[Dict] = None) -> webdriver.Firefox:
     """Создает Firefox драйвер с прокси."""
+    geckodriver_path = None
     try:
-        geckodriver_autoinstaller.install()
+        if DRIVER_BOOTSTRAP_CACHE:
+            geckodriver_path = get_geckodriver_path()
+        else:
+            geckodriver_autoinstaller.install()
     except Exception as e:
         logger.warning(f"Error installing geckodriver: {e}, trying to continue...")
     
@@ -825,9 +1171,19 @@ def _create_firefox_driver(proxy: Optional[Dict] = None) -> webdriver.Firefox:
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
     
-    # Обход Cloudflare
-    options.set_preference("dom.webdriver.enabled", False)
-    options.set_preference("useAutomationExtension", False)
+    # Статические настройки (обход Cloudflare, без картинок/шрифтов, кеш) - из шаблонного профиля
+    profile_dir = None
+    if DRIVER_BOOTSTRAP_CACHE:
+        try:
+            profile_dir = create_firefox_profile_copy()
+            options.add_argument("-profile")
+            options.add_argument(profile_dir)
+        except Exception as e:
+            logger.warning(f"Failed to prepare Firefox profile from template: {e}")
+            profile_dir = None
+    if not profile_dir:
+        for pref_name, pref_value in FIREFOX_TEMPLATE_PREFS.items():
+            options.set_preference(pref_name, pref_value)
     
     selected_ua = random.choice(USER_AGENTS)
     options.set_preference("general.useragent.override", selected_ua)
@@ -839,6 +1195,8 @@ def _create_firefox_driver(proxy: Optional[Dict] = None) -> webdriver.Firefox:
         port = proxy['port']
         login = proxy.get('login', '')
         password = proxy.get('password', '')
+        # Запросы к localhost тоже идут через прокси (нужно для proxy_farm_sim.py, на работу с сайтом не влияет)
+        options.set_preference("network.proxy.allow_hijacking_localhost", True)
         
         if protocol in ['http', 'https']:
             options.set_preference("network.proxy.type", 1)
@@ -869,14 +1227,17 @@ def _create_firefox_driver(proxy: Optional[Dict] = None) -> webdriver.Firefox:
             options.set_preference("network.proxy.socks_remote_dns", True)
     
     try:
-        service = Service()
+        service = Service(executable_path=geckodriver_path) if geckodriver_path else Service()
         driver = webdriver.Firefox(service=service, options=options)
+        if profile_dir:
+            attach_profile_cleanup(driver, profile_dir)
         
         # Дополнительные скрипты для обхода детекции
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         
         return driver
     except Exception as e:
+        remove_profile_copy(profile_dir)
         error_msg = str(e).lower()
         if "connection refused" in error_msg or "failed to establish" in error_msg:
             logger.error(f"Error connecting to geckodriver: {e}")
@@ -886,6 +1247,169 @@ def _create_firefox_driver(proxy: Optional[Dict] = None) -> webdriver.Firefox:
         raise
 
 
+def get_pages_count_from_soup(soup: BeautifulSoup, page_source: str) -> Optional[int]:
+    """
+    Определяет количество страниц каталога по HTML (без драйвера).
+    
+    Returns:
+        int: количество страниц; 0 - пагинацию найти не удалось
+        None: структура каталога есть, но нет товаров и пагинации (возможна частичная загрузка)
+        
+    Raises:
+        PaginationNotDetectedError: если на странице признаки блокировки или нет ни карточек, ни структуры каталога
+    """
+    page_source_lower = page_source.lower()
+    
+    # Проверяем на блокировку ПЕРЕД поиском пагинации
+    block_indicators = [
+        "cloudflare",
+        "checking your browser",
+        "just a moment",
+        "service temporarily unavailable",
+        "temporarily unavailable",
+        "access denied",
+        "ошибка 503",
+        "error 503",
+        "ошибка 403",
+        "error 403",
+        "captcha",
+        "please enable javascript",
+        "attention required",
+    ]
+    if any(indicator in page_source_lower for indicator in block_indicators):
+        logger.warning("[WARNING] Blocking indicators detected on catalog page")
+        raise PaginationNotDetectedError("Pagination not found due to blocking or placeholder")
+    
+    # Проверяем наличие товаров и пагинации с альтернативными селекторами
+    product_selectors = [
+        "div.product.product-plate",
+        ".product.product-plate",
+        "div.product",
+        ".products-grid .product",
+        ".products .product",
+        ".shop-container .product"
+    ]
+    pagination_selectors = [
+        ".facetwp-pager .facetwp-page",
+        ".facetwp-page",
+        ".woocommerce-pagination",
+        ".page-numbers",
+        ".facetwp-pager"
+    ]
+    
+    has_products = False
+    for selector in product_selectors:
+        if soup.select(selector):
+            has_products = True
+            logger.debug(f"Found products with selector: {selector}")
+            break
+    
+    has_pagination_any = False
+    for selector in pagination_selectors:
+        if soup.select(selector):
+            has_pagination_any = True
+            logger.debug(f"Found pagination with selector: {selector}")
+            break
+    
+    # Проверяем структуру страницы более тщательно
+    has_catalog_structure_check = has_catalog_structure(soup)
+    
+    if not has_products and not has_pagination_any and not has_catalog_structure_check:
+        logger.warning("[WARNING] Catalog does not contain cards and pagination — page may be blocked")
+        logger.warning(f"[WARNING] Catalog structure check: {has_catalog_structure_check}")
+        raise PaginationNotDetectedError("Pagination not found: missing cards and pagination")
+    
+    # Если есть структура каталога, но нет товаров/пагинации - возможно частичная загрузка
+    if has_catalog_structure_check and not has_products and not has_pagination_any:
+        logger.warning("[WARNING] Catalog structure found but no products/pagination - possible partial load")
+        return None
+    
+    # Ищем пагинацию через BeautifulSoup с альтернативными селекторами
+    last_page_selectors = [
+        ".facetwp-pager .facetwp-page.last",
+        ".facetwp-page.last",
+        ".facetwp-pager .last",
+        ".woocommerce-pagination .page-numbers .last",
+        ".page-numbers .last"
+    ]
+    
+    last_page_el = None
+    for selector in last_page_selectors:
+        last_page_el = soup.select_one(selector)
+        if last_page_el:
+            logger.debug(f"Found last page element with selector: {selector}")
+            break
+    
+    if last_page_el and last_page_el.has_attr("data-page"):
+        total_pages = int(last_page_el["data-page"])
+        logger.info(f"[OK] Found {total_pages} pages for parsing (via BeautifulSoup .last)")
+        return total_pages
+    
+    # Пробуем альтернативные селекторы для всех элементов пагинации
+    if not last_page_el:
+        pagination_all_selectors = [
+            ".facetwp-pager .facetwp-page",
+            ".facetwp-page",
+            ".woocommerce-pagination .page-numbers a",
+            ".page-numbers a",
+            ".facetwp-pager a"
+        ]
+        
+        last_page_els = []
+        for selector in pagination_all_selectors:
+            last_page_els = soup.select(selector)
+            if last_page_els:
+                logger.debug(f"Found pagination elements with selector: {selector}")
+                break
+        logger.debug(f"Found pagination elements via BeautifulSoup: {len(last_page_els)}")
+        if last_page_els:
+            # Берем максимальный номер из всех найденных элементов
+            max_page = 0
+            found_pages = []
+            for page_el in last_page_els:
+                data_page = page_el.get("data-page")
+                if data_page:
+                    try:
+                        page_num = int(data_page)
+                        found_pages.append(page_num)
+                        if page_num > max_page:
+                            max_page = page_num
+                    except ValueError:
+                        continue
+                else:
+                    text_value = page_el.get_text(strip=True)
+                    if text_value.isdigit():
+                        page_num = int(text_value)
+                        found_pages.append(page_num)
+                        if page_num > max_page:
+                            max_page = page_num
+            logger.debug(f"Found page numbers via BeautifulSoup: {found_pages}")
+            if max_page > 0:
+                total_pages = max_page
+                logger.info(f"[OK] Found {total_pages} pages for parsing (via BeautifulSoup, max number from {len(found_pages)} elements)")
+                return total_pages
+            else:
+                logger.warning(f"[WARNING] Found {len(last_page_els)} pagination elements via BeautifulSoup, but failed to extract page numbers")
+    
+    if last_page_el and last_page_el.has_attr("data-page"):
+        total_pages = int(last_page_el["data-page"])
+        logger.info(f"[OK] Found {total_pages} pages for parsing (alternative selector)")
+        return total_pages
+    
+    # Если есть товары, но нет пагинации - это одна страница
+    if has_products and not has_pagination_any:
+        logger.info("[INFO] Found product cards without pagination — assuming single catalog page")
+        return 1
+    
+    # Если ничего не найдено - это ошибка, прокси не работает
+    logger.warning(f"[WARNING] Failed to find page count information")
+    logger.warning(f"[WARNING] Page size: {len(page_source)} characters")
+    logger.warning(f"[WARNING] Contains 'facetwp': {'facetwp' in page_source_lower}")
+    logger.warning(f"[WARNING] Contains 'shop': {'shop' in page_source_lower}")
+    logger.warning(f"[WARNING] Has products: {has_products}, has pagination: {has_pagination_any}")
+    return 0
+
+
 def get_pages_count_with_driver(driver: webdriver.Remote, url: str = "https://trast-zapchast.ru/shop/") -> Optional[int]:
     """Получает количество страниц с улучшенной обработкой Cloudflare.
     
@@ -1094,169 +1618,18 @@ def get_pages_count_with_driver(driver: webdriver.Remote, url: str = "https://tr
             logger.warning("Failed to get page_source for BeautifulSoup")
             return None
         
-        page_source_lower = page_source.lower()
         soup = BeautifulSoup(page_source, 'html.parser')
         
-        # Проверяем на блокировку ПЕРЕД поиском пагинации
-        block_indicators = [
-            "cloudflare",
-            "checking your browser",
-            "just a moment",
-            "service temporarily unavailable",
-            "temporarily unavailable",
-            "access denied",
-            "ошибка 503",
-            "error 503",
-            "ошибка 403",
-            "error 403",
-            "captcha",
-            "please enable javascript",
-            "attention required",
-        ]
-        if any(indicator in page_source_lower for indicator in block_indicators):
-            logger.warning("[WARNING] Blocking indicators detected on catalog page")
-            raise PaginationNotDetectedError("Pagination not found due to blocking or placeholder")
-        
-        # Проверяем наличие товаров и пагинации с альтернативными селекторами
-        product_selectors = [
-            "div.product.product-plate",
-            ".product.product-plate",
-            "div.product",
-            ".products-grid .product",
-            ".products .product",
-            ".shop-container .product"
-        ]
-        pagination_selectors = [
-            ".facetwp-pager .facetwp-page",
-            ".facetwp-page",
-            ".woocommerce-pagination",
-            ".page-numbers",
-            ".facetwp-pager"
-        ]
-        
-        has_products = False
-        for selector in product_selectors:
-            if soup.select(selector):
-                has_products = True
-                logger.debug(f"Found products with selector: {selector}")
-                break
-        
-        has_pagination_any = False
-        for selector in pagination_selectors:
-            if soup.select(selector):
-                has_pagination_any = True
-                logger.debug(f"Found pagination with selector: {selector}")
-                break
-        
-        # Проверяем структуру страницы более тщательно
-        has_catalog_structure_check = has_catalog_structure(soup)
-        
-        if not has_products and not has_pagination_any and not has_catalog_structure_check:
-            logger.warning("[WARNING] Catalog does not contain cards and pagination — page may be blocked")
-            logger.warning(f"[WARNING] Catalog structure check: {has_catalog_structure_check}")
-            raise PaginationNotDetectedError("Pagination not found: missing cards and pagination")
-        
-        # Если есть структура каталога, но нет товаров/пагинации - возможно частичная загрузка
-        if has_catalog_structure_check and not has_products and not has_pagination_any:
-            logger.warning("[WARNING] Catalog structure found but no products/pagination - possible partial load")
+        total_pages = get_pages_count_from_soup(soup, page_source)
+        if total_pages is None:
             # Даем еще одну попытку через дополнительное ожидание
             time.sleep(5)
-            page_source = safe_get_page_source(driver)
-            if page_source:
-                soup = BeautifulSoup(page_source, 'html.parser')
-                for selector in product_selectors:
-                    if soup.select(selector):
-                        has_products = True
-                        break
-                for selector in pagination_selectors:
-                    if soup.select(selector):
-                        has_pagination_any = True
-                        break
-        
-        # Ищем пагинацию через BeautifulSoup с альтернативными селекторами
-        last_page_selectors = [
-            ".facetwp-pager .facetwp-page.last",
-            ".facetwp-page.last",
-            ".facetwp-pager .last",
-            ".woocommerce-pagination .page-numbers .last",
-            ".page-numbers .last"
-        ]
-        
-        last_page_el = None
-        for selector in last_page_selectors:
-            last_page_el = soup.select_one(selector)
-            if last_page_el:
-                logger.debug(f"Found last page element with selector: {selector}")
-                break
-        
-        if last_page_el and last_page_el.has_attr("data-page"):
-            total_pages = int(last_page_el["data-page"])
-            logger.info(f"[OK] Found {total_pages} pages for parsing (via BeautifulSoup .last)")
-            return total_pages
-        
-        # Пробуем альтернативные селекторы для всех элементов пагинации
-        if not last_page_el:
-            pagination_all_selectors = [
-                ".facetwp-pager .facetwp-page",
-                ".facetwp-page",
-                ".woocommerce-pagination .page-numbers a",
-                ".page-numbers a",
-                ".facetwp-pager a"
-            ]
-            
-            last_page_els = []
-            for selector in pagination_all_selectors:
-                last_page_els = soup.select(selector)
-                if last_page_els:
-                    logger.debug(f"Found pagination elements with selector: {selector}")
-                    break
-            logger.debug(f"Found pagination elements via BeautifulSoup: {len(last_page_els)}")
-            if last_page_els:
-                # Берем максимальный номер из всех найденных элементов
-                max_page = 0
-                found_pages = []
-                for page_el in last_page_els:
-                    data_page = page_el.get("data-page")
-                    if data_page:
-                        try:
-                            page_num = int(data_page)
-                            found_pages.append(page_num)
-                            if page_num > max_page:
-                                max_page = page_num
-                        except ValueError:
-                            continue
-                    else:
-                        text_value = page_el.get_text(strip=True)
-                        if text_value.isdigit():
-                            page_num = int(text_value)
-                            found_pages.append(page_num)
-                            if page_num > max_page:
-                                max_page = page_num
-                logger.debug(f"Found page numbers via BeautifulSoup: {found_pages}")
-                if max_page > 0:
-                    total_pages = max_page
-                    logger.info(f"[OK] Found {total_pages} pages for parsing (via BeautifulSoup, max number from {len(found_pages)} elements)")
-                    return total_pages
-                else:
-                    logger.warning(f"[WARNING] Found {len(last_page_els)} pagination elements via BeautifulSoup, but failed to extract page numbers")
-        
-        if last_page_el and last_page_el.has_attr("data-page"):
-            total_pages = int(last_page_el["data-page"])
-            logger.info(f"[OK] Found {total_pages} pages for parsing (alternative selector)")
+            page_source = safe_get_page_source(driver) or page_source
+            soup = BeautifulSoup(page_source, 'html.parser')
+            total_pages = get_pages_count_from_soup(soup, page_source)
+        if total_pages:
             return total_pages
         
-        # Если есть товары, но нет пагинации - это одна страница
-        if has_products and not has_pagination_any:
-            logger.info("[INFO] Found product cards without pagination — assuming single catalog page")
-            return 1
-        
-        # Если ничего не найдено - это ошибка, прокси не работает
-        logger.warning(f"[WARNING] Failed to find page count information")
-        logger.warning(f"[WARNING] Page size: {len(page_source)} characters")
-        logger.warning(f"[WARNING] Contains 'facetwp': {'facetwp' in page_source_lower}")
-        logger.warning(f"[WARNING] Contains 'shop': {'shop' in page_source_lower}")
-        logger.warning(f"[WARNING] Has products: {has_products}, has pagination: {has_pagination_any}")
-        
         # Сохраняем HTML для отладки
         try:
             debug_file = os.path.join(LOG_DIR, f"debug_pagination_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
@@ -1339,15 +1712,28 @@ def create_backup():
         logger.error(f"Error creating backup: {e}")
 
 
-def finalize_output_files():
-    """Финализирует временные файлы - перемещает CSV в основной и конвертирует в Excel."""
+def finalize_output_files(keep_temp: bool = False):
+    """
+    Финализирует временные файлы - перемещает CSV в основной и конвертирует в Excel.
+    
+    Args:
+        keep_temp: Копировать, а не перемещать CSV и оставить журнал контрольных точек
+            (прерванный запуск: собранное сохраняется, а --resume продолжит с того же места)
+    """
     try:
         if os.path.exists(OUTPUT_FILE):
             create_backup()
         
         if os.path.exists(TEMP_CSV_FILE):
-            shutil.move(TEMP_CSV_FILE, CSV_FILE)
-            logger.info(f"Temporary CSV file moved to main: {CSV_FILE}")
+            if keep_temp:
+                shutil.copy2(TEMP_CSV_FILE, CSV_FILE)
+                logger.info(f"Temporary CSV file copied to main: {CSV_FILE} (kept for --resume)")
+            else:
+                shutil.move(TEMP_CSV_FILE, CSV_FILE)
+                logger.info(f"Temporary CSV file moved to main: {CSV_FILE}")
+                # Журнал контрольных точек относится к временному CSV и больше не нужен
+                if os.path.exists(CHECKPOINT_FILE):
+                    os.remove(CHECKPOINT_FILE)
             
             if convert_csv_to_excel(CSV_FILE, OUTPUT_FILE):
                 logger.info(f"Excel file created from CSV: {OUTPUT_FILE}")
@@ -1370,6 +1756,9 @@ def cleanup_temp_files():
         if os.path.exists(TEMP_OUTPUT_FILE):
             os.remove(TEMP_OUTPUT_FILE)
             logger.info(f"Temporary Excel file deleted: {TEMP_OUTPUT_FILE}")
+        if os.path.exists(CHECKPOINT_FILE):
+            os.remove(CHECKPOINT_FILE)
+            logger.info(f"Checkpoint journal deleted: {CHECKPOINT_FILE}")
     except Exception as e:
         logger.warning(f"Failed to delete temporary files: {e}")
 
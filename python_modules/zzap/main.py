@@ -63,7 +63,7 @@ def main():
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
-        set_script_end(script_name, status="done")
+        set_script_end(script_name, status="done", items=len(updated_files))
         logger.info("ZZAP update completed.")
         TelegramNotifier.notify(f"[ZZAP] Update completed successfully — Duration: {duration:.2f}s")
 